@@ -9,7 +9,6 @@ import collections
 import os
 import bx.intervals.intersection
 import gzip
-import re
 
 
 @click.command()
@@ -90,11 +89,8 @@ def run(genome_file, filter_file, sequence_length, n_positions, max_unk):
                     seen.add((chrom, pos))
                     continue
 
-            # Get sequences.
-            seq = genome.get_sequence_from_coords(chrom, start, end, strand="+").upper()
-
-            # Check number of unknown characters.
-            n_unk = len(re.sub('[ACTG]', '', seq))
+            # Check number of unknown characters without reading the sequence.
+            n_unk = genome.count_unknown(chrom, start, end)
             if n_unk <= max_unk:
                 print(chrom, start, end, sep="\t")
                 break
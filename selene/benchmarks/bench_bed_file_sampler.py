@@ -0,0 +1,152 @@
+"""
+Benchmarks the indexed, chunked `BedFileSampler.sample` against the
+line-by-line reading it replaced and reports the samples per second as
+JSON.
+
+Usage:
+    python benchmarks/bench_bed_file_sampler.py
+        [--fixture-dir DIR] [--n-lines 1000000] [--batch-size 64]
+        [--n-batches 200] [--chunk-size 4096] [--genome-pack]
+        [--output results.json] [--seed 1337]
+
+The genome is the synthetic FASTA file of `bench_genome_access.py`, and
+the BED file has `--n-lines` windows of 1000 bases on its chromosomes,
+each with a few feature indices in its last column. The legacy loop
+reads one line at a time with `readline`, in the order of the file,
+and fetches the sequence of each line with one call. The report
+includes the time taken to build the line index, and the throughput of
+the indexed sampler with and without shuffling. With `--genome-pack`,
+the sequences are read from a genome pack built from the FASTA file,
+which encodes the windows of a batch with a fixed number of array
+operations.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench_genome_access import make_fixtures
+from selene_sdk.samplers.file_samplers import BedFileSampler
+from selene_sdk.samplers.file_samplers.bed_file_sampler import \
+    LINE_INDEX_EXTENSION
+from selene_sdk.samplers.file_samplers.bed_file_sampler import \
+    load_line_index
+from selene_sdk.sequences import Genome
+from selene_sdk.sequences.genome_pack import write_genome_pack
+
+
+def _write_bed(output_dir, rng, n_lines, chrom_length, n_features=100):
+    bed_path = os.path.join(output_dir, "examples_{0}.bed".format(n_lines))
+    chroms = rng.randint(1, 5, size=n_lines)
+    starts = rng.randint(0, chrom_length - 1000, size=n_lines)
+    with open(bed_path, 'w') as file_handle:
+        for chrom, start in zip(chroms, starts):
+            features = ';'.join(str(f) for f in np.unique(
+                rng.randint(0, n_features, size=rng.randint(0, 4))))
+            file_handle.write("chr{0}\t{1}\t{2}\t+\t{3}\n".format(
+                chrom, start, start + 1000, features))
+    return bed_path
+
+
+class _LegacySampler(object):
+
+    def __init__(self, filepath, reference_sequence, n_features):
+        self.filepath = filepath
+        self.file_handle = open(filepath, 'r')
+        self.reference_sequence = reference_sequence
+        self.n_features = n_features
+
+    def sample(self, batch_size):
+        sequences = []
+        targets = []
+        while len(sequences) < batch_size:
+            line = self.file_handle.readline()
+            if not line:
+                self.file_handle.close()
+                self.file_handle = open(self.filepath, 'r')
+                line = self.file_handle.readline()
+            cols = line.split('\t')
+            sequence = self.reference_sequence.get_encoding_from_coords(
+                cols[0], int(cols[1]), int(cols[2]), strand='+')
+            if sequence.shape[0] == 0:
+                continue
+            sequences.append(sequence)
+            tgts = np.zeros((self.n_features))
+            tgts[[int(f) for f in cols[4].strip().split(';') if f]] = 1
+            targets.append(tgts)
+        return np.array(sequences), np.array(targets)
+
+
+def _time_sampler(sample, batch_size, n_batches):
+    sample(batch_size)  # opens the files and loads the indices
+    t_start = time.perf_counter()
+    for _ in range(n_batches):
+        sample(batch_size)
+    seconds = time.perf_counter() - t_start
+    return {"seconds": seconds,
+            "samples_per_s": batch_size * n_batches / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixture-dir", default=None)
+    parser.add_argument("--n-lines", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-batches", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--genome-pack", action="store_true")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or tempfile.mkdtemp()
+    os.makedirs(fixture_dir, exist_ok=True)
+    try:
+        paths = make_fixtures(fixture_dir, seed=args.seed)
+        bed_path = _write_bed(fixture_dir, np.random.RandomState(args.seed),
+                              args.n_lines, 2000000)
+        if os.path.exists(bed_path + LINE_INDEX_EXTENSION):
+            os.remove(bed_path + LINE_INDEX_EXTENSION)
+        t_start = time.perf_counter()
+        load_line_index(bed_path)
+        index_seconds = time.perf_counter() - t_start
+
+        genome_path = paths["genome"]
+        if args.genome_pack:
+            genome_path = paths["genome"] + ".gpack"
+            if not os.path.exists(genome_path) or (
+                    os.path.getmtime(genome_path) <
+                    os.path.getmtime(paths["genome"])):
+                write_genome_pack(paths["genome"], genome_path)
+        genome = Genome(genome_path)
+        records = [dict(implementation="legacy", **_time_sampler(
+            _LegacySampler(bed_path, genome, 100).sample,
+            args.batch_size, args.n_batches))]
+        for shuffle in [False, True]:
+            sampler = BedFileSampler(
+                bed_path, genome, targets_avail=True, n_features=100,
+                random_seed=args.seed, shuffle=shuffle,
+                chunk_size=args.chunk_size)
+            records.append(dict(
+                implementation="indexed", shuffle=shuffle, **_time_sampler(
+                    sampler.sample, args.batch_size, args.n_batches)))
+    finally:
+        if args.fixture_dir is None:
+            shutil.rmtree(fixture_dir)
+
+    report = {"config": vars(args),
+              "index_seconds": index_seconds,
+              "results": records}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
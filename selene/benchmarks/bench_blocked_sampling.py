@@ -0,0 +1,132 @@
+"""
+Compares uniform and locality-blocked sampling in
+`RandomPositionsSampler` and reports, next to the throughput of each
+configuration, how well its batches are mixed, as JSON.
+
+Usage:
+    python benchmarks/bench_blocked_sampling.py
+        [--fixture-dir DIR] [--batch-size 64] [--n-batches 100]
+        [--block-sizes 100000 1000000] [--positions-per-block 64]
+        [--shuffle-buffer-size 256] [--cache-size 2097152]
+        [--entropy-bin-size 1000000] [--targets-in-memory]
+        [--output results.json] [--seed 1337]
+
+The genome is the synthetic FASTA file of `bench_genome_access.py`,
+read through a chunk cache of `--cache-size` bytes, and the targets a
+synthetic annotation file indexed with `pysam`, which must be
+installed. For each configuration (`uniform`, then blocked sampling
+with each of `--block-sizes`), the report includes the samples per
+second, the hit rate of the chunk cache, and the mixing of the batches:
+the mean Shannon entropy (in bits) of the chromosomes of the examples
+of a batch and of their `--entropy-bin-size` genomic bins. Uniform
+sampling gives the reference entropies; a smaller shuffle buffer or
+larger blocks trade mixing for locality.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench_genome_access import make_fixtures
+from bench_genomic_features import _write_synthetic_annotations
+from selene_sdk.samplers import RandomPositionsSampler
+from selene_sdk.sequences import Genome
+
+
+def _entropy(labels):
+    _, counts = np.unique(labels, return_counts=True)
+    frequencies = counts / counts.sum()
+    return float(-np.sum(frequencies * np.log2(frequencies)))
+
+
+def _run(sampler, batch_size, n_batches, entropy_bin_size):
+    sampler.sample(batch_size)  # builds the index of valid positions
+    sampler.reference_sequence.clear_cache()
+    rows = sampler._save_datasets[sampler.mode]
+    del rows[:]
+    chrom_entropies = []
+    bin_entropies = []
+    seconds = 0.
+    for _ in range(n_batches):
+        t_start = time.perf_counter()
+        sampler.sample(batch_size)
+        seconds += time.perf_counter() - t_start
+        chroms = [row[0] for row in rows]
+        bins = ["{0}:{1}".format(row[0], row[1] // entropy_bin_size)
+                for row in rows]
+        chrom_entropies.append(_entropy(chroms))
+        bin_entropies.append(_entropy(bins))
+        del rows[:]
+    cache_info = sampler.reference_sequence.cache_info()
+    return {"seconds": seconds,
+            "samples_per_s": batch_size * n_batches / seconds,
+            "cache_hit_rate": cache_info["hits"] / max(
+                cache_info["hits"] + cache_info["misses"], 1),
+            "chrom_entropy_bits": float(np.mean(chrom_entropies)),
+            "bin_entropy_bits": float(np.mean(bin_entropies))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixture-dir", default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-batches", type=int, default=100)
+    parser.add_argument("--block-sizes", type=int, nargs="+",
+                        default=[100000, 1000000])
+    parser.add_argument("--positions-per-block", type=int, default=64)
+    parser.add_argument("--shuffle-buffer-size", type=int, default=256)
+    parser.add_argument("--cache-size", type=int, default=1 << 21)
+    parser.add_argument("--entropy-bin-size", type=int, default=1000000)
+    parser.add_argument("--targets-in-memory", action="store_true")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or tempfile.mkdtemp()
+    os.makedirs(fixture_dir, exist_ok=True)
+    try:
+        paths = make_fixtures(fixture_dir, seed=args.seed)
+        target_path = _write_synthetic_annotations(
+            fixture_dir, np.random.RandomState(args.seed),
+            chrom_length=2000000)
+        features = ["feature{0}".format(i) for i in range(500)]
+
+        def make_sampler(block_size):
+            return RandomPositionsSampler(
+                Genome(paths["genome"], cache_size=args.cache_size),
+                target_path, features, seed=args.seed,
+                validation_holdout=["chr3"], test_holdout=["chr4"],
+                max_unknown_bases=100,
+                targets_in_memory=args.targets_in_memory,
+                block_size=block_size,
+                positions_per_block=args.positions_per_block,
+                shuffle_buffer_size=args.shuffle_buffer_size,
+                save_datasets=["train"],
+                output_dir=os.path.join(fixture_dir, "sampled"))
+
+        records = []
+        for block_size in [None] + args.block_sizes:
+            record = _run(make_sampler(block_size), args.batch_size,
+                          args.n_batches, args.entropy_bin_size)
+            record["sampling"] = "uniform" if block_size is None else \
+                "blocked"
+            record["block_size"] = block_size
+            records.append(record)
+    finally:
+        if args.fixture_dir is None:
+            shutil.rmtree(fixture_dir)
+
+    report = {"config": vars(args), "results": records}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
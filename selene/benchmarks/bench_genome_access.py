@@ -0,0 +1,407 @@
+"""
+Benchmarks the `Genome` and `Proteome` access paths on synthetic
+FASTA fixtures and reports the timings as JSON.
+
+Usage:
+    python benchmarks/bench_genome_access.py [--output results.json]
+        [--fixture-dir DIR] [--n-chroms 4] [--chrom-length 2000000]
+        [--n-blacklist 200] [--n-windows 1000]
+        [--window-sizes 1000 4095 16384] [--patterns random sorted tiled]
+        [--tile-step 128] [--cache-size 67108864] [--seed 1337]
+
+The fixtures are a genome FASTA file with runs of unknown and
+soft-masked bases, its `.fai` index, a gzip-compressed BED file of
+blacklisted regions and a protein FASTA file. They are written to a
+temporary directory unless `--fixture-dir` is given, in which case
+existing fixtures of the same configuration are reused.
+
+Each timed operation is run on `--n-windows` windows of each size, drawn
+with one of these access patterns:
+
+    random   positions drawn uniformly over the genome
+    sorted   the same random positions, sorted by chromosome and start
+    tiled    consecutive windows `--tile-step` bases apart
+
+and is reported as one JSON record with the `backend`, `operation`,
+`pattern`, `window_size`, `n_windows`, `valid_fraction` (the fraction
+of windows that are not blacklisted), `seconds`, `us_per_window` and
+`mb_per_s` (millions of sequence positions per second). The genome
+backends are the FASTA file (`fasta`), the FASTA file with a chunk
+cache (`fasta_cache`), the FASTA file with an in-memory blacklist
+(`fasta_blacklist`) and a genome pack (`gpack`).
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pyfaidx
+
+from selene_sdk.sequences import Genome
+from selene_sdk.sequences import Proteome
+from selene_sdk.sequences import write_genome_pack
+
+
+_FASTA_LINE_LENGTH = 60
+
+
+def _write_fasta(output_path, sequences):
+    with open(output_path, 'w') as file_handle:
+        for name, sequence in sequences:
+            file_handle.write(">{0}\n".format(name))
+            for i in range(0, len(sequence), _FASTA_LINE_LENGTH):
+                file_handle.write(sequence[i:i + _FASTA_LINE_LENGTH])
+                file_handle.write("\n")
+
+
+def _random_chromosome(rng, length):
+    chars = np.frombuffer(b"ACGTacgtN", dtype=np.uint8)
+    codes = rng.randint(0, 4, size=length)
+    # soft-masked repeats and assembly gaps, as in a real genome
+    for n_runs, offset, max_length in [(length // 5000, 4, 2000),
+                                       (length // 200000, 8, 50000)]:
+        starts = rng.randint(0, length, size=n_runs)
+        lengths = rng.randint(1, max_length, size=n_runs)
+        for start, run_length in zip(starts, lengths):
+            if offset == 8:
+                codes[start:start + run_length] = 8
+            else:
+                codes[start:start + run_length] %= 4
+                codes[start:start + run_length] += offset
+    return chars[codes].tobytes().decode("ascii")
+
+
+def make_fixtures(output_dir,
+                  n_chroms=4,
+                  chrom_length=2000000,
+                  n_blacklist=200,
+                  n_proteins=50,
+                  protein_length=20000,
+                  seed=1337):
+    """
+    Writes the synthetic fixtures, reusing those already in
+    `output_dir` that were written with the same configuration.
+
+    Parameters
+    ----------
+    output_dir : str
+        The directory to write the fixtures to.
+    n_chroms : int, optional
+        Default is 4. The number of chromosomes.
+    chrom_length : int, optional
+        Default is 2000000. The length of each chromosome.
+    n_blacklist : int, optional
+        Default is 200. The number of blacklisted regions.
+    n_proteins : int, optional
+        Default is 50. The number of proteins.
+    protein_length : int, optional
+        Default is 20000. The length of each protein.
+    seed : int, optional
+        Default is 1337. The seed of the fixture generator.
+
+    Returns
+    -------
+    dict
+        The paths of the `genome`, `genome_index`, `blacklist` and
+        `proteome` files.
+
+    """
+    prefix = os.path.join(output_dir, "synthetic_{0}x{1}_{2}".format(
+        n_chroms, chrom_length, seed))
+    paths = {"genome": prefix + ".fasta",
+             "genome_index": prefix + ".fasta.fai",
+             "blacklist": prefix + ".blacklist.bed.gz",
+             "proteome": "{0}_{1}x{2}.faa".format(
+                 prefix, n_proteins, protein_length)}
+    rng = np.random.RandomState(seed)
+    if not os.path.exists(paths["genome_index"]):
+        _write_fasta(paths["genome"], [
+            ("chr{0}".format(i + 1), _random_chromosome(rng, chrom_length))
+            for i in range(n_chroms)])
+        pyfaidx.Faidx(paths["genome"]).close()
+    if not os.path.exists(paths["blacklist"]):
+        with gzip.open(paths["blacklist"], "wt") as file_handle:
+            chroms = rng.randint(0, n_chroms, size=n_blacklist)
+            starts = rng.randint(0, chrom_length, size=n_blacklist)
+            for chrom_index, start in sorted(zip(chroms, starts)):
+                file_handle.write("chr{0}\t{1}\t{2}\n".format(
+                    chrom_index + 1, start,
+                    min(start + rng.randint(100, 5000), chrom_length)))
+    if not os.path.exists(paths["proteome"] + ".fai"):
+        amino_acids = np.frombuffer(
+            Proteome.BASES_ARR.astype(bytes).tobytes(), dtype=np.uint8)
+        _write_fasta(paths["proteome"], [
+            ("prot{0}".format(i + 1),
+             amino_acids[rng.randint(0, len(amino_acids),
+                                     size=protein_length)].tobytes()
+             .decode("ascii"))
+            for i in range(n_proteins)])
+        pyfaidx.Faidx(paths["proteome"]).close()
+    return paths
+
+
+def draw_windows(rng, chrom_lens, window_size, n_windows, pattern,
+                 tile_step=128):
+    """
+    Draws the windows of an access pattern.
+
+    Parameters
+    ----------
+    rng : numpy.random.RandomState
+        The random number generator.
+    chrom_lens : list(tuple(str, int))
+        The name and length of each chromosome.
+    window_size : int
+        The length of each window.
+    n_windows : int
+        The number of windows.
+    pattern : {'random', 'sorted', 'tiled'}
+        The access pattern.
+    tile_step : int, optional
+        Default is 128. The distance between consecutive tiled windows.
+        Tiled windows wrap around to the start of the chromosome when
+        they reach its end.
+
+    Returns
+    -------
+    chroms, starts, ends : tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        The chromosome, start and end of each window.
+
+    """
+    names = np.array([name for name, _ in chrom_lens])
+    max_starts = np.array([length - window_size for _, length in chrom_lens])
+    if pattern == "tiled":
+        chrom_index = rng.randint(len(names))
+        n_starts = max_starts[chrom_index] + 1
+        starts = (rng.randint(n_starts) +
+                  tile_step * np.arange(n_windows)) % n_starts
+        chrom_indices = np.full(n_windows, chrom_index)
+    elif pattern in ("random", "sorted"):
+        chrom_indices = rng.choice(
+            len(names), size=n_windows, p=max_starts / max_starts.sum())
+        starts = (rng.random_sample(n_windows) *
+                  max_starts[chrom_indices]).astype(np.int64)
+        if pattern == "sorted":
+            order = np.lexsort((starts, chrom_indices))
+            chrom_indices, starts = chrom_indices[order], starts[order]
+    else:
+        raise ValueError(
+            "Unknown access pattern {0}.".format(pattern))
+    return names[chrom_indices], starts, starts + window_size
+
+
+def _time(fn):
+    t_start = time.perf_counter()
+    fn()
+    return time.perf_counter() - t_start
+
+
+def _record(backend, operation, pattern, window_size, n_windows, seconds,
+            valid_fraction=1.):
+    return {"backend": backend,
+            "operation": operation,
+            "pattern": pattern,
+            "window_size": window_size,
+            "n_windows": n_windows,
+            "valid_fraction": valid_fraction,
+            "seconds": seconds,
+            "us_per_window": seconds / n_windows * 1e6,
+            "mb_per_s": window_size * n_windows / seconds / 1e6}
+
+
+def _genome_operations(genome, chroms, starts, ends):
+    """
+    Gets the timed operations of a genome backend as (name, function)
+    pairs.
+    """
+    windows = list(zip(chroms.tolist(), starts.tolist(), ends.tolist()))
+
+    def per_window(method, strand):
+        def run():
+            for chrom, start, end in windows:
+                method(chrom, start, end, strand=strand)
+        return run
+
+    return [
+        ("get_sequence_from_coords+",
+         per_window(genome.get_sequence_from_coords, '+')),
+        ("get_sequence_from_coords-",
+         per_window(genome.get_sequence_from_coords, '-')),
+        ("get_encoding_from_coords+",
+         per_window(genome.get_encoding_from_coords, '+')),
+        ("get_encoding_from_coords-",
+         per_window(genome.get_encoding_from_coords, '-')),
+        ("get_encodings_from_coords",
+         lambda: genome.get_encodings_from_coords(chroms, starts, ends)),
+    ]
+
+
+def _encoder_operations(sequences):
+    """
+    Gets the timed operations of the sequence encoders, which do not
+    depend on the backend.
+    """
+    encodings = Genome.sequence_to_encoding(sequences)
+    indices = Genome.sequence_to_indices(sequences)
+    return [
+        ("sequence_to_encoding",
+         lambda: Genome.sequence_to_encoding(sequences)),
+        ("sequence_to_indices",
+         lambda: Genome.sequence_to_indices(sequences)),
+        ("indices_to_encoding",
+         lambda: Genome.indices_to_encoding(indices)),
+        ("encoding_to_sequence",
+         lambda: Genome.encoding_to_sequence(encodings)),
+        ("get_reverse_encoding",
+         lambda: Genome.get_reverse_encoding(encodings)),
+    ]
+
+
+def run_benchmarks(paths,
+                   window_sizes=(1000, 4095, 16384),
+                   patterns=("random", "sorted", "tiled"),
+                   n_windows=1000,
+                   tile_step=128,
+                   cache_size=1 << 26,
+                   seed=1337):
+    """
+    Times every operation of every backend on every combination of
+    window size and access pattern.
+
+    Parameters
+    ----------
+    paths : dict
+        The fixture paths returned by `make_fixtures`.
+    window_sizes : list(int), optional
+        Default is (1000, 4095, 16384). The window sizes to time.
+    patterns : list(str), optional
+        Default is ('random', 'sorted', 'tiled'). The access patterns to
+        time.
+    n_windows : int, optional
+        Default is 1000. The number of windows per timing.
+    tile_step : int, optional
+        Default is 128. The distance between consecutive tiled windows.
+    cache_size : int, optional
+        Default is 64 MiB. The chunk cache budget of the `fasta_cache`
+        backend.
+    seed : int, optional
+        Default is 1337. The seed used to draw the windows.
+
+    Returns
+    -------
+    list(dict)
+        One record per timing (see the module docstring).
+
+    """
+    pack_path = paths["genome"] + ".gpack"
+    if not os.path.exists(pack_path) or (
+            os.path.getmtime(pack_path) < os.path.getmtime(paths["genome"])):
+        write_genome_pack(paths["genome"], pack_path)
+    backends = [
+        ("fasta", Genome(paths["genome"])),
+        ("fasta_cache", Genome(paths["genome"], cache_size=cache_size)),
+        ("fasta_blacklist",
+         Genome(paths["genome"], blacklist_regions=paths["blacklist"])),
+        ("gpack", Genome(pack_path)),
+    ]
+    proteome = Proteome(paths["proteome"])
+    chrom_lens = backends[0][1].get_chr_lens()
+    proteome_length = min(length for _, length in proteome.get_prot_lens())
+
+    records = []
+    for window_size in window_sizes:
+        for pattern in patterns:
+            rng = np.random.RandomState(seed)
+            chroms, starts, ends = draw_windows(
+                rng, chrom_lens, window_size, n_windows, pattern,
+                tile_step=tile_step)
+            for backend, genome in backends:
+                _, valid = genome.get_encodings_from_coords(
+                    chroms, starts, ends)
+                genome.clear_cache()
+                for operation, run in _genome_operations(
+                        genome, chroms, starts, ends):
+                    records.append(_record(
+                        backend, operation, pattern, window_size,
+                        n_windows, _time(run),
+                        valid_fraction=float(valid.mean())))
+            if window_size > proteome_length:
+                continue
+            prot_chroms, prot_starts, prot_ends = draw_windows(
+                rng, proteome.get_prot_lens(), window_size, n_windows,
+                pattern, tile_step=tile_step)
+            prot_windows = list(zip(prot_chroms.tolist(),
+                                    prot_starts.tolist(),
+                                    prot_ends.tolist()))
+
+            def proteome_encodings():
+                for prot, start, end in prot_windows:
+                    proteome.get_encoding_from_coords(prot, start, end)
+
+            records.append(_record(
+                "proteome", "get_encoding_from_coords", pattern,
+                window_size, n_windows, _time(proteome_encodings)))
+        sequences = [backends[0][1].get_sequence_from_coords(c, s, e)
+                     for c, s, e in zip(chroms, starts, ends)]
+        for operation, run in _encoder_operations(sequences):
+            records.append(_record(
+                "numpy", operation, None, window_size, n_windows,
+                _time(run)))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--fixture-dir", default=None)
+    parser.add_argument("--n-chroms", type=int, default=4)
+    parser.add_argument("--chrom-length", type=int, default=2000000)
+    parser.add_argument("--n-blacklist", type=int, default=200)
+    parser.add_argument("--n-windows", type=int, default=1000)
+    parser.add_argument("--window-sizes", type=int, nargs="+",
+                        default=[1000, 4095, 16384])
+    parser.add_argument("--patterns", nargs="+",
+                        choices=["random", "sorted", "tiled"],
+                        default=["random", "sorted", "tiled"])
+    parser.add_argument("--tile-step", type=int, default=128)
+    parser.add_argument("--cache-size", type=int, default=1 << 26)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or tempfile.mkdtemp()
+    try:
+        paths = make_fixtures(fixture_dir,
+                              n_chroms=args.n_chroms,
+                              chrom_length=args.chrom_length,
+                              n_blacklist=args.n_blacklist,
+                              seed=args.seed)
+        records = run_benchmarks(paths,
+                                 window_sizes=args.window_sizes,
+                                 patterns=args.patterns,
+                                 n_windows=args.n_windows,
+                                 tile_step=args.tile_step,
+                                 cache_size=args.cache_size,
+                                 seed=args.seed)
+    finally:
+        if args.fixture_dir is None:
+            shutil.rmtree(fixture_dir)
+
+    report = {"config": vars(args),
+              "python": platform.python_version(),
+              "numpy": np.__version__,
+              "pyfaidx": pyfaidx.__version__,
+              "results": records}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
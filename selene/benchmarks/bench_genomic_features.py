@@ -0,0 +1,180 @@
+"""
+Benchmarks the tabix, in-memory and label track backends of
+`GenomicFeatures`, checks that they produce the same targets, and
+reports the timings and the memory used by the in-memory backends as
+JSON.
+
+Usage:
+    python benchmarks/bench_genomic_features.py [--input data.bed.gz]
+        [--features distinct_features.txt] [--n-windows 2000]
+        [--sequence-length 1000] [--bin-size 200] [--step-size 100]
+        [--batch-size 64] [--n-threads 0] [--output results.json]
+        [--seed 1337]
+
+`--input` is a tabix-indexed BED file such as `sorted_data.all.bed.gz`,
+and `--features` the file listing its features, one per line (by
+default, every feature in the file). Without `--input`, a synthetic
+annotation file is written and indexed with `pysam`, which must then be
+installed.
+
+The windows are drawn uniformly from the chromosomes in the file. The
+report includes, for each backend, the time to load it, the windows and
+bin queries per second of `get_feature_data` and of
+`get_feature_data_batch` on batches of `--batch-size` windows (built
+in `--n-threads` threads by the compiled extension, if it is built),
+and for the in-memory
+backends the size of their arrays and the peak memory allocated while
+loading them. The label track is built on first use and saved next to
+the input file, so the first run reports its build time.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from selene_sdk.targets import GenomicFeatures
+
+
+def _write_synthetic_annotations(output_dir, rng, n_chroms=4,
+                                 chrom_length=5000000, n_features=500,
+                                 n_rows=200000):
+    import pysam
+    bed_path = os.path.join(output_dir, "synthetic.bed")
+    chroms = np.sort(rng.randint(0, n_chroms, size=n_rows))
+    starts = rng.randint(0, chrom_length, size=n_rows)
+    ends = starts + rng.geometric(1 / 300., size=n_rows)
+    order = np.lexsort((starts, chroms))
+    rows = pd.DataFrame({
+        "chrom": np.char.add("chr", (chroms[order] + 1).astype(str)),
+        "start": starts[order],
+        "end": ends[order],
+        "feature": np.char.add(
+            "feature", rng.randint(0, n_features, size=n_rows).astype(str))})
+    rows.to_csv(bed_path, sep='\t', header=False, index=False)
+    return pysam.tabix_index(bed_path, preset="bed", force=True)
+
+
+def _read_extents(input_path):
+    rows = pd.read_csv(input_path, sep='\t', header=None, usecols=[0, 2, 3],
+                       names=["chrom", "end", "feature"],
+                       dtype={"chrom": str, "end": np.int64, "feature": str})
+    extents = rows.groupby("chrom", sort=True)["end"].max()
+    return (list(extents.index), extents.values,
+            sorted(rows["feature"].unique()))
+
+
+def _time_backend(backend, input_path, features, windows, bin_size,
+                  step_size, batch_size, n_threads):
+    targets = GenomicFeatures(input_path, features, bin_size, step_size,
+                              in_memory=backend == "in_memory",
+                              use_label_track=backend == "label_track",
+                              n_threads=n_threads)
+    t_start = time.perf_counter()
+    tracemalloc.start()
+    targets.get_feature_data(*windows[0])  # opens or loads the backend
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t_load = time.perf_counter() - t_start
+
+    t_start = time.perf_counter()
+    results = [targets.get_feature_data(*window) for window in windows]
+    seconds = time.perf_counter() - t_start
+    n_bins = len(results[0]) // len(features)
+
+    chroms, starts, ends = [np.array(column) for column in zip(*windows)]
+    t_start = time.perf_counter()
+    batch_results = [
+        targets.get_feature_data_batch(chroms[i:i + batch_size],
+                                       starts[i:i + batch_size],
+                                       ends[i:i + batch_size])
+        for i in range(0, len(windows), batch_size)]
+    batch_seconds = time.perf_counter() - t_start
+    if not np.array_equal(np.concatenate(batch_results), np.stack(results)):
+        raise AssertionError(
+            "get_feature_data_batch and get_feature_data differ for the "
+            "{0} backend.".format(backend))
+    record = {"backend": backend,
+              "load_seconds": t_load,
+              "seconds": seconds,
+              "windows_per_s": len(windows) / seconds,
+              "queries_per_s": len(windows) * n_bins / seconds,
+              "batch_seconds": batch_seconds,
+              "batch_windows_per_s": len(windows) / batch_seconds}
+    if backend == "in_memory":
+        record["index_bytes"] = targets._index.nbytes
+        record["load_peak_bytes"] = peak
+    elif backend == "label_track":
+        record["index_bytes"] = targets._label_track.nbytes
+        record["load_peak_bytes"] = peak
+    return record, np.stack(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", default=None)
+    parser.add_argument("--features", default=None)
+    parser.add_argument("--n-windows", type=int, default=2000)
+    parser.add_argument("--sequence-length", type=int, default=1000)
+    parser.add_argument("--bin-size", type=int, default=200)
+    parser.add_argument("--step-size", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-threads", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(args.seed)
+    tmp_dir = None
+    input_path = args.input
+    if input_path is None:
+        tmp_dir = tempfile.mkdtemp()
+        input_path = _write_synthetic_annotations(tmp_dir, rng)
+    try:
+        chroms, chrom_ends, file_features = _read_extents(input_path)
+        features = file_features
+        if args.features is not None:
+            with open(args.features) as file_handle:
+                features = [line.strip() for line in file_handle]
+        chrom_index = rng.choice(
+            len(chroms), size=args.n_windows,
+            p=chrom_ends / chrom_ends.sum())
+        starts = (rng.random_sample(args.n_windows) *
+                  (chrom_ends[chrom_index] - args.sequence_length)).astype(
+                      np.int64)
+        windows = [(chroms[c], int(s), int(s) + args.sequence_length)
+                   for c, s in zip(chrom_index, starts)]
+
+        records = []
+        targets = []
+        for backend in ["tabix", "in_memory", "label_track"]:
+            record, backend_targets = _time_backend(
+                backend, input_path, features, windows, args.bin_size,
+                args.step_size, args.batch_size, args.n_threads)
+            records.append(record)
+            targets.append(backend_targets)
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir)
+
+    report = {"config": vars(args),
+              "n_features": len(features),
+              "identical_targets": all(
+                  np.array_equal(targets[0], backend_targets)
+                  for backend_targets in targets[1:]),
+              "positive_fraction": float(targets[0].mean()),
+              "results": records}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
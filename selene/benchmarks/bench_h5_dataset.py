@@ -0,0 +1,176 @@
+"""
+Benchmarks a pass over an HDF5 file with `H5DataLoader`, reading each
+example with one call against reading each mini-batch from a buffered
+read window, and reports the samples per second as JSON.
+
+Usage:
+    python benchmarks/bench_h5_dataset.py
+        [--fixture-dir DIR] [--n-examples 64000] [--sequence-length 1000]
+        [--n-features 919] [--batch-size 64] [--buffer-size 4096]
+        [--num-workers 0] [--unpackbits] [--unpack-device DEVICE]
+        [--output results.json] [--seed 1337]
+
+The file holds `--n-examples` random one-hot sequences and sparse
+targets, chunked along the examples and compressed, and packed with
+`numpy.packbits` with `--unpackbits`. Each configuration makes one
+pass over the file, in the order of the file (as for validation) and
+shuffled. With `--unpackbits`, the loader unpacks the mini-batches in
+the main process (on `--unpack-device` if given), and the report also
+compares unpacking a mini-batch with `numpy.unpackbits` and float64
+temporaries, as `H5Dataset` did for each example, against
+`selene_sdk.utils.unpack_sequence_bits`, and gives the bytes of a
+mini-batch that cross from the workers packed and as float32.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import h5py
+import numpy as np
+import torch
+
+from selene_sdk.samplers.file_samplers import H5DataLoader
+from selene_sdk.utils import unpack_sequence_bits
+from selene_sdk.utils import unpack_target_bits
+
+
+def _write_h5(output_dir, rng, n_examples, sequence_length, n_features,
+              unpackbits):
+    file_path = os.path.join(output_dir, "examples_{0}{1}.h5".format(
+        n_examples, "_packed" if unpackbits else ""))
+    if os.path.exists(file_path):
+        return file_path
+    sequences = None
+    with h5py.File(file_path, 'w') as db:
+        for start in range(0, n_examples, 4096):
+            end = min(start + 4096, n_examples)
+            bases = rng.randint(0, 4, size=(end - start, sequence_length))
+            seqs = (bases[..., None] == np.arange(4)).astype(np.uint8)
+            tgts = (rng.rand(end - start, n_features) < 0.02).astype(
+                np.uint8)
+            if unpackbits:
+                seqs = np.packbits(seqs, axis=-2)
+                tgts = np.packbits(tgts, axis=-1)
+            if sequences is None:
+                sequences = db.create_dataset(
+                    "sequences", (n_examples,) + seqs.shape[1:],
+                    dtype=np.uint8, chunks=(64,) + seqs.shape[1:],
+                    compression="gzip", compression_opts=1)
+                targets = db.create_dataset(
+                    "targets", (n_examples,) + tgts.shape[1:],
+                    dtype=np.uint8, chunks=(64,) + tgts.shape[1:],
+                    compression="gzip", compression_opts=1)
+            sequences[start:end] = seqs
+            targets[start:end] = tgts
+        db.create_dataset("sequences_length", data=sequence_length)
+        db.create_dataset("targets_length", data=n_features)
+    return file_path
+
+
+def _time_pass(loader):
+    t_start = time.perf_counter()
+    n_examples = 0
+    for sequences, _ in loader:
+        n_examples += len(sequences)
+    seconds = time.perf_counter() - t_start
+    return {"seconds": seconds, "samples_per_s": n_examples / seconds}
+
+
+def _numpy_unpack(sequences, targets, s_len, t_len):
+    sequences = np.unpackbits(sequences, axis=-2)
+    nulls = np.sum(sequences, axis=-1) == 4
+    sequences = sequences.astype(float)
+    sequences[nulls, :] = 0.25
+    targets = np.unpackbits(targets, axis=-1).astype(float)
+    return (torch.from_numpy(sequences[:, :s_len].astype(np.float32)),
+            torch.from_numpy(targets[:, :t_len].astype(np.float32)))
+
+
+def _torch_unpack(sequences, targets, s_len, t_len, device):
+    sequences = torch.from_numpy(sequences).to(device)
+    targets = torch.from_numpy(targets).to(device)
+    return (unpack_sequence_bits(sequences, s_len),
+            unpack_target_bits(targets, t_len))
+
+
+def _time_unpack(file_path, batch_size, device, n_repeats=50):
+    with h5py.File(file_path, 'r') as db:
+        sequences = db["sequences"][:batch_size]
+        targets = db["targets"][:batch_size]
+        s_len = int(db["sequences_length"][()])
+        t_len = int(db["targets_length"][()])
+    records = {}
+    for name, unpack in [
+            ("numpy", lambda: _numpy_unpack(sequences, targets,
+                                            s_len, t_len)),
+            ("torch", lambda: _torch_unpack(sequences, targets,
+                                            s_len, t_len, device))]:
+        unpack()
+        t_start = time.perf_counter()
+        for _ in range(n_repeats):
+            outputs = unpack()
+        if outputs[0].is_cuda:
+            torch.cuda.synchronize()
+        records[name + "_ms_per_batch"] = (
+            1000 * (time.perf_counter() - t_start) / n_repeats)
+    records["packed_bytes_per_batch"] = sequences.nbytes + targets.nbytes
+    records["float32_bytes_per_batch"] = 4 * batch_size * (
+        s_len * sequences.shape[-1] + t_len)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixture-dir", default=None)
+    parser.add_argument("--n-examples", type=int, default=64000)
+    parser.add_argument("--sequence-length", type=int, default=1000)
+    parser.add_argument("--n-features", type=int, default=919)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--buffer-size", type=int, default=4096)
+    parser.add_argument("--num-workers", type=int, default=0)
+    parser.add_argument("--unpackbits", action="store_true")
+    parser.add_argument("--unpack-device", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or tempfile.mkdtemp()
+    os.makedirs(fixture_dir, exist_ok=True)
+    try:
+        file_path = _write_h5(
+            fixture_dir, np.random.RandomState(args.seed), args.n_examples,
+            args.sequence_length, args.n_features, args.unpackbits)
+        records = []
+        for buffer_size in [None, args.buffer_size]:
+            for shuffle in [False, True]:
+                loader = H5DataLoader(
+                    file_path, num_workers=args.num_workers,
+                    batch_size=args.batch_size, shuffle=shuffle,
+                    unpackbits=args.unpackbits, buffer_size=buffer_size,
+                    unpack_device=args.unpack_device)
+                records.append(dict(
+                    implementation="per_example" if buffer_size is None
+                    else "windowed", shuffle=shuffle, **_time_pass(loader)))
+        unpack = None
+        if args.unpackbits:
+            unpack = _time_unpack(file_path, args.batch_size,
+                                  args.unpack_device or "cpu")
+    finally:
+        if args.fixture_dir is None:
+            shutil.rmtree(fixture_dir)
+
+    report = {"config": vars(args), "results": records}
+    if unpack is not None:
+        report["unpack"] = unpack
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmarks drawing windows from many intervals with `IntervalsSampler`
+against the interval cache it replaced and reports the draws per second
+as JSON.
+
+Usage:
+    python benchmarks/bench_intervals_sampler.py
+        [--fixture-dir DIR] [--n-intervals 1000000] [--batch-size 64]
+        [--n-batches 200] [--targets-in-memory]
+        [--output results.json] [--seed 1337]
+
+The genome is the synthetic FASTA file of `bench_genome_access.py`, the
+targets a synthetic annotation file indexed with `pysam`, which must be
+installed, and the intervals `--n-intervals` random intervals of 100 to
+2000 bases on its chromosomes. The legacy draws refill a cache of one
+interval index per interval with `numpy.random.choice` weighted by the
+interval lengths whenever it runs out, then look up each drawn interval
+in lists of tuples and draw its position with `random.uniform`; the
+report includes the time one refill stalls sampling. The indexed draws
+are those of `IntervalsSampler._draw_windows`, and the report also
+includes the samples per second of `IntervalsSampler.sample` and the
+time taken to read and partition the intervals.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench_genome_access import make_fixtures
+from bench_genomic_features import _write_synthetic_annotations
+from selene_sdk.samplers import IntervalsSampler
+from selene_sdk.sequences import Genome
+
+
+def _write_intervals(output_dir, rng, n_intervals, chrom_length):
+    intervals_path = os.path.join(
+        output_dir, "intervals_{0}.bed".format(n_intervals))
+    chroms = rng.randint(1, 5, size=n_intervals)
+    lengths = rng.randint(100, 2000, size=n_intervals)
+    starts = rng.randint(1000, chrom_length - 3000, size=n_intervals)
+    with open(intervals_path, 'w') as file_handle:
+        for chrom, start, length in zip(chroms, starts, lengths):
+            file_handle.write("chr{0}\t{1}\t{2}\n".format(
+                chrom, start, start + length))
+    return intervals_path
+
+
+class _LegacyDraws(object):
+
+    def __init__(self, sampler):
+        sample_intervals = sampler._sample_from_mode[sampler.mode]
+        self.intervals = sampler.sample_from_intervals
+        self.lengths = sampler.interval_lengths.tolist()
+        self.indices = sample_intervals.indices.tolist()
+        lengths = np.array(self.lengths)[self.indices]
+        self.weights = (lengths / float(np.sum(lengths))).tolist()
+        self.cache = []
+        self.next = 0
+        self.refill_seconds = []
+
+    def __call__(self, n_windows):
+        windows = []
+        for _ in range(n_windows):
+            if self.next >= len(self.cache):
+                t_start = time.perf_counter()
+                self.cache = np.random.choice(
+                    self.indices, size=len(self.indices), replace=True,
+                    p=self.weights)
+                self.next = 0
+                self.refill_seconds.append(time.perf_counter() - t_start)
+            index = self.cache[self.next]
+            self.next += 1
+            chrom, start, _ = self.intervals[index]
+            windows.append((chrom, int(
+                start + random.uniform(0, 1) * self.lengths[index])))
+        return windows
+
+
+def _time_draws(draw, batch_size, n_batches):
+    t_start = time.perf_counter()
+    for _ in range(n_batches):
+        draw(batch_size)
+    seconds = time.perf_counter() - t_start
+    return {"seconds": seconds,
+            "draws_per_s": batch_size * n_batches / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixture-dir", default=None)
+    parser.add_argument("--n-intervals", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-batches", type=int, default=200)
+    parser.add_argument("--targets-in-memory", action="store_true")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or tempfile.mkdtemp()
+    os.makedirs(fixture_dir, exist_ok=True)
+    try:
+        paths = make_fixtures(fixture_dir, seed=args.seed)
+        rng = np.random.RandomState(args.seed)
+        target_path = _write_synthetic_annotations(
+            fixture_dir, rng, chrom_length=2000000)
+        intervals_path = _write_intervals(
+            fixture_dir, rng, args.n_intervals, 2000000)
+        features = ["feature{0}".format(i) for i in range(500)]
+
+        t_start = time.perf_counter()
+        sampler = IntervalsSampler(
+            Genome(paths["genome"]), target_path, features, intervals_path,
+            sample_negative=True, seed=args.seed,
+            validation_holdout=["chr3"], test_holdout=["chr4"],
+            targets_in_memory=args.targets_in_memory, save_datasets=[])
+        build_seconds = time.perf_counter() - t_start
+
+        legacy_draws = _LegacyDraws(sampler)
+        records = [
+            dict(implementation="legacy", **_time_draws(
+                legacy_draws, args.batch_size, args.n_batches)),
+            dict(implementation="indexed", **_time_draws(
+                sampler._draw_windows, args.batch_size, args.n_batches))]
+        records[0]["max_refill_seconds"] = max(legacy_draws.refill_seconds)
+
+        sampler.sample(args.batch_size)  # opens the files
+        t_start = time.perf_counter()
+        for _ in range(args.n_batches):
+            sampler.sample(args.batch_size)
+        sample_seconds = time.perf_counter() - t_start
+    finally:
+        if args.fixture_dir is None:
+            shutil.rmtree(fixture_dir)
+
+    report = {"config": vars(args),
+              "build_seconds": build_seconds,
+              "sample_samples_per_s": (args.batch_size * args.n_batches /
+                                       sample_seconds),
+              "speedup": (records[1]["draws_per_s"] /
+                          records[0]["draws_per_s"]),
+              "results": records}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
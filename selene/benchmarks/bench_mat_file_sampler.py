@@ -0,0 +1,158 @@
+"""
+Benchmarks sampling from a MATLAB v7.3 (HDF5) `*.mat` file with the
+chunked `MatFileSampler.sample` against the indexing it replaced and
+reports the startup time, memory and samples per second as JSON.
+
+Usage:
+    python benchmarks/bench_mat_file_sampler.py
+        [--fixture-dir DIR] [--n-samples 50000] [--sequence-length 1000]
+        [--n-features 919] [--batch-size 64] [--n-batches 200]
+        [--chunk-size 4096] [--output results.json] [--seed 1337]
+
+The file mimics the DeepSEA training set: MATLAB stores the matrices
+transposed, so the sequences are a `sequence_length x 4 x n_samples`
+dataset and the targets a `n_features x n_samples` dataset, chunked
+along the last axis and compressed. The legacy sampler indexes the
+datasets with the sorted indices of each mini-batch, drawn from a
+shuffled list of every index, as `MatFileSampler` did; the in-memory
+sampler reads the whole matrices first, as it did for the files
+`scipy.io.loadmat` can load. The memory is the growth of the resident
+set size of the process from before the sampler is constructed to the
+end of sampling.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from selene_sdk.samplers.file_samplers import MatFileSampler
+
+
+def _write_mat(output_dir, rng, n_samples, sequence_length, n_features):
+    mat_path = os.path.join(output_dir, "train_{0}x{1}.mat".format(
+        n_samples, sequence_length))
+    if os.path.exists(mat_path):
+        return mat_path
+    with h5py.File(mat_path, 'w', userblock_size=512) as file_handle:
+        sequences = file_handle.create_dataset(
+            "trainxdata", (sequence_length, 4, n_samples), dtype=np.uint8,
+            chunks=(sequence_length, 4, 64), compression="gzip",
+            compression_opts=1)
+        targets = file_handle.create_dataset(
+            "traindata", (n_features, n_samples), dtype=np.uint8,
+            chunks=(n_features, 64), compression="gzip", compression_opts=1)
+        for start in range(0, n_samples, 4096):
+            end = min(start + 4096, n_samples)
+            bases = rng.randint(0, 4, size=(sequence_length, end - start))
+            sequences[:, :, start:end] = (
+                bases[:, None, :] == np.arange(4)[None, :, None])
+            targets[:, start:end] = rng.rand(n_features, end - start) < 0.02
+    return mat_path
+
+
+def _rss_bytes():
+    with open("/proc/self/statm") as file_handle:
+        return int(file_handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class _LegacySampler(object):
+
+    def __init__(self, mat_path, in_memory=False):
+        self.mat = h5py.File(mat_path, 'r')
+        self.sequences = self.mat["trainxdata"]
+        self.targets = self.mat["traindata"]
+        if in_memory:
+            self.sequences = np.asarray(self.sequences)
+            self.targets = np.asarray(self.targets)
+        self.indices = np.arange(self.sequences.shape[2]).tolist()
+        np.random.shuffle(self.indices)
+        self.next = 0
+
+    def sample(self, batch_size):
+        if self.next + batch_size >= len(self.indices):
+            np.random.shuffle(self.indices)
+            self.next = 0
+        use_indices = sorted(self.indices[self.next:self.next + batch_size])
+        self.next += batch_size
+        sequences = np.transpose(
+            self.sequences[:, :, use_indices], (2, 0, 1))
+        targets = np.transpose(self.targets[:, use_indices], (1, 0))
+        return sequences, targets
+
+
+def _time_sampler(make_sampler, batch_size, n_batches):
+    gc.collect()
+    rss_start = _rss_bytes()
+    t_start = time.perf_counter()
+    sampler = make_sampler()
+    startup_seconds = time.perf_counter() - t_start
+    t_start = time.perf_counter()
+    for _ in range(n_batches):
+        sampler.sample(batch_size)
+    seconds = time.perf_counter() - t_start
+    record = {"startup_seconds": startup_seconds,
+              "seconds": seconds,
+              "samples_per_s": batch_size * n_batches / seconds,
+              "rss_growth_mb": (_rss_bytes() - rss_start) / 2 ** 20}
+    del sampler
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixture-dir", default=None)
+    parser.add_argument("--n-samples", type=int, default=50000)
+    parser.add_argument("--sequence-length", type=int, default=1000)
+    parser.add_argument("--n-features", type=int, default=919)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-batches", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or tempfile.mkdtemp()
+    os.makedirs(fixture_dir, exist_ok=True)
+    try:
+        mat_path = _write_mat(
+            fixture_dir, np.random.RandomState(args.seed), args.n_samples,
+            args.sequence_length, args.n_features)
+        records = []
+        for shuffle in [False, True]:
+            records.append(dict(
+                implementation="chunked", shuffle=shuffle, **_time_sampler(
+                    lambda: MatFileSampler(
+                        mat_path, "trainxdata", targets_key="traindata",
+                        random_seed=args.seed, shuffle=shuffle,
+                        sequence_batch_axis=2, sequence_alphabet_axis=1,
+                        targets_batch_axis=1, chunk_size=args.chunk_size),
+                    args.batch_size, args.n_batches)))
+        records.append(dict(implementation="legacy", **_time_sampler(
+            lambda: _LegacySampler(mat_path),
+            args.batch_size, args.n_batches)))
+        records.append(dict(implementation="in_memory", **_time_sampler(
+            lambda: _LegacySampler(mat_path, in_memory=True),
+            args.batch_size, args.n_batches)))
+    finally:
+        if args.fixture_dir is None:
+            shutil.rmtree(fixture_dir)
+
+    report = {"config": vars(args),
+              "file_mb": None if args.fixture_dir is None else
+              os.path.getsize(mat_path) / 2 ** 20,
+              "results": records}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
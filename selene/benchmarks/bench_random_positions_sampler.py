@@ -0,0 +1,172 @@
+"""
+Benchmarks the batched `RandomPositionsSampler.sample` against the
+per-example loop it replaced and reports the samples per second as
+JSON.
+
+Usage:
+    python benchmarks/bench_random_positions_sampler.py
+        [--fixture-dir DIR] [--batch-size 64] [--n-batches 50]
+        [--sequence-length 1000] [--bin-size 200] [--step-size 100]
+        [--max-unknown-bases 100] [--targets-in-memory]
+        [--output results.json] [--seed 1337]
+
+The genome is the synthetic FASTA file of `bench_genome_access.py`
+(written to `--fixture-dir`, or a temporary directory), and the targets
+a synthetic annotation file indexed with `pysam`, which must be
+installed. The legacy loop draws one window at a time from whole
+chromosomes, taking its chromosome from a cache of 200000 draws weighted
+by chromosome length that is refilled when it runs out (the sampler's
+former `_randcache`) and its position and strand with
+`np.random.randint` and `random.randint`. It rejects the windows with
+too many unknown bases, and fetches the sequence and
+targets of the others with one call each. The report includes the
+fraction of drawn windows each implementation rejected.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench_genome_access import make_fixtures
+from bench_genomic_features import _write_synthetic_annotations
+from selene_sdk.samplers import RandomPositionsSampler
+from selene_sdk.sequences import Genome
+
+
+_RANDCACHE_SIZE = 200000
+
+
+def _legacy_sample(sampler, batch_size, counts, randcache):
+    sequences = None
+    targets = None
+    n_samples_drawn = 0
+    sample_indices = sampler._sample_from_mode[sampler.mode]
+    while n_samples_drawn < batch_size:
+        if randcache["sample_next"] == len(randcache["cache_indices"]):
+            randcache["cache_indices"] = np.random.choice(
+                sample_indices.indices, size=_RANDCACHE_SIZE,
+                replace=True, p=sample_indices.weights)
+            randcache["sample_next"] = 0
+        interval_index = randcache["cache_indices"][randcache["sample_next"]]
+        randcache["sample_next"] += 1
+        chrom, low, high = sampler.sample_from_intervals[interval_index]
+        position = int(np.random.randint(low, high))
+
+        bin_start = position - sampler._start_radius
+        bin_end = position + sampler._end_radius
+        window_start = bin_start - sampler._start_surrounding_sequence_radius
+        window_end = bin_end + sampler._end_surrounding_sequence_radius
+        counts["drawn"] += 1
+        if sampler._exceeds_max_unknown_bases(chrom, window_start,
+                                              window_end):
+            counts["rejected"] += 1
+            continue
+        strand = sampler.STRAND_SIDES[random.randint(0, 1)]
+        seq = sampler._get_sequence(chrom, window_start, window_end, strand)
+        if seq.shape[0] < sampler.sequence_length:
+            counts["rejected"] += 1
+            continue
+        seq_targets = sampler.target.get_feature_data(
+            chrom, bin_start, bin_end)
+        if sequences is None:
+            sequences = np.zeros((batch_size,) + seq.shape)
+            targets = np.zeros((batch_size, len(seq_targets)))
+        sequences[n_samples_drawn] = seq
+        targets[n_samples_drawn] = seq_targets
+        n_samples_drawn += 1
+    return sequences, targets
+
+
+def _time_sampler(sample, batch_size, n_batches):
+    sample(batch_size)  # opens the files and builds the indices
+    t_start = time.perf_counter()
+    for _ in range(n_batches):
+        sample(batch_size)
+    seconds = time.perf_counter() - t_start
+    return {"seconds": seconds,
+            "samples_per_s": batch_size * n_batches / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixture-dir", default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-batches", type=int, default=50)
+    parser.add_argument("--sequence-length", type=int, default=1000)
+    parser.add_argument("--bin-size", type=int, default=200)
+    parser.add_argument("--step-size", type=int, default=100)
+    parser.add_argument("--max-unknown-bases", type=int, default=100)
+    parser.add_argument("--targets-in-memory", action="store_true")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or tempfile.mkdtemp()
+    os.makedirs(fixture_dir, exist_ok=True)
+    try:
+        paths = make_fixtures(fixture_dir, seed=args.seed)
+        target_path = _write_synthetic_annotations(
+            fixture_dir, np.random.RandomState(args.seed),
+            chrom_length=2000000)
+        features = ["feature{0}".format(i) for i in range(500)]
+        radius = args.sequence_length // 2
+
+        def make_sampler():
+            return RandomPositionsSampler(
+                Genome(paths["genome"]), target_path, features,
+                seed=args.seed,
+                validation_holdout=["chr3"], test_holdout=["chr4"],
+                sequence_length=args.sequence_length,
+                bin_size=args.bin_size, step_size=args.step_size,
+                bins_start=radius - args.bin_size,
+                bins_end=radius + args.bin_size,
+                max_unknown_bases=args.max_unknown_bases,
+                targets_in_memory=args.targets_in_memory)
+
+        legacy_sampler = make_sampler()
+        legacy_sampler.initialize()
+        legacy_counts = {"drawn": 0, "rejected": 0}
+        legacy_randcache = {"cache_indices": [], "sample_next": 0}
+        sampler = make_sampler()
+        records = [
+            dict(implementation="legacy", **_time_sampler(
+                lambda batch_size: _legacy_sample(
+                    legacy_sampler, batch_size, legacy_counts,
+                    legacy_randcache),
+                args.batch_size, args.n_batches)),
+            dict(implementation="batched", **_time_sampler(
+                sampler.sample, args.batch_size, args.n_batches))]
+        records[0]["rejected_fraction"] = (
+            legacy_counts["rejected"] / legacy_counts["drawn"])
+        records[1]["rejected_fraction"] = (
+            sampler.n_windows_rejected / sampler.n_windows_drawn)
+
+        # the same seed draws the same batches
+        first, second = make_sampler(), make_sampler()
+        reproducible = all(
+            np.array_equal(a, b) for a, b in zip(
+                first.sample(args.batch_size),
+                second.sample(args.batch_size)))
+    finally:
+        if args.fixture_dir is None:
+            shutil.rmtree(fixture_dir)
+
+    report = {"config": vars(args),
+              "reproducible": reproducible,
+              "speedup": (records[1]["samples_per_s"] /
+                          records[0]["samples_per_s"]),
+              "results": records}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
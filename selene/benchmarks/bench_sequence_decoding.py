@@ -0,0 +1,115 @@
+"""
+Benchmarks the vectorized `encoding_to_sequence` and
+`get_reverse_encoding` against the per-row implementations they
+replaced.
+
+Usage:
+    python benchmarks/bench_sequence_decoding.py [--n-sequences 10000]
+        [--sequence-length 4095] [--n-legacy 200] [--seed 1337]
+
+The legacy implementations iterate over every row of an encoding in
+Python, so they are only timed on the first `--n-legacy` sequences and
+the per-sequence time is reported alongside the vectorized timings.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from selene_sdk.sequences import Genome
+
+
+def _legacy_get_base_index(encoding_row):
+    unk_val = 1 / len(encoding_row)
+    for index, val in enumerate(encoding_row):
+        if np.isclose(val, unk_val):
+            return -1
+        elif val == 1:
+            return index
+    return -1
+
+
+def _legacy_encoding_to_sequence(encoding, bases_arr, unk_base):
+    sequence = []
+    for row in encoding:
+        base_pos = _legacy_get_base_index(row)
+        if base_pos == -1:
+            sequence.append(unk_base)
+        else:
+            sequence.append(bases_arr[base_pos])
+    return "".join(sequence)
+
+
+def _legacy_get_reverse_encoding(encoding,
+                                 bases_arr,
+                                 base_to_index,
+                                 complementary_base_dict):
+    reverse_encoding = np.zeros(encoding.shape)
+    for index, row in enumerate(encoding):
+        base_pos = _legacy_get_base_index(row)
+        rev_index = encoding.shape[0] - index - 1
+        if base_pos == -1:
+            reverse_encoding[rev_index, :] = 1 / len(bases_arr)
+        else:
+            base = complementary_base_dict[bases_arr[base_pos]]
+            complem_base_pos = base_to_index[base]
+            reverse_encoding[rev_index, complem_base_pos] = 1
+    return reverse_encoding
+
+
+def _time(fn, *args):
+    t_start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n-sequences", type=int, default=10000)
+    parser.add_argument("--sequence-length", type=int, default=4095)
+    parser.add_argument("--n-legacy", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(args.seed)
+    chars = np.frombuffer(b"ACGTN", dtype=np.uint8)
+    codes = rng.choice(5, size=(args.n_sequences, args.sequence_length),
+                       p=[0.245, 0.245, 0.245, 0.245, 0.02])
+    sequences = [row.tobytes().decode("ascii") for row in chars[codes]]
+    encodings = Genome.sequence_to_encoding(sequences, dtype=np.float32)
+    n_legacy = min(args.n_legacy, args.n_sequences)
+
+    decoded, t_decode = _time(Genome.encoding_to_sequence, encodings)
+    assert decoded == sequences
+    _, t_reverse = _time(Genome.get_reverse_encoding, encodings)
+
+    def legacy_decode():
+        return [_legacy_encoding_to_sequence(
+                    e, Genome.BASES_ARR, Genome.UNK_BASE)
+                for e in encodings[:n_legacy]]
+
+    def legacy_reverse():
+        return [_legacy_get_reverse_encoding(
+                    e, Genome.BASES_ARR, Genome.BASE_TO_INDEX,
+                    Genome.COMPLEMENTARY_BASE_DICT)
+                for e in encodings[:n_legacy]]
+
+    legacy_decoded, t_legacy_decode = _time(legacy_decode)
+    assert legacy_decoded == sequences[:n_legacy]
+    _, t_legacy_reverse = _time(legacy_reverse)
+
+    print("{0} sequences x {1} bp ({2} for legacy)".format(
+        args.n_sequences, args.sequence_length, n_legacy))
+    print("{0:<24}{1:>16}{2:>16}{3:>10}".format(
+        "operation", "legacy us/seq", "batch us/seq", "speedup"))
+    for name, t_legacy, t_new in [
+            ("encoding_to_sequence", t_legacy_decode, t_decode),
+            ("get_reverse_encoding", t_legacy_reverse, t_reverse)]:
+        us_legacy = t_legacy / n_legacy * 1e6
+        us_new = t_new / args.n_sequences * 1e6
+        print("{0:<24}{1:>16.1f}{2:>16.1f}{3:>9.0f}x".format(
+            name, us_legacy, us_new, us_legacy / us_new))
+
+
+if __name__ == "__main__":
+    main()
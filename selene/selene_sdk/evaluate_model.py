@@ -5,13 +5,18 @@ import logging
 import os
 
 import numpy as np
+from scipy import sparse
 import torch
 import torch.nn as nn
 from torch.autograd import Variable
 
+from .utils import densify_targets
+from .utils import expand_sequence_indices
 from .utils import initialize_logger
 from .utils import load_model_from_state_dict
 from .utils import PerformanceMetrics
+from .utils import sequences_to_tensor
+from .utils import targets_to_tensor
 
 
 logger = logging.getLogger("selene")
@@ -174,18 +179,18 @@ class EvaluateModel(object):
         count = 0
         while count < self._test_targets.shape[0]:
             remainder = min(self._test_targets.shape[0] - count, self.batch_size)
-            inputs = self._test_data[count:count + remainder, :, :].astype(float)
-            targets = self._test_targets[count:count + remainder, :].astype(float)
-            inputs = torch.Tensor(inputs)
-            targets = torch.Tensor(targets)
+            inputs = self._test_data[count:count + remainder]
+            targets = self._test_targets[count:count + remainder, :]
+            inputs = sequences_to_tensor(inputs)
+            targets = targets_to_tensor(targets)
 
             if self.use_cuda:
                 inputs = inputs.cuda()
                 targets = targets.cuda()
 
             with torch.no_grad():
-                inputs = Variable(inputs)
-                targets = Variable(targets)
+                inputs = Variable(expand_sequence_indices(inputs))
+                targets = Variable(densify_targets(targets))
                 predictions = self.model(
                     inputs.transpose(1, 2))
                 loss = self.criterion(predictions[:, self._use_ixs], targets)
@@ -224,9 +229,14 @@ class EvaluateModel(object):
             os.path.join(self.output_dir, "test_predictions.npz"),
             data=all_predictions)
 
-        np.savez_compressed(
-            os.path.join(self.output_dir, "test_targets.npz"),
-            data=self._test_targets)
+        if sparse.issparse(self._test_targets):
+            sparse.save_npz(
+                os.path.join(self.output_dir, "test_targets.npz"),
+                self._test_targets)
+        else:
+            np.savez_compressed(
+                os.path.join(self.output_dir, "test_targets.npz"),
+                data=self._test_targets)
 
 
         return feature_scores_dict
@@ -7,6 +7,9 @@ import numpy as np
 import torch
 from torch.autograd import Variable
 
+from ..utils import expand_sequence_indices
+from ..utils import sequences_to_tensor
+
 
 
 def predict(model, batch_sequences, use_cuda=False):
@@ -21,6 +24,9 @@ def predict(model, batch_sequences, use_cuda=False):
         `batch_sequences` has the shape :math:`B \\times L \\times N`,
         where :math:`B` is `batch_size`, :math:`L` is the sequence length,
         :math:`N` is the size of the sequence type's alphabet.
+        Alternatively, the :math:`B \\times L` `numpy.uint8` base
+        indices of the sequences, which are expanded to one-hot
+        encodings on the device.
     use_cuda : bool, optional
         Default is `False`. Specifies whether CUDA-enabled GPUs are available
         for torch to use.
@@ -32,11 +38,11 @@ def predict(model, batch_sequences, use_cuda=False):
         is the number of features (classes) the model predicts.
 
     """
-    inputs = torch.Tensor(batch_sequences)
+    inputs = sequences_to_tensor(batch_sequences)
     if use_cuda:
         inputs = inputs.cuda()
     with torch.no_grad():
-        inputs = Variable(inputs)
+        inputs = Variable(expand_sequence_indices(inputs))
         outputs = model.forward(inputs.transpose(1, 2))
         return outputs.data.cpu().numpy()
 
@@ -87,6 +87,12 @@ class AnalyzeSequences(object):
         possible consideration is your model size and whether you are
         using it on the CPU or a CUDA-enabled GPU (i.e. setting
         `use_cuda` to True).
+    input_indices : bool, optional
+        Default is `False`. If `True`, `get_predictions_for_fasta_file`
+        batches the sequences as `numpy.uint8` base indices (see
+        `selene_sdk.sequences.Genome.sequence_to_indices`), which are
+        expanded to one-hot encodings on the device before the forward
+        pass. Unknown bases are then encoded as 0.25 in every column.
 
     Attributes
     ----------
@@ -116,7 +122,8 @@ class AnalyzeSequences(object):
                  use_cuda=False,
                  data_parallel=False,
                  reference_sequence=Genome,
-                 write_mem_limit=1500):
+                 write_mem_limit=1500,
+                 input_indices=False):
         """
         Constructs a new `AnalyzeSequences` object.
         """
@@ -152,6 +159,7 @@ class AnalyzeSequences(object):
         self.reference_sequence = reference_sequence
 
         self._write_mem_limit = write_mem_limit
+        self.input_indices = input_indices
 
     def _initialize_reporters(self,
                               save_data,
@@ -271,9 +279,15 @@ class AnalyzeSequences(object):
             ["index", "name"],
             mode="prediction")[0]
         fasta_file = pyfaidx.Fasta(input_path)
-        sequences = np.zeros((self.batch_size,
-                              self.sequence_length,
-                              len(self.reference_sequence.BASES_ARR)))
+        if self.input_indices:
+            encode = self.reference_sequence.sequence_to_indices
+            sequences = np.zeros((self.batch_size, self.sequence_length),
+                                 dtype=np.uint8)
+        else:
+            encode = self.reference_sequence.sequence_to_encoding
+            sequences = np.zeros((self.batch_size,
+                                  self.sequence_length,
+                                  len(self.reference_sequence.BASES_ARR)))
         batch_ids = []
         for i, fasta_record in enumerate(fasta_file):
             cur_sequence = str(fasta_record)
@@ -285,20 +299,18 @@ class AnalyzeSequences(object):
             elif len(cur_sequence) > self.sequence_length:
                 cur_sequence = _truncate_sequence(cur_sequence, self._sequence_length)
 
-            cur_sequence_encoding = self.reference_sequence.sequence_to_encoding(
-                cur_sequence)
+            cur_sequence_encoding = encode(cur_sequence)
             batch_ids.append([i, fasta_record.name])
 
             if i and i % self.batch_size == 0:
                 preds = predict(self.model, sequences, use_cuda=self.use_cuda)
-                sequences = np.zeros((
-                    self.batch_size, *cur_sequence_encoding.shape))
+                sequences = np.zeros_like(sequences)
                 reporter.handle_batch_predictions(preds, batch_ids)
 
-            sequences[i % self.batch_size, :, :] = cur_sequence_encoding
+            sequences[i % self.batch_size] = cur_sequence_encoding
 
         if i % self.batch_size != 0:
-            sequences = sequences[:i % self.batch_size + 1, :, :]
+            sequences = sequences[:i % self.batch_size + 1]
             preds = predict(self.model, sequences, use_cuda=self.use_cuda)
             reporter.handle_batch_predictions(preds, batch_ids)
 
@@ -1,22 +1,212 @@
 """
 This module provides the BedFileSampler class.
+
+The sampler reads the lines of the BED file through an index of their
+byte offsets, which `load_line_index` caches next to the file in a file
+ending with `LINE_INDEX_EXTENSION`.
 """
+from itertools import compress
+import logging
+import os
+
 import numpy as np
 
 from .file_sampler import FileSampler
+from ..permutation import FeistelPermutation
+from ..permutation import worker_steps
+
+logger = logging.getLogger(__name__)
+
+
+LINE_INDEX_EXTENSION = ".lines.npy"
+"""
+The extension appended to a BED file path to name its cached line
+index.
+"""
+
+_READ_BLOCK_SIZE = 1 << 24
+"""
+The number of bytes read at once when indexing the lines of a file.
+"""
+
+_MAX_READ_GAP = 1 << 16
+"""
+The largest number of bytes between two lines that are read with one
+`read` call rather than two.
+"""
+
+
+def _index_lines(filepath):
+    """
+    Finds the byte offsets of the non-empty lines of a file.
+
+    Parameters
+    ----------
+    filepath : str
+        The path to the file.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.int64
+        The :math:`N \\times 2` offsets of the start of each line and of
+        its end, excluding the newline.
+
+    """
+    newlines = []
+    n_read = 0
+    with open(filepath, 'rb') as file_handle:
+        while True:
+            block = file_handle.read(_READ_BLOCK_SIZE)
+            if not block:
+                break
+            newlines.append(np.flatnonzero(
+                np.frombuffer(block, dtype=np.uint8) == ord('\n')) + n_read)
+            n_read += len(block)
+    newlines = np.concatenate(newlines + [[]]).astype(np.int64)
+    starts = np.concatenate([[0], newlines + 1]).astype(np.int64)
+    ends = np.concatenate([newlines, [n_read]]).astype(np.int64)
+    nonempty = ends > starts
+    return np.stack([starts[nonempty], ends[nonempty]], axis=1)
+
+
+def load_line_index(filepath):
+    """
+    Loads the line index of a file (see `_index_lines`) from its cache
+    file, building the index and writing the cache file if it does not
+    exist or is older than the file.
+
+    Parameters
+    ----------
+    filepath : str
+        The path to the file.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.int64
+        The :math:`N \\times 2` start and end offsets of the non-empty
+        lines of the file.
+
+    """
+    cache_path = filepath + LINE_INDEX_EXTENSION
+    if (os.path.exists(cache_path) and
+            os.path.getmtime(cache_path) >= os.path.getmtime(filepath)):
+        return np.load(cache_path)
+    lines = _index_lines(filepath)
+    tmp_path = "{0}.{1}.tmp".format(cache_path, os.getpid())
+    try:
+        with open(tmp_path, "wb") as file_handle:
+            np.save(file_handle, lines)
+        os.replace(tmp_path, cache_path)
+    except OSError as error:
+        logger.warning("Could not cache the line index of {0} "
+                       "({1}).".format(filepath, error))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return lines
+
+
+def _parse_lines(data):
+    """
+    Splits the columns of tab-separated lines with one split of the
+    whole text rather than one per line, or line by line if the lines
+    do not all have the same number of columns (e.g. when only some of
+    them have the optional strand column).
+
+    Parameters
+    ----------
+    data : bytes
+        The lines, separated by newlines.
+
+    Returns
+    -------
+    chroms, starts, ends, last_column : \
+    tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray, list(bytes))
+        The first three columns of the lines, as a BED file defines
+        them, and the last column of each line that has more than
+        three (an empty string for the others).
+
+    Raises
+    ------
+    ValueError
+        If a line has fewer than 3 columns.
+
+    """
+    data = data.replace(b"\r", b"")
+    lines = data.split(b"\n")
+    col_counts = set(line.count(b"\t") + 1 for line in lines)
+    if min(col_counts) < 3:
+        raise ValueError(
+            "The lines of a BED file must have at least 3 columns.")
+    if len(col_counts) == 1:
+        n_cols = col_counts.pop()
+        fields = data.replace(b"\t", b"\n").split(b"\n")
+        chroms, starts, ends = (fields[i::n_cols] for i in range(3))
+        last_column = [b""] * len(lines)
+        if n_cols > 3:
+            last_column = fields[n_cols - 1::n_cols]
+    else:
+        rows = [line.split(b"\t") for line in lines]
+        chroms, starts, ends = ([row[i] for row in rows] for i in range(3))
+        last_column = [row[-1] if len(row) > 3 else b"" for row in rows]
+    chroms = np.array([chrom.decode() for chrom in chroms], dtype=object)
+    starts = np.array(list(map(int, starts)), dtype=np.int64)
+    ends = np.array(list(map(int, ends)), dtype=np.int64)
+    return chroms, starts, ends, last_column
+
+
+def _parse_feature_lists(features):
+    """
+    Parses the semicolon-separated feature indices of each example
+    (e.g. "0;1;45;60").
+
+    Parameters
+    ----------
+    features : list(bytes)
+        The feature list of each example.
+
+    Returns
+    -------
+    rows, indices : tuple(numpy.ndarray, numpy.ndarray)
+        The example and the feature index of each positive, sorted by
+        example.
+
+    """
+    # each list contributes one more token than it has separators
+    tokens = b";".join(features).split(b";")
+    rows = np.repeat(np.arange(len(features)), np.fromiter(
+        (f.count(b";") + 1 for f in features), dtype=np.int64,
+        count=len(features)))
+    nonempty = np.fromiter(
+        map(len, tokens), dtype=np.int64, count=len(tokens)) > 0
+    indices = np.array(list(map(int, compress(tokens, nonempty))),
+                       dtype=np.int64)
+    return rows[nonempty], indices
+
 
 class BedFileSampler(FileSampler):
     """
     A sampler for which the dataset is loaded directly from a `*.bed` file.
 
+    The lines of the file are read through an index of their byte
+    offsets (see `load_line_index`), `chunk_size` lines at a time: the
+    lines of a chunk are read in the order of their offsets and parsed
+    together, and the sequences of a mini-batch are retrieved together
+    when the reference sequence supports it (see
+    `selene_sdk.sequences.Genome.get_encodings_from_coords`). Each pass
+    over the file visits its lines once, in the order of a
+    pseudo-random permutation keyed by `random_seed` and the pass if
+    `shuffle` is True. With `set_worker`, the worker processes of a
+    `torch.utils.data.DataLoader` take disjoint shards of the passes.
+
     Parameters
     ----------
     filepath : str
         The path to the file to load the data from.
     reference_sequence : selene_sdk.sequences.Sequence
         A reference sequence from which to create examples.
-    n_samples : int
-        Number of lines in the file. (`wc -l <filepath>`)
+    n_samples : int or None, optional
+        Default is None. Number of lines in the file. (`wc -l <filepath>`)
+        If None, the number of non-empty lines in the line index.
     sequence_length : int or None, optional
         Default is None. If the coordinates of each sample in the BED file
         already account for the full sequence (that is,
@@ -35,6 +225,15 @@ class BedFileSampler(FileSampler):
     n_features : int or None, optional
         Default is None. If `targets_avail` is True, must specify
         `n_features`, the total number of features (classes).
+    random_seed : int, optional
+        Default is 436. The seed of the permutations of the lines.
+    shuffle : bool, optional
+        Default is False. Visit the lines of the file in a different
+        pseudo-random order on each pass over it, rather than in the
+        order of the file. Set it for training; evaluation usually
+        needs the predictions in the order of the file.
+    chunk_size : int, optional
+        Default is 4096. The number of lines read and parsed at once.
 
     Attributes
     ----------
@@ -61,27 +260,212 @@ class BedFileSampler(FileSampler):
     n_features : int or None
         If `targets_avail` is True, must specify
         `n_features`, the total number of features (classes).
+    random_seed : int
+        The seed of the permutations of the lines.
+    shuffle : bool
+        Whether each pass visits the lines in a pseudo-random order.
+    chunk_size : int
+        The number of lines read and parsed at once.
 
     """
 
     def __init__(self,
                  filepath,
                  reference_sequence,
-                 n_samples,
+                 n_samples=None,
                  sequence_length=None,
                  targets_avail=False,
-                 n_features=None):
+                 n_features=None,
+                 random_seed=436,
+                 shuffle=False,
+                 chunk_size=4096):
         """
         Constructs a new `BedFileSampler` object.
         """
         super(BedFileSampler, self).__init__()
         self.filepath = filepath
-        self._file_handle = open(self.filepath, 'r')
+        # opened on the first read, so that each worker process has its
+        # own file offset
+        self._file_handle = None
         self.reference_sequence = reference_sequence
         self.sequence_length = sequence_length
         self.targets_avail = targets_avail
         self.n_features = n_features
-        self.n_samples = n_samples
+        self.random_seed = random_seed
+        self.shuffle = shuffle
+        self.chunk_size = chunk_size
+
+        self._lines = None
+        self._n_samples = n_samples
+        # the walk through the passes over the lines (see
+        # `selene_sdk.samplers.permutation.worker_steps`) and the
+        # parsed lines of the current chunk
+        self._walk_start = 0
+        self._n_walked = 0
+        self._worker_id = 0
+        self._n_workers = 1
+        self._worker_batch_size = 1
+        self._chunk = None
+        self._chunk_next = 0
+
+    @property
+    def n_samples(self):
+        if self._n_samples is None:
+            self._n_samples = len(self._get_lines())
+        return self._n_samples
+
+    @n_samples.setter
+    def n_samples(self, n_samples):
+        self._n_samples = n_samples
+
+    def _get_lines(self):
+        """
+        Gets the line index of the file, loading it on first use.
+        """
+        if self._lines is None:
+            self._lines = load_line_index(self.filepath)
+        return self._lines
+
+    def initialize(self):
+        """
+        Loads the line index before the worker processes of a
+        `torch.utils.data.DataLoader` are started, so that it is built
+        once rather than in each worker.
+        """
+        self._get_lines()
+
+    def set_worker(self, worker_id, n_workers, batch_size=1):
+        """
+        Makes this copy of the sampler draw the examples of one of the
+        worker processes of a `torch.utils.data.DataLoader` (see
+        `selene_sdk.samplers.worker_init_fn`). The worker continues the
+        passes over the lines from where this process was, taking the
+        lines of batches `worker_id`, `worker_id + n_workers`, ...
+
+        Parameters
+        ----------
+        worker_id : int
+            The ID of the worker, in `[0, n_workers)`.
+        n_workers : int
+            The number of workers.
+        batch_size : int, optional
+            Default is 1. The number of examples in each batch of the
+            DataLoader.
+
+        """
+        self._walk_start += self._n_walked - (
+            len(self._chunk[0]) - self._chunk_next if self._chunk else 0)
+        self._n_walked = 0
+        self._chunk = None
+        self._chunk_next = 0
+        self._worker_id = worker_id
+        self._n_workers = n_workers
+        self._worker_batch_size = batch_size
+        self._file_handle = None
+
+    def _next_line_indices(self, n_lines):
+        """
+        Takes the next steps of the walk through the passes over the
+        lines and gets the indices of the lines they visit.
+        """
+        lines = self._get_lines()
+        steps = worker_steps(
+            self._walk_start, self._n_walked, n_lines,
+            worker_id=self._worker_id, n_workers=self._n_workers,
+            batch_size=self._worker_batch_size)
+        self._n_walked += n_lines
+        passes = steps // len(lines)
+        indices = steps % len(lines)
+        if self.shuffle:
+            for epoch in np.unique(passes):
+                in_pass = passes == epoch
+                permutation = FeistelPermutation(
+                    len(lines), [self.random_seed, int(epoch)])
+                indices[in_pass] = permutation(indices[in_pass])
+        return indices
+
+    def _read_lines(self, indices):
+        """
+        Reads lines of the file, in the order of their offsets and with
+        one `read` call for each run of nearby lines.
+
+        Parameters
+        ----------
+        indices : numpy.ndarray
+            The indices of the lines in the line index.
+
+        Returns
+        -------
+        bytes
+            The lines, in the order of `indices` and separated by
+            newlines.
+
+        """
+        if self._file_handle is None:
+            self._file_handle = open(self.filepath, 'rb')
+        offsets = self._get_lines()[indices]
+        order = np.argsort(offsets[:, 0], kind="stable")
+        offsets = offsets[order]
+        # a new read starts wherever the gap to the previous line is large
+        breaks = np.flatnonzero(
+            offsets[1:, 0] - offsets[:-1, 1] > _MAX_READ_GAP) + 1
+        lines = [None] * len(indices)
+        for run in np.split(np.arange(len(indices)), breaks):
+            run_start = offsets[run[0], 0]
+            self._file_handle.seek(run_start)
+            data = self._file_handle.read(
+                offsets[run, 1].max() - run_start)
+            for row in run:
+                lines[order[row]] = data[offsets[row, 0] - run_start:
+                                         offsets[row, 1] - run_start]
+        return b"\n".join(lines)
+
+    def _next_rows(self, n_rows):
+        """
+        Gets the chromosomes, start and end coordinates and (if
+        `targets_avail`) the targets of the next lines, reading and
+        parsing the next chunk of lines when the current one runs out.
+        """
+        if self._chunk is None or self._chunk_next >= len(self._chunk[0]):
+            chroms, starts, ends, features = _parse_lines(
+                self._read_lines(self._next_line_indices(self.chunk_size)))
+            self._chunk = (chroms, starts, ends)
+            if self.targets_avail:
+                self._chunk += _parse_feature_lists(features)
+            self._chunk_next = 0
+        first = self._chunk_next
+        last = min(first + n_rows, len(self._chunk[0]))
+        self._chunk_next = last
+        chroms, starts, ends = (column[first:last]
+                                for column in self._chunk[:3])
+        targets = None
+        if self.targets_avail:
+            feature_rows, feature_indices = self._chunk[3:]
+            positives = slice(*np.searchsorted(feature_rows, [first, last]))
+            targets = np.zeros((last - first, self.n_features))
+            targets[feature_rows[positives] - first,
+                    feature_indices[positives]] = 1
+        return chroms, starts, ends, targets
+
+    def _get_sequences(self, chroms, starts, ends):
+        """
+        Gets the encodings of the windows that can be retrieved, with
+        one call for the whole batch if the reference sequence supports
+        it and the windows have the same length.
+        """
+        lengths = ends - starts
+        if (hasattr(self.reference_sequence, "get_encodings_from_coords") and
+                np.all(lengths == lengths[0])):
+            encodings, valid = \
+                self.reference_sequence.get_encodings_from_coords(
+                    chroms, starts, ends, strands='+')
+            return encodings[valid], valid
+        encodings = [
+            self.reference_sequence.get_encoding_from_coords(
+                chrom, start, end, strand='+')
+            for chrom, start, end in zip(chroms, starts, ends)]
+        valid = np.array([e.shape[0] > 0 for e in encodings], dtype=bool)
+        return np.array([e for e in encodings if e.shape[0] > 0]), valid
 
     def sample(self, batch_size=1):
         """
@@ -108,61 +492,31 @@ class BedFileSampler(FileSampler):
 
         """
         sequences = []
-        targets = None
-        if self.targets_avail:
-            targets = []
-        while len(sequences) < batch_size:
-            line = self._file_handle.readline()
-            if not line:
-                # TODO: add functionality to shuffle the file if sampler
-                # reaches the end of the file.
-                self._file_handle.close()
-                self._file_handle = open(self.filepath, 'r')
-                line = self._file_handle.readline()
-            cols = line.split('\t')
-            chrom = cols[0]
-            start = int(cols[1])
-            end = int(cols[2])
-            strand_side = None
-            features = None
-
-            if len(cols) == 5:
-                strand_side = cols[3]
-                features = cols[4].strip()
-            elif len(cols) == 4 and self.targets_avail:
-                features = cols[3].strip()
-            elif len(cols) == 4:
-                strand_side = cols[3].strip()
-
-            # if strand_side is None, assume strandedness does not matter.
-            # can change this to randomly selecting +/- later
-            strand_side = '+'
-            n = end - start
-            if self.sequence_length and n < self.sequence_length:
+        targets = []
+        n_drawn = 0
+        while n_drawn < batch_size:
+            chroms, starts, ends, line_targets = self._next_rows(
+                batch_size - n_drawn)
+            # strandedness is assumed not to matter
+            if self.sequence_length:
+                n = ends - starts
                 diff = (self.sequence_length - n) / 2
-                pad_l = int(np.floor(diff))
-                pad_r = int(np.ceil(diff))
-                start = start - pad_l
-                end = end + pad_r
-            elif self.sequence_length and n > self.sequence_length:
-                start = int((n - self.sequence_length) // 2)
-                end = int(start + self.sequence_length)
-
-            sequence = self.reference_sequence.get_encoding_from_coords(
-                chrom, start, end, strand=strand_side)
-            if sequence.shape[0] == 0:
-                continue
-
-            sequences.append(sequence)
+                starts = np.where(
+                    n < self.sequence_length,
+                    starts - np.floor(diff).astype(np.int64),
+                    starts + (n - self.sequence_length) // 2)
+                ends = starts + self.sequence_length
+
+            encodings, valid = self._get_sequences(chroms, starts, ends)
+            if len(encodings) > 0:
+                sequences.append(encodings)
+            n_drawn += len(encodings)
             if self.targets_avail:
-                tgts = np.zeros((self.n_features))
-                features = [int(f) for f in features.split(';') if f]
-                tgts[features] = 1
-                targets.append(tgts.astype(float))
+                targets.append(line_targets[valid])
 
-        sequences = np.array(sequences)
+        sequences = np.concatenate(sequences)
         if self.targets_avail:
-            targets = np.array(targets)
+            targets = np.concatenate(targets)
             return (sequences, targets)
         return sequences,
 
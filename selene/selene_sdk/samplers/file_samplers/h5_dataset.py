@@ -1,27 +1,210 @@
+import logging
+
 import h5py
 import numpy as np
+from scipy import sparse
 import torch
 import torch.utils.data as data
 from torch.utils.data import DataLoader
+from torch.utils.data import Sampler
+
+from ..sampler_dataset import collate_examples
+from ...sequences import encoding_to_indices
+from ...utils import sparse_tensor_to_csr
+from ...utils import targets_to_tensor
+from ...utils import unpack_sequence_bits
+from ...utils import unpack_target_bits
+
+
+logger = logging.getLogger(__name__)
+
+_MAX_WINDOW_GROWTH = 2
+"""
+The most times larger that aligning to the HDF5 chunks of the datasets
+may make a read window, compared to a window of whole mini-batches
+only.
+"""
+
+
+def _get_window_size(file_path, keys, buffer_size, batch_size):
+    """
+    Gets the number of examples in a read window of at least
+    `buffer_size` examples that is a whole number of mini-batches. The
+    window is rounded up to a whole number of the HDF5 chunks of the
+    datasets at `keys` along their first axis as well, in the order of
+    `keys`, as long as that makes it at most `_MAX_WINDOW_GROWTH` times
+    larger.
+    """
+    with h5py.File(file_path, 'r') as db:
+        n_examples = db[keys[0]].shape[0]
+        chunks = [db[key].chunks for key in keys]
+    n_batched = -(-n_examples // batch_size) * batch_size
+
+    def round_up(extent):
+        extent = min(extent, n_batched)
+        return int(-(-buffer_size // extent) * extent)
+
+    window_size = round_up(batch_size)
+    max_size = _MAX_WINDOW_GROWTH * window_size
+    extent = batch_size
+    for key, key_chunks in zip(keys, chunks):
+        if key_chunks is None:
+            continue
+        extent = np.lcm(extent, key_chunks[0])
+        aligned_size = round_up(extent)
+        if aligned_size > max_size:
+            logger.warning(
+                "Read windows of {0} examples cannot be aligned to the "
+                "HDF5 chunks of '{1}' without growing to {2} "
+                "examples.".format(window_size, key, aligned_size))
+            break
+        window_size = aligned_size
+    return window_size
+
+
+class H5BatchSampler(Sampler):
+    """
+    Yields the indices of the mini-batches of an `H5Dataset` with a
+    `window_size`, so that each mini-batch falls within one read window
+    and the dataset reads each window once per pass (see
+    `H5DataLoader`). A pass visits the windows in a random order, and
+    the examples of each window in a random order.
+
+    The windows are dealt to `n_streams` streams, and the mini-batches
+    are taken from the streams in turn. A `torch.utils.data.DataLoader`
+    hands out the mini-batches to its worker processes in turn as well,
+    so with one stream per worker, each worker reads its own windows.
+
+    Parameters
+    ----------
+    n_examples : int
+        The number of examples in the dataset.
+    batch_size : int
+        The number of examples in each mini-batch.
+    window_size : int
+        The number of examples in a read window of the dataset, a
+        multiple of `batch_size`.
+    shuffle : bool, optional
+        Default is True. Whether to visit the windows, and the examples
+        in them, in a random order rather than in the order of the file.
+    n_streams : int, optional
+        Default is 1. The number of windows visited at once.
+
+    """
+
+    def __init__(self,
+                 n_examples,
+                 batch_size,
+                 window_size,
+                 shuffle=True,
+                 n_streams=1):
+        self.n_examples = n_examples
+        self.batch_size = batch_size
+        self.window_size = window_size
+        self.shuffle = shuffle
+        self.n_streams = max(1, n_streams)
+
+    def _window_batches(self, windows):
+        for window in windows:
+            start = window * self.window_size
+            end = min(start + self.window_size, self.n_examples)
+            if self.shuffle:
+                indices = torch.randperm(end - start).numpy() + start
+            else:
+                indices = np.arange(start, end)
+            for first in range(0, end - start, self.batch_size):
+                yield indices[first:first + self.batch_size]
+
+    def __iter__(self):
+        n_windows = -(-self.n_examples // self.window_size)
+        windows = np.arange(n_windows)
+        if self.shuffle:
+            windows = torch.randperm(n_windows).numpy()
+        streams = [self._window_batches(windows[stream::self.n_streams])
+                   for stream in range(self.n_streams)]
+        while streams:
+            for stream in list(streams):
+                batch = next(stream, None)
+                if batch is None:
+                    streams.remove(stream)
+                else:
+                    yield batch
+
+    def __len__(self):
+        n_full, remainder = divmod(self.n_examples, self.window_size)
+        return (n_full * (self.window_size // self.batch_size) +
+                -(-remainder // self.batch_size))
 
 
 class H5Dataset(data.Dataset):
+    """
+    A dataset of the examples in an HDF5 file. An index is an example,
+    a slice of examples or an array of example indices, which gives a
+    mini-batch. If `window_size` is not None and the examples are not
+    in memory, the mini-batch is taken from a buffer of the read window
+    of `window_size` examples it falls within, which is read with one
+    `h5py.Dataset.read_direct` call into the same buffer each time,
+    so that the batches of one window read the file once (see
+    `H5BatchSampler`). Otherwise, or if the mini-batch spans several
+    windows, its examples are read with one call.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the HDF5 file.
+    size : int or None, optional
+        Default is None. The number of examples, if not the number of
+        examples in the file, which are then repeated.
+    in_memory : bool, optional
+        Default is False. Whether to read the whole file into memory.
+    unpackbits : bool, optional
+        Default is False. Whether the sequences and targets are stored
+        with `numpy.packbits`.
+    seq_key : str, optional
+        Default is "sequences". The key of the sequences.
+    tgt_key : str, optional
+        Default is "targets". The key of the targets.
+    output_indices : bool, optional
+        Default is False. Whether to output the sequences as base
+        indices rather than one-hot encodings.
+    sparse_targets : bool, optional
+        Default is False. Whether to output the targets as sparse
+        tensors.
+    window_size : int or None, optional
+        Default is None. The number of examples in a read window.
+    packed_output : bool, optional
+        Default is False. If `unpackbits` is True, whether to output the
+        sequences, and the targets unless `sparse_targets` is True,
+        still packed, as `torch.uint8` tensors, for `H5DataLoader` to
+        unpack (see `selene_sdk.utils.unpack_sequence_bits`).
+
+    """
+
     def __init__(self,
                  file_path,
                  size=None,
                  in_memory=False,
                  unpackbits=False,
                  seq_key="sequences",
-                 tgt_key="targets"):
+                 tgt_key="targets",
+                 output_indices=False,
+                 sparse_targets=False,
+                 window_size=None,
+                 packed_output=False):
         super(H5Dataset, self).__init__()
         self.file_path = file_path
         self.db_len = None
         self.initialized = False
         self.in_memory = in_memory
         self.unpackbits = unpackbits
+        self.output_indices = output_indices
+        self.sparse_targets = sparse_targets
         self._seq_key = seq_key
         self._tgt_key = tgt_key
         self.size = size
+        self.window_size = window_size
+        self.packed_output = packed_output
+        self._window = None
 
     def init(func):
         # delay initialization to allow multiprocessing
@@ -40,19 +223,82 @@ class H5Dataset(data.Dataset):
             return func(self, *args, **kwargs)
         return dfunc
 
+    def _read_window(self, window):
+        """
+        Reads a window of the examples into the buffers, which are
+        allocated on the first read.
+        """
+        if self._window is None:
+            self._window = [
+                None,
+                np.empty((self.window_size,) + self.sequences.shape[1:],
+                         dtype=self.sequences.dtype),
+                np.empty((self.window_size,) + self.targets.shape[1:],
+                         dtype=self.targets.dtype)]
+        if self._window[0] != window:
+            start = window * self.window_size
+            end = min(start + self.window_size, self.sequences.shape[0])
+            for matrix, buffer in zip([self.sequences, self.targets],
+                                      self._window[1:]):
+                matrix.read_direct(buffer, np.s_[start:end],
+                                   np.s_[:end - start])
+            self._window[0] = window
+        return self._window[1:]
+
+    def _read_batch(self, indices):
+        """
+        Reads the examples of a mini-batch, in the order of `indices`.
+        """
+        indices = np.asarray(indices, dtype=np.int64) % \
+            self.sequences.shape[0]
+        if self.in_memory:
+            return self.sequences[indices], self.targets[indices]
+        if self.window_size is not None:
+            windows = indices // self.window_size
+            if np.all(windows == windows[0]):
+                sequences, targets = self._read_window(int(windows[0]))
+                rows = indices - windows[0] * self.window_size
+                return sequences[rows], targets[rows]
+        # h5py reads the examples of increasing, distinct indices
+        rows, inverse = np.unique(indices, return_inverse=True)
+        return (self.sequences[rows, :, :][inverse],
+                self.targets[rows, :][inverse])
+
+    def _get_targets_tensor(self, targets):
+        """
+        Converts the targets of an example or a mini-batch to a tensor,
+        keeping only the positives if `sparse_targets` is True.
+        """
+        if not self.sparse_targets:
+            return targets_to_tensor(targets)
+        # only the positives are copied, and densified on the model's device
+        tensor = targets_to_tensor(sparse.csr_matrix(np.atleast_2d(targets)))
+        return tensor[0] if targets.ndim == 1 else tensor
+
     @init
     def __getitem__(self, index):
         if isinstance(index, int):
             index = index % self.sequences.shape[0]
-        sequence = self.sequences[index, :, :]
-        targets = self.targets[index, :]
+        if isinstance(index, (list, np.ndarray, torch.Tensor)):
+            sequence, targets = self._read_batch(index)
+        else:
+            sequence = self.sequences[index, :, :]
+            targets = self.targets[index, :]
+        if self.unpackbits and self.packed_output and not self.output_indices:
+            # unpacked by `H5DataLoader`, after crossing to the main process
+            sequence = torch.from_numpy(np.ascontiguousarray(sequence))
+            if not self.sparse_targets:
+                return (sequence,
+                        torch.from_numpy(np.ascontiguousarray(targets)))
+            targets = np.unpackbits(targets, axis=-1)[..., :self.t_len]
+            return (sequence, self._get_targets_tensor(targets))
         if self.unpackbits:
             sequence = np.unpackbits(sequence, axis=-2)
-            nulls = np.sum(sequence, axis=-1) == 4
-            sequence = sequence.astype(float)
-            sequence[nulls, :] = 0.25
-            targets = np.unpackbits(targets, axis=-1).astype(
-                float)
+            if not self.output_indices:
+                nulls = np.sum(sequence, axis=-1) == 4
+                sequence = sequence.astype(np.float32)
+                sequence[nulls, :] = 0.25
+            targets = np.unpackbits(targets, axis=-1)
 
         if sequence.ndim == 3:
             sequence = sequence[:, :self.s_len, :]
@@ -62,8 +308,11 @@ class H5Dataset(data.Dataset):
             targets = targets[:, :self.t_len]
         else:
             targets = targets[:self.t_len]
-        return (torch.from_numpy(sequence.astype(np.float32)),
-                torch.from_numpy(targets.astype(np.float32)))
+        targets = self._get_targets_tensor(targets)
+        if self.output_indices:
+            return (torch.from_numpy(encoding_to_indices(sequence)),
+                    targets)
+        return (torch.from_numpy(sequence.astype(np.float32)), targets)
 
     @init
     def __len__(self):
@@ -72,6 +321,31 @@ class H5Dataset(data.Dataset):
         return self.size
 
 class H5DataLoader(DataLoader):
+    """
+    A data loader of the examples in an HDF5 file (see `H5Dataset`).
+
+    If `buffer_size` is not None, the loader takes its mini-batches
+    from read windows of at least `buffer_size` examples: each window
+    is read with one call and the examples of a mini-batch are taken
+    from it, rather than read with one call each. The windows are a
+    whole number of mini-batches, and are aligned to the HDF5 chunks of
+    the sequences and then of the targets unless that would more than
+    double their size (a warning is logged then). When shuffling, the windows and the examples in
+    each window are visited in a random order (see `H5BatchSampler`),
+    which is as random as a full shuffle only if `buffer_size` is close
+    to the number of examples. `buffer_size` is not used with
+    `use_subset`.
+
+    If `unpackbits` is True (and `output_indices` is False), the
+    examples are loaded still packed, so that the worker processes and
+    pinned memory handle a 32nd of the bytes of `torch.float32`
+    encodings. The loader unpacks each mini-batch once it reaches this
+    process, with `selene_sdk.utils.unpack_sequence_bits` and
+    `selene_sdk.utils.unpack_target_bits`, on `unpack_device` if it is
+    not None (e.g. the device of the model) and otherwise on the CPU.
+
+    """
+
     def __init__(self,
                  filepath,
                  size=None,
@@ -82,30 +356,78 @@ class H5DataLoader(DataLoader):
                  shuffle=True,
                  unpackbits=False,
                  seq_key="sequences",
-                 tgt_key="targets"):
+                 tgt_key="targets",
+                 output_indices=False,
+                 sparse_targets=False,
+                 buffer_size=None,
+                 unpack_device=None):
         args = {
             "batch_size": batch_size,
             "num_workers": 0 if in_memory else num_workers,
-            "pin_memory": True
+            "pin_memory": True,
+            "collate_fn": collate_examples
         }
+        window_size = None
         if use_subset is not None:
             from torch.utils.data.sampler import SubsetRandomSampler
             if type(use_subset, int):
                 use_subset = list(range(use_subset))
             args["sampler"] = SubsetRandomSampler(use_subset)
+        elif buffer_size is not None:
+            window_size = _get_window_size(
+                filepath, [seq_key, tgt_key], buffer_size, batch_size)
         else:
             args["shuffle"] = shuffle
-        super(H5DataLoader, self).__init__(
-            H5Dataset(filepath,
-                      size=size,
-                      in_memory=in_memory,
-                      unpackbits=unpackbits,
-                      seq_key=seq_key,
-                      tgt_key=tgt_key),
-            **args)
+        dataset = H5Dataset(filepath,
+                            size=size,
+                            in_memory=in_memory,
+                            unpackbits=unpackbits,
+                            seq_key=seq_key,
+                            tgt_key=tgt_key,
+                            output_indices=output_indices,
+                            sparse_targets=sparse_targets,
+                            window_size=window_size,
+                            packed_output=True)
+        if window_size is not None:
+            # the sampler yields the indices of whole mini-batches, which
+            # the dataset reads at once
+            args["sampler"] = H5BatchSampler(
+                len(dataset), batch_size, window_size, shuffle=shuffle,
+                n_streams=args["num_workers"])
+            args["batch_size"] = None
+            del args["collate_fn"]
+        super(H5DataLoader, self).__init__(dataset, **args)
+        self.unpack_device = unpack_device
+        self._packed = unpackbits and not output_indices
+        if self._packed:
+            with h5py.File(filepath, 'r') as db:
+                self._s_len = db['{0}_length'.format(seq_key)][()]
+                self._t_len = db['{0}_length'.format(tgt_key)][()]
+
+    def _unpack(self, sequences, targets, device=None):
+        """
+        Unpacks a mini-batch of packed sequences and (unless they are
+        sparse) targets, on `device` if it is not None.
+        """
+        if not self._packed:
+            return sequences, targets
+        device = device or sequences.device
+        sequences = unpack_sequence_bits(
+            sequences.to(device, non_blocking=True), self._s_len)
+        if targets.dtype == torch.uint8:
+            targets = unpack_target_bits(
+                targets.to(device, non_blocking=True), self._t_len)
+        return sequences, targets
+
+    def __iter__(self):
+        for sequences, targets in super(H5DataLoader, self).__iter__():
+            yield self._unpack(sequences, targets,
+                               device=self.unpack_device)
 
     def get_data_and_targets(self, batch_size, n_samples=None):
-        sequences, targets = self.dataset[:n_samples]
+        sequences, targets = self._unpack(*self.dataset[:n_samples])
+        if targets.is_sparse:
+            return sequences.numpy(), sparse_tensor_to_csr(targets)
         return sequences.numpy(), targets.numpy()
 
 
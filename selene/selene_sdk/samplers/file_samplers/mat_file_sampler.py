@@ -2,16 +2,39 @@
 This module provides the `MatFileSampler` class and its supporting
 methods.
 """
+import logging
+
 import h5py
 import numpy as np
 import scipy.io
 
 from .file_sampler import FileSampler
+from ..permutation import FeistelPermutation
+from ..permutation import worker_steps
+
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_CHUNK_SIZE = 4096
+"""
+The default number of examples read at once from a file in the HDF5
+format.
+"""
+
+_MAX_CHUNK_GROWTH = 2
+"""
+The most times larger that aligning to the HDF5 chunks of the targets
+may make the chunk size, compared to aligning to the chunks of the
+sequences only.
+"""
 
 
 def _load_mat_file(filepath, sequence_key, targets_key=None):
     """
-    Loads data from a `*.mat` file or a `*.h5` file.
+    Loads data from a `*.mat` file or a `*.h5` file. Files in the HDF5
+    format, which include MATLAB v7.3 `*.mat` files, are opened rather
+    than loaded, and their matrices are only read when they are
+    indexed.
 
     Parameters
     ----------
@@ -30,25 +53,69 @@ def _load_mat_file(filepath, sequence_key, targets_key=None):
         the tuple will only be (sequences, targets). Otherwise,
         the 2 matrices and the h5py file handle are returned.
     """
-    try:  # see if we can load the file using scipy first
-        mat = scipy.io.loadmat(filepath)
-        targets = None
-        if targets_key:
-            targets = mat[targets_key]
-        return (mat[sequence_key], targets)
-    except (NotImplementedError, ValueError):
+    if h5py.is_hdf5(filepath):
         mat = h5py.File(filepath, 'r')
         sequences = mat[sequence_key]
         targets = None
         if targets_key:
             targets = mat[targets_key]
         return (sequences, targets, mat)
+    mat = scipy.io.loadmat(filepath)
+    targets = None
+    if targets_key:
+        targets = mat[targets_key]
+    return (mat[sequence_key], targets)
+
+
+def _get_chunk_size(matrices, batch_axes, chunk_size):
+    """
+    Gets the number of examples to read at once from the matrices:
+    all of them if they are in memory, and otherwise `chunk_size`
+    rounded up to a whole number of the HDF5 chunks of the sequences
+    (the first matrix) along their batch axis, so that each read
+    decompresses every chunk it touches once. The chunk size is rounded
+    up to the chunks of the other matrices as well, unless that makes
+    it more than `_MAX_CHUNK_GROWTH` times larger.
+    """
+    n_samples = matrices[0].shape[batch_axes[0]]
+    if isinstance(matrices[0], np.ndarray):
+        return min(chunk_size or n_samples, n_samples)
+    chunk_size = chunk_size or _DEFAULT_CHUNK_SIZE
+    extents = []
+    for matrix, batch_axis in zip(matrices, batch_axes):
+        chunks = getattr(matrix, "chunks", None)
+        extents.append(1 if chunks is None else chunks[batch_axis])
+    sequence_size = min(-(-chunk_size // extents[0]) * extents[0],
+                        n_samples)
+    extent = np.lcm.reduce(extents)
+    aligned_size = min(-(-chunk_size // extent) * extent, n_samples)
+    if aligned_size <= _MAX_CHUNK_GROWTH * sequence_size:
+        return int(max(1, aligned_size))
+    logger.warning(
+        "Reads of {0} examples cannot be aligned to the HDF5 chunks of "
+        "both the sequences and the targets without growing to {1} "
+        "examples. Aligning to the chunks of the sequences only.".format(
+            sequence_size, aligned_size))
+    return int(max(1, sequence_size))
 
 
 class MatFileSampler(FileSampler):
     """
     A sampler for which the dataset is loaded directly from a `*.mat` file.
 
+    The examples are read `chunk_size` at a time, as a contiguous slice
+    along the batch axis of the matrices that is kept in the order of
+    the file: the other axes are only rearranged, without a copy, when
+    the examples of a mini-batch are taken from it. When the file is
+    in the HDF5 format (MATLAB v7.3), the matrices are read from the
+    file as they are sampled, so neither the time taken to construct
+    the sampler nor its memory use grow with the size of the dataset.
+    Each pass over the dataset visits its examples once: if `shuffle`
+    is True, it visits the chunks in a pseudo-random order keyed by
+    `random_seed` and the pass, and the examples of each chunk in a
+    pseudo-random order. With `set_worker`, the worker processes of a
+    `torch.utils.data.DataLoader` take disjoint shards of the passes.
+
     Parameters
     ----------
     filepath : str
@@ -68,11 +135,25 @@ class MatFileSampler(FileSampler):
         Default is 1. Specify the alphabet axis.
     targets_batch_axis : int, optional
         Default is 0. Speciy the batch axis.
+    unpackbits : bool, optional
+        Default is False. Whether the sequences and targets are stored
+        with `numpy.packbits`, along the sequence length axis and the
+        feature axis respectively.
+    chunk_size : int or None, optional
+        Default is None. The number of examples read at once, which is
+        also the granularity of the shuffling. Chunks of a file in the
+        HDF5 format are rounded up to a whole number of the HDF5 chunks
+        of the sequences, and of the targets too unless that would more
+        than double the chunk size. If None, 4096 for a file in the
+        HDF5 format, and the whole dataset (so that every pass is a
+        full shuffle) otherwise.
 
     Attributes
     ----------
     n_samples : int
         The number of samples in the data matrix.
+    chunk_size : int
+        The number of examples read at once.
     """
 
     def __init__(self,
@@ -84,11 +165,15 @@ class MatFileSampler(FileSampler):
                  sequence_batch_axis=0,
                  sequence_alphabet_axis=1,
                  targets_batch_axis=0,
-                 unpackbits=False):
+                 unpackbits=False,
+                 chunk_size=None):
         """
         Constructs a new `MatFileSampler` object.
         """
         super(MatFileSampler, self).__init__()
+        self._filepath = filepath
+        self._sequence_key = sequence_key
+        self._targets_key = targets_key
         out = _load_mat_file(
             filepath,
             sequence_key,
@@ -96,25 +181,202 @@ class MatFileSampler(FileSampler):
         self._sample_seqs = out[0]
         self._sample_tgts = out[1]
         self._mat_fh = None
-        if len(out) > 2:
+        self._in_memory = len(out) == 2
+        if not self._in_memory:
             self._mat_fh = out[2]
         self._seq_batch_axis = sequence_batch_axis
         self._seq_alphabet_axis = sequence_alphabet_axis
         self._seq_final_axis = 3 - sequence_batch_axis - sequence_alphabet_axis
-        if self._sample_tgts is not None:
-            self._tgts_batch_axis = targets_batch_axis
+        self._tgts_batch_axis = targets_batch_axis
         self.n_samples = self._sample_seqs.shape[self._seq_batch_axis]
 
-        self._sample_indices = np.arange(
-            self.n_samples).tolist()
-        self._sample_next = 0
+        matrices = [self._sample_seqs]
+        batch_axes = [self._seq_batch_axis]
+        if self._sample_tgts is not None:
+            matrices.append(self._sample_tgts)
+            batch_axes.append(self._tgts_batch_axis)
+        self.chunk_size = _get_chunk_size(matrices, batch_axes, chunk_size)
+        self._n_chunks = -(-self.n_samples // self.chunk_size)
 
+        self._random_seed = random_seed
         self._shuffle = shuffle
-        if self._shuffle:
-            np.random.shuffle(self._sample_indices)
+        # the walk through the passes over the examples (see
+        # `selene_sdk.samplers.permutation.worker_steps`), the order of
+        # the chunks in the current pass and the chunk last read
+        self._walk_start = 0
+        self._n_walked = 0
+        self._worker_id = 0
+        self._n_workers = 1
+        self._worker_batch_size = 1
+        self._pass_chunks = None
+        self._chunk = None
 
         self.unpackbits = unpackbits
 
+    def initialize(self):
+        """
+        Closes the HDF5 file before the worker processes of a
+        `torch.utils.data.DataLoader` are started, so that each worker
+        opens the file itself rather than sharing the handle of this
+        process.
+        """
+        self._close()
+
+    def set_worker(self, worker_id, n_workers, batch_size=1):
+        """
+        Makes this copy of the sampler draw the examples of one of the
+        worker processes of a `torch.utils.data.DataLoader` (see
+        `selene_sdk.samplers.worker_init_fn`). The worker continues the
+        passes over the examples from where this process was, taking
+        the examples of batches `worker_id`, `worker_id + n_workers`,
+        ...
+
+        Parameters
+        ----------
+        worker_id : int
+            The ID of the worker, in `[0, n_workers)`.
+        n_workers : int
+            The number of workers.
+        batch_size : int, optional
+            Default is 1. The number of examples in each batch of the
+            DataLoader.
+
+        """
+        self._walk_start += self._n_walked
+        self._n_walked = 0
+        self._worker_id = worker_id
+        self._n_workers = n_workers
+        self._worker_batch_size = batch_size
+        self._chunk = None
+        # the handle of the parent process is dropped without closing it
+        if not self._in_memory:
+            self._mat_fh = None
+            self._sample_seqs = None
+            self._sample_tgts = None
+
+    def _close(self):
+        """
+        Closes the HDF5 file, which is opened again on the next read.
+        """
+        self._chunk = None
+        if self._mat_fh is not None:
+            self._mat_fh.close()
+            self._mat_fh = None
+            self._sample_seqs = None
+            self._sample_tgts = None
+
+    def _get_matrices(self):
+        """
+        Gets the sequences and targets matrices, opening the HDF5 file
+        if it is not open in this process.
+        """
+        if not self._in_memory and self._mat_fh is None:
+            self._sample_seqs, self._sample_tgts, self._mat_fh = \
+                _load_mat_file(self._filepath, self._sequence_key,
+                               targets_key=self._targets_key)
+        return self._sample_seqs, self._sample_tgts
+
+    def _get_pass_chunks(self, epoch):
+        """
+        Gets the position in pass `epoch` at which each chunk starts
+        and the chunks in the order they are visited.
+        """
+        if self._pass_chunks is None or self._pass_chunks[0] != epoch:
+            chunks = np.arange(self._n_chunks, dtype=np.int64)
+            if self._shuffle:
+                chunks = FeistelPermutation(
+                    self._n_chunks, [self._random_seed, epoch])(chunks)
+            lengths = np.minimum(self.chunk_size,
+                                 self.n_samples - chunks * self.chunk_size)
+            starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            self._pass_chunks = (epoch, starts, chunks)
+        return self._pass_chunks[1:]
+
+    def _next_indices(self, n_samples):
+        """
+        Takes the next steps of the walk through the passes over the
+        examples and gets the indices of the examples they visit.
+        """
+        steps = worker_steps(
+            self._walk_start, self._n_walked, n_samples,
+            worker_id=self._worker_id, n_workers=self._n_workers,
+            batch_size=self._worker_batch_size)
+        self._n_walked += n_samples
+        if not self._shuffle:
+            return steps % self.n_samples
+        passes = steps // self.n_samples
+        positions = steps % self.n_samples
+        indices = np.empty_like(positions)
+        for epoch in np.unique(passes):
+            in_pass = np.flatnonzero(passes == epoch)
+            starts, chunks = self._get_pass_chunks(int(epoch))
+            slots = np.searchsorted(
+                starts, positions[in_pass], side="right") - 1
+            for slot in np.unique(slots):
+                in_chunk = in_pass[slots == slot]
+                chunk = int(chunks[slot])
+                length = min(self.chunk_size,
+                             self.n_samples - chunk * self.chunk_size)
+                permutation = FeistelPermutation(
+                    length, [self._random_seed, int(epoch), chunk])
+                indices[in_chunk] = chunk * self.chunk_size + permutation(
+                    positions[in_chunk] - starts[slot])
+        return indices
+
+    def _read_chunk(self, chunk):
+        """
+        Reads a chunk of the examples, keeping the slices of the
+        matrices as they are stored and rearranging their axes with
+        views, so that the examples are along the first axis.
+        """
+        if self._chunk is None or self._chunk[0] != chunk:
+            sequences, targets = self._get_matrices()
+            rows = slice(chunk * self.chunk_size,
+                         (chunk + 1) * self.chunk_size)
+            index = [slice(None)] * 3
+            index[self._seq_batch_axis] = rows
+            sequences = np.transpose(
+                np.asarray(sequences[tuple(index)]),
+                (self._seq_batch_axis,
+                 self._seq_final_axis,
+                 self._seq_alphabet_axis))
+            if targets is not None:
+                index = [slice(None)] * 2
+                index[self._tgts_batch_axis] = rows
+                targets = np.asarray(targets[tuple(index)])
+                if self._tgts_batch_axis != 0:
+                    targets = np.transpose(targets, (1, 0))
+            self._chunk = (chunk, sequences, targets)
+        return self._chunk[1:]
+
+    def _read_rows(self, indices):
+        """
+        Reads the examples at `indices`, in that order, from the chunks
+        they are in.
+        """
+        chunks = indices // self.chunk_size
+        sequences = None
+        targets = None
+        # visit the chunks in the order of the walk, so that the chunk
+        # kept for the next mini-batch is the last one
+        _, first = np.unique(chunks, return_index=True)
+        for chunk in chunks[np.sort(first)]:
+            rows = np.flatnonzero(chunks == chunk)
+            chunk_seqs, chunk_tgts = self._read_chunk(int(chunk))
+            offsets = indices[rows] - chunk * self.chunk_size
+            if sequences is None:
+                sequences = np.empty(
+                    (len(indices),) + chunk_seqs.shape[1:],
+                    dtype=chunk_seqs.dtype)
+                if chunk_tgts is not None:
+                    targets = np.empty(
+                        (len(indices),) + chunk_tgts.shape[1:],
+                        dtype=chunk_tgts.dtype)
+            sequences[rows] = chunk_seqs[offsets]
+            if chunk_tgts is not None:
+                targets[rows] = chunk_tgts[offsets]
+        return sequences, targets
+
     def sample(self, batch_size=1):
         """
         Draws a mini-batch of examples and their corresponding
@@ -138,41 +400,14 @@ class MatFileSampler(FileSampler):
             The shape of `targets` will be :math:`B \\times F`,
             where :math:`F` is the number of features.
         """
-        sample_up_to = self._sample_next + batch_size
-        use_indices = None
-        if sample_up_to >= len(self._sample_indices):
-            if self._shuffle:
-                np.random.shuffle(self._sample_indices)
-            self._sample_next = 0
-            use_indices = self._sample_indices[:batch_size]
-        else:
-            use_indices = self._sample_indices[self._sample_next:sample_up_to]
-        self._sample_next += batch_size
-        use_indices = sorted(use_indices)
-        if self._seq_batch_axis == 0:
-            sequences = self._sample_seqs[use_indices, :, :]
-        elif self._seq_batch_axis == 1:
-            sequences = self._sample_seqs[:, use_indices, :]
-        else:
-            sequences = self._sample_seqs[:, :, use_indices]
-        if self._seq_batch_axis != 0 or self._seq_alphabet_axis != 2:
-            sequences = np.transpose(
-                sequences, (self._seq_batch_axis,
-                            self._seq_final_axis,
-                            self._seq_alphabet_axis))
+        sequences, targets = self._read_rows(self._next_indices(batch_size))
         if self.unpackbits:
             sequences = np.unpackbits(sequences, axis=-2)
             nulls = np.sum(sequences, axis=-1) == 4
             sequences = sequences.astype(float)
             sequences[nulls, :] = 0.25
 
-        if self._sample_tgts is not None:
-            if self._tgts_batch_axis == 0:
-                targets = self._sample_tgts[use_indices, :]
-            else:
-                targets = self._sample_tgts[:, use_indices]
-                targets = np.transpose(
-                    targets, (1, 0))
+        if targets is not None:
             if self.unpackbits:
                 targets = np.unpackbits(targets,axis=-1).astype(bool)
             return (sequences, targets)
@@ -240,7 +475,7 @@ class MatFileSampler(FileSampler):
             `target_matrix` is of the shape :math:`S \\times F`, where
             :math:`S =` `n_samples`.
         """
-        if self._sample_tgts is None:
+        if self._targets_key is None:
             raise ValueError(
                 "No targets matrix was specified during sampler "
                 "initialization. Please use `get_data` instead.")
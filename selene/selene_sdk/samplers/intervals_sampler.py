@@ -4,35 +4,39 @@ methods.
 """
 from collections import namedtuple
 import logging
-import random
 
 import numpy as np
+from scipy import sparse
 
 from .online_sampler import OnlineSampler
-from ..utils import get_indices_and_probabilities
 
 logger = logging.getLogger(__name__)
 
 
-SampleIndices = namedtuple(
-    "SampleIndices", ["indices", "weights"])
+SampleIntervals = namedtuple(
+    "SampleIntervals", ["indices", "offsets"])
 """
-A tuple containing the indices for some samples, and a weight to
-allot to each index when randomly drawing from them.
+The intervals that the window centers of one mode are drawn from.
+Position `offsets[i] + k` of the mode is position `k` of interval
+`indices[i]`, so a position drawn uniformly from the total length of
+the intervals, which draws an interval with probability proportional
+to its length, is found in its interval with one binary search of
+`offsets`.
 
 Parameters
 ----------
-indices : list(int)
-    The numeric index of each sample.
-weights : list(float)
-    The amount of weight assigned to each sample.
+indices : numpy.ndarray, dtype=numpy.int64
+    The index of each interval in `IntervalsSampler.interval_starts`.
+offsets : numpy.ndarray, dtype=numpy.int64
+    The cumulative lengths of the intervals, starting at 0, so that
+    `offsets[-1]` is their total length.
 
 Attributes
 ----------
-indices : list(int)
-    The numeric index of each sample.
-weights : list(float)
-    The amount of weight assigned to each sample.
+indices : numpy.ndarray, dtype=numpy.int64
+    The index of each interval in `IntervalsSampler.interval_starts`.
+offsets : numpy.ndarray, dtype=numpy.int64
+    The cumulative lengths of the intervals, starting at 0.
 
 """
 
@@ -41,10 +45,12 @@ weights : list(float)
 class IntervalsSampler(OnlineSampler):
     """
     Draws samples from pre-specified windows in the reference sequence.
+    The window centers of a batch are drawn at once, uniformly from the
+    positions of the intervals of the current mode.
 
     Parameters
     ----------
-    reference_sequence : selene_sdk.sequences.Sequence
+    reference_sequence : selene_sdk.sequences.Genome
         A reference sequence from which to create examples.
     target_path : str
         Path to tabix-indexed, compressed BED file (`*.bed.gz`) of genomic
@@ -75,14 +81,44 @@ class IntervalsSampler(OnlineSampler):
         Default is 1000. Model is trained on sequences of `sequence_length`
         where genomic features are annotated to the center regions of
         these sequences.
-    center_bin_to_predict : int, optional
+    bin_size : int, optional
         Default is 200. Query the tabix-indexed file for a region of
-        length `center_bin_to_predict`.
+        length `bin_size`.
+    step_size : int, optional
+        Default is 100. The step between the bins of the center region
+        (see `selene_sdk.targets.GenomicFeatures`).
     feature_thresholds : float [0.0, 1.0] or None, optional
          Default is 0.5. The `feature_threshold` to pass to the
         `GenomicFeatures` object.
     mode : {'train', 'validate', 'test'}
         Default is `'train'`. The mode to run the sampler in.
+    max_unknown_bases : int or None, optional
+        Default is None. If not None, windows with more than this many
+        unknown bases are rejected before their sequence is read.
+    output_indices : bool, optional
+        Default is False. If True, `sample` returns the base indices of
+        the sequences instead of their one-hot encodings.
+    targets_in_memory : bool, optional
+        Default is False. If True, the annotations in `target_path` are
+        loaded into memory instead of queried through tabix (see
+        `selene_sdk.targets.GenomicFeatures`).
+    sparse_targets : bool, optional
+        Default is False. If True, `sample` returns the targets as a
+        `scipy.sparse.csr_matrix` of their positives.
+    block_size : int or None, optional
+        Default is None. If not None, positions are drawn in blocks of
+        `block_size` consecutive positions of the intervals of a mode,
+        so that nearby windows are read together: the sampler picks a
+        block with probability proportional to its size, draws
+        `positions_per_block` positions uniformly within it, and mixes
+        the positions of successive blocks in a shuffle buffer of
+        `shuffle_buffer_size` positions that the batches are drawn
+        from (see `selene_sdk.samplers.RandomPositionsSampler`).
+    positions_per_block : int, optional
+        Default is 64. The number of positions drawn from each block.
+    shuffle_buffer_size : int, optional
+        Default is 4096. The number of positions kept in the shuffle
+        buffer of the blocks.
     save_datasets : list of str
         Default is `["test"]`. The list of modes for which we should
         save the sampled data to file.
@@ -95,19 +131,27 @@ class IntervalsSampler(OnlineSampler):
 
     Attributes
     ----------
-    reference_sequence : selene_sdk.sequences.Sequence
+    reference_sequence : selene_sdk.sequences.Genome
         The reference sequence that examples are created from.
     target : selene_sdk.targets.Target
         The `selene_sdk.targets.Target` object holding the features that we
         would like to predict.
+    chrom_names : numpy.ndarray
+        The distinct chromosomes of the intervals, in order of first
+        appearance in `intervals_path`.
+    interval_chrom_codes : numpy.ndarray, dtype=numpy.int32
+        The index in `chrom_names` of the chromosome of each interval.
+    interval_starts : numpy.ndarray, dtype=numpy.int64
+        The start coordinate of each interval.
+    interval_ends : numpy.ndarray, dtype=numpy.int64
+        The end coordinate of each interval.
     sample_from_intervals : list(tuple(str, int, int))
-        A list of coordinates that specify the intervals we can draw
-        samples from.
-    interval_lengths : list(int)
-        A list of the lengths of the intervals that we can draw samples
-        from. The probability that we will draw a sample from an
-        interval is a function of that interval's length and the length
-        of all other intervals.
+        The coordinates of the intervals we can draw samples from,
+        built from the arrays above when accessed.
+    interval_lengths : numpy.ndarray, dtype=numpy.int64
+        The lengths of the intervals that we can draw samples from. The
+        probability that we will draw a sample from an interval is
+        proportional to its length.
     sample_negative : bool
         Whether negative examples (i.e. with no positive label) should
         be drawn when generating samples. If `True`, both negative and
@@ -137,6 +181,19 @@ class IntervalsSampler(OnlineSampler):
     mode : str
         The current mode that the sampler is running in. Must be one of
         the modes listed in `modes`.
+    n_windows_drawn : int
+        The number of windows drawn by `sample`.
+    n_windows_rejected : int
+        The number of windows drawn by `sample` that were rejected and
+        drawn again.
+    block_size : int or None
+        The number of consecutive positions in a block, or None if
+        positions are drawn independently.
+    positions_per_block : int
+        The number of positions drawn from each block.
+    shuffle_buffer_size : int
+        The number of positions kept in the shuffle buffer of the
+        blocks.
 
     """
     def __init__(self,
@@ -149,11 +206,19 @@ class IntervalsSampler(OnlineSampler):
                  validation_holdout=['chr6', 'chr7'],
                  test_holdout=['chr8', 'chr9'],
                  sequence_length=1000,
-                 bin_size_to_predict=200,
+                 bin_size=200,
+                 step_size=100,
                  bins_start=200,
                  bins_end=800,
                  feature_thresholds=0.5,
                  mode="train",
+                 max_unknown_bases=None,
+                 output_indices=False,
+                 targets_in_memory=False,
+                 sparse_targets=False,
+                 block_size=None,
+                 positions_per_block=64,
+                 shuffle_buffer_size=4096,
                  save_datasets=["test"],
                  output_dir=None):
         """
@@ -167,38 +232,55 @@ class IntervalsSampler(OnlineSampler):
             validation_holdout=validation_holdout,
             test_holdout=test_holdout,
             sequence_length=sequence_length,
-            bin_size_to_predict=bin_size_to_predict,
+            bin_size=bin_size,
+            step_size=step_size,
             bins_start=bins_start,
             bins_end=bins_end,
             feature_thresholds=feature_thresholds,
             mode=mode,
+            max_unknown_bases=max_unknown_bases,
+            output_indices=output_indices,
+            targets_in_memory=targets_in_memory,
+            sparse_targets=sparse_targets,
             save_datasets=save_datasets,
             output_dir=output_dir)
 
         self._sample_from_mode = {}
-        self._randcache = {}
         for mode in self.modes:
             self._sample_from_mode[mode] = None
-            self._randcache[mode] = {"cache_indices": None, "sample_next": 0}
-
-        self.sample_from_intervals = []
-        self.interval_lengths = []
-
+        # draws the positions and strands of whole batches
+        self._rng = np.random.default_rng(self.seed)
+        self.n_windows_drawn = 0
+        self.n_windows_rejected = 0
+        self.block_size = block_size
+        self.positions_per_block = positions_per_block
+        self.shuffle_buffer_size = shuffle_buffer_size
+        self._block_buffers = {
+            mode: np.zeros(0, dtype=np.int64) for mode in self.modes}
+
+        self._read_intervals(intervals_path)
         if self._holdout_type == "chromosome":
-            self._partition_dataset_chromosome(intervals_path)
+            self._partition_dataset_chromosome()
         else:
-            self._partition_dataset_proportion(intervals_path)
-
-        for mode in self.modes:
-            self._update_randcache(mode=mode)
+            self._partition_dataset_proportion()
 
         self.sample_negative = sample_negative
 
-    def _partition_dataset_proportion(self, intervals_path):
+    @property
+    def sample_from_intervals(self):
+        return list(zip(
+            self.chrom_names[self.interval_chrom_codes].tolist(),
+            self.interval_starts.tolist(),
+            self.interval_ends.tolist()))
+
+    @property
+    def interval_lengths(self):
+        return self.interval_ends - self.interval_starts
+
+    def _read_intervals(self, intervals_path):
         """
-        When holdout sets are created by randomly sampling a proportion
-        of the data, this method is used to divide the data into
-        train/test/validate subsets.
+        Reads the intervals into the arrays of their chromosome codes,
+        start and end coordinates.
 
         Parameters
         ----------
@@ -208,182 +290,118 @@ class IntervalsSampler(OnlineSampler):
             line.
 
         """
+        chrom_codes = {}
+        codes, starts, ends = [], [], []
         with open(intervals_path, 'r') as file_handle:
             for line in file_handle:
                 cols = line.strip().split('\t')
-                chrom = cols[0]
-                start = int(cols[1])
-                end = int(cols[2])
-                self.sample_from_intervals.append((chrom, start, end))
-                self.interval_lengths.append(end - start)
-        n_intervals = len(self.sample_from_intervals)
+                codes.append(chrom_codes.setdefault(cols[0], len(chrom_codes)))
+                starts.append(int(cols[1]))
+                ends.append(int(cols[2]))
+        self.chrom_names = np.array(list(chrom_codes), dtype=object)
+        self.interval_chrom_codes = np.array(codes, dtype=np.int32)
+        self.interval_starts = np.array(starts, dtype=np.int64)
+        self.interval_ends = np.array(ends, dtype=np.int64)
+
+    def _index_intervals(self, indices):
+        """
+        Builds the `SampleIntervals` of a mode from the indices of its
+        intervals.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = np.maximum(
+            self.interval_ends[indices] - self.interval_starts[indices], 0)
+        return SampleIntervals(
+            indices, np.concatenate([[0], np.cumsum(lengths)]).astype(
+                np.int64))
+
+    def _partition_dataset_proportion(self):
+        """
+        When holdout sets are created by randomly sampling a proportion
+        of the data, this method is used to divide the data into
+        train/test/validate subsets.
+        """
+        n_intervals = len(self.interval_starts)
 
         # all indices in the intervals list are shuffled
-        select_indices = list(range(n_intervals))
-        np.random.shuffle(select_indices)
+        select_indices = np.random.permutation(n_intervals)
 
         # the first section of indices is used as the validation set
         n_indices_validate = int(n_intervals * self.validation_holdout)
-        val_indices, val_weights = get_indices_and_probabilities(
-            self.interval_lengths, select_indices[:n_indices_validate])
-        self._sample_from_mode["validate"] = SampleIndices(
-            val_indices, val_weights)
+        self._sample_from_mode["validate"] = self._index_intervals(
+            select_indices[:n_indices_validate])
 
         if self.test_holdout:
             # if applicable, the second section of indices is used as the
             # test set
             n_indices_test = int(n_intervals * self.test_holdout)
             test_indices_end = n_indices_test + n_indices_validate
-            test_indices, test_weights = get_indices_and_probabilities(
-                self.interval_lengths,
+            self._sample_from_mode["test"] = self._index_intervals(
                 select_indices[n_indices_validate:test_indices_end])
-            self._sample_from_mode["test"] = SampleIndices(
-                test_indices, test_weights)
 
             # remaining indices are for the training set
-            tr_indices, tr_weights = get_indices_and_probabilities(
-                self.interval_lengths, select_indices[test_indices_end:])
-            self._sample_from_mode["train"] = SampleIndices(
-                tr_indices, tr_weights)
+            self._sample_from_mode["train"] = self._index_intervals(
+                select_indices[test_indices_end:])
         else:
             # remaining indices are for the training set
-            tr_indices, tr_weights = get_indices_and_probabilities(
-                self.interval_lengths, select_indices[n_indices_validate:])
-            self._sample_from_mode["train"] = SampleIndices(
-                tr_indices, tr_weights)
+            self._sample_from_mode["train"] = self._index_intervals(
+                select_indices[n_indices_validate:])
 
-    def _partition_dataset_chromosome(self, intervals_path):
+    def _partition_dataset_chromosome(self):
         """
         When holdout sets are created by selecting all samples from a
         specified region (e.g. a chromosome) this method is used to
         divide the data into train/test/validate subsets.
-
-        Parameters
-        ----------
-        intervals_path : str
-            The path to the file that contains the intervals to sample
-            from. In this file, each interval should occur on a separate
-            line.
-
-        """
-        for mode in self.modes:
-            self._sample_from_mode[mode] = SampleIndices([], [])
-        with open(intervals_path, 'r') as file_handle:
-            for index, line in enumerate(file_handle):
-                cols = line.strip().split('\t')
-                chrom = cols[0]
-                start = int(cols[1])
-                end = int(cols[2])
-                if chrom in self.validation_holdout:
-                    self._sample_from_mode["validate"].indices.append(
-                        index)
-                elif self.test_holdout and chrom in self.test_holdout:
-                    self._sample_from_mode["test"].indices.append(
-                        index)
-                else:
-                    self._sample_from_mode["train"].indices.append(
-                        index)
-                self.sample_from_intervals.append((chrom, start, end))
-                self.interval_lengths.append(end - start)
-
-        for mode in self.modes:
-            sample_indices = self._sample_from_mode[mode].indices
-            indices, weights = get_indices_and_probabilities(
-                self.interval_lengths, sample_indices)
-            self._sample_from_mode[mode] = \
-                self._sample_from_mode[mode]._replace(
-                    indices=indices, weights=weights)
-
-    def _retrieve(self, chrom, position):
         """
-        Retrieves samples around a position in the `reference_sequence`.
-
-        Parameters
-        ----------
-        chrom : str
-            The name of the region (e.g. "chrX", "YFP")
-        position : int
-            The position in the query region that we will search around
-            for samples.
-
-        Returns
-        -------
-        retrieved_seq, retrieved_targets : \
-        tuple(numpy.ndarray, list(numpy.ndarray))
-            A tuple containing the numeric representation of the
-            sequence centered at the query position, as well as a list
-            of samples within this region that met the filtering
-            standards.
-
-        """
-        retrieved_targets = self.target.get_feature_data(
-            chrom, self.bins_start, self.bins_end)
-        if not self.sample_negative and np.sum(retrieved_targets) == 0:
-            logger.info("No features found in region surrounding "
-                        "region \"{0}\" position {1}. Sampling again.".format(
-                            chrom, position))
-            return None
-
-        # TODO: fix this... could be significantly less computation.
-        bin_start = position - self._start_radius
-        bin_end = position + self._end_radius
-        window_start = bin_start - self.surrounding_sequence_radius
-        window_end = bin_end + self.surrounding_sequence_radius
-        strand = self.STRAND_SIDES[random.randint(0, 1)]
-        retrieved_seq = \
-            self.reference_sequence.get_encoding_from_coords(
-                chrom, window_start, window_end, strand)
-        if retrieved_seq.shape[0] == 0:
-            logger.info("Full sequence centered at region \"{0}\" position "
-                        "{1} could not be retrieved. Sampling again.".format(
-                            chrom, position))
-            return None
-        elif np.sum(retrieved_seq) / float(retrieved_seq.shape[0]) < 0.60:
-            logger.info("Over 30% of the bases in the sequence centered "
-                        "at region \"{0}\" position {1} are ambiguous ('N'). "
-                        "Sampling again.".format(chrom, position))
-            return None
-
-        if self.mode in self._save_datasets:
-            feature_indices = ';'.join(
-                [str(f) for f in np.nonzero(retrieved_targets)[0]])
-            self._save_datasets[self.mode].append(
-                [chrom,
-                 window_start,
-                 window_end,
-                 strand,
-                 feature_indices])
-            if len(self._save_datasets[self.mode]) > 200000:
-                self.save_dataset_to_file(self.mode)
-        return (retrieved_seq, retrieved_targets)
-
-    def _update_randcache(self, mode=None):
+        interval_chroms = self.chrom_names[self.interval_chrom_codes]
+        in_validate = np.isin(interval_chroms, self.validation_holdout)
+        in_test = np.zeros(len(interval_chroms), dtype=bool)
+        if self.test_holdout:
+            in_test = ~in_validate & np.isin(
+                interval_chroms, self.test_holdout)
+            self._sample_from_mode["test"] = self._index_intervals(
+                np.nonzero(in_test)[0])
+        self._sample_from_mode["validate"] = self._index_intervals(
+            np.nonzero(in_validate)[0])
+        self._sample_from_mode["train"] = self._index_intervals(
+            np.nonzero(~in_validate & ~in_test)[0])
+
+    def _draw_windows(self, n_windows):
         """
-        Updates the cache of indices of intervals. This allows us
-        to randomly sample from our data without having to use a
-        fixed-point approach or keeping all labels in memory.
-
-        Parameters
-        ----------
-        mode : str or None, optional
-            Default is `None`. The mode that these samples should be
-            used for. See `selene_sdk.samplers.IntervalsSampler.modes` for
-            more information.
-
+        Draws the chromosomes, center positions and strands of windows
+        uniformly from the positions of the intervals of `self.mode`.
         """
-        if not mode:
-            mode = self.mode
-        self._randcache[mode]["cache_indices"] = np.random.choice(
-            self._sample_from_mode[mode].indices,
-            size=len(self._sample_from_mode[mode].indices),
-            replace=True,
-            p=self._sample_from_mode[mode].weights)
-        self._randcache[mode]["sample_next"] = 0
+        sample_intervals = self._sample_from_mode[self.mode]
+        n_positions = sample_intervals.offsets[-1]
+        if n_positions == 0:
+            raise ValueError(
+                "No interval to draw from in mode '{0}'.".format(self.mode))
+        if self.block_size is not None:
+            draws = self._draw_blocked(n_windows, n_positions)
+        else:
+            draws = self._rng.integers(0, n_positions, size=n_windows)
+        slots = np.searchsorted(
+            sample_intervals.offsets, draws, side="right") - 1
+        intervals = sample_intervals.indices[slots]
+        positions = (self.interval_starts[intervals] + draws -
+                     sample_intervals.offsets[slots])
+        strands = np.array(self.STRAND_SIDES, dtype=object)[
+            self._rng.integers(0, 2, size=n_windows)]
+        return (self.chrom_names[self.interval_chrom_codes[intervals]],
+                positions, strands)
+
+    def set_worker(self, worker_id, n_workers, batch_size=1):
+        super(IntervalsSampler, self).set_worker(
+            worker_id, n_workers, batch_size=batch_size)
+        self._rng = np.random.default_rng(self._worker_seed_sequence())
 
     def sample(self, batch_size=1):
         """
         Randomly draws a mini-batch of examples and their corresponding
-        labels.
+        labels. The windows of the whole batch are drawn at once, and
+        any that have more than `max_unknown_bases` unknown bases,
+        whose sequence cannot be retrieved or, unless
+        `sample_negative`, that have no positive label are drawn again.
 
         Parameters
         ----------
@@ -401,34 +419,78 @@ class IntervalsSampler(OnlineSampler):
             `batch_size`, :math:`L` is the sequence length, and
             :math:`N` is the size of the sequence type's alphabet.
             The shape of `targets` will be :math:`B \\times F`,
-            where :math:`F` is the number of features.
+            where :math:`F` is the number of features times the
+            number of bins.
 
         """
-        sequences = np.zeros((batch_size, self.sequence_length, 4))
-        targets = np.zeros((batch_size, self.n_features))
-        n_samples_drawn = 0
-        while n_samples_drawn < batch_size:
-            sample_index = self._randcache[self.mode]["sample_next"]
-            if sample_index == len(self._sample_from_mode[self.mode].indices):
-                self._update_randcache()
-                sample_index = 0
-
-            rand_interval_index = \
-                self._randcache[self.mode]["cache_indices"][sample_index]
-            self._randcache[self.mode]["sample_next"] += 1
-
-            interval_info = self.sample_from_intervals[rand_interval_index]
-            interval_length = self.interval_lengths[rand_interval_index]
-
-            chrom = interval_info[0]
-            position = int(
-                interval_info[1] + random.uniform(0, 1) * interval_length)
-
-            retrieve_output = self._retrieve(chrom, position)
-            if not retrieve_output:
+        if self.output_indices:
+            sequences = np.zeros((batch_size, self.sequence_length),
+                                 dtype=np.uint8)
+        else:
+            sequences = np.zeros(
+                (batch_size, self.sequence_length,
+                 len(self.reference_sequence.BASES_ARR)), dtype=bool)
+        windows = []
+        targets = []
+        while len(windows) < batch_size:
+            n_windows = batch_size - len(windows)
+            chroms, positions, strands = self._draw_windows(n_windows)
+            bin_starts = positions - self._start_radius
+            bin_ends = positions + self._end_radius
+            window_starts = (bin_starts -
+                             self._start_surrounding_sequence_radius)
+            window_ends = bin_ends + self._end_surrounding_sequence_radius
+            self.n_windows_drawn += n_windows
+
+            keep = np.ones(n_windows, dtype=bool)
+            if self.max_unknown_bases is not None:
+                keep = self.reference_sequence.count_unknown_batch(
+                    chroms, window_starts, window_ends) <= \
+                    self.max_unknown_bases
+            kept = np.nonzero(keep)[0]
+            if len(kept) > 0:
+                window_targets = self.target.get_feature_data_batch(
+                    chroms[kept], bin_starts[kept], bin_ends[kept],
+                    as_sparse=self.sparse_targets)
+            if len(kept) > 0 and not self.sample_negative:
+                if self.sparse_targets:
+                    positive = window_targets.getnnz(axis=1) > 0
+                else:
+                    positive = np.any(window_targets, axis=1)
+                kept = kept[positive]
+                window_targets = window_targets[np.nonzero(positive)[0]]
+            n_rejected = n_windows - len(kept)
+            if len(kept) > 0:
+                encodings, valid = \
+                    self.reference_sequence.get_encodings_from_coords(
+                        chroms[kept], window_starts[kept],
+                        window_ends[kept], strands[kept],
+                        indices=self.output_indices)
+                if not self.output_indices:
+                    # rejects windows of mostly ambiguous bases
+                    valid &= (encodings.reshape(len(kept), -1).sum(axis=1) /
+                              float(self.sequence_length) >= 0.60)
+                n_rejected += len(kept) - int(np.sum(valid))
+            if n_rejected > 0:
+                self.n_windows_rejected += n_rejected
+                logger.info("{0} windows were rejected. Sampling "
+                            "again.".format(n_rejected))
+            if len(kept) == 0:
                 continue
-            seq, seq_targets = retrieve_output
-            sequences[n_samples_drawn, :, :] = seq
-            targets[n_samples_drawn, :] = seq_targets
-            n_samples_drawn += 1
+
+            accepted = kept[valid]
+            filled = len(windows) + np.arange(len(accepted))
+            sequences[filled] = encodings[valid]
+            windows.extend(zip(
+                chroms[accepted], bin_starts[accepted].tolist(),
+                bin_ends[accepted].tolist(),
+                window_starts[accepted].tolist(),
+                window_ends[accepted].tolist(), strands[accepted]))
+            targets.append(window_targets[np.nonzero(valid)[0]])
+
+        if self.sparse_targets:
+            targets = sparse.vstack(targets, format="csr").astype(np.float32)
+        else:
+            targets = np.concatenate(targets).astype(float)
+        self._save_batch_windows(windows, targets)
         return (sequences, targets)
@@ -49,6 +49,11 @@ class IntervalsWithoutReplacementSampler(OnlineSampler):
     a sequence centered at that position for input to the model. This sampler
     will draw samples without replacement.
 
+    It remembers the positions drawn so far rather than walking a
+    permutation of them, so its draws are not split among worker
+    processes and cannot be resumed from a checkpoint as those of
+    `RandomPositionsSampler` with `replacement=False` can.
+
     TODO: generalize to selene_sdk.sequences.Sequence?
 
     Parameters
@@ -83,6 +88,19 @@ class IntervalsWithoutReplacementSampler(OnlineSampler):
         `GenomicFeatures` object.
     mode : {'train', 'validate', 'test'}
         Default is `'train'`. The mode to run the sampler in.
+    max_unknown_bases : int or None, optional
+        Default is None. If not None, windows with more than this many
+        unknown bases are rejected before their sequence is read.
+    output_indices : bool, optional
+        Default is False. If True, `sample` returns the base indices of
+        the sequences instead of their one-hot encodings.
+    targets_in_memory : bool, optional
+        Default is False. If True, the annotations in `target_path` are
+        loaded into memory instead of queried through tabix (see
+        `selene_sdk.targets.GenomicFeatures`).
+    sparse_targets : bool, optional
+        Default is False. If True, `sample` returns the targets as a
+        `scipy.sparse.csr_matrix` of their positives.
     save_datasets : list(str), optional
         Default is `['test']`. The list of modes for which we should
         save the sampled data to file.
@@ -141,6 +159,10 @@ class IntervalsWithoutReplacementSampler(OnlineSampler):
                  bins_end=800,
                  feature_thresholds=0.5,
                  mode="train",
+                 max_unknown_bases=None,
+                 output_indices=False,
+                 targets_in_memory=False,
+                 sparse_targets=False,
                  save_datasets=[],
                  output_dir=None):
         super(IntervalsWithoutReplacementSampler, self).__init__(
@@ -157,6 +179,10 @@ class IntervalsWithoutReplacementSampler(OnlineSampler):
             bins_end=bins_end,
             feature_thresholds=feature_thresholds,
             mode=mode,
+            max_unknown_bases=max_unknown_bases,
+            output_indices=output_indices,
+            targets_in_memory=targets_in_memory,
+            sparse_targets=sparse_targets,
             save_datasets=save_datasets,
             output_dir=output_dir)
         self.intervals_path = intervals_path
@@ -264,10 +290,14 @@ class IntervalsWithoutReplacementSampler(OnlineSampler):
                   self._start_radius, self._end_radius,
                   self.surrounding_sequence_radius)
             return None
+        if self._exceeds_max_unknown_bases(chrom, window_start, window_end):
+            logger.info("Sequence centered at {0} position {1} has more "
+                        "than {2} unknown bases. Sampling again.".format(
+                            chrom, position, self.max_unknown_bases))
+            return None
         strand = self.STRAND_SIDES[random.randint(0, 1)]
-        retrieved_seq = \
-            self.reference_sequence.get_encoding_from_coords(
-                chrom, window_start, window_end, strand)
+        retrieved_seq = self._get_sequence(
+            chrom, window_start, window_end, strand)
         if retrieved_seq.shape[0] == 0:
             logger.info("Full sequence centered at {0} position {1} "
                         "could not be retrieved. Sampling again.".format(
@@ -282,31 +312,20 @@ class IntervalsWithoutReplacementSampler(OnlineSampler):
                       chrom, window_start, window_end, strand,
                       self.sequence_length))
             return None
-
-        retrieved_targets = self.target.get_feature_data(
-            chrom, bin_start, bin_end)
-        if self.mode in self._save_datasets:
-            feature_indices = ';'.join(
-                [str(f) for f in np.nonzero(retrieved_targets)[0]])
-            self._save_datasets[self.mode].append(
-                [chrom,
-                 window_start,
-                 window_end,
-                 strand,
-                 feature_indices])
-            if len(self._save_datasets[self.mode]) > 200000:
-                self.save_dataset_to_file(self.mode)
-        return (retrieved_seq, retrieved_targets)
+        # the targets are fetched for the whole mini-batch in `sample`
+        return (retrieved_seq,
+                (chrom, bin_start, bin_end, window_start, window_end, strand))
 
     def _update_randcache(self, mode=None):
         if not mode:
             mode = self.mode
-        self._randcache[mode]["cache_indices"] = np.random.choice(
+        self._randcache[mode]["cache_indices"] = self._cache_random_state(
+            mode, np.random).choice(
             self._sample_from_mode[mode].indices,
             size=200000,
             replace=True,
             p=self._sample_from_mode[mode].weights)
-        self._randcache[mode]["sample_next"] = 0
+        self._randcache[mode]["sample_next"] = self._worker_id
 
     def sample(self, batch_size=1):
         """
@@ -333,17 +352,17 @@ class IntervalsWithoutReplacementSampler(OnlineSampler):
 
         """
         sequences = None
-        targets = None
+        windows = []
         n_samples_drawn = 0
         while n_samples_drawn < batch_size:
             sample_index = self._randcache[self.mode]["sample_next"]
-            if sample_index == len(self._randcache[self.mode]["cache_indices"]):
+            if sample_index >= len(self._randcache[self.mode]["cache_indices"]):
                 self._update_randcache()
-                sample_index = 0
+                sample_index = self._randcache[self.mode]["sample_next"]
 
             rand_interval_index = \
                 self._randcache[self.mode]["cache_indices"][sample_index]
-            self._randcache[self.mode]["sample_next"] += 1
+            self._randcache[self.mode]["sample_next"] += self._n_workers
 
             # Only draw examples that we have not seen before.
             # print("About to draw", flush=True)
@@ -368,11 +387,12 @@ class IntervalsWithoutReplacementSampler(OnlineSampler):
             retrieve_output = self._retrieve(chrom, position)
             if not retrieve_output:
                 continue
-            seq, seq_targets = retrieve_output
-            if sequences is None and targets is None:
-                sequences = np.zeros((batch_size, seq.shape[0], seq.shape[1]), dtype=float)
-                targets = np.zeros((batch_size, self.n_features * self.n_bins), dtype=float)
-            sequences[n_samples_drawn, :, :] = seq
-            targets[n_samples_drawn, :] = seq_targets
+            seq, window = retrieve_output
+            if sequences is None:
+                sequences = np.zeros(
+                    (batch_size,) + seq.shape, dtype=seq.dtype)
+            sequences[n_samples_drawn] = seq
+            windows.append(window)
             n_samples_drawn += 1
+        targets = self._get_batch_targets(windows)
         return (sequences, targets)
@@ -9,6 +9,7 @@ import os
 import random
 
 import numpy as np
+from scipy import sparse
 
 from .sampler import Sampler
 from ..targets import GenomicFeatures
@@ -53,6 +54,27 @@ class OnlineSampler(Sampler, metaclass=ABCMeta):
         `GenomicFeatures` object.
     mode : {'train', 'validate', 'test'}, optional
         Default is `'train'`. The mode to run the sampler in.
+    max_unknown_bases : int or None, optional
+        Default is None. If not None, windows with more than this many
+        unknown bases are rejected before their sequence is read (see
+        `selene_sdk.sequences.Genome.count_unknown`).
+    output_indices : bool, optional
+        Default is False. If True, `sample` returns the
+        :math:`B \\times L` `numpy.uint8` base indices of the sequences
+        (see `selene_sdk.sequences.Genome.sequence_to_indices`) instead
+        of their :math:`B \\times L \\times N` encodings. The model
+        trainers expand them to one-hot encodings on the device (see
+        `selene_sdk.utils.expand_sequence_indices`).
+    targets_in_memory : bool, optional
+        Default is False. If True, the annotations in `target_path` are
+        loaded into memory once per process instead of queried through
+        tabix for every bin (see `selene_sdk.targets.GenomicFeatures`).
+    sparse_targets : bool, optional
+        Default is False. If True, `sample` and `get_data_and_targets`
+        return the targets as a `scipy.sparse.csr_matrix` of their
+        positives, which the data loaders and model trainers carry as
+        sparse tensors until the loss (see
+        `selene_sdk.utils.targets_to_tensor`).
     save_datasets : list(str), optional
         Default is `[]` the empty list. The list of modes for which we should
         save the sampled data to file (e.g. `["test", "validate"]`).
@@ -128,6 +150,10 @@ class OnlineSampler(Sampler, metaclass=ABCMeta):
                  bins_end=800,
                  feature_thresholds=0.5,
                  mode="train",
+                 max_unknown_bases=None,
+                 output_indices=False,
+                 targets_in_memory=False,
+                 sparse_targets=False,
                  save_datasets=[],
                  output_dir=None):
 
@@ -218,17 +244,236 @@ class OnlineSampler(Sampler, metaclass=ABCMeta):
             self._end_radius = self.bin_radius + 1
 
         self.reference_sequence = reference_sequence
+        self.max_unknown_bases = max_unknown_bases
+        self.output_indices = output_indices
+        self.sparse_targets = sparse_targets
 
         self.n_features = len(self._features)
 
         self.target = GenomicFeatures(
             target_path, self._features,
             feature_thresholds=feature_thresholds,
-            bin_size=bin_size, step_size=step_size)
+            bin_size=bin_size, step_size=step_size,
+            in_memory=targets_in_memory)
         self.n_bins = int((multibins_len - bin_size) / step_size) + 1
 
         self._save_filehandles = {}
 
+        # the worker process this copy of the sampler draws for (see
+        # `set_worker`), and the number of interval caches it has drawn
+        self._worker_id = 0
+        self._n_workers = 1
+        self._worker_batch_size = 1
+        self._n_cache_updates = {}
+
+    def initialize(self):
+        """
+        Builds the state that the copies of the sampler in the worker
+        processes of a `torch.utils.data.DataLoader` share, such as the
+        holdout partitions and the interval caches, so that it is built
+        once before the workers are started rather than in each worker.
+        """
+        return
+
+    def _worker_seed_sequence(self):
+        """
+        Gets the seed of the random stream of the current worker,
+        derived from `seed` and the worker ID.
+        """
+        return np.random.SeedSequence(
+            self.seed, spawn_key=(0, self._worker_id))
+
+    def set_worker(self, worker_id, n_workers, batch_size=1):
+        """
+        Makes this copy of the sampler draw the examples of one of the
+        worker processes of a `torch.utils.data.DataLoader` (see
+        `selene_sdk.samplers.SamplerDataLoader`). The worker gets its
+        own random stream, derived from `seed` and `worker_id`, and
+        takes every `n_workers`-th entry of the interval caches, which
+        all the workers draw identically, so that the workers do not
+        replay each other's examples.
+
+        Parameters
+        ----------
+        worker_id : int
+            The ID of the worker, in `[0, n_workers)`.
+        n_workers : int
+            The number of workers.
+        batch_size : int, optional
+            Default is 1. The number of examples in each batch of the
+            DataLoader. Each worker draws whole batches, and the
+            DataLoader takes batch `b` from worker `b % n_workers`.
+
+        """
+        self._worker_id = worker_id
+        self._n_workers = n_workers
+        self._worker_batch_size = batch_size
+        self._n_cache_updates = {}
+        numpy_seed, python_seed = \
+            self._worker_seed_sequence().generate_state(2)
+        np.random.seed(numpy_seed)
+        random.seed(int(python_seed))
+        for randcache in getattr(self, "_randcache", {}).values():
+            randcache["sample_next"] += worker_id
+
+    def _cache_random_state(self, mode, random_state):
+        """
+        Gets the random state that draws the next interval cache of
+        `mode`: `random_state` in a single process, and otherwise a
+        state seeded by the number of caches drawn so far, which is
+        the same in every worker.
+        """
+        if self._n_workers == 1:
+            return random_state
+        self._n_cache_updates[mode] = self._n_cache_updates.get(mode, 0) + 1
+        return np.random.RandomState(np.random.SeedSequence(
+            self.seed,
+            spawn_key=(1, self.modes.index(mode),
+                       self._n_cache_updates[mode])).generate_state(1))
+
+    def _draw_blocked(self, n_windows, n_positions):
+        """
+        Draws `n_windows` of the `n_positions` positions of `self.mode`
+        from its shuffle buffer, first refilling it with positions
+        drawn from randomly chosen blocks of `block_size` consecutive
+        positions. Used by the samplers with a `block_size`, which draw
+        from `self._rng` and keep a buffer per mode in
+        `self._block_buffers`.
+        """
+        buffer = self._block_buffers[self.mode]
+        n_missing = self.shuffle_buffer_size + n_windows - len(buffer)
+        if n_missing > 0:
+            n_blocks = -(-n_missing // self.positions_per_block)
+            # a block is chosen by one of its positions, so in proportion
+            # to its size
+            block_starts = self._rng.integers(0, n_positions, size=n_blocks)
+            block_starts -= block_starts % self.block_size
+            block_ends = np.minimum(block_starts + self.block_size,
+                                    n_positions)
+            buffer = np.concatenate([buffer, self._rng.integers(
+                np.repeat(block_starts, self.positions_per_block),
+                np.repeat(block_ends, self.positions_per_block))])
+        taken = self._rng.choice(len(buffer), size=n_windows, replace=False)
+        self._block_buffers[self.mode] = np.delete(buffer, taken)
+        return buffer[taken]
+
+    def _exceeds_max_unknown_bases(self, chrom, start, end):
+        """
+        Checks whether a window has more than `max_unknown_bases`
+        unknown bases, without reading its sequence.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the window.
+        end : int
+            One past the last coordinate of the window.
+
+        Returns
+        -------
+        bool
+            `True` if `max_unknown_bases` is set and the window exceeds
+            it.
+
+        """
+        if self.max_unknown_bases is None:
+            return False
+        n_unknown = self.reference_sequence.count_unknown(chrom, start, end)
+        return n_unknown > self.max_unknown_bases
+
+    def _get_sequence(self, chrom, start, end, strand):
+        """
+        Gets the encoding of the sequence in a window, or its base
+        indices if `output_indices` is True.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the window.
+        end : int
+            One past the last coordinate of the window.
+        strand : {'+', '-'}
+            The strand the sequence is located on.
+
+        Returns
+        -------
+        numpy.ndarray
+            The :math:`L \\times N` encoding of the sequence or its
+            :math:`L` base indices. Empty if the window could not be
+            retrieved.
+
+        """
+        if self.output_indices:
+            return self.reference_sequence.get_encoding_from_coords(
+                chrom, start, end, strand, indices=True)
+        return self.reference_sequence.get_encoding_from_coords(
+            chrom, start, end, strand)
+
+    def _get_batch_targets(self, windows):
+        """
+        Gets the targets of a mini-batch of windows with one call to
+        `GenomicFeatures.get_feature_data_batch`, and records the
+        windows if the current mode is in `save_datasets`.
+
+        Parameters
+        ----------
+        windows : list(tuple)
+            The `(chrom, bin_start, bin_end, window_start, window_end,
+            strand)` of each example in the mini-batch.
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse.csr_matrix
+            The :math:`B \\times F` targets of the examples, where
+            :math:`F` is `n_features * n_bins`. They are sparse if
+            `sparse_targets` is True.
+
+        """
+        chroms, bin_starts, bin_ends = zip(*[w[:3] for w in windows])
+        targets = self.target.get_feature_data_batch(
+            chroms, bin_starts, bin_ends, as_sparse=self.sparse_targets)
+        self._save_batch_windows(windows, targets)
+        if self.sparse_targets:
+            return targets.astype(np.float32)
+        return targets.astype(float)
+
+    def _save_batch_windows(self, windows, targets):
+        """
+        Records the windows of a mini-batch and the indices of their
+        positive features if the current mode is in `save_datasets`.
+
+        Parameters
+        ----------
+        windows : list(tuple)
+            The `(chrom, bin_start, bin_end, window_start, window_end,
+            strand)` of each example in the mini-batch.
+        targets : numpy.ndarray or scipy.sparse.csr_matrix
+            The :math:`B \\times F` targets of the examples.
+
+        """
+        if self.mode not in self._save_datasets:
+            return
+        for row, window in enumerate(windows):
+            if sparse.issparse(targets):
+                positives = targets.indices[
+                    targets.indptr[row]:targets.indptr[row + 1]]
+            else:
+                positives = np.nonzero(targets[row])[0]
+            feature_indices = ';'.join([str(f) for f in positives])
+            chrom, _, _, window_start, window_end, strand = window
+            self._save_datasets[self.mode].append(
+                [chrom,
+                 window_start,
+                 window_end,
+                 strand,
+                 feature_indices])
+        if len(self._save_datasets[self.mode]) > 200000:
+            self.save_dataset_to_file(self.mode)
+
     def get_feature_from_index(self, index):
         """
         Returns the feature corresponding to an index in the feature
@@ -257,13 +502,16 @@ class OnlineSampler(Sampler, metaclass=ABCMeta):
             An :math:`L \\times N` array (where :math:`L` is the length
             of the sequence and :math:`N` is the size of the sequence
             type's alphabet) containing the one-hot encoding of the
-            sequence.
+            sequence, or its :math:`L` base indices if `output_indices`
+            is True.
 
         Returns
         -------
         str
             The sequence of :math:`L` characters decoded from the input.
         """
+        if self.output_indices:
+            encoding = self.reference_sequence.indices_to_encoding(encoding)
         return self.reference_sequence.encoding_to_sequence(encoding)
 
     def save_dataset_to_file(self, mode, close_filehandle=False):
@@ -354,7 +602,10 @@ class OnlineSampler(Sampler, metaclass=ABCMeta):
             sequences_mat.append(inputs)
             targets_mat.append(targets)
         sequences_mat = np.vstack(sequences_mat)
-        targets_mat = np.vstack(targets_mat)
+        if self.sparse_targets:
+            targets_mat = sparse.vstack(targets_mat, format="csr")
+        else:
+            targets_mat = np.vstack(targets_mat)
         if mode in self._save_datasets:
             print("saving dataset for mode {0} to file".format(mode),
                   flush=True)
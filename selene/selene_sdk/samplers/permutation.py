@@ -0,0 +1,133 @@
+"""
+This module provides the `FeistelPermutation` class, a keyed
+pseudo-random permutation of the integers `[0, n)` that maps each index
+independently, so that a shuffled pass over `n` items needs no memory
+per item.
+
+The permutation is a balanced Feistel network over the smallest domain
+of :math:`4^h \\geq n` integers, whose halves of :math:`h` bits are
+mixed with a round function keyed by the seed. Since a Feistel network
+is a bijection of its whole domain, indices it maps to `n` or more are
+mapped again ("cycle walking") until they fall in `[0, n)`, which takes
+fewer than 4 rounds on average.
+
+`worker_steps` splits a walk through such permutations among the
+worker processes of a `torch.utils.data.DataLoader`.
+
+"""
+import numpy as np
+
+
+def _mix(values):
+    """
+    The `splitmix64` finalizer, which scrambles the bits of unsigned
+    64-bit integers.
+    """
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * \
+        np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * \
+        np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def worker_steps(start, n_taken, n_steps, worker_id=0, n_workers=1,
+                 batch_size=1):
+    """
+    Gets the next steps of a walk that one of the worker processes of
+    a `torch.utils.data.DataLoader` takes. Worker `w` of `N` takes the
+    steps of batches `w`, `w + N`, ..., so after `B` batches the
+    workers together have taken exactly the first `B * batch_size`
+    steps after `start`, in the order of a single process.
+
+    Parameters
+    ----------
+    start : int
+        The step the workers started walking from.
+    n_taken : int
+        The number of steps the worker has taken since `start`.
+    n_steps : int
+        The number of steps to take.
+    worker_id : int, optional
+        Default is 0. The ID of the worker, in `[0, n_workers)`.
+    n_workers : int, optional
+        Default is 1. The number of workers.
+    batch_size : int, optional
+        Default is 1. The number of examples in each batch of the
+        DataLoader.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.int64
+        The steps.
+
+    """
+    local_steps = n_taken + np.arange(n_steps, dtype=np.int64)
+    return (start + local_steps % batch_size +
+            (worker_id + local_steps // batch_size * n_workers) * batch_size)
+
+
+class FeistelPermutation(object):
+    """
+    A keyed pseudo-random permutation of `[0, n)`.
+
+    Parameters
+    ----------
+    n : int
+        The number of items to permute.
+    key : int or list(int)
+        The key of the permutation, used as the entropy of a
+        `numpy.random.SeedSequence`. Different keys give independent
+        permutations.
+    n_rounds : int, optional
+        Default is 4. The number of Feistel rounds.
+
+    Attributes
+    ----------
+    n : int
+        The number of items to permute.
+
+    """
+
+    def __init__(self, n, key, n_rounds=4):
+        """
+        Constructs a new `FeistelPermutation` object.
+        """
+        self.n = n
+        self._half_bits = np.uint64(max(1, (int(n - 1).bit_length() + 1) // 2))
+        self._half_mask = np.uint64((1 << int(self._half_bits)) - 1)
+        self._round_keys = np.random.SeedSequence(key).generate_state(
+            n_rounds, dtype=np.uint64)
+
+    def _encrypt(self, values):
+        left = values >> self._half_bits
+        right = values & self._half_mask
+        for round_key in self._round_keys:
+            left, right = right, left ^ (
+                _mix(right ^ round_key) & self._half_mask)
+        return (left << self._half_bits) | right
+
+    def __call__(self, indices):
+        """
+        Maps indices to their positions in the permutation.
+
+        Parameters
+        ----------
+        indices : numpy.ndarray
+            Indices in `[0, n)`.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=numpy.int64
+            The permuted indices.
+
+        """
+        values = self._encrypt(np.asarray(indices, dtype=np.uint64))
+        outside = np.nonzero(values >= np.uint64(self.n))[0]
+        while len(outside) > 0:
+            values[outside] = self._encrypt(values[outside])
+            outside = outside[values[outside] >= np.uint64(self.n)]
+        return values.astype(np.int64)
+
+    def __len__(self):
+        return self.n
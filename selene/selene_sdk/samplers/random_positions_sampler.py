@@ -6,12 +6,13 @@ We would like to generalize this to `selene_sdk.sequences.Sequence` if possible.
 """
 from collections import namedtuple
 import logging
-import random
 from time import time
 
 import numpy as np
 
 from .online_sampler import OnlineSampler
+from .permutation import FeistelPermutation
+from .permutation import worker_steps
 from ..utils import get_indices_and_probabilities
 
 logger = logging.getLogger(__name__)
@@ -44,10 +45,41 @@ weights : list(float)
 """
 
 
+ValidPositions = namedtuple(
+    "ValidPositions", ["chrom_indices", "starts", "offsets"])
+"""
+The positions that window centers can be drawn from in one mode, as
+sorted, disjoint, half-open intervals. Position `offsets[i] + k` of the
+mode is position `starts[i] + k` of interval `i`, so a uniformly drawn
+position is found in its interval with one binary search of `offsets`.
+
+Parameters
+----------
+chrom_indices : numpy.ndarray, dtype=numpy.int32
+    The index of the chromosome of each interval in
+    `RandomPositionsSampler.sample_from_intervals`.
+starts : numpy.ndarray, dtype=numpy.int64
+    The first position of each interval.
+offsets : numpy.ndarray, dtype=numpy.int64
+    The number of positions before each interval, followed by the total
+    number of positions.
+
+"""
+
+
 class RandomPositionsSampler(OnlineSampler):
     """This sampler randomly selects a position in the genome and queries for
     a sequence centered at that position for input to the model.
 
+    The positions are drawn uniformly from those at least
+    `sequence_length` bases away from the ends of their chromosome
+    whose window can be retrieved: before the first draw, the sampler
+    indexes, for each mode, the windows that are in bounds, do not
+    overlap a blacklisted region of the genome and have at most
+    `max_unknown_bases` unknown bases (see
+    `selene_sdk.sequences.Genome.get_valid_window_starts`), so drawn
+    windows are not rejected.
+
     TODO: generalize to selene_sdk.sequences.Sequence?
 
     Parameters
@@ -82,6 +114,46 @@ class RandomPositionsSampler(OnlineSampler):
         `GenomicFeatures` object.
     mode : {'train', 'validate', 'test'}
         Default is `'train'`. The mode to run the sampler in.
+    max_unknown_bases : int or None, optional
+        Default is None. If not None, windows with more than this many
+        unknown bases are not drawn.
+    output_indices : bool, optional
+        Default is False. If True, `sample` returns the base indices of
+        the sequences instead of their one-hot encodings.
+    targets_in_memory : bool, optional
+        Default is False. If True, the annotations in `target_path` are
+        loaded into memory instead of queried through tabix (see
+        `selene_sdk.targets.GenomicFeatures`).
+    sparse_targets : bool, optional
+        Default is False. If True, `sample` returns the targets as a
+        `scipy.sparse.csr_matrix` of their positives.
+    replacement : bool, optional
+        Default is True. If False, each mode draws every valid position
+        once per epoch, in the order of a pseudo-random permutation
+        keyed by `seed`, the mode and the epoch (see
+        `selene_sdk.samplers.permutation.FeistelPermutation`), which
+        needs no memory per position. The strand of each draw is also
+        derived from the walk, so the worker processes of a
+        `torch.utils.data.DataLoader` (see `set_worker`) together draw
+        the same examples as a single process. The walk through the
+        epochs is resumed with `seek`.
+    block_size : int or None, optional
+        Default is None. If not None, positions are drawn in blocks of
+        `block_size` consecutive valid positions, so that nearby
+        windows are read together: the sampler picks a block with
+        probability proportional to its size, draws
+        `positions_per_block` positions uniformly within it, and mixes
+        the positions of successive blocks in a shuffle buffer of
+        `shuffle_buffer_size` positions that the batches are drawn
+        from. Each position is still drawn uniformly, and the locality
+        of the reads improves the hit rates of the genome chunk cache
+        (see `selene_sdk.sequences.Genome`), the page cache and tabix.
+        Requires `replacement`.
+    positions_per_block : int, optional
+        Default is 64. The number of positions drawn from each block.
+    shuffle_buffer_size : int, optional
+        Default is 4096. The number of positions kept in the shuffle
+        buffer of the blocks.
     save_datasets : list(str), optional
         Default is `['test']`. The list of modes for which we should
         save the sampled data to file.
@@ -123,6 +195,21 @@ class RandomPositionsSampler(OnlineSampler):
     mode : str
         The current mode that the sampler is running in. Must be one of
         the modes listed in `modes`.
+    n_windows_drawn : int
+        The number of windows drawn by `sample`.
+    n_windows_rejected : int
+        The number of windows drawn by `sample` whose sequence could
+        not be retrieved, and that were drawn again.
+    replacement : bool
+        Whether positions are drawn with replacement.
+    block_size : int or None
+        The number of consecutive valid positions in a block, or None
+        if positions are drawn independently.
+    positions_per_block : int
+        The number of positions drawn from each block.
+    shuffle_buffer_size : int
+        The number of positions kept in the shuffle buffer of the
+        blocks.
 
     """
     def __init__(self,
@@ -139,6 +226,14 @@ class RandomPositionsSampler(OnlineSampler):
                  bins_end=800,
                  feature_thresholds=0.5,
                  mode="train",
+                 max_unknown_bases=None,
+                 output_indices=False,
+                 targets_in_memory=False,
+                 sparse_targets=False,
+                 replacement=True,
+                 block_size=None,
+                 positions_per_block=64,
+                 shuffle_buffer_size=4096,
                  save_datasets=[],
                  output_dir=None):
         super(RandomPositionsSampler, self).__init__(
@@ -155,17 +250,39 @@ class RandomPositionsSampler(OnlineSampler):
             bins_end=bins_end,
             feature_thresholds=feature_thresholds,
             mode=mode,
+            max_unknown_bases=max_unknown_bases,
+            output_indices=output_indices,
+            targets_in_memory=targets_in_memory,
+            sparse_targets=sparse_targets,
             save_datasets=save_datasets,
             output_dir=output_dir)
 
         self._sample_from_mode = {}
-        self._randcache = {}
+        self._valid_positions = {}
         for mode in self.modes:
             self._sample_from_mode[mode] = None
-            self._randcache[mode] = {"cache_indices": [], "sample_next": 0}
 
         self.sample_from_intervals = []
         self.interval_lengths = []
+        # draws the positions and strands of whole batches
+        self._rng = np.random.default_rng(self.seed)
+        self.n_windows_drawn = 0
+        self.n_windows_rejected = 0
+        # without replacement, the number of steps of the walk of each
+        # mode through its permutations before this process started
+        # drawing, and the number of steps it has taken since
+        self.replacement = replacement
+        self._walk_start = {mode: 0 for mode in self.modes}
+        self._n_walked = {mode: 0 for mode in self.modes}
+        if block_size is not None and not replacement:
+            raise ValueError(
+                "Blocked sampling (`block_size`) requires sampling with "
+                "replacement.")
+        self.block_size = block_size
+        self.positions_per_block = positions_per_block
+        self.shuffle_buffer_size = shuffle_buffer_size
+        self._block_buffers = {
+            mode: np.zeros(0, dtype=np.int64) for mode in self.modes}
         self.initialized = False
 
     def init(func):
@@ -177,8 +294,7 @@ class RandomPositionsSampler(OnlineSampler):
                 else:
                      self._partition_genome_by_proportion()
 
-                for mode in self.modes:
-                    self._update_randcache(mode=mode)
+                self._index_valid_positions()
                 self.initialized = True
             return func(self, *args, **kwargs)
         return dfunc
@@ -249,65 +365,151 @@ class RandomPositionsSampler(OnlineSampler):
                 self._sample_from_mode[mode]._replace(
                     indices=indices, weights=weights)
 
-    def _retrieve(self, chrom, position):
-        bin_start = position - self._start_radius
-        bin_end = position + self._end_radius
-        window_start = bin_start - self._start_surrounding_sequence_radius
-        window_end = bin_end + self._end_surrounding_sequence_radius
-        if window_end - window_start != self.sequence_length:
-            print(bin_start, bin_end,
-                  self._start_radius, self._end_radius,
-                  self.surrounding_sequence_radius)
-            return None
-        strand = self.STRAND_SIDES[random.randint(0, 1)]
-        retrieved_seq = \
-            self.reference_sequence.get_encoding_from_coords(
-                chrom, window_start, window_end, strand)
-        if retrieved_seq.shape[0] == 0:
-            logger.info("Full sequence centered at {0} position {1} "
-                        "could not be retrieved. Sampling again.".format(
-                            chrom, position))
-            return None
-        if retrieved_seq.shape[0] < self.sequence_length:
-            # TODO: remove after investigating this bug.
-            print("Warning: sequence retrieved for {0}, {1}, {2}, {3} "
-                  "had length less than required sequence length {4}. "
-                  "This bug will be investigated and addressed in the next "
-                  "version of Selene.".format(
-                      chrom, window_start, window_end, strand,
-                      self.sequence_length))
-            return None
-
-        retrieved_targets = self.target.get_feature_data(
-            chrom, bin_start, bin_end)
-        if self.mode in self._save_datasets:
-            feature_indices = ';'.join(
-                [str(f) for f in np.nonzero(retrieved_targets)[0]])
-            self._save_datasets[self.mode].append(
-                [chrom,
-                 window_start,
-                 window_end,
-                 strand,
-                 feature_indices])
-            if len(self._save_datasets[self.mode]) > 200000:
-                self.save_dataset_to_file(self.mode)
-        return (retrieved_seq, retrieved_targets)
-
-    def _update_randcache(self, mode=None):
-        if not mode:
-            mode = self.mode
-        self._randcache[mode]["cache_indices"] = np.random.choice(
-            self._sample_from_mode[mode].indices,
-            size=200000,
-            replace=True,
-            p=self._sample_from_mode[mode].weights)
-        self._randcache[mode]["sample_next"] = 0
+    def _index_valid_positions(self):
+        """
+        Indexes the positions that the window centers of each mode can
+        be drawn from: those at least `sequence_length` bases away from
+        the ends of their chromosome (see `sample_from_intervals`) whose
+        window is valid.
+        """
+        t_start = time()
+        chroms = [chrom for chrom, _ in self.reference_sequence.get_chr_lens()]
+        self._interval_chroms = np.array(
+            [info[0] for info in self.sample_from_intervals])
+        # the window starting at `x` is centered at `x + center_offset`
+        center_offset = (self._start_radius +
+                         self._start_surrounding_sequence_radius)
+        for mode in self.modes:
+            chrom_indices, starts, ends = [], [], []
+            for index in self._sample_from_mode[mode].indices:
+                window_starts, window_ends = \
+                    self.reference_sequence.get_valid_window_starts(
+                        chroms[index], self.sequence_length,
+                        max_unknown_bases=self.max_unknown_bases)
+                # the centers are kept in the interval of the chromosome
+                # in `sample_from_intervals`, a window length away from
+                # its ends
+                _, first, last = self.sample_from_intervals[index]
+                window_starts = np.maximum(
+                    window_starts, first - center_offset)
+                window_ends = np.minimum(window_ends, last - center_offset)
+                nonempty = window_starts < window_ends
+                window_starts = window_starts[nonempty]
+                window_ends = window_ends[nonempty]
+                chrom_indices.append(
+                    np.full(len(window_starts), index, dtype=np.int32))
+                starts.append(window_starts)
+                ends.append(window_ends)
+            starts = np.concatenate(starts + [[]]).astype(np.int64)
+            ends = np.concatenate(ends + [[]]).astype(np.int64)
+            self._valid_positions[mode] = ValidPositions(
+                np.concatenate(chrom_indices + [[]]).astype(np.int32),
+                starts + center_offset,
+                np.concatenate([[0], np.cumsum(ends - starts)]).astype(
+                    np.int64))
+            logger.info("{0} positions in {1} intervals can be drawn in "
+                        "mode '{2}'.".format(
+                            self._valid_positions[mode].offsets[-1],
+                            len(starts), mode))
+        logger.debug("Indexed the valid positions in {0} s.".format(
+            time() - t_start))
+
+    def _draw_windows(self, n_windows):
+        """
+        Draws the chromosomes, center positions and strands of windows
+        uniformly from the valid positions of `self.mode`.
+        """
+        valid_positions = self._valid_positions[self.mode]
+        n_positions = valid_positions.offsets[-1]
+        if n_positions == 0:
+            raise ValueError(
+                "No window of {0} bases can be drawn in mode '{1}'.".format(
+                    self.sequence_length, self.mode))
+        strand_sides = None
+        if not self.replacement:
+            draws, strand_sides = self._walk_permutations(
+                n_windows, n_positions)
+        elif self.block_size is not None:
+            draws = self._draw_blocked(n_windows, n_positions)
+        else:
+            draws = self._rng.integers(0, n_positions, size=n_windows)
+        intervals = np.searchsorted(
+            valid_positions.offsets, draws, side="right") - 1
+        positions = (valid_positions.starts[intervals] + draws -
+                     valid_positions.offsets[intervals])
+        if strand_sides is None:
+            strand_sides = self._rng.integers(0, 2, size=n_windows)
+        strands = np.array(self.STRAND_SIDES)[strand_sides]
+        return (self._interval_chroms[
+                    valid_positions.chrom_indices[intervals]],
+                positions, strands)
+
+    def _walk_permutations(self, n_windows, n_positions):
+        """
+        Takes the next steps of the walk of `self.mode` through its
+        permutations of the valid positions, one permutation per epoch,
+        split among the workers by `worker_steps`. The strand of each
+        step (an index into `STRAND_SIDES`) is the lowest bit of a
+        second permutation of the epoch, so that it only depends on the
+        step and every position is drawn with a new strand each epoch.
+        """
+        mode = self.mode
+        steps = worker_steps(
+            self._walk_start[mode], self._n_walked[mode], n_windows,
+            worker_id=self._worker_id, n_workers=self._n_workers,
+            batch_size=self._worker_batch_size)
+        self._n_walked[mode] += n_windows
+        epochs = steps // n_positions
+        draws = steps % n_positions
+        strand_sides = np.empty_like(draws)
+        for epoch in np.unique(epochs):
+            in_epoch = epochs == epoch
+            key = [self.seed, self.modes.index(mode), int(epoch)]
+            strand_sides[in_epoch] = FeistelPermutation(
+                n_positions, key + [1])(draws[in_epoch]) & 1
+            draws[in_epoch] = FeistelPermutation(
+                n_positions, key)(draws[in_epoch])
+        return draws, strand_sides
+
+    def seek(self, n_drawn, mode=None):
+        """
+        Moves the walk of a mode through the permutations of its valid
+        positions to after its first `n_drawn` draws, e.g. to resume
+        training from a checkpoint. This only affects sampling without
+        replacement.
+
+        Parameters
+        ----------
+        n_drawn : int
+            The number of examples drawn in the mode so far.
+        mode : str or None, optional
+            Default is None. The mode, or None for the current mode.
+
+        """
+        mode = mode or self.mode
+        self._walk_start[mode] = n_drawn
+        self._n_walked[mode] = 0
+
+    @init
+    def initialize(self):
+        return
+
+    @init
+    def set_worker(self, worker_id, n_workers, batch_size=1):
+        super(RandomPositionsSampler, self).set_worker(
+            worker_id, n_workers, batch_size=batch_size)
+        self._rng = np.random.default_rng(self._worker_seed_sequence())
+        # the workers continue the walks from where this process was
+        for mode in self.modes:
+            self.seek(self._walk_start[mode] + self._n_walked[mode], mode)
 
     @init
     def sample(self, batch_size=1):
         """
         Randomly draws a mini-batch of examples and their corresponding
-        labels.
+        labels. The windows of the whole batch are drawn at once from
+        the indexed valid positions, and any whose sequence cannot be
+        retrieved are drawn again.
 
         Parameters
         ----------
@@ -328,33 +530,44 @@ class RandomPositionsSampler(OnlineSampler):
             where :math:`F` is the number of features.
 
         """
-        sequences = None
-        targets = None
-        n_samples_drawn = 0
-        while n_samples_drawn < batch_size:
-            sample_index = self._randcache[self.mode]["sample_next"]
-            if sample_index == len(self._randcache[self.mode]["cache_indices"]):
-                self._update_randcache()
-                sample_index = 0
-
-            rand_interval_index = \
-                self._randcache[self.mode]["cache_indices"][sample_index]
-            self._randcache[self.mode]["sample_next"] += 1
-
-            interval_info = self.sample_from_intervals[rand_interval_index]
-            interval_length = self.interval_lengths[rand_interval_index]
-
-            chrom = interval_info[0]
-            position = int(np.random.randint(interval_info[1], interval_info[2]))
-
-            retrieve_output = self._retrieve(chrom, position)
-            if not retrieve_output:
-                continue
-            seq, seq_targets = retrieve_output
-            if sequences is None and targets is None:
-                sequences = np.zeros((batch_size, seq.shape[0], seq.shape[1]), dtype=float)
-                targets = np.zeros((batch_size, self.n_features * self.n_bins), dtype=float)
-            sequences[n_samples_drawn, :, :] = seq
-            targets[n_samples_drawn, :] = seq_targets
-            n_samples_drawn += 1
+        if self.output_indices:
+            sequences = np.zeros((batch_size, self.sequence_length),
+                                 dtype=np.uint8)
+        else:
+            sequences = np.zeros(
+                (batch_size, self.sequence_length,
+                 len(self.reference_sequence.BASES_ARR)), dtype=bool)
+        chroms = np.empty(batch_size, dtype=object)
+        positions = np.zeros(batch_size, dtype=np.int64)
+        strands = np.empty(batch_size, dtype=object)
+        slots = np.arange(batch_size)
+        while len(slots) > 0:
+            slot_chroms, slot_positions, slot_strands = \
+                self._draw_windows(len(slots))
+            window_starts = (slot_positions - self._start_radius -
+                             self._start_surrounding_sequence_radius)
+            window_ends = window_starts + self.sequence_length
+            encodings, valid = \
+                self.reference_sequence.get_encodings_from_coords(
+                    slot_chroms, window_starts, window_ends, slot_strands,
+                    indices=self.output_indices)
+            self.n_windows_drawn += len(slots)
+            if not np.all(valid):
+                self.n_windows_rejected += int(np.sum(~valid))
+                logger.info("{0} full sequences could not be retrieved. "
+                            "Sampling again.".format(np.sum(~valid)))
+            filled = slots[valid]
+            sequences[filled] = encodings[valid]
+            chroms[filled] = slot_chroms[valid]
+            positions[filled] = slot_positions[valid]
+            strands[filled] = slot_strands[valid]
+            slots = slots[~valid]
+
+        bin_starts = positions - self._start_radius
+        bin_ends = positions + self._end_radius
+        window_starts = bin_starts - self._start_surrounding_sequence_radius
+        window_ends = bin_ends + self._end_surrounding_sequence_radius
+        targets = self._get_batch_targets(list(zip(
+            chroms, bin_starts.tolist(), bin_ends.tolist(),
+            window_starts.tolist(), window_ends.tolist(), strands)))
         return (sequences, targets)
@@ -1,9 +1,70 @@
-import numpy as np
+import functools
+
 import torch
 import torch.utils.data as data
 from torch.utils.data import DataLoader
+from torch.utils.data.dataloader import default_collate
 import sys
 
+from ..utils import sequences_to_tensor
+from ..utils import targets_to_tensor
+
+
+def _targets_to_tensor(targets, squeeze):
+    # sparse targets (see `OnlineSampler.sparse_targets`) stay sparse
+    # until the trainer densifies them on the model's device
+    targets = targets_to_tensor(targets)
+    return targets[0] if squeeze else targets
+
+
+def collate_examples(batch):
+    """
+    Collates `(sequence, targets)` examples into a batch like the
+    default `torch.utils.data.DataLoader` collation, but also stacks
+    sparse target tensors into a sparse batch.
+
+    Parameters
+    ----------
+    batch : list(tuple(torch.Tensor, torch.Tensor))
+        The examples.
+
+    Returns
+    -------
+    tuple(torch.Tensor, torch.Tensor)
+        The batch of sequences and the batch of targets.
+
+    """
+    sequences, targets = zip(*batch)
+    if targets[0].is_sparse:
+        return (default_collate(sequences),
+                torch.stack(targets).coalesce())
+    return default_collate(batch)
+
+
+def worker_init_fn(worker_id, batch_size=1):
+    """
+    Gives the sampler copies of a `torch.utils.data.DataLoader` worker
+    process their own random streams (see
+    `selene_sdk.samplers.OnlineSampler.set_worker`). Pass it as the
+    `worker_init_fn` of a DataLoader over a `SamplerDataset` or a
+    `SamplerMultiDataset`.
+
+    Parameters
+    ----------
+    worker_id : int
+        The ID of the worker.
+    batch_size : int, optional
+        Default is 1. The batch size of the DataLoader.
+
+    """
+    worker_info = data.get_worker_info()
+    dataset = worker_info.dataset
+    samplers = getattr(dataset, "samplers", None) or [dataset.sampler]
+    for sampler in samplers:
+        sampler.set_worker(worker_id, worker_info.num_workers,
+                           batch_size=batch_size)
+
+
 class SamplerDataset(data.Dataset):
     def __init__(self, sampler, size=sys.maxsize):
         super(SamplerDataset, self).__init__()
@@ -13,11 +74,11 @@ class SamplerDataset(data.Dataset):
     def __getitem__(self, index):
         sequences, targets = self.sampler.sample(
             batch_size=1 if isinstance(index, int) else len(index))
-        if sequences.shape[0] == 1:
+        squeeze = sequences.shape[0] == 1
+        if squeeze:
             sequences = sequences[0, :]
-            targets = targets[0, :]
-        return (torch.from_numpy(sequences.astype(np.float32)),
-                torch.from_numpy(targets.astype(np.float32)))
+        return (sequences_to_tensor(sequences),
+                _targets_to_tensor(targets, squeeze))
 
     def __len__(self):
         return self.size
@@ -33,10 +94,10 @@ class SamplerMultiDataset(data.Dataset):
 
     def __getitem__(self, index):
         sequences, targets = self.samplers[self.current_dataset].sample(batch_size=self.batch_size if isinstance(index, int) else len(index)*self.batch_size)
-        if sequences.shape[0]==1:
-            sequences = sequences[0,:]
-            targets = targets[0,:]
-        return torch.from_numpy(sequences.astype(np.float32)), torch.from_numpy(targets.astype(np.float32))
+        squeeze = sequences.shape[0] == 1
+        if squeeze:
+            sequences = sequences[0, :]
+        return sequences_to_tensor(sequences), _targets_to_tensor(targets, squeeze)
 
     def __len__(self):
         return self.size
@@ -45,16 +106,56 @@ class SamplerMultiDataset(data.Dataset):
 
 
 class SamplerDataLoader(DataLoader):
+    """
+    A DataLoader that draws examples from an online sampler.
+
+    Parameters
+    ----------
+    sampler : selene_sdk.samplers.OnlineSampler
+        The sampler to draw examples from.
+    num_workers : int, optional
+        Default is 1. The number of worker processes.
+    batch_size : int, optional
+        Default is 1. The number of examples in each batch.
+    size : int, optional
+        Default is `sys.maxsize`. The number of examples in an epoch.
+    share_genome : bool, optional
+        Default is False. If True and `num_workers` is greater than 0,
+        the sampler's reference genome is loaded into shared memory
+        (see `selene_sdk.sequences.Genome.share_memory`) so that all
+        workers read one copy of it instead of each opening the FASTA
+        file.
+
+    Notes
+    -----
+    With `num_workers` greater than 0, the holdout partitions and
+    interval caches of the sampler are built before the workers are
+    started (see `selene_sdk.samplers.OnlineSampler.initialize`), and
+    each worker draws from its own random stream, derived from the
+    sampler seed and the worker ID, so the workers do not draw the same
+    examples.
+
+    """
     def __init__(self,
                  sampler,
                  num_workers=1,
                  batch_size=1,
-                 size=sys.maxsize):
+                 size=sys.maxsize,
+                 share_genome=False):
+        reference_sequence = getattr(sampler, "reference_sequence", None)
+        if (share_genome and num_workers > 0 and
+                hasattr(reference_sequence, "share_memory")):
+            reference_sequence.share_memory()
         args = {
             "batch_size": batch_size,
             "num_workers": num_workers,
             "pin_memory": True,
+            "collate_fn": collate_examples,
         }
+        if num_workers > 0:
+            sampler.initialize()
+            args["worker_init_fn"] = functools.partial(
+                worker_init_fn, batch_size=batch_size)
         super(SamplerDataLoader, self).__init__(
             SamplerDataset(sampler, size=size),**args)
 
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from selene_sdk.samplers.file_samplers import BedFileSampler
+from selene_sdk.samplers.file_samplers.bed_file_sampler import \
+    LINE_INDEX_EXTENSION
+from selene_sdk.samplers.file_samplers.bed_file_sampler import \
+    load_line_index
+from selene_sdk.sequences import Genome
+
+
+class TestBedFileSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bed_path = os.path.join(self.tmp_dir, "examples.bed")
+        # line i starts at position 50 + i and has feature i
+        with open(self.bed_path, 'w') as file_handle:
+            for i in range(30):
+                file_handle.write("chr1\t{0}\t{1}\t+\t{2}\n".format(
+                    50 + i, 60 + i, i))
+                if i == 10:
+                    file_handle.write("\n")
+        self.genome = Genome(os.path.join(
+            os.path.dirname(__file__), "..", "..", "sequences", "tests",
+            "files", "small.fasta"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_sampler(self, **kwargs):
+        return BedFileSampler(self.bed_path, self.genome,
+                              targets_avail=True, n_features=30,
+                              chunk_size=8, **kwargs)
+
+    def test_line_index(self):
+        lines = load_line_index(self.bed_path)
+        self.assertTrue(os.path.exists(self.bed_path + LINE_INDEX_EXTENSION))
+        np.testing.assert_array_equal(load_line_index(self.bed_path), lines)
+        with open(self.bed_path, 'rb') as file_handle:
+            data = file_handle.read()
+        self.assertEqual([data[start:end] for start, end in lines],
+                         [line for line in data.split(b"\n") if line])
+
+    def test_passes(self):
+        sampler = self.make_sampler(shuffle=True)
+        self.assertEqual(sampler.n_samples, 30)
+        orders = []
+        for _ in range(2):
+            sequences, targets = sampler.sample(30)
+            self.assertEqual(sequences.shape, (30, 10, 4))
+            # each pass visits every line once
+            np.testing.assert_array_equal(np.sum(targets, axis=0), 1)
+            orders.append(np.argmax(targets, axis=1))
+        self.assertFalse(np.array_equal(orders[0], orders[1]))
+        _, other_targets = self.make_sampler(
+            shuffle=True, random_seed=1).sample(30)
+        self.assertFalse(np.array_equal(
+            orders[0], np.argmax(other_targets, axis=1)))
+        sequences, targets = self.make_sampler(shuffle=True).sample(5)
+        for line, sequence in zip(np.argmax(targets, axis=1), sequences):
+            self.assertEqual(
+                self.genome.encoding_to_sequence(sequence),
+                self.genome.get_sequence_from_coords(
+                    "chr1", 50 + line, 60 + line).upper())
+
+    def test_unshuffled(self):
+        # the lines are visited in the order of the file by default
+        _, targets = self.make_sampler().sample(6)
+        np.testing.assert_array_equal(
+            np.nonzero(targets)[1], np.arange(6))
+
+    def test_mixed_columns(self):
+        # only some lines have the strand column, and one has no targets
+        with open(self.bed_path, 'w') as file_handle:
+            for i in range(10):
+                strand = "\t-" if i % 3 == 0 else ""
+                features = "\t{0}".format(i) if i != 4 else ""
+                file_handle.write("chr1\t{0}\t{1}{2}{3}\n".format(
+                    50 + i, 60 + i, strand, features))
+        sequences, targets = self.make_sampler().sample(10)
+        self.assertEqual(sequences.shape, (10, 10, 4))
+        expected = np.eye(30)[:10]
+        expected[4] = 0
+        np.testing.assert_array_equal(targets, expected)
+
+    def test_worker_shards(self):
+        expected, _ = self.make_sampler(shuffle=True).sample(24)
+        batches = {}
+        for worker_id in range(2):
+            sampler = self.make_sampler(shuffle=True)
+            sampler.set_worker(worker_id, 2, batch_size=4)
+            for batch in range(3):
+                batches[2 * batch + worker_id], _ = sampler.sample(4)
+        np.testing.assert_array_equal(
+            np.concatenate([batches[b] for b in range(6)]), expected)
+
+    def test_sequence_length(self):
+        sampler = self.make_sampler(sequence_length=6)
+        sequences, _ = sampler.sample(2)
+        self.assertEqual(
+            [self.genome.encoding_to_sequence(s) for s in sequences],
+            [self.genome.get_sequence_from_coords("chr1", 52, 58).upper(),
+             self.genome.get_sequence_from_coords("chr1", 53, 59).upper()])
+
+
+if __name__ == "__main__":
+    unittest.main()
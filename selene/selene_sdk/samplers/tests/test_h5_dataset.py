@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+import torch
+
+from selene_sdk.samplers.file_samplers import H5DataLoader
+from selene_sdk.samplers.file_samplers import H5Dataset
+from selene_sdk.samplers.file_samplers.h5_dataset import H5BatchSampler
+from selene_sdk.samplers.file_samplers.h5_dataset import _get_window_size
+
+
+class TestH5Dataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, "data.h5")
+        rng = np.random.RandomState(0)
+        bases = rng.randint(0, 4, size=(70, 8))
+        self.sequences = (bases[..., None] == np.arange(4)).astype(np.uint8)
+        # example i has the targets of feature i
+        self.targets = np.eye(70, dtype=np.uint8)
+        with h5py.File(self.file_path, 'w') as db:
+            db.create_dataset("sequences", data=self.sequences,
+                              chunks=(5, 8, 4))
+            db.create_dataset("targets", data=self.targets, chunks=(5, 70))
+            db.create_dataset("sequences_length", data=8)
+            db.create_dataset("targets_length", data=70)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read_batch(self):
+        indices = np.array([12, 3, 17, 3])
+        expected = [H5Dataset(self.file_path)[int(i)] for i in indices]
+        for window_size in [None, 10, 20]:
+            sequences, targets = H5Dataset(
+                self.file_path, window_size=window_size)[indices]
+            np.testing.assert_array_equal(
+                sequences, torch.stack([e[0] for e in expected]))
+            np.testing.assert_array_equal(
+                targets, torch.stack([e[1] for e in expected]))
+
+    def test_batch_sampler(self):
+        sampler = H5BatchSampler(70, 4, 20, n_streams=2)
+        batches = list(sampler)
+        self.assertEqual(len(batches), len(sampler))
+        self.assertEqual(len(batches), 18)
+        np.testing.assert_array_equal(
+            np.sort(np.concatenate(batches)), np.arange(70))
+        for batch in batches:
+            self.assertEqual(len(np.unique(batch // 20)), 1)
+        # the batches of the two streams alternate
+        windows = [batch[0] // 20 for batch in batches[:10]]
+        self.assertEqual(len(set(windows[0::2]) & set(windows[1::2])), 0)
+        batches = list(H5BatchSampler(70, 4, 20, shuffle=False))
+        np.testing.assert_array_equal(
+            np.concatenate(batches), np.arange(70))
+
+    def test_loader(self):
+        loader = H5DataLoader(self.file_path, num_workers=0, batch_size=8,
+                              buffer_size=24)
+        # rounded up to whole batches and HDF5 chunks
+        self.assertEqual(loader.dataset.window_size, 40)
+        seen = []
+        for sequences, targets in loader:
+            self.assertEqual(sequences.dtype, torch.float32)
+            indices = np.argmax(targets.numpy(), axis=1)
+            np.testing.assert_array_equal(
+                sequences.numpy(), self.sequences[indices])
+            seen.append(indices)
+        self.assertEqual(sorted(len(s) for s in seen), [6] + [8] * 8)
+        np.testing.assert_array_equal(np.sort(np.concatenate(seen)),
+                                      np.arange(70))
+
+    def test_mismatched_chunks(self):
+        file_path = os.path.join(self.tmp_dir, "mismatched.h5")
+        with h5py.File(file_path, 'w') as db:
+            db.create_dataset("sequences", shape=(1000, 8, 4),
+                              dtype=np.uint8, chunks=(64, 8, 4))
+            db.create_dataset("targets", shape=(1000, 3),
+                              dtype=np.uint8, chunks=(100, 3))
+            db.create_dataset("unaligned", shape=(1000, 8, 4),
+                              dtype=np.uint8, chunks=(125, 8, 4))
+            db.create_dataset("sequences_length", data=8)
+            db.create_dataset("targets_length", data=3)
+        logger = "selene_sdk.samplers.file_samplers.h5_dataset"
+        # the chunks of both datasets only align every 1600 examples
+        with self.assertLogs(logger, level="WARNING"):
+            self.assertEqual(_get_window_size(
+                file_path, ["sequences", "targets"], 100, 8), 128)
+        # whole batches of 64 only align to chunks of 125 every 8000
+        # examples, which is more than the whole dataset
+        with self.assertLogs(logger, level="WARNING"):
+            self.assertEqual(_get_window_size(
+                file_path, ["unaligned", "targets"], 100, 64), 128)
+        self.assertEqual(_get_window_size(
+            file_path, ["sequences"], 100, 16), 128)
+        loader = H5DataLoader(file_path, num_workers=0, batch_size=8,
+                              buffer_size=100)
+        self.assertEqual(loader.dataset.window_size, 128)
+        self.assertEqual(sum(len(targets) for _, targets in loader), 1000)
+
+    def test_packed_loader(self):
+        # the last base is unknown, and the lengths are not multiples of 8
+        sequences = self.sequences.copy()
+        sequences[:, 6] = 1
+        packed_path = os.path.join(self.tmp_dir, "packed.h5")
+        with h5py.File(packed_path, 'w') as db:
+            db.create_dataset("sequences",
+                              data=np.packbits(sequences[:, :7], axis=-2))
+            db.create_dataset("targets",
+                              data=np.packbits(self.targets, axis=-1))
+            db.create_dataset("sequences_length", data=7)
+            db.create_dataset("targets_length", data=70)
+        for buffer_size in [None, 16]:
+            loader = H5DataLoader(packed_path, num_workers=0, batch_size=8,
+                                  shuffle=False, unpackbits=True,
+                                  buffer_size=buffer_size)
+            # the examples are loaded still packed
+            self.assertEqual(loader.dataset[[0, 1]][0].dtype, torch.uint8)
+            batch_sequences, batch_targets = next(iter(loader))
+            self.assertEqual(batch_sequences.dtype, torch.float32)
+            np.testing.assert_array_equal(batch_targets, self.targets[:8])
+            expected = sequences[:8, :7].astype(np.float32)
+            expected[:, -1] = 0.25
+            np.testing.assert_array_equal(batch_sequences, expected)
+            sequences_mat, targets_mat = loader.get_data_and_targets(8, 8)
+            np.testing.assert_array_equal(sequences_mat, expected)
+            np.testing.assert_array_equal(targets_mat, self.targets[:8])
+
+
+if __name__ == "__main__":
+    unittest.main()
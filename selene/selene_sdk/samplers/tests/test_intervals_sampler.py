@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from selene_sdk.samplers import IntervalsSampler
+from selene_sdk.sequences import Genome
+
+
+class TestIntervalsSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.intervals_path = os.path.join(self.tmp_dir, "intervals.bed")
+        with open(self.intervals_path, 'w') as file_handle:
+            file_handle.write("chr1\t20\t30\n"
+                              "chr1\t50\t80\n"
+                              "chr1\t60\t60\n"
+                              "chr2\t30\t70\n"
+                              "chr4\t20\t30\n")
+        self.genome_path = os.path.join(self.tmp_dir, "small.fasta")
+        shutil.copy(os.path.join(os.path.dirname(__file__), "..", "..",
+                                 "sequences", "tests", "files",
+                                 "small.fasta"),
+                    self.genome_path)
+        self.target_path = os.path.join(
+            os.path.dirname(__file__), "..", "..", "targets", "tests",
+            "files", "features.bed.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_sampler(self, **kwargs):
+        return IntervalsSampler(
+            Genome(self.genome_path), self.target_path,
+            ["CTCF", "GABP", "Pbx3", "TBP", "eGFP-FOS"],
+            self.intervals_path, sample_negative=True, seed=3,
+            validation_holdout=["chr2"], test_holdout=["chr4"],
+            sequence_length=20, bin_size=10, step_size=10, bins_start=5,
+            bins_end=15, **kwargs)
+
+    def test_partition(self):
+        sampler = self.make_sampler()
+        np.testing.assert_array_equal(
+            sampler._sample_from_mode["train"].indices, [0, 1, 2])
+        np.testing.assert_array_equal(
+            sampler._sample_from_mode["train"].offsets, [0, 10, 40, 40])
+        np.testing.assert_array_equal(
+            sampler._sample_from_mode["validate"].indices, [3])
+        np.testing.assert_array_equal(
+            sampler._sample_from_mode["test"].indices, [4])
+        self.assertEqual(sampler.sample_from_intervals[3], ("chr2", 30, 70))
+
+    def test_draw_windows(self):
+        sampler = self.make_sampler()
+        chroms, positions, strands = sampler._draw_windows(20000)
+        self.assertTrue(np.all(chroms == "chr1"))
+        in_first = (positions >= 20) & (positions < 30)
+        in_second = (positions >= 50) & (positions < 80)
+        self.assertTrue(np.all(in_first | in_second))
+        # intervals are drawn in proportion to their lengths
+        self.assertAlmostEqual(np.mean(in_first), 0.25, delta=0.02)
+        self.assertEqual(set(strands), {'+', '-'})
+
+    def test_draw_windows_blocked(self):
+        sampler = self.make_sampler(block_size=8, positions_per_block=4,
+                                    shuffle_buffer_size=16)
+        chroms, positions, strands = sampler._draw_windows(20000)
+        self.assertTrue(np.all(chroms == "chr1"))
+        in_first = (positions >= 20) & (positions < 30)
+        in_second = (positions >= 50) & (positions < 80)
+        self.assertTrue(np.all(in_first | in_second))
+        self.assertAlmostEqual(np.mean(in_first), 0.25, delta=0.03)
+        self.assertEqual(len(sampler._block_buffers["train"]), 16)
+        batches = [self.make_sampler(block_size=8).sample(8)
+                   for _ in range(2)]
+        for first, second in zip(*batches):
+            np.testing.assert_array_equal(first, second)
+
+    def test_sample(self):
+        sequences, targets = self.make_sampler().sample(8)
+        self.assertEqual(sequences.shape, (8, 20, 4))
+        self.assertEqual(targets.shape, (8, 5))
+        other_sequences, other_targets = self.make_sampler().sample(8)
+        np.testing.assert_array_equal(sequences, other_sequences)
+        np.testing.assert_array_equal(targets, other_targets)
+
+
+    def test_worker_streams(self):
+        streams = {}
+        for run in range(2):
+            for worker_id in range(2):
+                sampler = self.make_sampler()
+                sampler.set_worker(worker_id, 2, batch_size=4)
+                streams[run, worker_id], _ = sampler.sample(16)
+        # each worker draws its own stream, the same in every run
+        np.testing.assert_array_equal(streams[0, 0], streams[1, 0])
+        np.testing.assert_array_equal(streams[0, 1], streams[1, 1])
+        self.assertFalse(np.array_equal(streams[0, 0], streams[0, 1]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+import scipy.io
+
+from selene_sdk.samplers.file_samplers import MatFileSampler
+
+
+class TestMatFileSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        # example i has the targets of feature i
+        self.sequences = rng.randint(0, 2, size=(43, 4, 8)).astype(np.uint8)
+        self.targets = np.eye(43, dtype=np.uint8)
+        # v7.3 files are HDF5 files with the matrices transposed
+        self.h5_path = os.path.join(self.tmp_dir, "data_v73.mat")
+        with h5py.File(self.h5_path, 'w') as file_handle:
+            file_handle.create_dataset(
+                "x", data=self.sequences.transpose(2, 1, 0), chunks=(8, 4, 5))
+            file_handle.create_dataset(
+                "y", data=self.targets.T, chunks=(43, 5))
+        self.mat_path = os.path.join(self.tmp_dir, "data.mat")
+        scipy.io.savemat(self.mat_path,
+                         {"x": self.sequences, "y": self.targets})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_h5_sampler(self, **kwargs):
+        return MatFileSampler(self.h5_path, "x", targets_key="y",
+                              sequence_batch_axis=2,
+                              sequence_alphabet_axis=1,
+                              targets_batch_axis=1, chunk_size=8, **kwargs)
+
+    def assert_examples(self, sequences, targets):
+        indices = np.argmax(targets, axis=1)
+        np.testing.assert_array_equal(
+            sequences, self.sequences[indices].transpose(0, 2, 1))
+        return indices
+
+    def test_h5_passes(self):
+        sampler = self.make_h5_sampler()
+        self.assertEqual(sampler.n_samples, 43)
+        # rounded up to whole HDF5 chunks
+        self.assertEqual(sampler.chunk_size, 10)
+        orders = []
+        for _ in range(2):
+            sequences, targets = sampler.sample(43)
+            self.assertEqual(sequences.shape, (43, 8, 4))
+            orders.append(self.assert_examples(sequences, targets))
+            np.testing.assert_array_equal(np.sort(orders[-1]), np.arange(43))
+        self.assertFalse(np.array_equal(orders[0], orders[1]))
+        # the examples of a chunk are visited together
+        for order in orders:
+            chunks = order // 10
+            self.assertEqual(np.count_nonzero(np.diff(chunks)), 4)
+
+    def test_mismatched_chunks(self):
+        n_samples = 1003
+        path = os.path.join(self.tmp_dir, "mismatched.h5")
+        with h5py.File(path, 'w') as file_handle:
+            file_handle.create_dataset(
+                "x", data=np.zeros((n_samples, 4, 8), dtype=np.uint8),
+                chunks=(64, 4, 8))
+            file_handle.create_dataset(
+                "y", data=np.arange(n_samples).reshape(-1, 1),
+                chunks=(100, 1))
+        # the chunks of both matrices only align every 1600 examples
+        with self.assertLogs(
+                "selene_sdk.samplers.file_samplers.mat_file_sampler",
+                level="WARNING"):
+            sampler = MatFileSampler(path, "x", targets_key="y",
+                                     chunk_size=100)
+        self.assertEqual(sampler.chunk_size, 128)
+        _, targets = sampler.sample(n_samples)
+        np.testing.assert_array_equal(
+            np.sort(targets[:, 0]), np.arange(n_samples))
+
+    def test_in_memory(self):
+        sampler = MatFileSampler(self.mat_path, "x", targets_key="y",
+                                 sequence_alphabet_axis=1)
+        self.assertEqual(sampler.chunk_size, 43)
+        sequences, targets = sampler.sample(43)
+        np.testing.assert_array_equal(
+            np.sort(self.assert_examples(sequences, targets)), np.arange(43))
+
+    def test_unshuffled(self):
+        sequences, targets = self.make_h5_sampler(shuffle=False).sample(12)
+        np.testing.assert_array_equal(self.assert_examples(
+            sequences, targets), np.arange(12))
+
+    def test_worker_shards(self):
+        expected, _ = self.make_h5_sampler().sample(48)
+        batches = {}
+        for worker_id in range(2):
+            sampler = self.make_h5_sampler()
+            sampler.initialize()
+            sampler.set_worker(worker_id, 2, batch_size=4)
+            for batch in range(6):
+                batches[2 * batch + worker_id], _ = sampler.sample(4)
+        np.testing.assert_array_equal(
+            np.concatenate([batches[b] for b in range(12)]), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
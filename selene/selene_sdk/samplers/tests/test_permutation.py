@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+
+from selene_sdk.samplers.permutation import FeistelPermutation
+
+
+class TestFeistelPermutation(unittest.TestCase):
+
+    def test_bijection(self):
+        for n in [1, 2, 3, 16, 17, 1000, 12345]:
+            permuted = FeistelPermutation(n, [7, 1])(np.arange(n))
+            np.testing.assert_array_equal(np.sort(permuted), np.arange(n))
+
+    def test_keys(self):
+        indices = np.arange(1000)
+        np.testing.assert_array_equal(
+            FeistelPermutation(1000, 3)(indices),
+            FeistelPermutation(1000, 3)(indices))
+        self.assertFalse(np.array_equal(
+            FeistelPermutation(1000, 3)(indices),
+            FeistelPermutation(1000, 4)(indices)))
+
+    def test_large_domain(self):
+        permutation = FeistelPermutation(3 * 10 ** 9, 5)
+        permuted = permutation(np.arange(10000))
+        self.assertEqual(len(np.unique(permuted)), 10000)
+        self.assertTrue(np.all((permuted >= 0) & (permuted < 3 * 10 ** 9)))
+        # the indices mapped one at a time match the batch
+        self.assertEqual(permutation(np.array([9999]))[0], permuted[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
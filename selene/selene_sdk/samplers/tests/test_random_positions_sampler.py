@@ -0,0 +1,221 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+
+from selene_sdk.samplers import RandomPositionsSampler
+from selene_sdk.samplers.sampler_dataset import SamplerDataLoader
+from selene_sdk.sequences import Genome
+
+
+class TestRandomPositionsSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.genome_path = os.path.join(self.tmp_dir, "small.fasta")
+        shutil.copy(os.path.join(os.path.dirname(__file__), "..", "..",
+                                 "sequences", "tests", "files",
+                                 "small.fasta"),
+                    self.genome_path)
+        self.target_path = os.path.join(
+            os.path.dirname(__file__), "..", "..", "targets", "tests",
+            "files", "features.bed.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_sampler(self, **kwargs):
+        return RandomPositionsSampler(
+            Genome(self.genome_path), self.target_path,
+            ["CTCF", "GABP", "Pbx3", "TBP", "eGFP-FOS"], seed=3,
+            validation_holdout=["chr3"], test_holdout=["chr4"],
+            sequence_length=20, bin_size=10, step_size=10, bins_start=5,
+            bins_end=15, **kwargs)
+
+    def test_valid_positions(self):
+        for max_unknown_bases in [None, 0, 3, 12]:
+            sampler = self.make_sampler(max_unknown_bases=max_unknown_bases)
+            sampler.initialize()
+            genome = sampler.reference_sequence
+            chrom_lens = dict(genome.get_chr_lens())
+            center_offset = (sampler._start_radius +
+                             sampler._start_surrounding_sequence_radius)
+            for mode in sampler.modes:
+                valid_positions = sampler._valid_positions[mode]
+                indexed = set()
+                for index, start, length in zip(
+                        valid_positions.chrom_indices,
+                        valid_positions.starts,
+                        np.diff(valid_positions.offsets)):
+                    chrom = sampler._interval_chroms[index]
+                    indexed.update(
+                        (chrom, int(p)) for p in range(start, start + length))
+                self.assertEqual(len(indexed), valid_positions.offsets[-1])
+                # every center a window length away from the ends of a
+                # chromosome of the mode whose window is known enough
+                expected = set()
+                for index in sampler._sample_from_mode[mode].indices:
+                    chrom, _, _ = sampler.sample_from_intervals[index]
+                    for center in range(20, chrom_lens[chrom] - 20):
+                        start = center - center_offset
+                        if start < 0 or start + 20 > chrom_lens[chrom]:
+                            continue
+                        encoding = genome.get_encoding_from_coords(
+                            chrom, start, start + 20)
+                        n_unknown = np.sum(encoding.sum(axis=1) != 1)
+                        if max_unknown_bases is None or \
+                                n_unknown <= max_unknown_bases:
+                            expected.add((chrom, center))
+                self.assertEqual(indexed, expected)
+
+    def test_reproducible(self):
+        batches = [self.make_sampler().sample(16) for _ in range(2)]
+        for first, second in zip(*batches):
+            np.testing.assert_array_equal(first, second)
+        self.assertEqual(batches[0][0].dtype, bool)
+
+    def test_max_unknown_bases(self):
+        # the first half of chr1 is unknown
+        sampler = self.make_sampler(max_unknown_bases=2)
+        sequences, targets = sampler.sample(64)
+        self.assertEqual(sequences.shape, (64, 20, 4))
+        self.assertEqual(len(targets), 64)
+        n_unknown = np.sum(sequences.sum(axis=2) != 1, axis=1)
+        self.assertTrue(np.all(n_unknown <= 2))
+
+    def test_rejected_windows_drawn_again(self):
+        sampler = self.make_sampler()
+        genome = sampler.reference_sequence
+        get_encodings = genome.get_encodings_from_coords
+        calls = []
+
+        def reject_first_windows(*args, **kwargs):
+            encodings, valid = get_encodings(*args, **kwargs)
+            if not calls:
+                encodings[:3] = 0
+                valid[:3] = False
+            calls.append(len(valid))
+            return encodings, valid
+
+        with mock.patch.object(genome, "get_encodings_from_coords",
+                               side_effect=reject_first_windows):
+            sequences, targets = sampler.sample(8)
+        # only the rejected slots are drawn again
+        self.assertEqual(calls, [8, 3])
+        self.assertEqual(sampler.n_windows_drawn, 11)
+        self.assertEqual(sampler.n_windows_rejected, 3)
+        self.assertEqual(sequences.shape, (8, 20, 4))
+        self.assertTrue(np.all(sequences.any(axis=2)))
+
+    def test_epochs_without_replacement(self):
+        sampler = self.make_sampler(replacement=False)
+        sampler.initialize()
+        n_positions = int(sampler._valid_positions["train"].offsets[-1])
+        orders = []
+        for _ in range(2):
+            chroms, positions, _ = sampler._draw_windows(n_positions)
+            order = list(zip(chroms, positions.tolist()))
+            # every valid position is drawn once per epoch
+            self.assertEqual(len(set(order)), n_positions)
+            orders.append(order)
+        self.assertEqual(set(orders[0]), set(orders[1]))
+        self.assertNotEqual(orders[0], orders[1])
+
+    def test_seek(self):
+        sampler = self.make_sampler(replacement=False)
+        sampler.initialize()
+        n_positions = int(sampler._valid_positions["train"].offsets[-1])
+        sequences, targets = sampler.sample(n_positions + 10)
+        # resumes mid-epoch, and across the end of an epoch
+        for n_drawn in [5, n_positions - 5]:
+            sampler = self.make_sampler(replacement=False)
+            sampler.seek(n_drawn)
+            tail_sequences, tail_targets = sampler.sample(10)
+            np.testing.assert_array_equal(
+                tail_sequences, sequences[n_drawn:n_drawn + 10])
+            np.testing.assert_array_equal(
+                tail_targets, targets[n_drawn:n_drawn + 10])
+
+    def test_worker_shards_without_replacement(self):
+        expected, _ = self.make_sampler(replacement=False).sample(24)
+        batches = {}
+        for worker_id in range(3):
+            sampler = self.make_sampler(replacement=False)
+            sampler.set_worker(worker_id, 3, batch_size=4)
+            for batch in range(2):
+                batches[3 * batch + worker_id], _ = sampler.sample(4)
+        # the strands match too, so the encodings are the same
+        np.testing.assert_array_equal(
+            np.concatenate([batches[b] for b in range(6)]), expected)
+
+    def test_worker_streams(self):
+        streams = {}
+        for run in range(2):
+            for worker_id in range(2):
+                sampler = self.make_sampler()
+                sampler.set_worker(worker_id, 2, batch_size=4)
+                streams[run, worker_id], _ = sampler.sample(16)
+        # each worker draws its own stream, the same in every run
+        np.testing.assert_array_equal(streams[0, 0], streams[1, 0])
+        np.testing.assert_array_equal(streams[0, 1], streams[1, 1])
+        self.assertFalse(np.array_equal(streams[0, 0], streams[0, 1]))
+
+    def test_data_loader_workers(self):
+        expected, _ = self.make_sampler(replacement=False).sample(24)
+        loader = SamplerDataLoader(self.make_sampler(replacement=False),
+                                   num_workers=2, batch_size=4, size=24)
+        sequences = torch.cat([batch[0] for batch in loader]).numpy()
+        # the workers split one walk, so no window is drawn twice
+        np.testing.assert_array_equal(sequences, expected)
+        loader = SamplerDataLoader(self.make_sampler(), num_workers=2,
+                                   batch_size=4, size=24)
+        batches = [batch[0].numpy() for batch in loader]
+        self.assertEqual(len(batches), 6)
+        self.assertFalse(np.array_equal(batches[0], batches[1]))
+
+    def test_blocked_requires_replacement(self):
+        with self.assertRaises(ValueError):
+            self.make_sampler(block_size=8, replacement=False)
+
+    def test_blocked_draws(self):
+        sampler = self.make_sampler(block_size=8, positions_per_block=4,
+                                    shuffle_buffer_size=10)
+        sampler.initialize()
+        n_positions = sampler._valid_positions["train"].offsets[-1]
+        # the first draw fills the buffer with whole blocks of draws
+        draws = sampler._draw_blocked(5, n_positions)
+        self.assertEqual(len(draws), 5)
+        self.assertEqual(len(sampler._block_buffers["train"]), 4 * 4 - 5)
+        # the buffer is only refilled when it would drop below its size
+        draws = np.concatenate(
+            [draws, sampler._draw_blocked(1, n_positions)])
+        self.assertEqual(len(sampler._block_buffers["train"]), 10)
+        draws = np.concatenate(
+            [draws, sampler._draw_blocked(3, n_positions)])
+        self.assertEqual(len(sampler._block_buffers["train"]), 11)
+        for _ in range(50):
+            draws = np.concatenate(
+                [draws, sampler._draw_blocked(7, n_positions)])
+            self.assertGreaterEqual(
+                len(sampler._block_buffers["train"]), 10)
+        self.assertTrue(np.all((draws >= 0) & (draws < n_positions)))
+        self.assertEqual(len(draws), 5 + 1 + 3 + 50 * 7)
+
+        sequences, targets = sampler.sample(6)
+        self.assertEqual(sequences.shape, (6, 20, 4))
+        self.assertGreaterEqual(sampler.n_windows_drawn, 6)
+
+    def test_blocked_reproducible(self):
+        batches = [self.make_sampler(block_size=8, positions_per_block=4,
+                                     shuffle_buffer_size=10).sample(8)
+                   for _ in range(2)]
+        for first, second in zip(*batches):
+            np.testing.assert_array_equal(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
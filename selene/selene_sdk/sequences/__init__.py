@@ -5,8 +5,21 @@ from .sequence import Sequence
 from .sequence import sequence_to_encoding
 from .sequence import encoding_to_sequence
 from .sequence import get_reverse_encoding
+from .sequence import sequence_to_indices
+from .sequence import indices_to_encoding
+from .sequence import encoding_to_indices
 from .genome import Genome
 from .proteome import Proteome
+from .genome_pack import GenomePack
+from .genome_pack import write_genome_pack
+from .blacklist import BlacklistIndex
+from .blacklist import TabixBlacklist
+from .unknown_index import UnknownBaseIndex
+from .chunk_cache import ChunkCache
 
 __all__ = ["Sequence", "Genome", "Proteome", "sequence_to_encoding",
-           "encoding_to_sequence", "get_reverse_encoding"]
+           "encoding_to_sequence", "get_reverse_encoding",
+           "sequence_to_indices", "indices_to_encoding",
+           "encoding_to_indices", "GenomePack",
+           "write_genome_pack", "BlacklistIndex", "TabixBlacklist",
+           "UnknownBaseIndex", "ChunkCache"]
@@ -0,0 +1,309 @@
+"""
+This module provides the blacklist backends used by `Genome` to reject
+regions that overlap blacklisted intervals. `BlacklistIndex` holds the
+whole blacklist in memory as per-chromosome sorted interval arrays,
+while `TabixBlacklist` queries a tabix-indexed file and is used as a
+fallback for blacklist files too large to load.
+
+"""
+import gzip
+import os
+from functools import lru_cache
+
+import numpy as np
+import tabix
+
+
+MAX_IN_MEMORY_BLACKLIST_SIZE = 1 << 26
+"""
+The size in bytes of the largest blacklist file `load_blacklist` will
+load into a `BlacklistIndex`. Larger files are queried through tabix.
+"""
+
+
+class BlacklistIndex(object):
+    """
+    An in-memory index of blacklisted intervals. Overlapping intervals
+    are merged so that the intervals of each chromosome are disjoint and
+    sorted, and an overlap test is a single binary search.
+
+    Parameters
+    ----------
+    intervals : dict
+        A dictionary mapping chromosome names to a pair of integer
+        arrays `(starts, ends)` of 0-based, half-open intervals.
+
+    Attributes
+    ----------
+    starts : dict
+        A dictionary mapping chromosome names to the sorted starts of
+        the merged intervals.
+    ends : dict
+        A dictionary mapping chromosome names to the sorted ends of the
+        merged intervals.
+
+    """
+
+    def __init__(self, intervals):
+        """
+        Constructs a new `BlacklistIndex` object.
+        """
+        self.starts = {}
+        self.ends = {}
+        for chrom, (starts, ends) in intervals.items():
+            starts = np.asarray(starts, dtype=np.int64)
+            ends = np.asarray(ends, dtype=np.int64)
+            keep = starts < ends
+            if not keep.any():
+                continue
+            starts, ends = starts[keep], ends[keep]
+            order = np.argsort(starts, kind="mergesort")
+            starts, ends = starts[order], ends[order]
+            ends = np.maximum.accumulate(ends)
+            # a new merged interval begins wherever an interval starts
+            # after every earlier interval has ended
+            is_first = np.ones(len(starts), dtype=bool)
+            is_first[1:] = starts[1:] > ends[:-1]
+            first = np.nonzero(is_first)[0]
+            self.starts[chrom] = starts[first]
+            self.ends[chrom] = ends[np.append(first[1:], len(ends)) - 1]
+
+    @classmethod
+    def from_bed(cls, input_path):
+        """
+        Loads the intervals in a BED file, which may be gzip-compressed.
+
+        Parameters
+        ----------
+        input_path : str
+            Path to the BED file. Only the first 3 columns are read.
+
+        Returns
+        -------
+        BlacklistIndex
+            The index of the intervals in the file.
+
+        """
+        open_func = gzip.open if input_path.endswith(".gz") else open
+        intervals = {}
+        with open_func(input_path, "rt") as file_handle:
+            for line in file_handle:
+                if not line.strip() or line.startswith(
+                        ("#", "track", "browser")):
+                    continue
+                cols = line.split('\t', 3)
+                chrom_intervals = intervals.setdefault(cols[0], ([], []))
+                chrom_intervals[0].append(int(cols[1]))
+                chrom_intervals[1].append(int(cols[2]))
+        return cls(intervals)
+
+    def get_intervals(self, chrom):
+        """
+        Gets the blacklisted intervals of a chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+
+        Returns
+        -------
+        starts, ends : tuple(numpy.ndarray, numpy.ndarray)
+            The sorted starts and ends of the merged intervals.
+
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        return self.starts.get(chrom, empty), self.ends.get(chrom, empty)
+
+    def overlaps(self, chrom, start, end):
+        """
+        Checks whether a region overlaps a blacklisted interval.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the region.
+        end : int
+            One past the last coordinate of the region.
+
+        Returns
+        -------
+        bool
+            Whether the region overlaps a blacklisted interval.
+
+        """
+        if chrom not in self.starts:
+            return False
+        ends = self.ends[chrom]
+        index = np.searchsorted(ends, start, side="right")
+        return bool(index < len(ends) and self.starts[chrom][index] < end)
+
+    def overlaps_batch(self, chroms, starts, ends):
+        """
+        Checks whether each of a batch of regions overlaps a
+        blacklisted interval.
+
+        Parameters
+        ----------
+        chroms : numpy.ndarray
+            The chromosome of each region.
+        starts : numpy.ndarray, dtype=numpy.int64
+            The 0-based start coordinate of each region.
+        ends : numpy.ndarray, dtype=numpy.int64
+            One past the last coordinate of each region.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=bool
+            `True` for each region that overlaps a blacklisted interval.
+
+        """
+        chroms = np.asarray(chroms)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        overlaps = np.zeros(len(chroms), dtype=bool)
+        names, inverse = np.unique(chroms, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for name_index, name in enumerate(names):
+            if name not in self.starts:
+                continue
+            rows = np.nonzero(inverse == name_index)[0]
+            chrom_starts = self.starts[name]
+            chrom_ends = self.ends[name]
+            index = np.searchsorted(chrom_ends, starts[rows], side="right")
+            in_range = index < len(chrom_ends)
+            overlaps[rows[in_range]] = (
+                chrom_starts[index[in_range]] < ends[rows[in_range]])
+        return overlaps
+
+
+class TabixBlacklist(object):
+    """
+    Queries blacklisted intervals from a tabix-indexed file. This has
+    the same interface as `BlacklistIndex` but does not load the file
+    into memory.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the tabix-indexed .bed.gz file.
+
+    """
+
+    def __init__(self, input_path):
+        """
+        Constructs a new `TabixBlacklist` object.
+        """
+        self._tabix = tabix.open(input_path)
+
+    def get_intervals(self, chrom):
+        """
+        Gets the blacklisted intervals of a chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+
+        Returns
+        -------
+        starts, ends : tuple(numpy.ndarray, numpy.ndarray)
+            The sorted starts and ends of the merged intervals.
+
+        """
+        starts, ends = [], []
+        try:
+            for row in self._tabix.query(chrom, 0, 1 << 29):
+                starts.append(int(row[1]))
+                ends.append(int(row[2]))
+        except tabix.TabixError:
+            pass
+        return BlacklistIndex({chrom: (starts, ends)}).get_intervals(chrom)
+
+    def overlaps(self, chrom, start, end):
+        """
+        Checks whether a region overlaps a blacklisted interval.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the region.
+        end : int
+            One past the last coordinate of the region.
+
+        Returns
+        -------
+        bool
+            Whether the region overlaps a blacklisted interval.
+
+        """
+        try:
+            rows = self._tabix.query(chrom, start, end)
+            for row in rows:
+                return True
+        except tabix.TabixError:
+            pass
+        return False
+
+    def overlaps_batch(self, chroms, starts, ends):
+        """
+        Checks whether each of a batch of regions overlaps a
+        blacklisted interval.
+
+        Parameters
+        ----------
+        chroms : numpy.ndarray
+            The chromosome of each region.
+        starts : numpy.ndarray, dtype=numpy.int64
+            The 0-based start coordinate of each region.
+        ends : numpy.ndarray, dtype=numpy.int64
+            One past the last coordinate of each region.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=bool
+            `True` for each region that overlaps a blacklisted interval.
+
+        """
+        return np.array(
+            [self.overlaps(chrom, int(start), int(end))
+             for chrom, start, end in zip(chroms, starts, ends)],
+            dtype=bool)
+
+
+@lru_cache(maxsize=None)
+def _load_blacklist_index(input_path, mtime):
+    return BlacklistIndex.from_bed(input_path)
+
+
+def load_blacklist(input_path, in_memory=True,
+                   max_in_memory_size=MAX_IN_MEMORY_BLACKLIST_SIZE):
+    """
+    Loads a blacklist, in memory when the file is small enough. Each
+    file is loaded into memory at most once per process.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the tabix-indexed .bed.gz file of blacklisted regions.
+    in_memory : bool, optional
+        Default is `True`. Whether to load the blacklist into a
+        `BlacklistIndex`. If `False`, the file is queried through tabix.
+    max_in_memory_size : int, optional
+        Default is `MAX_IN_MEMORY_BLACKLIST_SIZE`. Files larger than
+        this many bytes are queried through tabix.
+
+    Returns
+    -------
+    BlacklistIndex or TabixBlacklist
+        The blacklist.
+
+    """
+    stat = os.stat(input_path)
+    if not in_memory or stat.st_size > max_in_memory_size:
+        return TabixBlacklist(input_path)
+    return _load_blacklist_index(os.path.abspath(input_path), stat.st_mtime)
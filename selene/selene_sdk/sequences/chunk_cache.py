@@ -0,0 +1,146 @@
+"""
+This module provides the `ChunkCache` class, a least-recently-used
+cache of fixed-size chromosome chunks used by `Genome` to serve
+overlapping windows (e.g. tiled or coordinate-sorted queries) from
+memory instead of reading the FASTA file for every window.
+
+"""
+from collections import OrderedDict
+
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+"""
+The default number of bases in a cached chunk.
+"""
+
+
+class ChunkCache(object):
+    """
+    A least-recently-used cache of the forward-strand sequence of
+    chromosome chunks. Chunk `i` of a chromosome covers the positions
+    `[i * chunk_size, (i + 1) * chunk_size)`, so a window is served by
+    the one or more consecutive chunks that it overlaps.
+
+    Parameters
+    ----------
+    read_chunk : function
+        A function taking `(chrom, start, end)` that reads the
+        forward-strand sequence of a region as a string. It is only
+        called for chunks that are not in the cache.
+    max_size : int
+        The byte budget of the cache. The least recently used chunks are
+        evicted to keep the total size of the cached chunks below it.
+    chunk_size : int, optional
+        Default is `DEFAULT_CHUNK_SIZE`. The number of bases in a chunk.
+
+    Attributes
+    ----------
+    max_size : int
+        The byte budget of the cache.
+    chunk_size : int
+        The number of bases in a chunk.
+    size : int
+        The total size in bytes of the cached chunks.
+    hits : int
+        The number of chunk lookups served from the cache.
+    misses : int
+        The number of chunk lookups that read the chunk.
+
+    """
+
+    def __init__(self, read_chunk, max_size, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Constructs a new `ChunkCache` object.
+        """
+        if chunk_size <= 0:
+            raise ValueError(
+                "`chunk_size` must be positive. Input was {0}".format(
+                    chunk_size))
+        self._read_chunk = read_chunk
+        self._chunks = OrderedDict()
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get_chunk(self, chrom, chunk_index, chrom_len):
+        """
+        Gets a chunk, reading it and evicting older chunks on a miss.
+        """
+        key = (chrom, chunk_index)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            self.hits += 1
+            return chunk
+        self.misses += 1
+        chunk_start = chunk_index * self.chunk_size
+        chunk = self._read_chunk(
+            chrom, chunk_start, min(chunk_start + self.chunk_size, chrom_len))
+        if len(chunk) > self.max_size:
+            return chunk
+        self._chunks[key] = chunk
+        self.size += len(chunk)
+        while self.size > self.max_size:
+            _, evicted = self._chunks.popitem(last=False)
+            self.size -= len(evicted)
+        return chunk
+
+    def get_sequence(self, chrom, start, end, chrom_len):
+        """
+        Gets the forward-strand sequence of a region.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the region.
+        end : int
+            One past the last coordinate of the region.
+        chrom_len : int
+            The length of the chromosome. The region must be within
+            `[0, chrom_len)`.
+
+        Returns
+        -------
+        str
+            The sequence of the region.
+
+        """
+        first = start // self.chunk_size
+        last = (end - 1) // self.chunk_size
+        offset = first * self.chunk_size
+        if first == last:
+            return self._get_chunk(chrom, first, chrom_len)[
+                start - offset:end - offset]
+        sequence = "".join([self._get_chunk(chrom, index, chrom_len)
+                            for index in range(first, last + 1)])
+        return sequence[start - offset:end - offset]
+
+    def clear(self):
+        """
+        Empties the cache and resets the hit and miss counters.
+        """
+        self._chunks.clear()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """
+        Gets the statistics of the cache.
+
+        Returns
+        -------
+        dict
+            The `hits`, `misses`, number of cached `chunks`, total
+            `size` in bytes and `max_size` of the cache.
+
+        """
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "chunks": len(self._chunks),
+                "size": self.size,
+                "max_size": self.max_size}
@@ -5,14 +5,194 @@ parts of the sequence and converting these parts into their one-hot
 encodings.
 
 """
+import io
+import os
+import weakref
+from multiprocessing import shared_memory
+
 import numpy as np
 import pkg_resources
 import pyfaidx
-import tabix
 
+from .blacklist import load_blacklist
+from .chunk_cache import DEFAULT_CHUNK_SIZE
+from .chunk_cache import ChunkCache
+from .genome_pack import GENOME_PACK_EXTENSION
+from .genome_pack import GenomePack
+from .genome_pack import write_genome_pack
 from .sequence import Sequence
 from .sequence import sequence_to_encoding
 from .sequence import encoding_to_sequence
+from .sequence import get_reverse_encoding
+from .sequence import indices_to_encoding
+from .sequence import sequence_to_indices
+from .unknown_index import UnknownBaseIndex
+from .unknown_index import load_unknown_index
+
+
+def _is_valid_region(len_chrs,
+                     chrom,
+                     start,
+                     end,
+                     pad=False,
+                     blacklist=None):
+    """
+    Checks whether a sequence can be retrieved from the input
+    coordinates.
+
+    Parameters
+    ----------
+    len_chrs : dict
+        A dictionary mapping chromosome names to lengths.
+    chrom : str
+        The name of the chromosomes, e.g. "chr1".
+    start : int
+        The 0-based start coordinate of the sequence.
+    end : int
+        One past the last coordinate of the sequence.
+    pad : bool, optional
+        Default is `False`. Whether out of bounds coordinates will be
+        padded rather than rejected.
+    blacklist : BlacklistIndex or TabixBlacklist or None, optional
+        Default is `None`. The blacklisted regions, if a file of
+        blacklisted regions is available.
+
+    Returns
+    -------
+    bool
+        `False` if `chrom` is unknown, the coordinates are out of bounds
+        (and `pad` is `False`) or the region overlaps a blacklisted
+        region. Otherwise `True`.
+
+    """
+    if chrom not in len_chrs:
+        return False
+
+    if start >= len_chrs[chrom]:
+        return False
+
+    if not pad and (end > len_chrs[chrom] or start < 0):
+        return False
+
+    if start >= end:
+        return False
+
+    if blacklist is not None and blacklist.overlaps(chrom, start, end):
+        return False
+    return True
+
+
+def _get_valid_regions(len_chrs,
+                       chroms,
+                       starts,
+                       ends,
+                       blacklist=None):
+    """
+    Checks which of a batch of regions a sequence can be retrieved
+    from. This is the batch form of `_is_valid_region` without padding.
+
+    Parameters
+    ----------
+    len_chrs : dict
+        A dictionary mapping chromosome names to lengths.
+    chroms : numpy.ndarray
+        The chromosome of each region.
+    starts : numpy.ndarray, dtype=numpy.int64
+        The 0-based start coordinate of each region.
+    ends : numpy.ndarray, dtype=numpy.int64
+        One past the last coordinate of each region.
+    blacklist : BlacklistIndex or TabixBlacklist or None, optional
+        Default is `None`. The blacklisted regions, if a file of
+        blacklisted regions is available.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=bool
+        `True` for each region that is on a known chromosome, in bounds
+        and does not overlap a blacklisted region.
+
+    """
+    names, inverse = np.unique(chroms, return_inverse=True)
+    chrom_lens = np.array([len_chrs.get(name, -1) for name in names],
+                          dtype=np.int64)[inverse.reshape(-1)]
+    valid = (starts >= 0) & (starts < ends) & (ends <= chrom_lens)
+    if blacklist is not None and valid.any():
+        valid[valid] = ~blacklist.overlaps_batch(
+            chroms[valid], starts[valid], ends[valid])
+    return valid
+
+
+def _merge_intervals(starts, ends):
+    """
+    Merges overlapping or adjacent half-open intervals into the sorted,
+    disjoint intervals covering the same positions.
+    """
+    keep = starts < ends
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return starts, ends
+    order = np.argsort(starts, kind="mergesort")
+    starts, ends = starts[order], np.maximum.accumulate(ends[order])
+    is_first = np.ones(len(starts), dtype=bool)
+    is_first[1:] = starts[1:] > ends[:-1]
+    first = np.nonzero(is_first)[0]
+    return starts[first], ends[np.append(first[1:], len(ends)) - 1]
+
+
+def _covers(starts, ends, positions):
+    """
+    Checks which positions are in one of sorted, disjoint intervals.
+    """
+    if len(starts) == 0:
+        return np.zeros(len(positions), dtype=bool)
+    index = np.searchsorted(starts, positions, side="right") - 1
+    return (index >= 0) & (positions < ends[np.maximum(index, 0)])
+
+
+def _subtract_intervals(starts, ends, cut_starts, cut_ends):
+    """
+    Removes the positions of the sorted, disjoint `cut` intervals from
+    the sorted, disjoint intervals `(starts, ends)`.
+    """
+    bounds = np.unique(np.concatenate([starts, ends, cut_starts, cut_ends]))
+    if len(bounds) < 2:
+        return starts[:0], ends[:0]
+    # each elementary segment between consecutive bounds is either kept
+    # or removed as a whole
+    kept = (_covers(starts, ends, bounds[:-1]) &
+            ~_covers(cut_starts, cut_ends, bounds[:-1]))
+    return _merge_intervals(bounds[:-1][kept], bounds[1:][kept])
+
+
+def _below_unknown_threshold(count_unknown, lower, upper, window_length,
+                             run_starts, run_ends, max_unknown_bases):
+    """
+    Finds the window starts in `[lower, upper)` whose window of
+    `window_length` bases has at most `max_unknown_bases` unknown bases,
+    where `count_unknown` counts the unknown bases of the windows at an
+    array of starts.
+
+    The number of unknown bases in the window starting at `x` changes
+    by -1, 0 or 1 from `x` to `x + 1`, and that step only changes where
+    the first or the last base of the window enters or leaves a run of
+    unknown bases. Between these breakpoints the count is linear, so
+    the windows below the threshold are found from the count and its
+    step at each breakpoint.
+    """
+    breakpoints = np.unique(np.clip(np.concatenate(
+        [[lower, upper], run_starts - window_length, run_ends - window_length,
+         run_starts, run_ends]), lower, upper))
+    segment_starts, segment_ends = breakpoints[:-1], breakpoints[1:]
+    counts = count_unknown(segment_starts)
+    steps = count_unknown(segment_starts + 1) - counts
+    excess = counts - max_unknown_bases
+    valid_starts = np.where(
+        steps < 0, segment_starts + np.maximum(excess, 0),
+        np.where(excess <= 0, segment_starts, segment_ends))
+    valid_ends = np.where(
+        steps > 0, np.minimum(segment_starts + 1 - excess, segment_ends),
+        segment_ends)
+    return _merge_intervals(valid_starts, np.maximum(valid_ends, valid_starts))
 
 
 def _get_sequence_from_coords(len_chrs,
@@ -22,7 +202,7 @@ def _get_sequence_from_coords(len_chrs,
                               end,
                               strand='+',
                               pad=False,
-                              blacklist_tabix=None):
+                              blacklist=None):
     """
     Gets the genomic sequence at the input coordinates.
 
@@ -44,9 +224,9 @@ def _get_sequence_from_coords(len_chrs,
         Default is `False`. If the coordinates are out of bounds, make an
         in-bounds query and then pad the sequence to return the desired
         sequence length.
-    blacklist_tabix : tabix.open or None, optional
-        Default is `None`. Tabix file handle if a file of blacklisted regions
-        is available.
+    blacklist : BlacklistIndex or TabixBlacklist or None, optional
+        Default is `None`. The blacklisted regions, if a file of
+        blacklisted regions is available.
 
     Returns
     -------
@@ -60,26 +240,10 @@ def _get_sequence_from_coords(len_chrs,
         choices.
 
     """
-    if chrom not in len_chrs:
-        return ""
-
-    if start >= len_chrs[chrom]:
-        return ""
-
-    if not pad and (end > len_chrs[chrom] or start < 0):
-        return ""
-
-    if start >= end:
+    if not _is_valid_region(len_chrs, chrom, start, end, pad=pad,
+                            blacklist=blacklist):
         return ""
 
-    if blacklist_tabix is not None:
-        try:
-            rows = blacklist_tabix.query(chrom, start, end)
-            for row in rows:
-                return ""
-        except tabix.TabixError:
-            pass
-
     if strand != '+' and strand != '-':
         raise ValueError(
             "Strand must be one of '+' or '-'. Input was {0}".format(
@@ -102,12 +266,36 @@ def _get_sequence_from_coords(len_chrs,
             Genome.UNK_BASE * end_pad)
 
 
+class _SharedMemory(shared_memory.SharedMemory):
+    """
+    A shared memory block that tolerates numpy views of its buffer
+    outliving it when the interpreter shuts down.
+    """
+
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+
+def _unlink_shared_memory(block, owner_pid):
+    """
+    Unlinks a shared memory block, but only from the process that
+    created it (forked workers inherit the owner's finalizers).
+    """
+    if os.getpid() == owner_pid:
+        block.unlink()
+
+
 class Genome(Sequence):
     """This class provides access to an organism's genomic sequence.
 
     This class supports retrieving parts of the sequence and converting
     these parts into their one-hot encodings. It is essentially a
-    wrapper class around the `pyfaidx.Fasta` class.
+    wrapper class around the `pyfaidx.Fasta` class, or around a
+    `selene_sdk.sequences.genome_pack.GenomePack` if `input_path` is
+    a genome pack.
 
     Parameters
     ----------
@@ -115,6 +303,9 @@ class Genome(Sequence):
         Path to an indexed FASTA file, that is, a `*.fasta` file with
         a corresponding `*.fai` file in the same directory. This file
         should contain the target organism's genome sequence.
+        Alternatively, the path to a genome pack (a `*.gpack` file built
+        with `selene_sdk.sequences.genome_pack.write_genome_pack`), which
+        encodes sequences directly from the memory-mapped file.
     blacklist_regions : str or None, optional
         Default is None. Path to a tabix-indexed list of regions from
         which we should not output sequences. This is used to ensure that
@@ -122,16 +313,38 @@ class Genome(Sequence):
         measurements. You can pass as input "hg19" or "hg38" to use the
         blacklist regions released by ENCODE. You can also pass in your own
         tabix-indexed .gz file.
+    blacklist_in_memory : bool, optional
+        Default is `True`. Whether to load the blacklist into memory once
+        per process (see `selene_sdk.sequences.blacklist.load_blacklist`)
+        rather than query the tabix index for every region. Blacklist
+        files larger than
+        `selene_sdk.sequences.blacklist.MAX_IN_MEMORY_BLACKLIST_SIZE`
+        are always queried through tabix.
+    cache_size : int, optional
+        Default is 0. The byte budget of an in-memory least-recently-used
+        cache of chromosome chunks (see
+        `selene_sdk.sequences.chunk_cache.ChunkCache`), which serves
+        overlapping windows, such as those of tiled or coordinate-sorted
+        queries, without reading the FASTA file again. The cache is
+        disabled if 0, which is best for randomly sampled windows. It is
+        not used for genome packs, which are already read from memory.
+        Each process (e.g. each `DataLoader` worker) has its own cache.
+    cache_chunk_size : int, optional
+        Default is `selene_sdk.sequences.chunk_cache.DEFAULT_CHUNK_SIZE`
+        (1 Mb). The number of bases in a cached chunk.
 
     Attributes
     ----------
-    genome : pyfaidx.Fasta
-        The FASTA file containing the genome sequence.
+    genome : pyfaidx.Fasta or selene_sdk.sequences.genome_pack.GenomePack
+        The FASTA file or genome pack containing the genome sequence.
     chrs : list(str)
         The list of chromosome names.
     len_chrs : dict
         A dictionary mapping the names of each chromosome in the file to
         the length of said chromosome.
+    shared_memory_name : str or None
+        The name of the shared memory block holding the genome after
+        `share_memory` is called, otherwise `None`.
 
     """
 
@@ -179,41 +392,169 @@ class Genome(Sequence):
     from the alphabet, but we are uncertain which.
     """
 
-    def __init__(self, input_path, blacklist_regions=None):
+    def __init__(self, input_path, blacklist_regions=None,
+                 blacklist_in_memory=True, cache_size=0,
+                 cache_chunk_size=DEFAULT_CHUNK_SIZE):
         """
         Constructs a `Genome` object.
         """
         self.input_path = input_path
         self.blacklist_regions = blacklist_regions
+        self.blacklist_in_memory = blacklist_in_memory
+        self.cache_size = cache_size
+        self.cache_chunk_size = cache_chunk_size
+        self.shared_memory_name = None
+        self._shared_memory_size = 0
+        self._shared_memory = None
+        self._unlink_shared_memory = None
+        self._unknown_index = None
         self.initialized = False
 
+    def __getstate__(self):
+        # open file handles and shared memory mappings are recreated by
+        # `init` in the unpickling process (e.g. a spawned worker)
+        state = self.__dict__.copy()
+        for key in ["genome", "_genome_pack", "_blacklist", "_chunk_cache",
+                    "chrs", "len_chrs"]:
+            state.pop(key, None)
+        state["_shared_memory"] = None
+        state["_unlink_shared_memory"] = None
+        state["initialized"] = False
+        return state
+
     def init(func):
         # delay initlization to allow multiprocessing
         def dfunc(self, *args, **kwargs):
             if not self.initialized:
-                self.genome = pyfaidx.Fasta(self.input_path)
+                if self.shared_memory_name is not None:
+                    if self._shared_memory is None:
+                        self._shared_memory = _SharedMemory(
+                            name=self.shared_memory_name)
+                    self.genome = GenomePack(
+                        self.input_path,
+                        buffer=np.frombuffer(
+                            self._shared_memory.buf, dtype=np.uint8,
+                            count=self._shared_memory_size))
+                    self._genome_pack = self.genome
+                elif self.input_path.endswith(GENOME_PACK_EXTENSION):
+                    self.genome = GenomePack(self.input_path)
+                    self._genome_pack = self.genome
+                else:
+                    self.genome = pyfaidx.Fasta(self.input_path)
+                    self._genome_pack = None
                 self.chrs = sorted(self.genome.keys())
                 self.len_chrs = self._get_len_chrs()
-                self._blacklist_tabix = None
+                self._chunk_cache = None
+                if self.cache_size > 0 and self._genome_pack is None:
+                    self._chunk_cache = ChunkCache(
+                        self._read_chunk, self.cache_size,
+                        chunk_size=self.cache_chunk_size)
+                self._blacklist = None
 
+                blacklist_path = None
                 if self.blacklist_regions == "hg19":
-                    self._blacklist_tabix = tabix.open(
-                        pkg_resources.resource_filename(
-                            "selene_sdk",
-                            "sequences/data/hg19_blacklist_ENCFF001TDO.bed.gz"))
+                    blacklist_path = pkg_resources.resource_filename(
+                        "selene_sdk",
+                        "sequences/data/hg19_blacklist_ENCFF001TDO.bed.gz")
                 elif self.blacklist_regions == "hg38":
-                    self._blacklist_tabix = tabix.open(
-                        pkg_resources.resource_filename(
-                            "selene_sdk",
-                            "sequences/data/hg38.blacklist.bed.gz"))
+                    blacklist_path = pkg_resources.resource_filename(
+                        "selene_sdk",
+                        "sequences/data/hg38.blacklist.bed.gz")
                 elif self.blacklist_regions is not None:  # user-specified file
-                    self._blacklist_tabix = tabix.open(
-                        self.blacklist_regions)
+                    blacklist_path = self.blacklist_regions
+                if blacklist_path is not None:
+                    self._blacklist = load_blacklist(
+                        blacklist_path, in_memory=self.blacklist_in_memory)
 
                 self.initialized = True
             return func(self, *args, **kwargs)
         return dfunc
 
+    def share_memory(self):
+        """Loads the genome into POSIX shared memory as a genome pack.
+
+        Call this in the parent process before starting the workers of
+        a `torch.utils.data.DataLoader`. Forked workers inherit the
+        mapping and spawned workers attach to it by name when unpickled,
+        so every worker reads the same physical pages and none of them
+        opens the FASTA file. If `input_path` is a FASTA file, it is
+        converted to a genome pack in memory first.
+
+        Returns
+        -------
+        str
+            The name of the shared memory block.
+
+        """
+        if self.shared_memory_name is not None:
+            return self.shared_memory_name
+        if self.input_path.endswith(GENOME_PACK_EXTENSION):
+            with open(self.input_path, "rb") as file_handle:
+                pack = file_handle.read()
+        else:
+            pack = write_genome_pack(self.input_path, io.BytesIO())
+            pack = pack.getbuffer()
+        self._shared_memory_size = len(pack)
+        self._shared_memory = _SharedMemory(
+            create=True, size=self._shared_memory_size)
+        self._shared_memory.buf[:self._shared_memory_size] = pack
+        del pack
+        self.shared_memory_name = self._shared_memory.name
+        self._unlink_shared_memory = weakref.finalize(
+            self, _unlink_shared_memory, self._shared_memory, os.getpid())
+        self._reset()
+        return self.shared_memory_name
+
+    def release_shared_memory(self):
+        """Frees the shared memory created by `share_memory`.
+
+        The genome reverts to reading `input_path`. This must only be
+        called once the workers using the shared memory have exited.
+        Otherwise, the shared memory is freed when the `Genome` that
+        created it is garbage collected or the process exits.
+        """
+        if self.shared_memory_name is None:
+            return
+        self._reset()
+        self._shared_memory.close()
+        if self._unlink_shared_memory is not None:
+            self._unlink_shared_memory()
+        self._shared_memory = None
+        self._unlink_shared_memory = None
+        self.shared_memory_name = None
+
+    def _reset(self):
+        """
+        Drops the open genome so that it is reloaded on next use.
+        """
+        for key in ["genome", "_genome_pack", "_chunk_cache", "chrs",
+                    "len_chrs"]:
+            self.__dict__.pop(key, None)
+        self.initialized = False
+
+    @init
+    def cache_info(self):
+        """Gets the statistics of the chunk cache (see `cache_size`).
+
+        Returns
+        -------
+        dict or None
+            The `hits`, `misses`, number of cached `chunks`, total
+            `size` in bytes and `max_size` of the chunk cache, or `None`
+            if the cache is disabled.
+
+        """
+        if self._chunk_cache is None:
+            return None
+        return self._chunk_cache.info()
+
+    @init
+    def clear_cache(self):
+        """Empties the chunk cache and resets its hit and miss counters.
+        """
+        if self._chunk_cache is not None:
+            self._chunk_cache.clear()
+
     @init
     def get_chrs(self):
         """Gets the list of chromosome names.
@@ -238,13 +579,137 @@ class Genome(Sequence):
         """
         return [(k, self.len_chrs[k]) for k in self.get_chrs()]
 
+    @init
+    def count_unknown(self, chrom, start, end):
+        """Counts the unknown bases (anything other than A, C, G or T)
+        at the queried coordinates without reading the sequence.
+
+        The first call builds the index of unknown bases. For a FASTA
+        file, the index is cached next to it (see
+        `selene_sdk.sequences.unknown_index.load_unknown_index`); for a
+        genome pack, it is read from the pack.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome or region, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the first position in the
+            sequence.
+        end : int
+            One past the 0-based last position in the sequence.
+
+        Returns
+        -------
+        int
+            The number of unknown bases in the region. Positions outside
+            the chromosome are not counted.
+
+        """
+        return self._get_unknown_index().count(chrom, start, end)
+
+    @init
+    def count_unknown_batch(self, chroms, starts, ends):
+        """Counts the unknown bases in each of a batch of regions. This
+        is the batch form of `count_unknown`.
+
+        Parameters
+        ----------
+        chroms : list(str) or numpy.ndarray
+            The chromosome of each region.
+        starts : list(int) or numpy.ndarray
+            The 0-based start coordinate of each region.
+        ends : list(int) or numpy.ndarray
+            One past the 0-based last position of each region.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=numpy.int64
+            The number of unknown bases in each region.
+
+        """
+        return self._get_unknown_index().count_batch(chroms, starts, ends)
+
+    @init
+    def get_valid_window_starts(self, chrom, window_length,
+                                max_unknown_bases=None):
+        """Gets the start coordinates of the windows on a chromosome
+        that a sequence can be retrieved from: the windows that are in
+        bounds, do not overlap a blacklisted region and, if
+        `max_unknown_bases` is not None, have at most that many unknown
+        bases.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        window_length : int
+            The length of the windows.
+        max_unknown_bases : int or None, optional
+            Default is None. If not None, the maximum number of unknown
+            bases in a window (see `count_unknown`).
+
+        Returns
+        -------
+        starts, ends : tuple(numpy.ndarray, numpy.ndarray)
+            The sorted, disjoint, half-open intervals of the valid
+            window starts, as `numpy.int64` arrays.
+
+        """
+        upper = self.len_chrs.get(chrom, -1) - window_length + 1
+        starts = np.array([0], dtype=np.int64)
+        ends = np.array([max(upper, 0)], dtype=np.int64)
+        if max_unknown_bases is not None:
+            unknown_index = self._get_unknown_index()
+            run_starts, run_ends = unknown_index.get_runs(chrom)
+
+            def count_unknown(window_starts):
+                return unknown_index.count_batch(
+                    np.full(len(window_starts), chrom), window_starts,
+                    window_starts + window_length)
+
+            starts, ends = _below_unknown_threshold(
+                count_unknown, 0, max(upper, 0), window_length,
+                run_starts, run_ends, max_unknown_bases)
+        if self._blacklist is not None:
+            blacklist_starts, blacklist_ends = \
+                self._blacklist.get_intervals(chrom)
+            # the windows starting in `(start - window_length, end)`
+            # overlap the blacklisted interval `[start, end)`
+            starts, ends = _subtract_intervals(
+                starts, ends, *_merge_intervals(
+                    blacklist_starts - window_length + 1, blacklist_ends))
+        return _merge_intervals(starts, ends)
+
+    def _get_unknown_index(self):
+        if self._unknown_index is None:
+            if self._genome_pack is not None:
+                self._unknown_index = UnknownBaseIndex(
+                    self._genome_pack._unk_runs)
+            else:
+                self._unknown_index = load_unknown_index(self.input_path)
+        return self._unknown_index
+
     def _get_len_chrs(self):
+        if self._genome_pack is not None:
+            return dict(self._genome_pack.len_chrs)
         len_chrs = {}
         for chrom in self.chrs:
             len_chrs[chrom] = len(self.genome[chrom])
         return len_chrs
 
+    def _read_chunk(self, chrom, start, end):
+        return self.genome[chrom][start:end].seq
+
     def _genome_sequence(self, chrom, start, end, strand='+'):
+        if self._genome_pack is not None:
+            return self._genome_pack.get_sequence(chrom, start, end, strand)
+        if self._chunk_cache is not None:
+            sequence = self._chunk_cache.get_sequence(
+                chrom, start, end, self.len_chrs[chrom])
+            if strand == '+':
+                return sequence
+            return pyfaidx.complement(sequence[::-1])
         if strand == '+':
             return self.genome[chrom][start:end].seq
         else:
@@ -329,10 +794,15 @@ class Genome(Sequence):
                                          end,
                                          strand=strand,
                                          pad=pad,
-                                         blacklist_tabix=self._blacklist_tabix)
+                                         blacklist=self._blacklist)
 
     @init
-    def get_encoding_from_coords(self, chrom, start, end, strand='+'):
+    def get_encoding_from_coords(self,
+                                 chrom,
+                                 start,
+                                 end,
+                                 strand='+',
+                                 indices=False):
         """Gets the one-hot encoding of the genomic sequence at the
         queried coordinates.
 
@@ -347,11 +817,16 @@ class Genome(Sequence):
             One past the 0-based last position in the sequence.
         strand : {'+', '-'}, optional
             Default is '+'. The strand the sequence is located on.
+        indices : bool, optional
+            Default is False. If True, return the base indices of the
+            sequence (see `Genome.sequence_to_indices`) instead of its
+            one-hot encoding.
 
         Returns
         -------
         numpy.ndarray, dtype=bool
-            The :math:`L \\times 4` encoding of the sequence, where
+            The :math:`L \\times 4` encoding of the sequence (or its
+            :math:`L` `numpy.uint8` base indices), where
             :math:`L = end - start`, unless `chrom` cannot be found
             in the input FASTA, `start` or `end` are out of bounds,
             or (if a blacklist exists) the region overlaps with a blacklisted
@@ -366,32 +841,205 @@ class Genome(Sequence):
             (Raised in the call to `self.get_sequence_from_coords`)
 
         """
+        encode = self.sequence_to_indices if indices else \
+            self.sequence_to_encoding
         try:
+            if self._genome_pack is not None:
+                return self._get_encoding_from_genome_pack(
+                    chrom, start, end, strand, indices)
             sequence = self.get_sequence_from_coords(
                 chrom, start, end, strand=strand)
-            encoding = self.sequence_to_encoding(sequence)
+            encoding = encode(sequence)
             return encoding
         except ValueError:
             print("Caught ValueError for {0}, {1}, {2}".format(
                 chrom, start, end), flush=True)
+            return encode("")
+
+    @init
+    def get_encodings_from_coords(self,
+                                  chroms,
+                                  starts,
+                                  ends,
+                                  strands='+',
+                                  out=None,
+                                  indices=False):
+        """Gets the one-hot encodings of a batch of equal-length
+        genomic windows.
+
+        Parameters
+        ----------
+        chroms : list(str) or numpy.ndarray
+            The chromosome of each of the :math:`B` windows.
+        starts : list(int) or numpy.ndarray
+            The 0-based start coordinate of each window.
+        ends : list(int) or numpy.ndarray
+            One past the 0-based last position of each window. Every
+            window must have the same length :math:`L`.
+        strands : str or list(str) or numpy.ndarray, optional
+            Default is '+'. The strand of each window, or a single strand
+            ('+' or '-') for all of them.
+        out : numpy.ndarray or None, optional
+            Default is None. A :math:`B \\times L \\times 4` array (or
+            :math:`B \\times L` if `indices` is True) to write the
+            encodings into. If None, a new boolean (or `numpy.uint8`)
+            array is allocated.
+        indices : bool, optional
+            Default is False. If True, return the base indices of the
+            windows (see `Genome.sequence_to_indices`) instead of their
+            one-hot encodings.
+
+        Returns
+        -------
+        encodings, valid : tuple(numpy.ndarray, numpy.ndarray)
+            The :math:`B \\times L \\times 4` encodings (or
+            :math:`B \\times L` base indices) and a boolean
+            array of length :math:`B` that is `False` for each window that
+            is on an unknown chromosome, out of bounds or (if a blacklist
+            exists) overlaps a blacklisted region. The encodings of
+            invalid windows are all zeros. When the genome is a genome
+            pack, the valid windows are encoded with a fixed number of
+            array operations regardless of :math:`B`.
+
+        Raises
+        ------
+        ValueError
+            If the windows are not all the same length, if `out` has the
+            wrong shape, or if a strand is not one of '+' or '-'.
+
+        """
+        chroms = np.asarray(chroms)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        n_windows = len(starts)
+        length = int(ends[0] - starts[0]) if n_windows else 0
+        if np.any(ends - starts != length):
+            raise ValueError(
+                "All windows passed to `get_encodings_from_coords` must "
+                "have the same length.")
+        strands = np.broadcast_to(np.asarray(strands), (n_windows,))
+        if not np.all((strands == '+') | (strands == '-')):
+            raise ValueError(
+                "Strand must be one of '+' or '-'. Input was {0}".format(
+                    np.unique(strands).tolist()))
+        if indices:
+            shape = (n_windows, length)
+            encode = self.sequence_to_indices
+        else:
+            shape = (n_windows, length, len(self.BASES_ARR))
+            encode = self.sequence_to_encoding
+        if out is None:
+            out = np.zeros(shape, dtype=np.uint8 if indices else bool)
+        elif out.shape != shape:
+            raise ValueError(
+                "Expected `out` to have shape {0} but it has shape "
+                "{1}.".format(shape, out.shape))
+
+        valid = _get_valid_regions(self.len_chrs, chroms, starts, ends,
+                                   blacklist=self._blacklist)
+        out[~valid] = 0
+        if self._genome_pack is not None:
+            if valid.any():
+                out[valid] = self._genome_pack.get_encodings(
+                    chroms[valid], starts[valid], length,
+                    reverse=strands[valid] == '-', indices=indices)
+        else:
+            for index in np.nonzero(valid)[0]:
+                out[index] = encode(self._genome_sequence(
+                    chroms[index], int(starts[index]), int(ends[index]),
+                    strands[index]))
+        return out, valid
+
+    def _get_encoding_from_genome_pack(self,
+                                       chrom,
+                                       start,
+                                       end,
+                                       strand,
+                                       indices=False):
+        """
+        Encodes the queried region straight from the genome pack,
+        applying the same checks as `get_sequence_from_coords`.
+        """
+        if not _is_valid_region(self.len_chrs, chrom, start, end,
+                                blacklist=self._blacklist):
+            if indices:
+                return self.sequence_to_indices("")
             return self.sequence_to_encoding("")
+        if strand != '+' and strand != '-':
+            raise ValueError(
+                "Strand must be one of '+' or '-'. Input was {0}".format(
+                    strand))
+        if indices:
+            return self._genome_pack.get_indices(chrom, start, end, strand)
+        return self._genome_pack.get_encoding(chrom, start, end, strand)
 
     @classmethod
-    def sequence_to_encoding(cls, sequence):
+    def sequence_to_encoding(cls, sequence, dtype=bool):
         """Converts an input sequence to its one-hot encoding.
 
         Parameters
         ----------
-        sequence : str
-            A nucleotide sequence of length :math:`L`
+        sequence : str or list(str)
+            A nucleotide sequence of length :math:`L`, or a list of
+            :math:`B` such sequences.
+        dtype : numpy.dtype, optional
+            Default is `bool`. The data type of the encoding. Unknown
+            bases are encoded as 0.25 in every column, cast to `dtype`.
+
+        Returns
+        -------
+        numpy.ndarray
+            The :math:`L \\times 4` one-hot encoding of the sequence, or
+            the :math:`B \\times L \\times 4` encodings of the sequences.
+
+        """
+        return sequence_to_encoding(
+            sequence, cls.BASE_TO_INDEX, cls.BASES_ARR, dtype=dtype)
+
+    @classmethod
+    def sequence_to_indices(cls, sequence):
+        """Converts an input sequence to its base indices, a compact
+        alternative to the one-hot encoding that uses one byte per base.
+
+        Parameters
+        ----------
+        sequence : str or list(str)
+            A nucleotide sequence of length :math:`L`, or a list of
+            :math:`B` such sequences.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=numpy.uint8
+            The :math:`L` base indices of the sequence (or the
+            :math:`B \\times L` indices of the sequences), where `A`,
+            `C`, `G` and `T` are 0 through 3 and unknown bases are 4.
+
+        """
+        return sequence_to_indices(
+            sequence, cls.BASE_TO_INDEX, cls.BASES_ARR)
+
+    @classmethod
+    def indices_to_encoding(cls, indices, dtype=np.float32):
+        """Expands base indices (see `Genome.sequence_to_indices`) to
+        their one-hot encoding.
+
+        Parameters
+        ----------
+        indices : numpy.ndarray
+            The :math:`L` base indices of a sequence, or the
+            :math:`B \\times L` base indices of a batch of sequences.
+        dtype : numpy.dtype, optional
+            Default is `numpy.float32`. The data type of the encoding.
 
         Returns
         -------
-        numpy.ndarray, dtype=numpy.float32
-            The :math:`L \\times 4` one-hot encoding of the sequence.
+        numpy.ndarray
+            The :math:`L \\times 4` (or :math:`B \\times L \\times 4`)
+            encoding. Unknown bases are encoded as 0.25 in every column,
+            cast to `dtype`.
 
         """
-        return sequence_to_encoding(sequence, cls.BASE_TO_INDEX, cls.BASES_ARR)
+        return indices_to_encoding(indices, cls.BASES_ARR, dtype=dtype)
 
     @classmethod
     def encoding_to_sequence(cls, encoding):
@@ -399,15 +1047,37 @@ class Genome(Sequence):
 
         Parameters
         ----------
-        encoding : numpy.ndarray, dtype=numpy.float32
+        encoding : numpy.ndarray
             An :math:`L \\times 4` one-hot encoding of the sequence,
-            where :math:`L` is the length of the output sequence.
+            where :math:`L` is the length of the output sequence, or a
+            :math:`B \\times L \\times 4` batch of encodings.
 
         Returns
         -------
-        str
+        str or list(str)
             The sequence of :math:`L` nucleotides decoded from the
-            input array.
+            input array, or the list of :math:`B` decoded sequences.
 
         """
         return encoding_to_sequence(encoding, cls.BASES_ARR, cls.UNK_BASE)
+
+    @classmethod
+    def get_reverse_encoding(cls, encoding):
+        """Gets the encoding of the reverse complement of a sequence.
+
+        Parameters
+        ----------
+        encoding : numpy.ndarray
+            An :math:`L \\times 4` one-hot encoding of the sequence, or a
+            :math:`B \\times L \\times 4` batch of encodings.
+
+        Returns
+        -------
+        numpy.ndarray
+            The encoding of the reverse complement, with the same shape
+            and dtype as `encoding`.
+
+        """
+        return get_reverse_encoding(encoding, cls.BASES_ARR,
+                                    cls.BASE_TO_INDEX,
+                                    cls.COMPLEMENTARY_BASE_DICT)
@@ -0,0 +1,557 @@
+"""
+This module provides the `GenomePack` class and the `write_genome_pack`
+function. A genome pack is a single memory-mapped file that stores a
+genome at 2 bits per base, alongside a run index of unknown (N) bases,
+a run index of soft-masked (lowercase) bases, and the length of each
+chromosome. `selene_sdk.sequences.Genome` uses a genome pack as its
+backend whenever its `input_path` ends with `GENOME_PACK_EXTENSION`.
+
+A genome pack can be built from an indexed FASTA file by running
+::
+    python -m selene_sdk.sequences.genome_pack <input.fa> [<output.gpack>]
+
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pyfaidx
+
+
+GENOME_PACK_EXTENSION = ".gpack"
+"""
+The file extension used to recognize genome pack files.
+"""
+
+_MAGIC = b"SLNGPACK"
+_VERSION = 1
+_FOOTER_SIZE = 16
+_WRITE_BLOCK_SIZE = 1 << 22
+
+_UNK_CODE = 4
+
+_BASE_CODES = np.full(256, _UNK_CODE, dtype=np.uint8)
+for _index, _base in enumerate("ACGT"):
+    _BASE_CODES[ord(_base)] = _index
+    _BASE_CODES[ord(_base.lower())] = _index
+
+_IS_LOWER = np.zeros(256, dtype=bool)
+_IS_LOWER[ord('a'):ord('z') + 1] = True
+
+_UNPACK_CODES = np.array(
+    [[(byte >> (2 * i)) & 3 for i in range(4)] for byte in range(256)],
+    dtype=np.uint8)
+
+_UNPACK_ONE_HOT = np.eye(4, dtype=bool)[_UNPACK_CODES]
+
+_CODE_CHARS = np.frombuffer(b"ACGTN", dtype=np.uint8)
+
+
+def _mask_to_runs(mask, offset):
+    """
+    Finds the runs of `True` values in a boolean mask.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray, dtype=bool
+        The mask to search.
+    offset : int
+        The coordinate of the first position in `mask`.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.int64
+        An :math:`R \\times 2` array of the `[start, end)` coordinates of
+        each of the :math:`R` runs.
+
+    """
+    padded = np.concatenate(([0], mask.view(np.int8), [0]))
+    boundaries = np.diff(padded)
+    starts = np.nonzero(boundaries == 1)[0]
+    ends = np.nonzero(boundaries == -1)[0]
+    return np.stack([starts, ends], axis=1).astype(np.int64) + offset
+
+
+def _append_runs(runs, new_runs):
+    """
+    Appends runs found in a block to the runs found in previous blocks,
+    merging any run that continues across the block boundary.
+    """
+    if len(new_runs) == 0:
+        return
+    if runs and runs[-1][1] == new_runs[0, 0]:
+        runs[-1][1] = int(new_runs[0, 1])
+        new_runs = new_runs[1:]
+    runs.extend(new_runs.tolist())
+
+
+def _pack_codes(codes):
+    """
+    Packs an array of 2-bit base codes 4 to a byte. The first base in
+    each group of 4 occupies the lowest 2 bits of the byte.
+    """
+    remainder = len(codes) % 4
+    if remainder:
+        codes = np.concatenate(
+            (codes, np.zeros(4 - remainder, dtype=np.uint8)))
+    codes = codes.reshape(-1, 4)
+    return (codes[:, 0] | (codes[:, 1] << 2) |
+            (codes[:, 2] << 4) | (codes[:, 3] << 6)).astype(np.uint8)
+
+
+def _complement_codes(codes):
+    """
+    Complements base codes, leaving the unknown base code unchanged.
+    """
+    return np.where(codes == _UNK_CODE, codes, 3 - codes).astype(np.uint8)
+
+
+def _write_aligned(file_handle, data):
+    """
+    Writes `data` to `file_handle`, starting at the next 8-byte
+    boundary, and returns the offset that `data` was written at.
+    """
+    offset = file_handle.tell()
+    padding = -offset % 8
+    if padding:
+        file_handle.write(b"\x00" * padding)
+        offset += padding
+    file_handle.write(data)
+    return offset
+
+
+def write_genome_pack(input_path, output_path=None):
+    """
+    Builds a genome pack from an indexed FASTA file.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to an indexed FASTA file, that is, a `*.fasta` file with
+        a corresponding `*.fai` file in the same directory.
+    output_path : str or file object or None, optional
+        Default is None. The path to write the genome pack to, or an
+        empty binary file object (e.g. `io.BytesIO`) to write it into.
+        If None, `GENOME_PACK_EXTENSION` is appended to
+        `input_path`.
+
+    Returns
+    -------
+    str or file object
+        The path to the genome pack, or `output_path` if it is a file
+        object.
+
+    Notes
+    -----
+    Characters other than `A`, `C`, `G` and `T` (in either case) are
+    stored as unknown bases and are read back as `N` (or `n` if
+    soft-masked).
+
+    """
+    if output_path is None:
+        output_path = input_path + GENOME_PACK_EXTENSION
+    if hasattr(output_path, "write"):
+        _write_genome_pack(input_path, output_path)
+    else:
+        with open(output_path, "wb") as file_handle:
+            _write_genome_pack(input_path, file_handle)
+    return output_path
+
+
+def _write_genome_pack(input_path, file_handle):
+    """
+    Writes the genome pack of the indexed FASTA file at `input_path`
+    to the open binary file `file_handle`.
+    """
+    fasta = pyfaidx.Fasta(input_path)
+    chroms = []
+    file_handle.write(_MAGIC)
+    for chrom in fasta.keys():
+        chrom_len = len(fasta[chrom])
+        unk_runs = []
+        lower_runs = []
+        packed_offset = None
+        for block_start in range(0, chrom_len, _WRITE_BLOCK_SIZE):
+            block_end = min(block_start + _WRITE_BLOCK_SIZE, chrom_len)
+            block = np.frombuffer(
+                fasta[chrom][block_start:block_end].seq.encode("ascii"),
+                dtype=np.uint8)
+            codes = _BASE_CODES[block]
+            is_unk = codes == _UNK_CODE
+            _append_runs(unk_runs, _mask_to_runs(is_unk, block_start))
+            _append_runs(
+                lower_runs, _mask_to_runs(_IS_LOWER[block], block_start))
+            codes[is_unk] = 0
+            packed = _pack_codes(codes).tobytes()
+            if packed_offset is None:
+                packed_offset = _write_aligned(file_handle, packed)
+            else:
+                file_handle.write(packed)
+        if packed_offset is None:
+            packed_offset = file_handle.tell()
+        unk_offset = _write_aligned(
+            file_handle, np.array(unk_runs, dtype=np.int64).tobytes())
+        lower_offset = _write_aligned(
+            file_handle, np.array(lower_runs, dtype=np.int64).tobytes())
+        chroms.append({
+            "name": chrom,
+            "length": chrom_len,
+            "packed_offset": packed_offset,
+            "unk_runs_offset": unk_offset,
+            "n_unk_runs": len(unk_runs),
+            "lower_runs_offset": lower_offset,
+            "n_lower_runs": len(lower_runs)})
+    header = json.dumps(
+        {"version": _VERSION, "chroms": chroms}).encode("utf-8")
+    file_handle.write(header)
+    file_handle.write(len(header).to_bytes(8, "little"))
+    file_handle.write(_MAGIC)
+    fasta.close()
+
+
+class GenomePack(object):
+    """
+    Provides read-only, memory-mapped access to a genome pack built by
+    `write_genome_pack`.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the genome pack file.
+    buffer : numpy.ndarray or None, optional
+        Default is None. A `numpy.uint8` array holding the contents of
+        the genome pack, e.g. a view of shared memory. If given, the
+        pack is read from `buffer` without copying and `input_path` is
+        only used in error messages.
+
+    Attributes
+    ----------
+    len_chrs : dict
+        A dictionary mapping the names of each chromosome in the file to
+        the length of said chromosome.
+
+    Raises
+    ------
+    ValueError
+        If `input_path` is not a genome pack file.
+
+    """
+
+    def __init__(self, input_path, buffer=None):
+        """
+        Constructs a new `GenomePack` object.
+        """
+        self.input_path = input_path
+        if buffer is None:
+            self._data = np.memmap(input_path, dtype=np.uint8, mode='r')
+        else:
+            self._data = buffer
+        footer = self._data[-_FOOTER_SIZE:].tobytes()
+        if (self._data[:len(_MAGIC)].tobytes() != _MAGIC or
+                footer[8:] != _MAGIC):
+            raise ValueError(
+                "{0} is not a genome pack file.".format(input_path))
+        header_len = int.from_bytes(footer[:8], "little")
+        header_end = len(self._data) - _FOOTER_SIZE
+        header = json.loads(
+            self._data[header_end - header_len:header_end].tobytes())
+        if header["version"] != _VERSION:
+            raise ValueError(
+                "Genome pack version {0} is not supported. Expected "
+                "version {1}.".format(header["version"], _VERSION))
+
+        self.len_chrs = {}
+        self._packed = {}
+        self._unk_runs = {}
+        self._lower_runs = {}
+        for info in header["chroms"]:
+            name = info["name"]
+            self.len_chrs[name] = info["length"]
+            offset = info["packed_offset"]
+            self._packed[name] = self._data[
+                offset:offset + (info["length"] + 3) // 4]
+            self._unk_runs[name] = self._get_runs(
+                info["unk_runs_offset"], info["n_unk_runs"])
+            self._lower_runs[name] = self._get_runs(
+                info["lower_runs_offset"], info["n_lower_runs"])
+
+        # Genome-wide coordinates, used to serve batches of windows from
+        # several chromosomes with a handful of array operations.
+        self._chrom_ids = {
+            info["name"]: i for i, info in enumerate(header["chroms"])}
+        self._packed_offsets = np.array(
+            [info["packed_offset"] for info in header["chroms"]],
+            dtype=np.int64)
+        lengths = np.array(
+            [info["length"] for info in header["chroms"]], dtype=np.int64)
+        self._base_offsets = np.cumsum(lengths) - lengths
+        self._all_unk_runs = np.concatenate(
+            [np.zeros((0, 2), dtype=np.int64)] +
+            [self._unk_runs[info["name"]] + base_offset
+             for info, base_offset in zip(header["chroms"],
+                                          self._base_offsets)])
+
+    def _get_runs(self, offset, n_runs):
+        runs = self._data[offset:offset + 16 * n_runs].view(np.int64)
+        return runs.reshape(n_runs, 2)
+
+    def keys(self):
+        """Gets the chromosome names, in file order.
+
+        Returns
+        -------
+        list(str)
+            The chromosome names.
+
+        """
+        return list(self.len_chrs.keys())
+
+    def get_chrom_ids(self, chroms):
+        """Maps chromosome names to their index in the genome pack.
+
+        Parameters
+        ----------
+        chroms : list(str) or numpy.ndarray
+            The chromosome names.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=numpy.int64
+            The index of each chromosome, or -1 for unknown names.
+
+        """
+        names, inverse = np.unique(np.asarray(chroms), return_inverse=True)
+        ids = np.array([self._chrom_ids.get(name, -1) for name in names],
+                       dtype=np.int64)
+        return ids[inverse.reshape(-1)]
+
+    def _get_packed_block(self, chrom, start, end):
+        """
+        Returns the packed bytes covering `[start, end)` and the
+        position of `start` within the first of those bytes.
+        """
+        return self._packed[chrom][start // 4:(end + 3) // 4], start % 4
+
+    @staticmethod
+    def _overlapping_runs(runs, start, end):
+        """
+        Returns the runs overlapping `[start, end)`, clipped to the
+        region and shifted to be relative to `start`.
+        """
+        first = np.searchsorted(runs[:, 1], start, side="right")
+        last = np.searchsorted(runs[:, 0], end, side="left")
+        overlapping = runs[first:last]
+        return np.clip(overlapping, start, end) - start
+
+    def get_codes(self, chrom, start, end):
+        """Gets the base codes of the sequence at the input coordinates.
+        Coordinates are assumed to be in bounds.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the sequence.
+        end : int
+            One past the last coordinate of the sequence.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=numpy.uint8
+            The :math:`L` codes of the sequence, where `A`, `C`, `G` and
+            `T` are 0 through 3 and unknown bases are 4.
+
+        """
+        block, offset = self._get_packed_block(chrom, start, end)
+        codes = _UNPACK_CODES[block].reshape(-1)[offset:offset + end - start]
+        for run_start, run_end in self._overlapping_runs(
+                self._unk_runs[chrom], start, end):
+            codes[run_start:run_end] = _UNK_CODE
+        return codes
+
+    def get_sequence(self, chrom, start, end, strand='+'):
+        """Gets the sequence at the input coordinates. Coordinates are
+        assumed to be in bounds.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the sequence.
+        end : int
+            One past the last coordinate of the sequence.
+        strand : {'+', '-'}, optional
+            Default is '+'. The strand the sequence is located on.
+
+        Returns
+        -------
+        str
+            The sequence, with soft-masked bases in lowercase.
+
+        """
+        codes = self.get_codes(chrom, start, end)
+        if strand == '-':
+            codes = _complement_codes(codes)
+        chars = _CODE_CHARS[codes]
+        for run_start, run_end in self._overlapping_runs(
+                self._lower_runs[chrom], start, end):
+            chars[run_start:run_end] += 32
+        if strand == '-':
+            chars = chars[::-1]
+        return chars.tobytes().decode("ascii")
+
+    def get_encoding(self, chrom, start, end, strand='+'):
+        """Gets the one-hot encoding of the sequence at the input
+        coordinates, without constructing an intermediate string.
+        Coordinates are assumed to be in bounds.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the sequence.
+        end : int
+            One past the last coordinate of the sequence.
+        strand : {'+', '-'}, optional
+            Default is '+'. The strand the sequence is located on.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=bool
+            The :math:`L \\times 4` encoding of the sequence. Unknown
+            bases are encoded as rows of `True`, as in
+            `selene_sdk.sequences.sequence_to_encoding`.
+
+        """
+        block, offset = self._get_packed_block(chrom, start, end)
+        encoding = _UNPACK_ONE_HOT[block].reshape(-1, 4)[
+            offset:offset + end - start]
+        for run_start, run_end in self._overlapping_runs(
+                self._unk_runs[chrom], start, end):
+            encoding[run_start:run_end, :] = True
+        if strand == '-':
+            encoding = np.ascontiguousarray(encoding[::-1, ::-1])
+        return encoding
+
+    def get_indices(self, chrom, start, end, strand='+'):
+        """Gets the base indices of the sequence at the input
+        coordinates. Coordinates are assumed to be in bounds.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the sequence.
+        end : int
+            One past the last coordinate of the sequence.
+        strand : {'+', '-'}, optional
+            Default is '+'. The strand the sequence is located on.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=numpy.uint8
+            The :math:`L` base indices of the sequence, where `A`, `C`,
+            `G` and `T` are 0 through 3 and unknown bases are 4.
+
+        """
+        codes = self.get_codes(chrom, start, end)
+        if strand == '-':
+            codes = _complement_codes(codes[::-1])
+        return codes
+
+    def get_encodings(self, chroms, starts, length, reverse=None,
+                      indices=False):
+        """Gets the one-hot encodings of a batch of equal-length
+        windows. The windows are gathered from the memory map together,
+        so the number of array operations does not depend on the batch
+        size. Coordinates are assumed to be in bounds.
+
+        Parameters
+        ----------
+        chroms : list(str) or numpy.ndarray
+            The chromosome of each of the :math:`B` windows.
+        starts : numpy.ndarray
+            The 0-based start coordinate of each window.
+        length : int
+            The length :math:`L` of every window.
+        reverse : numpy.ndarray or None, optional
+            Default is None. A boolean array marking the windows on the
+            '-' strand, which are reverse complemented.
+        indices : bool, optional
+            Default is False. If True, return the base indices of the
+            windows (as in `get_indices`) instead of their encodings.
+
+        Returns
+        -------
+        numpy.ndarray
+            The :math:`B \\times L \\times 4` boolean encodings of the
+            windows, or their :math:`B \\times L` `numpy.uint8` base
+            indices if `indices` is True.
+
+        """
+        table = _UNPACK_CODES if indices else _UNPACK_ONE_HOT
+        unk_value = _UNK_CODE if indices else True
+        starts = np.asarray(starts, dtype=np.int64)
+        chrom_ids = self.get_chrom_ids(chroms)
+        n_windows = len(starts)
+        if n_windows == 0:
+            return np.zeros((0, length) + table.shape[2:], dtype=table.dtype)
+        n_bytes = (length + 3) // 4 + 1
+        byte_index = ((self._packed_offsets[chrom_ids] + starts // 4)[:, None]
+                      + np.arange(n_bytes))
+        np.minimum(byte_index, len(self._data) - 1, out=byte_index)
+        unpacked = table[self._data[byte_index]].reshape(
+            (n_windows, -1) + table.shape[2:])
+        positions = (starts % 4)[:, None] + np.arange(length)
+        encodings = unpacked[np.arange(n_windows)[:, None], positions]
+
+        window_starts = self._base_offsets[chrom_ids] + starts
+        runs = self._all_unk_runs
+        first_run = np.searchsorted(runs[:, 1], window_starts, side="right")
+        last_run = np.searchsorted(
+            runs[:, 0], window_starts + length, side="left")
+        has_unk = np.nonzero(last_run > first_run)[0]
+        if len(has_unk) > 0:
+            window_positions = window_starts[has_unk, None] + np.arange(length)
+            run_index = np.searchsorted(
+                runs[:, 0], window_positions, side="right") - 1
+            is_unk = ((run_index >= 0) &
+                      (window_positions < runs[run_index.clip(0), 1]))
+            unk_encodings = encodings[has_unk]
+            unk_encodings[is_unk] = unk_value
+            encodings[has_unk] = unk_encodings
+
+        if reverse is not None and np.any(reverse):
+            reverse = np.asarray(reverse, dtype=bool)
+            if indices:
+                encodings[reverse] = _complement_codes(
+                    encodings[reverse][:, ::-1])
+            else:
+                encodings[reverse] = encodings[reverse][:, ::-1, ::-1]
+        return encodings
+
+
+def main():
+    """
+    Builds a genome pack from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Build a genome pack from an indexed FASTA file.")
+    parser.add_argument("input_path",
+                        help="Path to the FASTA file (with a .fai index).")
+    parser.add_argument("output_path", nargs="?", default=None,
+                        help="Path to the output genome pack. Defaults to "
+                             "<input_path>{0}.".format(GENOME_PACK_EXTENSION))
+    args = parser.parse_args()
+    output_path = write_genome_pack(args.input_path, args.output_path)
+    print("Wrote genome pack to {0} ({1} bytes)".format(
+        output_path, os.path.getsize(output_path)))
+
+
+if __name__ == "__main__":
+    main()
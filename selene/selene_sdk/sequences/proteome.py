@@ -236,22 +236,29 @@ class Proteome(Sequence):
         return encoding
 
     @classmethod
-    def sequence_to_encoding(cls, sequence):
+    def sequence_to_encoding(cls, sequence, dtype=bool):
         """Converts an input sequence to its one-hot encoding.
 
         Parameters
         ----------
-        sequence : str
-            The input sequence of amino acids of length :math:`L`.
+        sequence : str or list(str)
+            The input sequence of amino acids of length :math:`L`, or a
+            list of :math:`B` such sequences.
+        dtype : numpy.dtype, optional
+            Default is `bool`. The data type of the encoding. Unknown
+            amino acids are encoded as 0.05 in every column, cast to
+            `dtype`.
 
         Returns
         -------
-        numpy.ndarray, dtype=numpy.float32
+        numpy.ndarray
             The :math:`L \\times 20` array, where `L` was the length of
-            the input sequence.
+            the input sequence, or the :math:`B \\times L \\times 20`
+            array for a list of sequences.
 
         """
-        return sequence_to_encoding(sequence, cls.BASE_TO_INDEX, cls.BASES_ARR)
+        return sequence_to_encoding(
+            sequence, cls.BASE_TO_INDEX, cls.BASES_ARR, dtype=dtype)
 
     @classmethod
     def encoding_to_sequence(cls, encoding):
@@ -259,15 +266,16 @@ class Proteome(Sequence):
 
         Parameters
         ----------
-        encoding : numpy.ndarray, dtype=numpy.float32
+        encoding : numpy.ndarray
             The :math:`L \\times 20` encoding of the sequence, where
-            :math:`L` is the length of the output amino acid sequence.
+            :math:`L` is the length of the output amino acid sequence,
+            or a :math:`B \\times L \\times 20` batch of encodings.
 
         Returns
         -------
-        str
+        str or list(str)
             The sequence of :math:`L` amino acids decoded from the
-            input array.
+            input array, or the list of :math:`B` decoded sequences.
 
         """
         return encoding_to_sequence(encoding, cls.BASES_ARR, cls.UNK_BASE)
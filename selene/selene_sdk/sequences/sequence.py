@@ -5,19 +5,53 @@ base class for biological sequence collections (e.g. genomes).
 """
 from abc import ABCMeta
 from abc import abstractmethod
+from functools import lru_cache
 
 import numpy as np
 
-from ._sequence import _fast_sequence_to_encoding
 
+@lru_cache(maxsize=None)
+def _get_encoding_table(base_to_index_items, bases_size, dtype):
+    """
+    Builds the lookup table used to one-hot encode sequences. Row `b`
+    of the table is the encoding of the character with byte value `b`.
 
-def sequence_to_encoding(sequence, base_to_index, bases_arr):
+    Parameters
+    ----------
+    base_to_index_items : tuple(tuple(str, int))
+        The items of a `base_to_index` dict.
+    bases_size : int
+        The size of the sequence alphabet.
+    dtype : numpy.dtype
+        The data type of the table.
+
+    Returns
+    -------
+    numpy.ndarray
+        The :math:`256 \\times N` lookup table. Characters outside of
+        `base_to_index` are encoded as :math:`1 / N` in every column,
+        cast to `dtype` (e.g. `True` for `bool`).
+
+    """
+    table = np.full((256, bases_size),
+                    np.divide(1, bases_size, dtype=np.float32),
+                    dtype=np.float32)
+    for base, index in base_to_index_items:
+        table[ord(base), :] = 0.
+        table[ord(base), index] = 1.
+    table = table.astype(dtype)
+    table.setflags(write=False)
+    return table
+
+
+def sequence_to_encoding(sequence, base_to_index, bases_arr, dtype=bool):
     """Converts an input sequence to its one-hot encoding.
 
     Parameters
     ----------
-    sequence : str
-        The input sequence of length :math:`L`.
+    sequence : str or list(str)
+        The input sequence of length :math:`L`, or a list of :math:`B`
+        sequences that are all of length :math:`L`.
     base_to_index : dict
         A dict that maps input characters to indices, where the indices
         specify the column to assign as 1 when a base exists at the
@@ -29,26 +63,169 @@ def sequence_to_encoding(sequence, base_to_index, bases_arr):
         mapping to values of `[0, 1, 2, 3]`.
     bases_arr : list(str)
         The characters in the sequence's alphabet.
+    dtype : numpy.dtype, optional
+        Default is `bool`. The data type of the encoding. Characters
+        that are not in `base_to_index` are encoded as :math:`1 / N` in
+        every column, cast to `dtype`.
 
     Returns
     -------
-    numpy.ndarray, dtype=numpy.float32
+    numpy.ndarray
         The :math:`L \\times N` encoding of the sequence, where
         :math:`L` is the length of the input sequence and :math:`N` is
-        the size of the sequence alphabet.
+        the size of the sequence alphabet. If `sequence` is a list, the
+        :math:`B \\times L \\times N` encodings of the sequences.
+
+    Raises
+    ------
+    ValueError
+        If `sequence` is a list of sequences that are not all the same
+        length.
+
+    """
+    table = _get_encoding_table(
+        tuple(sorted(base_to_index.items())), len(bases_arr), np.dtype(dtype))
+    return table[_get_sequence_bytes(sequence, "sequence_to_encoding")]
+
+
+def _get_sequence_bytes(sequence, func_name):
+    """
+    Gets the byte values of a sequence, or of a list of equal-length
+    sequences as a :math:`B \\times L` array. Non-ASCII characters
+    become `?`. `func_name` is used in the error message.
+    """
+    if isinstance(sequence, str):
+        return np.frombuffer(
+            sequence.encode("ascii", errors="replace"), dtype=np.uint8)
+    length = len(sequence[0]) if len(sequence) else 0
+    if any(len(s) != length for s in sequence):
+        raise ValueError(
+            "All sequences passed to `{0}` must have the same "
+            "length.".format(func_name))
+    sequence_bytes = np.frombuffer(
+        "".join(sequence).encode("ascii", errors="replace"), dtype=np.uint8)
+    return sequence_bytes.reshape(len(sequence), length)
+
+
+@lru_cache(maxsize=None)
+def _get_index_table(base_to_index_items, bases_size):
+    """
+    Builds the lookup table used to convert sequences to base indices.
+    Entry `b` of the table is the index of the character with byte
+    value `b`, or `bases_size` if it is not in the alphabet.
+    """
+    table = np.full(256, bases_size, dtype=np.uint8)
+    for base, index in base_to_index_items:
+        table[ord(base)] = index
+    table.setflags(write=False)
+    return table
+
+
+def sequence_to_indices(sequence, base_to_index, bases_arr):
+    """Converts an input sequence to the indices of its bases. This is
+    a compact alternative to the one-hot encoding, using one byte per
+    position.
+
+    Parameters
+    ----------
+    sequence : str or list(str)
+        The input sequence of length :math:`L`, or a list of :math:`B`
+        sequences that are all of length :math:`L`.
+    base_to_index : dict
+        A dict that maps input characters to indices.
+    bases_arr : list(str)
+        The characters in the sequence's alphabet.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.uint8
+        The :math:`L` base indices of the sequence, or the
+        :math:`B \\times L` base indices of the sequences. Characters
+        that are not in `base_to_index` have the index :math:`N`, the
+        size of the sequence alphabet.
+
+    Raises
+    ------
+    ValueError
+        If `sequence` is a list of sequences that are not all the same
+        length.
+
+    """
+    table = _get_index_table(
+        tuple(sorted(base_to_index.items())), len(bases_arr))
+    return table[_get_sequence_bytes(sequence, "sequence_to_indices")]
+
+
+def indices_to_encoding(indices, bases_arr, dtype=np.float32):
+    """Expands base indices (see `sequence_to_indices`) to their one-hot
+    encoding.
+
+    Parameters
+    ----------
+    indices : numpy.ndarray
+        The base indices of a sequence, or of a batch of sequences.
+    bases_arr : list(str)
+        The characters in the sequence's alphabet.
+    dtype : numpy.dtype, optional
+        Default is `numpy.float32`. The data type of the encoding.
+
+    Returns
+    -------
+    numpy.ndarray
+        The encoding, with a trailing axis of size :math:`N` added to
+        the shape of `indices`. The index :math:`N` is encoded as
+        :math:`1 / N` in every column, cast to `dtype`.
+
+    """
+    bases_size = len(bases_arr)
+    table = np.concatenate([
+        np.eye(bases_size, dtype=np.float32),
+        np.full((1, bases_size), 1. / bases_size, dtype=np.float32)])
+    return table.astype(dtype)[indices]
+
+
+def _get_base_indices(encoding):
+    """
+    Finds the column of the base encoded at each position.
+
+    Parameters
+    ----------
+    encoding : numpy.ndarray
+        An encoding whose last axis is the sequence alphabet.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.int64
+        The column of the base at each position, or -1 where the row is
+        not a one-hot vector (e.g. the :math:`1 / N` rows of unknown
+        bases, or all-`True` rows in a boolean encoding).
 
     """
-    return _fast_sequence_to_encoding(sequence, base_to_index, len(bases_arr)).astype(bool)
+    is_one_hot = ((encoding.max(axis=-1) == 1) &
+                  (encoding.sum(axis=-1, dtype=np.float64) == 1))
+    return np.where(is_one_hot, encoding.argmax(axis=-1), -1)
+
+
+def encoding_to_indices(encoding):
+    """Converts a one-hot encoding to base indices (see
+    `sequence_to_indices`).
+
+    Parameters
+    ----------
+    encoding : numpy.ndarray
+        The :math:`L \\times N` encoding of a sequence, or a
+        :math:`B \\times L \\times N` batch of encodings.
 
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.uint8
+        The base index at each position. Positions that are not one-hot
+        (unknown bases) have the index :math:`N`.
 
-def _get_base_index(encoding_row):
-    unk_val = 1 / len(encoding_row)
-    for index, val in enumerate(encoding_row):
-        if np.isclose(val, unk_val) is True:
-            return -1
-        elif val == 1:
-            return index
-    return -1
+    """
+    indices = _get_base_indices(np.asarray(encoding))
+    indices[indices == -1] = encoding.shape[-1]
+    return indices.astype(np.uint8)
 
 
 def encoding_to_sequence(encoding, bases_arr, unk_base):
@@ -56,10 +233,11 @@ def encoding_to_sequence(encoding, bases_arr, unk_base):
 
     Parameters
     ----------
-    encoding : numpy.ndarray, dtype=numpy.float32
+    encoding : numpy.ndarray
         The :math:`L \\times N` encoding of the sequence, where
         :math:`L` is the length of the sequence, and :math:`N` is the
-        size of the sequence alphabet.
+        size of the sequence alphabet. A batch of :math:`B` encodings
+        of shape :math:`B \\times L \\times N` is also accepted.
     bases_arr : list(str)
         A list of the bases in the sequence's alphabet that corresponds
         to the correct columns for those bases in the encoding.
@@ -70,19 +248,17 @@ def encoding_to_sequence(encoding, bases_arr, unk_base):
 
     Returns
     -------
-    str
+    str or list(str)
         The sequence of :math:`L` characters decoded from the
-        input array.
+        input array, or the list of :math:`B` sequences for a batch.
 
     """
-    sequence = []
-    for row in encoding:
-        base_pos = _get_base_index(row)
-        if base_pos == -1:
-            sequence.append(unk_base)
-        else:
-            sequence.append(bases_arr[base_pos])
-    return "".join(sequence)
+    chars = np.frombuffer(
+        ("".join(bases_arr) + unk_base).encode("ascii"), dtype=np.uint8)
+    decoded = chars[_get_base_indices(np.asarray(encoding))]
+    if decoded.ndim == 1:
+        return decoded.tobytes().decode("ascii")
+    return [row.tobytes().decode("ascii") for row in decoded]
 
 
 def get_reverse_encoding(encoding,
@@ -90,33 +266,36 @@ def get_reverse_encoding(encoding,
                          base_to_index,
                          complementary_base_dict):
     """
-    The Genome DNA bases encoding is created such that the reverse
-    encoding can be quickly computed.
+    Computes the encoding of the reverse complement of a sequence by
+    reversing the positions and permuting the alphabet columns. For
+    the Genome DNA bases encoding, this is a flip of both axes.
 
     Parameters
     ----------
     encoding : numpy.ndarray
+        The :math:`L \\times N` encoding of the sequence, or a batch of
+        :math:`B \\times L \\times N` encodings.
     bases_arr : list(str)
+        The bases in the sequence's alphabet, in column order.
     base_to_index : dict
+        A dict that maps bases to their column in the encoding.
     complementary_base_dict : dict
+        A dict that maps bases to their complementary bases.
 
     Returns
     -------
     numpy.ndarray
+        The encoding of the reverse complement, with the same shape and
+        dtype as `encoding`. Rows for unknown bases (e.g. :math:`1 / N`
+        rows) are unchanged by the column permutation.
 
     """
-
-    reverse_encoding = np.zeros(encoding.shape)
-    for index, row in enumerate(encoding):
-        base_pos = _get_base_index(row)
-        if base_pos == -1:
-            reverse_encoding[index, :] = 1 / len(bases_arr)
-        else:
-            base = complementary_base_dict[bases_arr[base_pos]]
-            complem_base_pos = base_to_index[base]
-            rev_index = encoding.shape[0] - row - 1
-            reverse_encoding[rev_index, complem_base_pos] = 1
-    return reverse_encoding
+    complement_columns = np.array(
+        [base_to_index[complementary_base_dict[base]] for base in bases_arr])
+    if np.array_equal(complement_columns,
+                      np.arange(len(bases_arr))[::-1]):
+        return np.ascontiguousarray(encoding[..., ::-1, ::-1])
+    return encoding[..., ::-1, :][..., complement_columns]
 
 
 def reverse_complement_sequence(sequence, complementary_base_dict):
@@ -254,18 +433,21 @@ class Sequence(metaclass=ABCMeta):
 
     @classmethod
     @abstractmethod
-    def sequence_to_encoding(cls, sequence):
+    def sequence_to_encoding(cls, sequence, dtype=bool):
         """Transforms a biological sequence into a numerical
         representation.
 
         Parameters
         ----------
-        sequence : str
-            The input sequence of characters.
+        sequence : str or list(str)
+            The input sequence of characters, or a list of sequences of
+            the same length.
+        dtype : numpy.dtype, optional
+            Default is `bool`. The data type of the encoding.
 
         Returns
         -------
-        numpy.ndarray, dtype=numpy.float32
+        numpy.ndarray
             The :math:`L \\times N` encoding of the sequence, where
             :math:`L` is the length of the sequence, and :math:`N` is
             the size of the sequence type's alphabet.
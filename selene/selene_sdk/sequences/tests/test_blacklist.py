@@ -0,0 +1,126 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from selene_sdk.sequences import Genome
+from selene_sdk.sequences.blacklist import BlacklistIndex
+from selene_sdk.sequences.blacklist import load_blacklist
+
+
+class TestBlacklistIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.intervals = {
+            "chr1": ([50, 10, 12, 30, 80, 90], [60, 20, 25, 31, 95, 92]),
+            "chr2": ([5], [6]),
+        }
+        self.index = BlacklistIndex(self.intervals)
+
+    def _expected_overlaps(self, chrom, start, end):
+        if chrom not in self.intervals:
+            return False
+        return any(s < end and e > start
+                   for s, e in zip(*self.intervals[chrom]))
+
+    def test_merged_intervals(self):
+        self.assertListEqual(
+            self.index.starts["chr1"].tolist(), [10, 30, 50, 80])
+        self.assertListEqual(
+            self.index.ends["chr1"].tolist(), [25, 31, 60, 95])
+
+    def test_overlaps(self):
+        for chrom in ["chr1", "chr2", "chr3"]:
+            for start in range(0, 100):
+                for end in [start + 1, start + 3, start + 12]:
+                    self.assertEqual(
+                        self.index.overlaps(chrom, start, end),
+                        self._expected_overlaps(chrom, start, end))
+
+    def test_overlaps_batch(self):
+        rng = np.random.RandomState(0)
+        chroms = rng.choice(["chr1", "chr2", "chr3"], size=500)
+        starts = rng.randint(0, 100, size=500)
+        ends = starts + rng.randint(1, 15, size=500)
+        expected = [self._expected_overlaps(c, s, e)
+                    for c, s, e in zip(chroms, starts, ends)]
+        self.assertListEqual(
+            self.index.overlaps_batch(chroms, starts, ends).tolist(),
+            expected)
+
+    def test_from_bed(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            bed_path = os.path.join(tmp_dir, "blacklist.bed.gz")
+            with gzip.open(bed_path, "wt") as file_handle:
+                file_handle.write("track name=blacklist\n")
+                file_handle.write("chr1\t10\t20\tHigh_Signal_Region\n")
+                file_handle.write("chr1\t15\t25\n")
+                file_handle.write("chrX\t0\t5\n")
+            index = BlacklistIndex.from_bed(bed_path)
+            self.assertListEqual(index.starts["chr1"].tolist(), [10])
+            self.assertListEqual(index.ends["chr1"].tolist(), [25])
+            self.assertIs(load_blacklist(bed_path), load_blacklist(bed_path))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class TestGenomeBlacklist(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fasta_path = os.path.join(self.tmp_dir, "small.fasta")
+        shutil.copyfile(
+            os.path.join("selene_sdk", "sequences", "tests",
+                         "files", "small.fasta"),
+            self.fasta_path)
+        self.bed_path = os.path.join(self.tmp_dir, "blacklist.bed")
+        with open(self.bed_path, 'w') as file_handle:
+            file_handle.write("chr1\t20\t30\nchr2\t50\t51\n")
+        self.genome = Genome(self.fasta_path,
+                             blacklist_regions=self.bed_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_sequence_from_coords(self):
+        self.assertEqual(
+            self.genome.get_sequence_from_coords("chr1", 25, 35), "")
+        self.assertEqual(
+            self.genome.get_sequence_from_coords("chr1", 30, 35),
+            Genome(self.fasta_path).get_sequence_from_coords(
+                "chr1", 30, 35))
+
+    def test_get_encodings_from_coords(self):
+        _, valid = self.genome.get_encodings_from_coords(
+            ["chr1", "chr1", "chr2", "chr2"], [10, 30, 45, 51],
+            [20, 40, 55, 61])
+        self.assertListEqual(valid.tolist(), [True, True, False, True])
+
+    def test_get_valid_window_starts(self):
+        for chrom, chrom_len in self.genome.get_chr_lens():
+            for window_length in [1, 7, 30]:
+                for max_unknown_bases in [None, 0, 5]:
+                    starts, ends = self.genome.get_valid_window_starts(
+                        chrom, window_length,
+                        max_unknown_bases=max_unknown_bases)
+                    valid = np.zeros(chrom_len + 1, dtype=bool)
+                    for start, end in zip(starts, ends):
+                        valid[start:end] = True
+                    expected = np.zeros(chrom_len + 1, dtype=bool)
+                    for start in range(chrom_len - window_length + 1):
+                        end = start + window_length
+                        expected[start] = (
+                            self.genome.get_sequence_from_coords(
+                                chrom, start, end) != "" and
+                            (max_unknown_bases is None or
+                             self.genome.count_unknown(chrom, start, end) <=
+                             max_unknown_bases))
+                    np.testing.assert_array_equal(valid, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
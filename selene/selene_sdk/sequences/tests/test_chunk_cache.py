@@ -0,0 +1,114 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from selene_sdk.sequences import Genome
+from selene_sdk.sequences.chunk_cache import ChunkCache
+
+
+class TestChunkCache(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(11)
+        self.sequences = {
+            "chr1": "".join(rng.choice(list("ACGTN"), size=95)),
+            "chr2": "".join(rng.choice(list("acgt"), size=40)),
+        }
+        self.reads = []
+        self.cache = ChunkCache(self._read_chunk, 50, chunk_size=10)
+
+    def _read_chunk(self, chrom, start, end):
+        self.reads.append((chrom, start, end))
+        return self.sequences[chrom][start:end]
+
+    def _get_sequence(self, chrom, start, end):
+        return self.cache.get_sequence(
+            chrom, start, end, len(self.sequences[chrom]))
+
+    def test_get_sequence(self):
+        for chrom, sequence in self.sequences.items():
+            for start in range(len(sequence)):
+                for end in [start + 1, start + 10, start + 27]:
+                    end = min(end, len(sequence))
+                    self.assertEqual(self._get_sequence(chrom, start, end),
+                                     sequence[start:end])
+        self.assertLessEqual(self.cache.size, 50)
+
+    def test_hits_and_misses(self):
+        self._get_sequence("chr1", 0, 15)
+        self._get_sequence("chr1", 5, 20)
+        self.assertListEqual(self.reads,
+                             [("chr1", 0, 10), ("chr1", 10, 20)])
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(self.cache.hits, 2)
+        self._get_sequence("chr1", 90, 95)
+        self.assertEqual(self.reads[-1], ("chr1", 90, 95))
+        self.assertEqual(self.cache.size, 25)
+
+    def test_eviction(self):
+        for start in range(0, 60, 10):
+            self._get_sequence("chr1", start, start + 10)
+        self.assertEqual(self.cache.info()["chunks"], 5)
+        self._get_sequence("chr1", 0, 10)
+        self.assertEqual(self.reads[-1], ("chr1", 0, 10))
+        self.assertEqual(self.cache.misses, 7)
+
+    def test_clear(self):
+        self._get_sequence("chr2", 0, 30)
+        self.cache.clear()
+        self.assertDictEqual(
+            self.cache.info(),
+            {"hits": 0, "misses": 0, "chunks": 0, "size": 0,
+             "max_size": 50})
+
+
+class TestGenomeChunkCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fasta_path = os.path.join(self.tmp_dir, "small.fasta")
+        shutil.copyfile(
+            os.path.join("selene_sdk", "sequences", "tests",
+                         "files", "small.fasta"),
+            self.fasta_path)
+        self.genome = Genome(self.fasta_path)
+        self.cached_genome = Genome(self.fasta_path, cache_size=1000,
+                                    cache_chunk_size=16)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_sequence_from_coords(self):
+        for chrom, length in self.genome.get_chr_lens():
+            for start in range(0, length, 5):
+                for end in [start + 1, start + 20, length]:
+                    if end > length:
+                        continue
+                    for strand in ['+', '-']:
+                        if chrom == "chr3" and strand == '-':
+                            continue  # pyfaidx cannot complement 'U'
+                        self.assertEqual(
+                            self.cached_genome.get_sequence_from_coords(
+                                chrom, start, end, strand=strand),
+                            self.genome.get_sequence_from_coords(
+                                chrom, start, end, strand=strand))
+        self.assertGreater(self.cached_genome.cache_info()["hits"], 0)
+
+    def test_cache_disabled(self):
+        self.genome.get_sequence_from_coords("chr1", 0, 10)
+        self.assertIsNone(self.genome.cache_info())
+
+    def test_pickle(self):
+        self.cached_genome.get_sequence_from_coords("chr1", 0, 10)
+        genome = pickle.loads(pickle.dumps(self.cached_genome))
+        self.assertEqual(genome.get_sequence_from_coords("chr1", 0, 10),
+                         self.genome.get_sequence_from_coords("chr1", 0, 10))
+        self.assertEqual(genome.cache_info()["misses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,8 @@ import numpy as np
 
 from selene_sdk.sequences.genome import _get_sequence_from_coords
 from selene_sdk.sequences.sequence import sequence_to_encoding, \
-    encoding_to_sequence
+    encoding_to_sequence, get_reverse_encoding, sequence_to_indices, \
+    indices_to_encoding, encoding_to_indices
 
 
 class TestGenome(unittest.TestCase):
@@ -59,6 +60,35 @@ class TestGenome(unittest.TestCase):
         ])
         self.assertSequenceEqual(observed.tolist(), expected.tolist())
 
+    def test_sequence_to_encoding_dtypes(self):
+        sequence = "AnUt"
+        expected = np.array([
+            [1., 0., 0., 0.], [.25, .25, .25, .25],
+            [.25, .25, .25, .25], [0., 0., 0., 1.]], dtype=np.float32)
+        for dtype in [bool, np.uint8, np.float16, np.float32]:
+            observed = sequence_to_encoding(
+                sequence, self.bases_encoding, self.bases_arr, dtype=dtype)
+            self.assertEqual(observed.dtype, np.dtype(dtype))
+            self.assertSequenceEqual(observed.tolist(),
+                                     expected.astype(dtype).tolist())
+
+    def test_sequence_to_encoding_batch(self):
+        sequences = ["ACGT", "nNta", "GGCC"]
+        observed = sequence_to_encoding(
+            sequences, self.bases_encoding, self.bases_arr, dtype=np.float32)
+        self.assertEqual(observed.shape, (3, 4, 4))
+        for i, sequence in enumerate(sequences):
+            self.assertSequenceEqual(
+                observed[i].tolist(),
+                sequence_to_encoding(sequence, self.bases_encoding,
+                                     self.bases_arr,
+                                     dtype=np.float32).tolist())
+
+    def test_sequence_to_encoding_batch_unequal_lengths(self):
+        with self.assertRaises(ValueError):
+            sequence_to_encoding(
+                ["ACGT", "ACG"], self.bases_encoding, self.bases_arr)
+
     def test_encoding_to_sequence(self):
         encoding = np.array([
             [1., 0., 0., 0.], [1., 0., 0., 0.],
@@ -77,6 +107,73 @@ class TestGenome(unittest.TestCase):
         expected = "GNATNN"
         self.assertEqual(observed, expected)
 
+    def test_encoding_to_sequence_bool_unknown_bases(self):
+        encoding = sequence_to_encoding(
+            "ANNCT", self.bases_encoding, self.bases_arr, dtype=bool)
+        observed = encoding_to_sequence(encoding, self.bases_arr, "N")
+        self.assertEqual(observed, "ANNCT")
+
+    def test_encoding_to_sequence_batch(self):
+        sequences = ["AGCTN", "NNNAC", "TTGCA"]
+        encoding = sequence_to_encoding(
+            sequences, self.bases_encoding, self.bases_arr)
+        observed = encoding_to_sequence(encoding, self.bases_arr, "N")
+        self.assertListEqual(observed, sequences)
+
+    def test_get_reverse_encoding(self):
+        complementary_base_dict = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+        encoding = sequence_to_encoding(
+            "AGNCTT", self.bases_encoding, self.bases_arr)
+        observed = get_reverse_encoding(
+            encoding, self.bases_arr, self.bases_encoding,
+            complementary_base_dict)
+        expected = sequence_to_encoding(
+            "AAGNCT", self.bases_encoding, self.bases_arr)
+        np.testing.assert_array_equal(observed, expected)
+
+    def test_get_reverse_encoding_batch(self):
+        complementary_base_dict = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+        encoding = sequence_to_encoding(
+            ["AGNCTT", "CCCGAT"], self.bases_encoding, self.bases_arr,
+            dtype=bool)
+        observed = get_reverse_encoding(
+            encoding, self.bases_arr, self.bases_encoding,
+            complementary_base_dict)
+        expected = sequence_to_encoding(
+            ["AAGNCT", "ATCGGG"], self.bases_encoding, self.bases_arr,
+            dtype=bool)
+        self.assertEqual(observed.dtype, expected.dtype)
+        np.testing.assert_array_equal(observed, expected)
+
+    def test_sequence_to_indices(self):
+        observed = sequence_to_indices(
+            ["AGnCT", "ctNNa"], self.bases_encoding, self.bases_arr)
+        self.assertEqual(observed.dtype, np.uint8)
+        self.assertListEqual(observed.tolist(),
+                             [[0, 2, 4, 1, 3], [1, 3, 4, 4, 0]])
+
+    def test_indices_to_encoding(self):
+        indices = sequence_to_indices(
+            "AGNCT", self.bases_encoding, self.bases_arr)
+        observed = indices_to_encoding(indices, self.bases_arr)
+        expected = np.array([[1., 0., 0., 0.],
+                             [0., 0., 1., 0.],
+                             [.25, .25, .25, .25],
+                             [0., 1., 0., 0.],
+                             [0., 0., 0., 1.]])
+        self.assertEqual(observed.dtype, np.float32)
+        np.testing.assert_array_equal(observed, expected)
+
+    def test_encoding_to_indices(self):
+        sequences = ["AGNCT", "NNNAC"]
+        for dtype in [bool, np.float32]:
+            encoding = sequence_to_encoding(
+                sequences, self.bases_encoding, self.bases_arr, dtype=dtype)
+            np.testing.assert_array_equal(
+                encoding_to_indices(encoding),
+                sequence_to_indices(
+                    sequences, self.bases_encoding, self.bases_arr))
+
     def test__get_sequence_from_coords_pos_strand(self):
         observed = _get_sequence_from_coords(
             self.len_chrs, self._genome_sequence, "chr1", 0, 14, '+')
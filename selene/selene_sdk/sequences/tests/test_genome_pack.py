@@ -0,0 +1,211 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from selene_sdk.sequences import Genome
+from selene_sdk.sequences.genome_pack import GenomePack
+from selene_sdk.sequences.genome_pack import write_genome_pack
+
+
+class TestGenomePack(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fasta_path = os.path.join(self.tmp_dir, "small.fasta")
+        shutil.copyfile(
+            os.path.join("selene_sdk", "sequences", "tests",
+                         "files", "small.fasta"),
+            self.fasta_path)
+        self.pack_path = write_genome_pack(self.fasta_path)
+        self.fasta_genome = Genome(self.fasta_path)
+        self.pack_genome = Genome(self.pack_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write_genome_pack_default_path(self):
+        self.assertEqual(self.pack_path, self.fasta_path + ".gpack")
+
+    def test_GenomePack_not_a_pack(self):
+        with self.assertRaises(ValueError):
+            GenomePack(self.fasta_path)
+
+    def test_get_chr_lens(self):
+        self.assertListEqual(self.pack_genome.get_chr_lens(),
+                             self.fasta_genome.get_chr_lens())
+
+    def test_get_sequence_from_coords(self):
+        for chrom, start, end in [("chr1", 0, 100), ("chr1", 45, 55),
+                                  ("chr2", 25, 35), ("chr2", 3, 97),
+                                  ("chr4", 10, 11)]:
+            for strand in ['+', '-']:
+                self.assertEqual(
+                    self.pack_genome.get_sequence_from_coords(
+                        chrom, start, end, strand=strand),
+                    self.fasta_genome.get_sequence_from_coords(
+                        chrom, start, end, strand=strand))
+
+    def test_get_sequence_from_coords_non_dna_characters(self):
+        observed = self.pack_genome.get_sequence_from_coords("chr3", 0, 10)
+        self.assertEqual(observed, "nNNnnNNAtC")
+
+    def test_get_sequence_from_coords_out_of_bounds(self):
+        self.assertEqual(
+            self.pack_genome.get_sequence_from_coords("chr3", 5, 11), "")
+
+    def test_get_encoding_from_coords(self):
+        for chrom, length in self.fasta_genome.get_chr_lens():
+            for start in range(0, length, 7):
+                for end in [start + 1, start + 6, length]:
+                    if end > length:
+                        continue
+                    for strand in ['+', '-']:
+                        if chrom == "chr3" and strand == '-':
+                            continue  # pyfaidx cannot complement 'U'
+                        observed = self.pack_genome.get_encoding_from_coords(
+                            chrom, start, end, strand=strand)
+                        expected = self.fasta_genome.get_encoding_from_coords(
+                            chrom, start, end, strand=strand)
+                        self.assertEqual(observed.dtype, expected.dtype)
+                        np.testing.assert_array_equal(observed, expected)
+
+    def test_get_encoding_from_coords_out_of_bounds(self):
+        observed = self.pack_genome.get_encoding_from_coords("chr2", 90, 101)
+        self.assertEqual(observed.shape[0], 0)
+
+    def test_get_encodings_from_coords(self):
+        chroms = ["chr1", "chr2", "chr2", "chr4", "chr1", "chr5", "chr2"]
+        starts = np.array([0, 31, 3, 45, 48, 0, 95])
+        strands = ['+', '-', '-', '+', '-', '+', '+']
+        expected_valid = [True, True, True, False, True, False, False]
+        for genome in [self.fasta_genome, self.pack_genome]:
+            encodings, valid = genome.get_encodings_from_coords(
+                chroms, starts, starts + 10, strands)
+            self.assertEqual(encodings.shape, (7, 10, 4))
+            self.assertListEqual(valid.tolist(), expected_valid)
+            for i in range(len(chroms)):
+                if not expected_valid[i]:
+                    self.assertFalse(encodings[i].any())
+                    continue
+                np.testing.assert_array_equal(
+                    encodings[i],
+                    self.fasta_genome.get_encoding_from_coords(
+                        chroms[i], starts[i], starts[i] + 10, strands[i]))
+
+    def test_get_encoding_from_coords_indices(self):
+        for genome in [self.fasta_genome, self.pack_genome]:
+            for chrom, start, end in [("chr1", 0, 100), ("chr2", 3, 97),
+                                      ("chr3", 0, 10), ("chr4", 10, 11)]:
+                for strand in ['+', '-']:
+                    if chrom == "chr3" and strand == '-':
+                        continue  # pyfaidx cannot complement 'U'
+                    observed = genome.get_encoding_from_coords(
+                        chrom, start, end, strand=strand, indices=True)
+                    self.assertEqual(observed.dtype, np.uint8)
+                    np.testing.assert_array_equal(
+                        observed,
+                        Genome.sequence_to_indices(
+                            self.fasta_genome.get_sequence_from_coords(
+                                chrom, start, end, strand=strand)))
+
+    def test_get_encodings_from_coords_indices(self):
+        chroms = ["chr1", "chr2", "chr4", "chr1"]
+        starts = np.array([0, 31, 45, 48])
+        strands = ['+', '-', '+', '-']
+        for genome in [self.fasta_genome, self.pack_genome]:
+            indices, valid = genome.get_encodings_from_coords(
+                chroms, starts, starts + 10, strands, indices=True)
+            encodings, _ = genome.get_encodings_from_coords(
+                chroms, starts, starts + 10, strands)
+            self.assertEqual(indices.shape, (4, 10))
+            self.assertListEqual(valid.tolist(), [True, True, False, True])
+            np.testing.assert_array_equal(
+                Genome.indices_to_encoding(indices[valid]),
+                encodings[valid].astype(np.float32) / encodings[valid].sum(
+                    axis=2, keepdims=True))
+
+    def test_get_encodings_from_coords_out(self):
+        out = np.ones((2, 5, 4), dtype=np.float32)
+        encodings, valid = self.pack_genome.get_encodings_from_coords(
+            ["chr2", "chr3"], [30, 20], [35, 25], out=out)
+        self.assertIs(encodings, out)
+        self.assertListEqual(valid.tolist(), [True, False])
+        np.testing.assert_array_equal(
+            out[0], self.fasta_genome.get_encoding_from_coords(
+                "chr2", 30, 35))
+        self.assertFalse(out[1].any())
+
+    def test_get_encodings_from_coords_all_invalid(self):
+        for genome in [self.fasta_genome, self.pack_genome]:
+            for indices in [False, True]:
+                encodings, valid = genome.get_encodings_from_coords(
+                    ["chr1", "chr2"], [-1, 95], [9, 105], indices=indices)
+                self.assertListEqual(valid.tolist(), [False, False])
+                self.assertEqual(encodings.shape[:2], (2, 10))
+                self.assertFalse(encodings.any())
+        encodings = self.pack_genome._genome_pack.get_encodings([], [], 10)
+        self.assertEqual(encodings.shape, (0, 10, 4))
+
+    def test_get_encodings_from_coords_unequal_lengths(self):
+        with self.assertRaises(ValueError):
+            self.pack_genome.get_encodings_from_coords(
+                ["chr1", "chr2"], [0, 0], [10, 11])
+
+
+class TestGenomeSharedMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fasta_path = os.path.join(self.tmp_dir, "small.fasta")
+        shutil.copyfile(
+            os.path.join("selene_sdk", "sequences", "tests",
+                         "files", "small.fasta"),
+            self.fasta_path)
+        self.fasta_genome = Genome(self.fasta_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _assert_same_genome(self, genome):
+        self.assertListEqual(genome.get_chr_lens(),
+                             self.fasta_genome.get_chr_lens())
+        for chrom, start, end in [("chr1", 0, 100), ("chr2", 3, 97)]:
+            for strand in ['+', '-']:
+                np.testing.assert_array_equal(
+                    genome.get_encoding_from_coords(
+                        chrom, start, end, strand=strand),
+                    self.fasta_genome.get_encoding_from_coords(
+                        chrom, start, end, strand=strand))
+
+    def test_share_memory(self):
+        for input_path in [self.fasta_path,
+                           write_genome_pack(self.fasta_path)]:
+            genome = Genome(input_path)
+            genome.get_chrs()
+            name = genome.share_memory()
+            self.assertEqual(genome.share_memory(), name)
+            self._assert_same_genome(genome)
+            self.assertIsInstance(genome.genome, GenomePack)
+            genome.release_shared_memory()
+            self.assertIsNone(genome.shared_memory_name)
+            self._assert_same_genome(genome)
+
+    def test_share_memory_pickle(self):
+        genome = Genome(self.fasta_path)
+        genome.share_memory()
+        genome.get_chrs()
+        worker_genome = pickle.loads(pickle.dumps(genome))
+        self.assertFalse(worker_genome.initialized)
+        self.assertEqual(worker_genome.shared_memory_name,
+                         genome.shared_memory_name)
+        self._assert_same_genome(worker_genome)
+        worker_genome.release_shared_memory()
+        genome.release_shared_memory()
+
+
+if __name__ == "__main__":
+    unittest.main()
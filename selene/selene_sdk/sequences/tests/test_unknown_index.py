@@ -0,0 +1,163 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from selene_sdk.sequences import Genome
+from selene_sdk.sequences.genome_pack import write_genome_pack
+from selene_sdk.sequences.unknown_index import UNKNOWN_INDEX_EXTENSION
+from selene_sdk.sequences.unknown_index import UnknownBaseIndex
+
+
+class TestUnknownBaseIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fasta_path = os.path.join(self.tmp_dir, "random.fasta")
+        rng = np.random.RandomState(7)
+        self.sequences = {}
+        with open(self.fasta_path, 'w') as file_handle:
+            for chrom, length in [("chr1", 300), ("chr2", 57), ("chrM", 20)]:
+                chars = np.array(list("ACGTacgtNnRY"))
+                weights = [0.2, 0.2, 0.2, 0.2, 0.02, 0.02, 0.02, 0.02,
+                           0.06, 0.02, 0.02, 0.02]
+                if chrom == "chrM":
+                    weights = [0.25, 0.25, 0.25, 0.25] + [0.] * 8
+                sequence = "".join(rng.choice(chars, size=length, p=weights))
+                self.sequences[chrom] = sequence
+                file_handle.write(">{0}\n".format(chrom))
+                for i in range(0, length, 60):
+                    file_handle.write(sequence[i:i + 60] + "\n")
+        self.genome = Genome(self.fasta_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _expected_count(self, chrom, start, end):
+        sequence = self.sequences[chrom][max(start, 0):max(end, 0)]
+        return len(re.sub("[ACGT]", "", sequence.upper()))
+
+    def test_count_unknown(self):
+        for chrom, sequence in self.sequences.items():
+            for start in range(-3, len(sequence) + 3, 4):
+                for end in [start, start + 1, start + 17, len(sequence) + 5]:
+                    self.assertEqual(
+                        self.genome.count_unknown(chrom, start, end),
+                        self._expected_count(chrom, start, end))
+
+    def test_count_unknown_unknown_chrom(self):
+        self.assertEqual(self.genome.count_unknown("chr9", 0, 10), 0)
+
+    def test_count_unknown_batch(self):
+        rng = np.random.RandomState(3)
+        chroms = rng.choice(["chr1", "chr2", "chrM"], size=200)
+        starts = rng.randint(0, 300, size=200)
+        ends = starts + rng.randint(0, 40, size=200)
+        expected = [self._expected_count(c, s, e)
+                    for c, s, e in zip(chroms, starts, ends)]
+        self.assertListEqual(
+            self.genome.count_unknown_batch(chroms, starts, ends).tolist(),
+            expected)
+
+    def test_cache_file(self):
+        self.genome.count_unknown("chr1", 0, 10)
+        cache_path = self.fasta_path + UNKNOWN_INDEX_EXTENSION
+        self.assertTrue(os.path.exists(cache_path))
+        index = UnknownBaseIndex.load(cache_path)
+        self.assertEqual(index.count("chr1", 0, 300),
+                         self._expected_count("chr1", 0, 300))
+
+    def test_genome_pack(self):
+        pack_genome = Genome(write_genome_pack(self.fasta_path))
+        chroms = ["chr1", "chr2", "chrM", "chr1"]
+        starts = [0, 10, 0, 250]
+        ends = [300, 50, 20, 400]
+        np.testing.assert_array_equal(
+            pack_genome.count_unknown_batch(chroms, starts, ends),
+            self.genome.count_unknown_batch(chroms, starts, ends))
+
+
+class TestValidWindowStarts(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fasta_path = os.path.join(self.tmp_dir, "runs.fasta")
+        self.bed_path = os.path.join(self.tmp_dir, "blacklist.bed")
+        rng = np.random.RandomState(11)
+        self.sequences = {}
+        with open(self.fasta_path, 'w') as fasta, \
+                open(self.bed_path, 'w') as bed:
+            for chrom, length in [("chr1", 400), ("chr2", 90), ("chr3", 8)]:
+                sequence = rng.choice(list("ACGT"), size=length)
+                # runs of unknown bases of various lengths, some adjacent
+                for _ in range(length // 30):
+                    start = rng.randint(0, length)
+                    sequence[start:start + rng.randint(1, 25)] = "N"
+                sequence[rng.rand(length) < 0.02] = "R"
+                self.sequences[chrom] = "".join(sequence)
+                fasta.write(">{0}\n{1}\n".format(
+                    chrom, self.sequences[chrom]))
+                # overlapping and adjacent blacklisted intervals
+                for _ in range(length // 100):
+                    start = rng.randint(0, length)
+                    end = start + rng.randint(1, 20)
+                    bed.write("{0}\t{1}\t{2}\n".format(chrom, start, end))
+                    bed.write("{0}\t{1}\t{2}\n".format(
+                        chrom, end - rng.randint(0, 3),
+                        end + rng.randint(1, 5)))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _expected_starts(self, chrom, window_length, max_unknown_bases,
+                         blacklist):
+        sequence = self.sequences[chrom]
+        expected = []
+        for start in range(len(sequence) - window_length + 1):
+            end = start + window_length
+            if blacklist and any(s < end and e > start
+                                 for s, e in self._blacklist(chrom)):
+                continue
+            n_unknown = len(re.sub("[ACGT]", "", sequence[start:end]))
+            if max_unknown_bases is not None and \
+                    n_unknown > max_unknown_bases:
+                continue
+            expected.append(start)
+        return expected
+
+    def _blacklist(self, chrom):
+        with open(self.bed_path) as file_handle:
+            rows = [line.split("\t") for line in file_handle]
+        return [(int(r[1]), int(r[2])) for r in rows if r[0] == chrom]
+
+    def test_brute_force(self):
+        pack_path = write_genome_pack(self.fasta_path)
+        genomes = [
+            (Genome(self.fasta_path), False),
+            (Genome(self.fasta_path, blacklist_regions=self.bed_path), True),
+            (Genome(pack_path, blacklist_regions=self.bed_path), True)]
+        for genome, blacklist in genomes:
+            for chrom in self.sequences:
+                for window_length in [1, 7, 30, 100]:
+                    for max_unknown_bases in [None, 0, 1, 5, 29]:
+                        starts, ends = genome.get_valid_window_starts(
+                            chrom, window_length,
+                            max_unknown_bases=max_unknown_bases)
+                        # sorted, disjoint and non-empty
+                        self.assertTrue(np.all(starts < ends))
+                        self.assertTrue(np.all(ends[:-1] < starts[1:]))
+                        observed = [x for s, e in zip(starts, ends)
+                                    for x in range(s, e)]
+                        self.assertEqual(
+                            observed, self._expected_starts(
+                                chrom, window_length, max_unknown_bases,
+                                blacklist),
+                            msg=(chrom, window_length, max_unknown_bases,
+                                 blacklist))
+
+
+if __name__ == "__main__":
+    unittest.main()
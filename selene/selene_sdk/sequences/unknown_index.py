@@ -0,0 +1,264 @@
+"""
+This module provides the `UnknownBaseIndex` class, which counts the
+unknown bases (anything other than `A`, `C`, `G` or `T`, in either
+case) in a genomic window without reading the sequence. For each
+chromosome it stores the sorted runs of unknown bases together with
+the cumulative number of unknown bases before each run, so a count is
+the difference of two prefix sums found by binary search.
+
+`load_unknown_index` caches the index of a FASTA file next to it, in a
+file ending with `UNKNOWN_INDEX_EXTENSION`.
+
+"""
+import logging
+import os
+
+import numpy as np
+import pyfaidx
+
+from .genome_pack import _BASE_CODES
+from .genome_pack import _UNK_CODE
+from .genome_pack import _WRITE_BLOCK_SIZE
+from .genome_pack import _append_runs
+from .genome_pack import _mask_to_runs
+
+logger = logging.getLogger(__name__)
+
+
+UNKNOWN_INDEX_EXTENSION = ".unk.npz"
+"""
+The extension appended to a FASTA file path to name its cached
+`UnknownBaseIndex`.
+"""
+
+
+class UnknownBaseIndex(object):
+    """
+    Counts the unknown bases in genomic windows.
+
+    Parameters
+    ----------
+    runs : dict
+        A dictionary mapping chromosome names to :math:`R \\times 2`
+        integer arrays of the sorted, disjoint, 0-based half-open runs
+        of unknown bases in that chromosome.
+
+    """
+
+    def __init__(self, runs):
+        """
+        Constructs a new `UnknownBaseIndex` object.
+        """
+        self._starts = {}
+        self._ends = {}
+        self._counts_before = {}
+        for chrom, chrom_runs in runs.items():
+            chrom_runs = np.asarray(chrom_runs, dtype=np.int64).reshape(-1, 2)
+            self._starts[chrom] = np.ascontiguousarray(chrom_runs[:, 0])
+            self._ends[chrom] = np.ascontiguousarray(chrom_runs[:, 1])
+            self._counts_before[chrom] = np.concatenate(
+                [[0], np.cumsum(chrom_runs[:, 1] - chrom_runs[:, 0])])
+
+    @classmethod
+    def from_fasta(cls, input_path):
+        """
+        Builds the index of an indexed FASTA file.
+
+        Parameters
+        ----------
+        input_path : str
+            Path to an indexed FASTA file, that is, a `*.fasta` file
+            with a corresponding `*.fai` file in the same directory.
+
+        Returns
+        -------
+        UnknownBaseIndex
+            The index of the unknown bases in the file.
+
+        """
+        fasta = pyfaidx.Fasta(input_path)
+        runs = {}
+        for chrom in fasta.keys():
+            chrom_len = len(fasta[chrom])
+            chrom_runs = []
+            for block_start in range(0, chrom_len, _WRITE_BLOCK_SIZE):
+                block_end = min(block_start + _WRITE_BLOCK_SIZE, chrom_len)
+                block = np.frombuffer(
+                    fasta[chrom][block_start:block_end].seq.encode("ascii"),
+                    dtype=np.uint8)
+                _append_runs(chrom_runs, _mask_to_runs(
+                    _BASE_CODES[block] == _UNK_CODE, block_start))
+            runs[chrom] = chrom_runs
+        fasta.close()
+        return cls(runs)
+
+    @classmethod
+    def load(cls, input_path):
+        """
+        Loads an index saved by `UnknownBaseIndex.save`.
+
+        Parameters
+        ----------
+        input_path : str
+            Path to the saved index.
+
+        Returns
+        -------
+        UnknownBaseIndex
+            The loaded index.
+
+        """
+        with np.load(input_path) as data:
+            offsets = data["offsets"]
+            runs = data["runs"]
+            return cls({chrom: runs[offsets[i]:offsets[i + 1]]
+                        for i, chrom in enumerate(data["chroms"].tolist())})
+
+    def save(self, output_path):
+        """
+        Saves the index to a `.npz` file.
+
+        Parameters
+        ----------
+        output_path : str
+            The path to save the index to.
+
+        """
+        chroms = list(self._starts.keys())
+        lengths = [len(self._starts[chrom]) for chrom in chroms]
+        runs = np.zeros((sum(lengths), 2), dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        for i, chrom in enumerate(chroms):
+            runs[offsets[i]:offsets[i + 1], 0] = self._starts[chrom]
+            runs[offsets[i]:offsets[i + 1], 1] = self._ends[chrom]
+        with open(output_path, "wb") as file_handle:
+            np.savez(file_handle, chroms=np.array(chroms, dtype=str),
+                     offsets=offsets, runs=runs)
+
+    def get_runs(self, chrom):
+        """
+        Gets the runs of unknown bases of a chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+
+        Returns
+        -------
+        starts, ends : tuple(numpy.ndarray, numpy.ndarray)
+            The sorted starts and ends of the 0-based half-open runs,
+            which are empty for chromosomes that are not in the index.
+
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        return self._starts.get(chrom, empty), self._ends.get(chrom, empty)
+
+    def _count_before(self, chrom, positions):
+        """
+        Counts the unknown bases of `chrom` before each of `positions`.
+        """
+        starts = self._starts[chrom]
+        ends = self._ends[chrom]
+        if len(starts) == 0:
+            return np.zeros(len(positions), dtype=np.int64)
+        index = np.searchsorted(starts, positions, side="right")
+        # `index - 1` is the last run starting at or before the position,
+        # which is counted in full by the prefix sum up to `index`
+        past = np.maximum(ends[np.maximum(index - 1, 0)] - positions, 0)
+        return self._counts_before[chrom][index] - np.where(
+            index > 0, past, 0)
+
+    def count(self, chrom, start, end):
+        """
+        Counts the unknown bases in a region.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        start : int
+            The 0-based start coordinate of the region.
+        end : int
+            One past the last coordinate of the region.
+
+        Returns
+        -------
+        int
+            The number of unknown bases in the region. Positions outside
+            the chromosome, and chromosomes that are not in the index,
+            have no unknown bases.
+
+        """
+        if chrom not in self._starts or end <= start:
+            return 0
+        counts = self._count_before(
+            chrom, np.array([start, end], dtype=np.int64))
+        return int(counts[1] - counts[0])
+
+    def count_batch(self, chroms, starts, ends):
+        """
+        Counts the unknown bases in each of a batch of regions.
+
+        Parameters
+        ----------
+        chroms : numpy.ndarray
+            The chromosome of each region.
+        starts : numpy.ndarray, dtype=numpy.int64
+            The 0-based start coordinate of each region.
+        ends : numpy.ndarray, dtype=numpy.int64
+            One past the last coordinate of each region.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=numpy.int64
+            The number of unknown bases in each region.
+
+        """
+        chroms = np.asarray(chroms)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.maximum(np.asarray(ends, dtype=np.int64), starts)
+        counts = np.zeros(len(chroms), dtype=np.int64)
+        names, inverse = np.unique(chroms, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for name_index, name in enumerate(names):
+            if name not in self._starts:
+                continue
+            rows = np.nonzero(inverse == name_index)[0]
+            counts[rows] = (self._count_before(name, ends[rows]) -
+                            self._count_before(name, starts[rows]))
+        return counts
+
+
+def load_unknown_index(input_path):
+    """
+    Loads the `UnknownBaseIndex` of a FASTA file from its cache file,
+    building the index and writing the cache file if it does not exist
+    or is older than the FASTA file.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to an indexed FASTA file.
+
+    Returns
+    -------
+    UnknownBaseIndex
+        The index of the unknown bases in the file.
+
+    """
+    cache_path = input_path + UNKNOWN_INDEX_EXTENSION
+    if (os.path.exists(cache_path) and
+            os.path.getmtime(cache_path) >= os.path.getmtime(input_path)):
+        return UnknownBaseIndex.load(cache_path)
+    index = UnknownBaseIndex.from_fasta(input_path)
+    tmp_path = "{0}.{1}.tmp".format(cache_path, os.getpid())
+    try:
+        index.save(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError as error:
+        logger.warning("Could not cache the unknown base index of {0} "
+                       "({1}).".format(input_path, error))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return index
@@ -5,5 +5,6 @@ as a label or annotation on an input sequence.
 """
 from .target import Target
 from .genomic_features import GenomicFeatures
+from .interval_index import FeatureIntervalIndex
 
-__all__ = ["Target", "GenomicFeatures"]
+__all__ = ["Target", "GenomicFeatures", "FeatureIntervalIndex"]
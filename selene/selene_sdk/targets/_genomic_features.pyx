@@ -1,62 +1,174 @@
 # cython: language_level=3
+"""
+Builds the binned targets of `GenomicFeatures` from the feature
+intervals overlapping each query region. A feature is positive in a bin
+if one of its intervals contains the bin center, so each interval sets
+the contiguous range of bins whose centers it covers, without building
+a per-base matrix. The batch entry point builds the targets of the
+queries of a mini-batch in parallel threads.
+"""
 import numpy as np
 
 cimport cython
 cimport numpy as np
+from cython.parallel cimport prange
+
+ctypedef np.int64_t ITYPE_t
+ctypedef np.uint8_t BTYPE_t
+
+
+@cython.cdivision(True)
+cdef inline Py_ssize_t _floor_div(Py_ssize_t a, Py_ssize_t b) noexcept nogil:
+    # `b` is positive
+    if a >= 0:
+        return a // b
+    return -((-a + b - 1) // b)
 
-ctypedef np.int_t DTYPE_t
-ctypedef np.float32_t FDTYPE_t
 
 @cython.boundscheck(False)
-@cython.wraparound(False) 
-def _fast_get_feature_data(int start,
-                           int end,
-                           int bin_size,
-                           int step_size,
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _accumulate_bins(Py_ssize_t query_start,
+                           Py_ssize_t n_bins,
+                           Py_ssize_t bin_size,
+                           Py_ssize_t step_size,
+                           Py_ssize_t n_features,
+                           const ITYPE_t[:] feature_starts,
+                           const ITYPE_t[:] feature_ends,
+                           const ITYPE_t[:] feature_indices,
+                           Py_ssize_t row_start,
+                           Py_ssize_t row_end,
+                           BTYPE_t[:] targets) noexcept nogil:
+    cdef Py_ssize_t first_center = query_start + bin_size // 2
+    cdef Py_ssize_t row, bin_index, first_bin, last_bin
+    for row in range(row_start, row_end):
+        # bins whose center is in [feature_start, feature_end)
+        first_bin = -_floor_div(
+            first_center - feature_starts[row], step_size)
+        last_bin = _floor_div(
+            feature_ends[row] - 1 - first_center, step_size)
+        if first_bin < 0:
+            first_bin = 0
+        if last_bin > n_bins - 1:
+            last_bin = n_bins - 1
+        for bin_index in range(first_bin, last_bin + 1):
+            targets[bin_index * n_features + feature_indices[row]] = 1
+
+
+def _fast_get_feature_data(Py_ssize_t start,
+                           Py_ssize_t end,
+                           Py_ssize_t bin_size,
+                           Py_ssize_t step_size,
                            dict feature_index_dict,
                            rows):
-    cdef int n_features = len(feature_index_dict)
-    cdef int query_length = end - start
-    cdef int n_bins = query_length // step_size
-    cdef int feature_start, feature_end, index_start, index_end, index_feat
-    cdef np.ndarray[DTYPE_t, ndim=2] encoding = np.zeros(
-        (query_length, n_features), dtype=np.int)
-    
-    cdef np.ndarray[DTYPE_t, ndim=1] targets = np.zeros(
-        n_features * n_bins, dtype=np.int)
-    cdef np.ndarray[DTYPE_t, ndim=1] bin_targets = np.zeros(
-        n_features, dtype=np.int)
-
-    cdef list row
-    cdef list used_feature_indices
-    cdef set feature_indices = set()
+    """
+    Builds the targets of one region from the rows of a tabix query
+    covering its bin centers.
 
-    if rows is None:
-        return targets
+    Parameters
+    ----------
+    start : int
+        The 0-based start coordinate of the region.
+    end : int
+        One past the last coordinate of the region.
+    bin_size : int
+        The length of a bin.
+    step_size : int
+        The distance between the starts of consecutive bins.
+    feature_index_dict : dict
+        A dictionary mapping feature names (`str`) to indices (`int`).
+    rows : list(list(str)) or None
+        The `[chrom, start, end, feature, ...]` rows overlapping the
+        region.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=bool
+        The targets of the :math:`M` bins, laid out bin by bin with
+        `len(feature_index_dict)` features each.
 
+    """
+    cdef Py_ssize_t n_features = len(feature_index_dict)
+    cdef Py_ssize_t n_bins = int((end - start - bin_size) / step_size) + 1
+    targets = np.zeros(n_features * n_bins, dtype=np.uint8)
+    if rows is None:
+        return targets.view(bool)
+    starts, ends, features = [], [], []
     for row in rows:
-        feature_start = int(row[1])
-        feature_end = int(row[2])
-        index_start = max(0, feature_start - start)
-        index_end = min(feature_end - start, query_length)
-        #index_feat = feature_index_dict[row[3]]
-        #feature_indices.add(index_feat)
-        index_feats = [int(i) for i in row[3].split(';')]
-        feature_indices |= set(index_feats)
-        if index_start == index_end:
-            index_end += 1
-        encoding[index_start:index_end, index_feats] = 1
-    
-    used_feature_indices = sorted(list(feature_indices))
-    for ix, _ in enumerate(range(0, query_length, step_size)):
-        start = ix * bin_size
-        end = ix * bin_size + bin_size
-        bin_encoding = encoding[start:end, used_feature_indices]
-        bin_targets[used_feature_indices] = bin_encoding.any(axis=0).astype(
-            np.int) 
-        tgts_start = ix * n_features
-        tgts_end = tgts_start + n_features
-        targets[tgts_start:tgts_end] = bin_targets
-        bin_targets = np.zeros(n_features, dtype=np.int)
-    return targets
+        starts.append(int(row[1]))
+        ends.append(int(row[2]))
+        features.append(feature_index_dict[row[3]])
+    cdef ITYPE_t[:] starts_view = np.array(starts, dtype=np.int64)
+    cdef ITYPE_t[:] ends_view = np.array(ends, dtype=np.int64)
+    cdef ITYPE_t[:] features_view = np.array(features, dtype=np.int64)
+    cdef BTYPE_t[:] targets_view = targets
+    with nogil:
+        _accumulate_bins(start, n_bins, bin_size, step_size, n_features,
+                         starts_view, ends_view, features_view,
+                         0, starts_view.shape[0], targets_view)
+    return targets.view(bool)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _fast_get_feature_data_batch(const ITYPE_t[:] query_starts,
+                                 Py_ssize_t n_bins,
+                                 Py_ssize_t bin_size,
+                                 Py_ssize_t step_size,
+                                 Py_ssize_t n_features,
+                                 const ITYPE_t[:] row_offsets,
+                                 const ITYPE_t[:] feature_starts,
+                                 const ITYPE_t[:] feature_ends,
+                                 const ITYPE_t[:] feature_indices,
+                                 int n_threads=0):
+    """
+    Builds the targets of a batch of equal-length regions in parallel.
+
+    Parameters
+    ----------
+    query_starts : numpy.ndarray, dtype=numpy.int64
+        The 0-based start coordinate of each of the :math:`B` regions.
+    n_bins : int
+        The number of bins of each region.
+    bin_size : int
+        The length of a bin.
+    step_size : int
+        The distance between the starts of consecutive bins.
+    n_features : int
+        The number of features.
+    row_offsets : numpy.ndarray, dtype=numpy.int64
+        The :math:`B + 1` offsets of the rows of each region in the
+        row arrays: the rows of region `i` are `row_offsets[i]` to
+        `row_offsets[i + 1]`.
+    feature_starts, feature_ends, feature_indices : numpy.ndarray
+        The start, end and feature index of each interval row, as
+        `numpy.int64`.
+    n_threads : int, optional
+        Default is 0. The number of threads, or 0 for the OpenMP default.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=bool
+        The :math:`B \\times (N \\cdot M)` targets.
 
+    """
+    cdef Py_ssize_t n_queries = query_starts.shape[0]
+    targets = np.zeros((n_queries, n_features * n_bins), dtype=np.uint8)
+    cdef BTYPE_t[:, :] targets_view = targets
+    cdef Py_ssize_t query
+    if n_threads <= 0:
+        for query in prange(n_queries, nogil=True, schedule="static"):
+            _accumulate_bins(
+                query_starts[query], n_bins, bin_size, step_size,
+                n_features, feature_starts, feature_ends, feature_indices,
+                row_offsets[query], row_offsets[query + 1],
+                targets_view[query])
+    else:
+        for query in prange(n_queries, nogil=True, schedule="static",
+                            num_threads=n_threads):
+            _accumulate_bins(
+                query_starts[query], n_bins, bin_size, step_size,
+                n_features, feature_starts, feature_ends, feature_indices,
+                row_offsets[query], row_offsets[query + 1],
+                targets_view[query])
+    return targets.view(bool)
@@ -15,9 +15,19 @@ import types
 
 import tabix
 import numpy as np
+from scipy import sparse
 
+from .interval_index import load_feature_index
+from .label_track import load_label_track
 from .target import Target
-#from ._genomic_features import _fast_get_feature_data
+try:
+    from ._genomic_features import _fast_get_feature_data
+    from ._genomic_features import _fast_get_feature_data_batch
+except ImportError:
+    # the extension is not built (e.g. in a source checkout), so the
+    # targets are built with one query per bin
+    _fast_get_feature_data = None
+    _fast_get_feature_data_batch = None
 
 
 def _any_positive_rows(rows, start, end, thresholds):
@@ -103,42 +113,45 @@ def _is_positive_row(start, end,
 def _get_feature_data(start, end, bin_size, step_size,
                       feature_index_dict, rows):
     """
-    Generates a target vector for the given query region.
+    Generates a target vector for the given query region from the
+    feature annotations overlapping its bin centers. A feature is
+    positive in a bin if one of its annotations contains the bin center.
 
     Parameters
     ----------
-     chrom : str
-        The name of the region (e.g. 'chr1', 'chr2', ..., 'chrX',
-        'chrY') to query inside of.
     start : int
         The 0-based start coordinate of the region to query.
     end : int
         One past the last coordinate of the region to query.
-    thresholds : np.ndarray, dtype=numpy.float32
-        An array of feature thresholds, where the value in position
-        `i` corresponds to the threshold for the feature name that is
-        mapped to index `i` by `feature_index_dict`.
+    bin_size : int
+        The length of a bin.
+    step_size : int
+        The distance between the starts of consecutive bins.
     feature_index_dict : dict
         A dictionary mapping feature names (`str`) to indices (`int`),
         where the index is the position of the feature in `features`.
-    get_feature_rows : types.FunctionType
-        A function that takes coordinates and returns rows
-        (`list(tuple(int, int, str))`).
+    rows : list(list(str)) or None
+        The `[chrom, start, end, feature, ...]` rows of the annotations
+        overlapping the region, e.g. from a tabix query.
 
     Returns
     -------
-    numpy.ndarray, dtype=int
-        A target vector where the `i`th position is equal to one if the
-        `i`th feature is positive, and zero otherwise.
+    numpy.ndarray, dtype=bool
+        A target vector of `len(feature_index_dict)` features per bin,
+        where position `i * n_features + j` is `True` if the `j`th
+        feature is positive in bin `i`.
+
+    Raises
+    ------
+    KeyError
+        If a row is annotated with a feature not in
+        `feature_index_dict`.
 
     """
-    raise NotImplementedError
-    """
-    _fast_get_feature_data(
+    return _fast_get_feature_data(
         start, end,
         bin_size, step_size,
         feature_index_dict, rows)
-    """
 
 
 def _define_feature_thresholds(feature_thresholds, features):
@@ -235,6 +248,24 @@ class GenomicFeatures(Target):
         * `types.FunctionType` - define a function that takes as \
                                  input the feature name and returns\
                                  the feature's threshold.
+    in_memory : bool, optional
+        Default is `False`. Whether to load the annotations into an
+        in-memory `selene_sdk.targets.interval_index.FeatureIntervalIndex`
+        once per process instead of querying the tabix index for every
+        bin. The targets are the same, except that annotations of
+        features not in `features` are ignored rather than raising a
+        `KeyError`.
+    use_label_track : bool or None, optional
+        Default is `None`. Whether `get_feature_data` reads the labels of
+        the bin centers from the precompiled
+        `selene_sdk.targets.label_track.LabelTrack` of `input_path`,
+        which is built and saved next to it on first use. If `None`, the
+        track is used when `bin_size` is 1. Annotations of features not
+        in `features` are ignored, as with `in_memory`.
+    n_threads : int, optional
+        Default is 0. The number of threads `get_feature_data_batch`
+        builds the targets of a batch with, or 0 for the OpenMP default.
+        Set it to 1 when each data loading worker builds its own batches.
 
     Attributes
     ----------
@@ -262,12 +293,20 @@ class GenomicFeatures(Target):
 
     """
 
-    def __init__(self, input_path, features, bin_size, step_size, feature_thresholds=None):
+    def __init__(self, input_path, features, bin_size, step_size,
+                 feature_thresholds=None, in_memory=False,
+                 use_label_track=None, n_threads=0):
         """
         Constructs a new `GenomicFeatures` object.
         """
         self.input_path = input_path
+        self.in_memory = in_memory
+        self.n_threads = n_threads
+        if use_label_track is None:
+            use_label_track = bin_size == 1
+        self.use_label_track = use_label_track
         self.n_features = len(features)
+        self._features = list(features)
 
         self.feature_index_dict = dict(
             [(feat, index) for index, feat in enumerate(features)])
@@ -283,17 +322,65 @@ class GenomicFeatures(Target):
         else:
             self.feature_thresholds, self._feature_thresholds_vec = \
                 _define_feature_thresholds(feature_thresholds, features)
+        # the float32 `_feature_thresholds_vec` can round differently
+        # from the thresholds `_is_positive_row` compares against
+        self._feature_thresholds_arr = None
+        if self.feature_thresholds is not None:
+            self._feature_thresholds_arr = np.array(
+                [self.feature_thresholds[f] for f in features],
+                dtype=np.float64)
         self.initialized = False
 
     def init(func):
         #delay initlization to allow  multiprocessing
         def dfunc(self, *args, **kwargs):
             if not self.initialized:
-                self.data = tabix.open(self.input_path)
+                if self.in_memory:
+                    self._index = load_feature_index(
+                        self.input_path, self._features)
+                else:
+                    self._index = None
+                    self.data = tabix.open(self.input_path)
+                self._label_track = None
+                if self.use_label_track:
+                    self._init_label_track()
                 self.initialized = True
             return func(self, *args, **kwargs)
         return dfunc
 
+    def _init_label_track(self):
+        """
+        Loads the label track and maps its features to `features`.
+        """
+        self._label_track = load_label_track(self.input_path)
+        self._label_columns = None
+        if self._label_track.features != self._features:
+            track_index = dict(
+                (feat, index)
+                for index, feat in enumerate(self._label_track.features))
+            # features missing from the track read an all-False column
+            self._label_columns = np.array(
+                [track_index.get(feat, len(track_index))
+                 for feat in self._features])
+
+    def _get_bin_centers(self, start, end):
+        """
+        Gets the center of each bin of the region `[start, end)`.
+        """
+        n_bins = int((end - start - self.bin_size) / self.step_size) + 1
+        return (start + np.arange(n_bins) * self.step_size +
+                self.bin_size / 2).astype(np.int64)
+
+    def _select_label_columns(self, labels):
+        """
+        Maps the feature columns of label track lookups to `features`.
+        """
+        if self._label_columns is None:
+            return labels
+        missing = np.zeros(labels.shape[:-1] + (1,), dtype=bool)
+        return np.concatenate([labels, missing], axis=-1)[
+            ..., self._label_columns]
+
     def _query_tabix(self, chrom, start, end):
         """
         Queries a tabix-indexed `*.bed` file for features falling into
@@ -348,6 +435,17 @@ class GenomicFeatures(Target):
             assume the error was the result of no features being present
             in the queried region and return `False`.
         """
+        if self._index is not None:
+            _, feature_starts, feature_ends, features = self._index.query(
+                chrom, start, end)
+            if self._feature_thresholds_arr is None:
+                return len(features) > 0
+            min_overlap_needed = np.maximum(
+                ((end - start) *
+                 self._feature_thresholds_arr[features] - 1).astype(int), 0)
+            overlaps = (np.minimum(feature_ends, end) -
+                        np.maximum(feature_starts, start))
+            return bool(np.any(overlaps > min_overlap_needed))
         rows = self._query_tabix(chrom, start, end)
         return _any_positive_rows(rows, start, end, self.feature_thresholds)
 
@@ -382,8 +480,26 @@ class GenomicFeatures(Target):
         """
         # TODO: error handling for feature threshold is None
         # and multiple bins
+        if self._label_track is not None:
+            labels = self._label_track.get_labels(
+                chrom, self._get_bin_centers(start, end))
+            return self._select_label_columns(labels).reshape(-1)
         n_bins = int((end - start - self.bin_size) / self.step_size) + 1
         targets = np.zeros(self.n_features * n_bins, dtype=bool)
+        if self._index is not None:
+            centers = self._get_bin_centers(start, end)
+            bins, _, _, features = self._index.query(
+                chrom, centers, centers + 1)
+            targets[bins * self.n_features + features] = True
+            return targets
+        if _fast_get_feature_data is not None:
+            # one query spanning the bin centers instead of one per bin
+            centers = self._get_bin_centers(start, end)
+            rows = self._query_tabix(
+                chrom, int(centers[0]), int(centers[-1]) + 1)
+            return _get_feature_data(
+                start, end, self.bin_size, self.step_size,
+                self.feature_index_dict, rows)
         for i in range(n_bins):
             bstart = start + i * self.step_size
             center = int(bstart + self.bin_size / 2)
@@ -396,3 +512,148 @@ class GenomicFeatures(Target):
                 fidx = self.feature_index_dict[r[3]]
                 targets[tgts_start + fidx] = True
         return targets
+
+    @init
+    def get_feature_data_batch(self, chroms, starts, ends, as_sparse=False):
+        """
+        Gets the targets of a batch of equal-length regions. This is
+        the batch form of `get_feature_data`: the bin centers of all the
+        regions on a chromosome are looked up together, with the label
+        track or the in-memory index if they are enabled.
+
+        Parameters
+        ----------
+        chroms : list(str) or numpy.ndarray
+            The name of the region of each of the :math:`B` queries
+            (e.g. '1', '2', ..., 'X', 'Y').
+        starts : list(int) or numpy.ndarray
+            The 0-based first position of each region.
+        ends : list(int) or numpy.ndarray
+            One past the 0-based last position of each region. Every
+            region must have the same length.
+        as_sparse : bool, optional
+            Default is `False`. Whether to return the targets as a
+            `scipy.sparse.csr_matrix`.
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse.csr_matrix
+            The :math:`B \\times (N \\cdot M)` boolean targets, where
+            :math:`N =` `self.n_features` and :math:`M` is the number of
+            bins, laid out as in `get_feature_data`.
+
+        Raises
+        ------
+        ValueError
+            If the regions are not all the same length.
+
+        """
+        chroms = np.asarray(chroms)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        n_queries = len(starts)
+        length = int(ends[0] - starts[0]) if n_queries else self.bin_size
+        if np.any(ends - starts != length):
+            raise ValueError(
+                "All regions passed to `get_feature_data_batch` must have "
+                "the same length.")
+        n_bins = int((length - self.bin_size) / self.step_size) + 1
+        n_targets = self.n_features * n_bins
+
+        names, inverse = np.unique(chroms, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        centers = (starts[:, None] + np.arange(n_bins) * self.step_size +
+                   self.bin_size / 2).astype(np.int64)
+        if self._label_track is not None:
+            targets = np.zeros((n_queries, n_bins, self.n_features),
+                               dtype=bool)
+            for name_index, name in enumerate(names):
+                rows = np.nonzero(inverse == name_index)[0]
+                targets[rows] = self._select_label_columns(
+                    self._label_track.get_labels(name, centers[rows]))
+            targets = targets.reshape(n_queries, n_targets)
+            return sparse.csr_matrix(targets) if as_sparse else targets
+
+        if _fast_get_feature_data_batch is not None:
+            targets = self._build_targets_batch(
+                names, inverse, starts, centers[:, 0], centers[:, -1] + 1,
+                n_bins)
+            return sparse.csr_matrix(targets) if as_sparse else targets
+
+        if self._index is None:
+            targets = np.zeros((n_queries, n_targets), dtype=bool)
+            for i in range(n_queries):
+                targets[i] = self.get_feature_data(
+                    chroms[i], int(starts[i]), int(ends[i]))
+            return sparse.csr_matrix(targets) if as_sparse else targets
+
+        target_rows = []
+        target_cols = []
+        for name_index, name in enumerate(names):
+            rows = np.nonzero(inverse == name_index)[0]
+            chrom_centers = centers[rows].reshape(-1)
+            query_index, _, _, features = self._index.query(
+                name, chrom_centers, chrom_centers + 1)
+            target_rows.append(rows[query_index // n_bins])
+            target_cols.append(
+                (query_index % n_bins) * self.n_features + features)
+        target_rows = np.concatenate(target_rows + [[]]).astype(np.int64)
+        target_cols = np.concatenate(target_cols + [[]]).astype(np.int64)
+        if as_sparse:
+            targets = sparse.csr_matrix(
+                (np.ones(len(target_rows), dtype=bool),
+                 (target_rows, target_cols)),
+                shape=(n_queries, n_targets))
+            # an annotation repeated in the file is a duplicate entry
+            targets.sum_duplicates()
+            return targets
+        targets = np.zeros((n_queries, n_targets), dtype=bool)
+        targets[target_rows, target_cols] = True
+        return targets
+
+    def _build_targets_batch(self, names, inverse, starts, span_starts,
+                             span_ends, n_bins):
+        """
+        Builds the targets of a batch of regions with
+        `_fast_get_feature_data_batch`, from the annotations overlapping
+        the span of the bin centers of each region.
+        """
+        query_rows = []
+        feature_starts = []
+        feature_ends = []
+        features = []
+        for name_index, name in enumerate(names):
+            rows = np.nonzero(inverse == name_index)[0]
+            if self._index is not None:
+                query_index, chrom_starts, chrom_ends, chrom_features = \
+                    self._index.query(name, span_starts[rows],
+                                      span_ends[rows])
+                query_rows.append(rows[query_index])
+                feature_starts.append(chrom_starts)
+                feature_ends.append(chrom_ends)
+                features.append(chrom_features)
+                continue
+            for row in rows:
+                tabix_rows = self._query_tabix(
+                    name, int(span_starts[row]), int(span_ends[row]))
+                if tabix_rows is None:
+                    continue
+                parsed = np.array(
+                    [[int(r[1]), int(r[2]), self.feature_index_dict[r[3]]]
+                     for r in tabix_rows], dtype=np.int64).reshape(-1, 3)
+                query_rows.append(np.full(len(parsed), row))
+                feature_starts.append(parsed[:, 0])
+                feature_ends.append(parsed[:, 1])
+                features.append(parsed[:, 2])
+        query_rows, feature_starts, feature_ends, features = [
+            np.concatenate(arrays + [[]]).astype(np.int64)
+            for arrays in [query_rows, feature_starts, feature_ends,
+                           features]]
+        order = np.argsort(query_rows, kind="mergesort")
+        row_offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(query_rows, minlength=len(starts)),
+                  out=row_offsets[1:])
+        return _fast_get_feature_data_batch(
+            starts, n_bins, self.bin_size, self.step_size, self.n_features,
+            row_offsets, feature_starts[order], feature_ends[order], features[order],
+            self.n_threads)
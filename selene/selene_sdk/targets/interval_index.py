@@ -0,0 +1,241 @@
+"""
+This module provides the `FeatureIntervalIndex` class, an in-memory
+index of the feature annotations of a BED file used by
+`GenomicFeatures` in place of tabix queries.
+
+The intervals of each chromosome are stored as sorted NumPy arrays of
+starts, ends and feature indices, decomposed into the components of an
+augmented interval list (Feng, Ratan and Sheffield, 2019). Within a
+component, the running maximum of the interval ends is non-decreasing,
+so the intervals that can overlap a query are a contiguous range found
+by two binary searches. Intervals that contain many of the intervals
+after them would make those ranges long, so they are moved to a later
+component.
+
+"""
+from functools import lru_cache
+import os
+
+import numpy as np
+import pandas as pd
+
+
+_MAX_COMPONENTS = 10
+_COVERAGE_LOOKAHEAD = 20
+_MIN_COVERAGE = 10
+
+
+def _decompose(starts, ends):
+    """
+    Splits intervals sorted by start into components, as in an
+    augmented interval list. An interval is moved to a later component
+    if it contains at least `_MIN_COVERAGE` of the next
+    `_COVERAGE_LOOKAHEAD` intervals.
+
+    Returns
+    -------
+    list(numpy.ndarray)
+        The indices of the intervals in each component, each sorted.
+
+    """
+    components = []
+    remaining = np.arange(len(starts))
+    while len(remaining) > 0:
+        if (len(components) == _MAX_COMPONENTS - 1 or
+                len(remaining) <= _COVERAGE_LOOKAHEAD):
+            components.append(remaining)
+            break
+        comp_ends = ends[remaining]
+        covered = np.zeros(len(remaining), dtype=np.int64)
+        for offset in range(1, _COVERAGE_LOOKAHEAD + 1):
+            covered[:-offset] += comp_ends[offset:] <= comp_ends[:-offset]
+        is_long = covered >= _MIN_COVERAGE
+        if not np.any(is_long):
+            components.append(remaining)
+            break
+        components.append(remaining[~is_long])
+        remaining = remaining[is_long]
+    return components
+
+
+class _ChromIntervals(object):
+    """
+    The augmented interval list of the intervals of one chromosome.
+    """
+
+    def __init__(self, starts, ends, features):
+        order = np.lexsort((ends, starts))
+        starts, ends, features = starts[order], ends[order], features[order]
+        self.components = []
+        for indices in _decompose(starts, ends):
+            comp_ends = ends[indices]
+            self.components.append((
+                starts[indices], comp_ends,
+                np.maximum.accumulate(comp_ends), features[indices]))
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for component in self.components
+                   for array in component)
+
+    def query(self, query_starts, query_ends):
+        """
+        Finds the intervals overlapping each query.
+
+        Returns
+        -------
+        query_index, starts, ends, features : tuple(numpy.ndarray, ...)
+            One entry per overlap: the index of the query and the start,
+            end and feature index of the interval.
+
+        """
+        results = []
+        for starts, ends, max_ends, features in self.components:
+            # intervals starting before the query end, after the last one
+            # that (like all before it) ends at or before the query start
+            lo = np.searchsorted(max_ends, query_starts, side="right")
+            hi = np.searchsorted(starts, query_ends, side="left")
+            n_candidates = np.maximum(hi - lo, 0)
+            total = int(n_candidates.sum())
+            if total == 0:
+                continue
+            query_index = np.repeat(
+                np.arange(len(query_starts)), n_candidates)
+            offsets = np.cumsum(n_candidates) - n_candidates
+            candidates = (np.arange(total) - np.repeat(offsets, n_candidates)
+                          + np.repeat(lo, n_candidates))
+            overlaps = ends[candidates] > query_starts[query_index]
+            candidates = candidates[overlaps]
+            results.append((query_index[overlaps], starts[candidates],
+                            ends[candidates], features[candidates]))
+        if not results:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+class FeatureIntervalIndex(object):
+    """
+    An in-memory index of feature annotations, which returns the indices
+    of the features overlapping a region without parsing any rows.
+
+    Parameters
+    ----------
+    intervals : dict
+        A dictionary mapping chromosome names to a tuple of integer
+        arrays `(starts, ends, features)` of 0-based, half-open
+        intervals and the index of the feature each is annotated with.
+
+    """
+
+    def __init__(self, intervals):
+        """
+        Constructs a new `FeatureIntervalIndex` object.
+        """
+        self._chroms = {}
+        for chrom, (starts, ends, features) in intervals.items():
+            self._chroms[chrom] = _ChromIntervals(
+                np.asarray(starts, dtype=np.int64),
+                np.asarray(ends, dtype=np.int64),
+                np.asarray(features, dtype=np.int64))
+
+    @classmethod
+    def from_bed(cls, input_path, feature_index_dict):
+        """
+        Loads the annotations in a BED file, which may be
+        gzip-compressed.
+
+        Parameters
+        ----------
+        input_path : str
+            Path to a file with the columns `[chrom, start, end, feature]`
+            and no header. Any additional columns are ignored.
+        feature_index_dict : dict
+            A dictionary mapping feature names (`str`) to indices
+            (`int`). Rows of other features are skipped.
+
+        Returns
+        -------
+        FeatureIntervalIndex
+            The index of the annotations in the file.
+
+        """
+        rows = pd.read_csv(
+            input_path, sep='\t', header=None, usecols=[0, 1, 2, 3],
+            names=["chrom", "start", "end", "feature"],
+            dtype={"chrom": str, "start": np.int64, "end": np.int64,
+                   "feature": str},
+            comment='#')
+        features = rows["feature"].map(feature_index_dict)
+        rows = rows[features.notna()]
+        features = features[features.notna()].astype(np.int64)
+        intervals = {}
+        for chrom, chrom_rows in rows.groupby("chrom", sort=False):
+            intervals[chrom] = (chrom_rows["start"].values,
+                                chrom_rows["end"].values,
+                                features[chrom_rows.index].values)
+        return cls(intervals)
+
+    @property
+    def nbytes(self):
+        """
+        int : The number of bytes used by the index arrays.
+        """
+        return sum(chrom.nbytes for chrom in self._chroms.values())
+
+    def query(self, chrom, starts, ends):
+        """
+        Finds the annotations overlapping each of a batch of regions on
+        one chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        starts : numpy.ndarray
+            The 0-based start coordinate of each region.
+        ends : numpy.ndarray
+            One past the last coordinate of each region.
+
+        Returns
+        -------
+        query_index, starts, ends, features : tuple(numpy.ndarray, ...)
+            One entry per overlapping annotation: the index of the region
+            it overlaps, and its start, end and feature index.
+
+        """
+        starts = np.asarray(starts, dtype=np.int64).reshape(-1)
+        ends = np.asarray(ends, dtype=np.int64).reshape(-1)
+        if chrom not in self._chroms:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        return self._chroms[chrom].query(starts, ends)
+
+
+@lru_cache(maxsize=None)
+def _load_feature_index(input_path, mtime, features):
+    return FeatureIntervalIndex.from_bed(
+        input_path, dict((feat, index) for index, feat in enumerate(features)))
+
+
+def load_feature_index(input_path, features):
+    """
+    Loads the `FeatureIntervalIndex` of a BED file. Each file is loaded
+    at most once per process for a given list of features.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the BED file.
+    features : list(str)
+        The features to index, in the order of their indices.
+
+    Returns
+    -------
+    FeatureIntervalIndex
+        The index of the annotations in the file.
+
+    """
+    return _load_feature_index(os.path.abspath(input_path),
+                               os.path.getmtime(input_path),
+                               tuple(features))
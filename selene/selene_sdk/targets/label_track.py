@@ -0,0 +1,326 @@
+"""
+This module provides the `LabelTrack` class, a precompiled store of the
+features annotated to each base of a genome, used by `GenomicFeatures`
+when every bin is a single base.
+
+The track is run-length encoded: each chromosome is split into the
+segments over which the set of overlapping features does not change,
+and each segment points to a row of a table of the distinct feature
+sets, bit-packed with one bit per feature. Looking up the labels of a
+position is a binary search over the segment starts followed by the
+read of one packed row.
+
+`load_label_track` saves the track of a BED file next to it, in a
+directory ending with `LABEL_TRACK_EXTENSION` whose arrays are loaded
+as memory maps, so processes reading the same track share its pages.
+
+"""
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+LABEL_TRACK_EXTENSION = ".labels"
+"""
+The extension appended to a BED file path to name the directory of its
+cached `LabelTrack`.
+"""
+
+_ARRAY_NAMES = ["segment_starts", "segment_labels", "label_sets",
+                "chrom_offsets"]
+
+
+def _merge_feature_intervals(rows):
+    """
+    Merges the overlapping or adjacent intervals of each feature on each
+    chromosome, so that a feature is toggled on at the start of each
+    merged interval and off at its end.
+    """
+    rows = rows.sort_values(["chrom", "feature", "start"], kind="mergesort")
+    chrom = rows["chrom"].values
+    feature = rows["feature"].values
+    starts = rows["start"].values
+    ends = rows["end"].values
+    group_start = np.ones(len(rows), dtype=bool)
+    group_start[1:] = (chrom[1:] != chrom[:-1]) | (feature[1:] != feature[:-1])
+    # running maximum of the ends within each (chrom, feature) group
+    group_id = np.cumsum(group_start) - 1
+    max_ends = pd.Series(ends).groupby(group_id).cummax().values
+    is_first = group_start.copy()
+    is_first[1:] |= starts[1:] > max_ends[:-1]
+    first = np.nonzero(is_first)[0]
+    last = np.append(first[1:], len(rows)) - 1
+    return chrom[first], feature[first], starts[first], max_ends[last]
+
+
+class LabelTrack(object):
+    """
+    The run-length encoded, bit-packed features annotated to each base
+    of a genome.
+
+    Parameters
+    ----------
+    chroms : list(str)
+        The chromosome names.
+    features : list(str)
+        The feature names, in the order of the bits of `label_sets`.
+    segment_starts : numpy.ndarray, dtype=numpy.int64
+        The start of each segment. The segments of each chromosome are
+        sorted and consecutive, and the first starts at 0.
+    segment_labels : numpy.ndarray, dtype=numpy.uint32
+        The row of `label_sets` of each segment.
+    label_sets : numpy.ndarray, dtype=numpy.uint8
+        The distinct feature sets, one bit-packed row each. The first
+        row is the empty set.
+    chrom_offsets : numpy.ndarray, dtype=numpy.int64
+        The index of the first segment of each chromosome, followed by
+        the total number of segments.
+
+    Attributes
+    ----------
+    chroms : list(str)
+        The chromosome names.
+    features : list(str)
+        The feature names.
+
+    """
+
+    def __init__(self, chroms, features, segment_starts, segment_labels,
+                 label_sets, chrom_offsets):
+        """
+        Constructs a new `LabelTrack` object.
+        """
+        self.chroms = list(chroms)
+        self.features = list(features)
+        self._segment_starts = segment_starts
+        self._segment_labels = segment_labels
+        self._label_sets = label_sets
+        self._chrom_offsets = chrom_offsets
+        # plain views of the (possibly memory-mapped) arrays of each
+        # chromosome, which avoid the `numpy.memmap` overhead per lookup
+        self._chrom_segments = {}
+        for index, chrom in enumerate(self.chroms):
+            first, last = chrom_offsets[index], chrom_offsets[index + 1]
+            self._chrom_segments[chrom] = (
+                segment_starts[first:last].view(np.ndarray),
+                segment_labels[first:last].view(np.ndarray))
+        self._packed_label_sets = label_sets.view(np.ndarray)
+
+    @classmethod
+    def from_bed(cls, input_path):
+        """
+        Builds the track of a BED file, which may be gzip-compressed.
+
+        Parameters
+        ----------
+        input_path : str
+            Path to a file with the columns `[chrom, start, end, feature]`
+            and no header. Any additional columns are ignored.
+
+        Returns
+        -------
+        LabelTrack
+            The track of the annotations in the file.
+
+        """
+        rows = pd.read_csv(
+            input_path, sep='\t', header=None, usecols=[0, 1, 2, 3],
+            names=["chrom", "start", "end", "feature"],
+            dtype={"chrom": str, "start": np.int64, "end": np.int64,
+                   "feature": str},
+            comment='#')
+        rows = rows[rows["end"] > rows["start"]]
+        features = sorted(rows["feature"].unique())
+        rows["feature"] = pd.Categorical(
+            rows["feature"], categories=features).codes.astype(np.int64)
+        chroms, feature_ids, starts, ends = _merge_feature_intervals(rows)
+
+        # a feature set is an integer whose big-endian bytes are its
+        # `numpy.packbits` row, so features are toggled with one XOR
+        n_bytes = (len(features) + 7) // 8
+        feature_bits = [1 << (8 * n_bytes - 1 - index)
+                        for index in range(len(features))]
+        label_set_ids = {0: 0}
+        chrom_names = sorted(set(chroms))
+        segment_starts = []
+        segment_labels = []
+        chrom_offsets = [0]
+        for chrom in chrom_names:
+            in_chrom = chroms == chrom
+            positions = np.concatenate([starts[in_chrom], ends[in_chrom]])
+            toggles = np.concatenate([feature_ids[in_chrom]] * 2)
+            order = np.argsort(positions, kind="mergesort")
+            positions, toggles = positions[order], toggles[order]
+            boundaries = np.unique(positions)
+            # every chromosome starts with an unlabeled segment
+            chrom_labels = [0]
+            label_set = 0
+            previous = positions[0]
+            for position, toggle in zip(positions.tolist(),
+                                        toggles.tolist()):
+                if position != previous:
+                    chrom_labels.append(label_set_ids.setdefault(
+                        label_set, len(label_set_ids)))
+                    previous = position
+                label_set ^= feature_bits[toggle]
+            chrom_labels.append(label_set_ids.setdefault(
+                label_set, len(label_set_ids)))
+            segment_starts.append(np.concatenate([[0], boundaries]))
+            segment_labels.append(np.array(chrom_labels, dtype=np.uint32))
+            chrom_offsets.append(chrom_offsets[-1] + len(boundaries) + 1)
+        label_sets = np.frombuffer(
+            b"".join(label_set.to_bytes(n_bytes, "big")
+                     for label_set in label_set_ids),
+            dtype=np.uint8).reshape(len(label_set_ids), n_bytes)
+        return cls(chrom_names, features,
+                   np.concatenate(segment_starts + [[]]).astype(np.int64),
+                   np.concatenate(segment_labels + [[]]).astype(np.uint32),
+                   label_sets,
+                   np.array(chrom_offsets, dtype=np.int64))
+
+    @classmethod
+    def load(cls, input_path):
+        """
+        Loads a track saved by `LabelTrack.save`, memory-mapping its
+        arrays.
+
+        Parameters
+        ----------
+        input_path : str
+            Path to the directory of the saved track.
+
+        Returns
+        -------
+        LabelTrack
+            The loaded track.
+
+        """
+        with open(os.path.join(input_path, "track.json")) as file_handle:
+            metadata = json.load(file_handle)
+        arrays = [np.load(os.path.join(input_path, name + ".npy"),
+                          mmap_mode='r')
+                  for name in _ARRAY_NAMES]
+        return cls(metadata["chroms"], metadata["features"], *arrays)
+
+    def save(self, output_path):
+        """
+        Saves the track to a directory.
+
+        Parameters
+        ----------
+        output_path : str
+            The path of the directory to create.
+
+        """
+        os.makedirs(output_path)
+        arrays = [self._segment_starts, self._segment_labels,
+                  self._label_sets, self._chrom_offsets]
+        for name, array in zip(_ARRAY_NAMES, arrays):
+            np.save(os.path.join(output_path, name + ".npy"), array)
+        with open(os.path.join(output_path, "track.json"), 'w') as \
+                file_handle:
+            json.dump({"chroms": self.chroms, "features": self.features},
+                      file_handle)
+
+    @property
+    def nbytes(self):
+        """
+        int : The number of bytes of the track arrays.
+        """
+        return sum(array.nbytes for array in [
+            self._segment_starts, self._segment_labels, self._label_sets,
+            self._chrom_offsets])
+
+    def get_packed_labels(self, chrom, positions):
+        """
+        Gets the bit-packed feature sets of positions on one chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        positions : numpy.ndarray
+            The 0-based positions.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=numpy.uint8
+            One row of :math:`\\lceil F / 8 \\rceil` bytes per position,
+            where bit `i` (in `numpy.packbits` order) is set if the
+            position is annotated with `features[i]`.
+
+        """
+        chrom_segments = self._chrom_segments.get(chrom)
+        if chrom_segments is None:
+            return np.zeros(np.shape(positions) + self._label_sets.shape[1:],
+                            dtype=np.uint8)
+        segment_starts, segment_labels = chrom_segments
+        segments = segment_starts.searchsorted(positions, side="right")
+        # positions before the chromosome start (segment -1) are unlabeled
+        return self._packed_label_sets[
+            segment_labels[segments - 1] * (segments > 0)]
+
+    def get_labels(self, chrom, positions):
+        """
+        Gets the features annotated to positions on one chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+            The name of the chromosome, e.g. "chr1".
+        positions : numpy.ndarray
+            The 0-based positions.
+
+        Returns
+        -------
+        numpy.ndarray, dtype=bool
+            A :math:`P \\times F` array that is `True` where position `p`
+            is annotated with `features[f]`.
+
+        """
+        return np.unpackbits(
+            self.get_packed_labels(chrom, positions), axis=-1,
+            count=len(self.features)).view(bool)
+
+
+def load_label_track(input_path):
+    """
+    Loads the `LabelTrack` of a BED file from its cache directory,
+    building the track and saving it if it does not exist or is older
+    than the BED file.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the BED file.
+
+    Returns
+    -------
+    LabelTrack
+        The track of the annotations in the file.
+
+    """
+    cache_path = input_path + LABEL_TRACK_EXTENSION
+    if os.path.isdir(cache_path):
+        if os.path.getmtime(cache_path) >= os.path.getmtime(input_path):
+            return LabelTrack.load(cache_path)
+        shutil.rmtree(cache_path, ignore_errors=True)
+    track = LabelTrack.from_bed(input_path)
+    tmp_path = "{0}.{1}.tmp".format(cache_path, os.getpid())
+    try:
+        track.save(tmp_path)
+        os.rename(tmp_path, cache_path)
+    except OSError as error:
+        # another process may have saved the track first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(cache_path):
+            logger.warning("Could not cache the label track of {0} "
+                           "({1}).".format(input_path, error))
+            return track
+    return LabelTrack.load(cache_path)
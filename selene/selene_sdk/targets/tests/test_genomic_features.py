@@ -122,72 +122,72 @@ class TestGenomicFeatures(unittest.TestCase):
 
     def test__get_feature_data_none_rows(self):
         query_chrom, query_start, query_end = (None, 10, 211)
-        threshold = np.array([0.50] * self.n_features).astype(np.float32)
 
         expected_encoding = [0, 0, 0, 0, 0, 0]
         observed_encoding = _get_feature_data(
-            query_chrom, query_start, query_end, threshold,
-            self.feature_index_map, self.get_feature_rows)
+            query_start, query_end, 201, 201, self.feature_index_map,
+            self.get_feature_rows(query_chrom, query_start, query_end))
 
         self.assertSequenceEqual(
             observed_encoding.tolist(), expected_encoding)
 
     def test__get_feature_data_empty_rows(self):
         query_chrom, query_start, query_end = ("7", 10, 211)
-        threshold = np.array([0.50] * self.n_features).astype(np.float32)
 
         expected_encoding = [0, 0, 0, 0, 0, 0]
         observed_encoding = _get_feature_data(
-            query_chrom, query_start, query_end, threshold,
-            self.feature_index_map, self.get_feature_rows)
+            query_start, query_end, 201, 201, self.feature_index_map,
+            self.get_feature_rows(query_chrom, query_start, query_end))
 
         self.assertSequenceEqual(
             observed_encoding.tolist(), expected_encoding)
 
     def test__get_feature_data_single_feat_positive(self):
+        # bin center 16225
         query_chrom, query_start, query_end = ("1", 16100, 16350)
-        threshold = np.array([0.50] * self.n_features).astype(np.float32)
 
         expected_encoding = [1, 0, 0, 0, 0, 0]
         observed_encoding = _get_feature_data(
-            query_chrom, query_start, query_end, threshold,
-            self.feature_index_map, self.get_feature_rows)
+            query_start, query_end, 250, 250, self.feature_index_map,
+            self.get_feature_rows(query_chrom, query_start, query_end))
 
         self.assertSequenceEqual(
             observed_encoding.tolist(), expected_encoding)
 
     def test__get_feature_data_no_feat_positive(self):
+        # bin center 91127, just before the features start
         query_chrom, query_start, query_end = ("2", 91027, 91228)
-        threshold = np.array([0.51] * self.n_features).astype(np.float32)
 
         expected_encoding = [0, 0, 0, 0, 0, 0]
         observed_encoding = _get_feature_data(
-            query_chrom, query_start, query_end, threshold,
-            self.feature_index_map, self.get_feature_rows)
+            query_start, query_end, 201, 201, self.feature_index_map,
+            self.get_feature_rows(query_chrom, query_start, query_end))
 
         self.assertSequenceEqual(
             observed_encoding.tolist(), expected_encoding)
 
     def test__get_feature_data_multiple_feats_positive(self):
+        # bin center 8669
         query_chrom, query_start, query_end = ("3", 8619, 8719)
-        threshold = np.array([0.50] * self.n_features).astype(np.float32)
 
         expected_encoding = [1, 1, 0, 0, 0, 1]
         observed_encoding = _get_feature_data(
-            query_chrom, query_start, query_end, threshold,
-            self.feature_index_map, self.get_feature_rows)
+            query_start, query_end, 100, 100, self.feature_index_map,
+            self.get_feature_rows(query_chrom, query_start, query_end))
 
         self.assertSequenceEqual(
             observed_encoding.tolist(), expected_encoding)
 
-    def test__get_feature_data_different_thresholds(self):
+    def test__get_feature_data_multiple_bins(self):
+        # bin centers 8644, 8669 and 8694
         query_chrom, query_start, query_end = ("3", 8619, 8719)
-        threshold = np.array([0.50, 0.0, 0.0, 0.0, 0.0, 1.0]).astype(np.float32)
 
-        expected_encoding = [1, 1, 1, 0, 1, 0]
+        expected_encoding = [1, 1, 1, 0, 0, 1,
+                             1, 1, 0, 0, 0, 1,
+                             1, 1, 0, 0, 0, 1]
         observed_encoding = _get_feature_data(
-            query_chrom, query_start, query_end, threshold,
-            self.feature_index_map, self.get_feature_rows)
+            query_start, query_end, 50, 25, self.feature_index_map,
+            self.get_feature_rows(query_chrom, query_start, query_end))
 
         self.assertSequenceEqual(
             observed_encoding.tolist(), expected_encoding)
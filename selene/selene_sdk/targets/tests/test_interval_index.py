@@ -0,0 +1,120 @@
+import os
+import unittest
+
+import numpy as np
+
+from selene_sdk.targets import GenomicFeatures
+from selene_sdk.targets.interval_index import FeatureIntervalIndex
+
+
+class TestFeatureIntervalIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        starts = rng.randint(0, 1000, size=300)
+        ends = starts + rng.randint(1, 50, size=300)
+        # long intervals that contain many others
+        starts[:5] = [0, 10, 20, 300, 301]
+        ends[:5] = [900, 400, 950, 700, 302]
+        self.starts, self.ends = starts, ends
+        self.features = rng.randint(0, 6, size=300)
+        self.index = FeatureIntervalIndex(
+            {"chr1": (starts, ends, self.features)})
+
+    def test_decomposition(self):
+        self.assertGreater(len(self.index._chroms["chr1"].components), 1)
+
+    def test_query(self):
+        query_starts = np.arange(0, 1100, 3)
+        query_ends = query_starts + np.tile([1, 7, 40], 367)[:367]
+        query_index, starts, ends, features = self.index.query(
+            "chr1", query_starts, query_ends)
+        for i, (start, end) in enumerate(zip(query_starts, query_ends)):
+            expected = sorted(
+                zip(self.starts[(self.starts < end) & (self.ends > start)],
+                    self.ends[(self.starts < end) & (self.ends > start)],
+                    self.features[(self.starts < end) &
+                                  (self.ends > start)]))
+            observed = sorted(zip(starts[query_index == i],
+                                  ends[query_index == i],
+                                  features[query_index == i]))
+            self.assertListEqual(observed, expected)
+
+    def test_query_unknown_chrom(self):
+        query_index, _, _, _ = self.index.query("chr2", [0], [10])
+        self.assertEqual(len(query_index), 0)
+
+
+class TestGenomicFeaturesInMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.input_path = os.path.join(
+            "selene_sdk", "targets", "tests", "files", "features.bed.gz")
+        self.features = ["CTCF", "eGFP-FOS", "GABP", "Pbx3", "Pol2", "TBP"]
+
+    def _get_targets(self, in_memory, bin_size, step_size):
+        return GenomicFeatures(
+            self.input_path, self.features, bin_size, step_size,
+            feature_thresholds={"default": 0.5, "TBP": 0.3},
+            in_memory=in_memory, use_label_track=False)
+
+    def test_get_feature_data(self):
+        for bin_size, step_size in [(200, 100), (1, 1), (50, 17)]:
+            tabix_targets = self._get_targets(False, bin_size, step_size)
+            memory_targets = self._get_targets(True, bin_size, step_size)
+            for chrom in ["chr1", "chr2", "chr3"]:
+                for start in range(0, 20000, 331):
+                    end = start + 1000
+                    np.testing.assert_array_equal(
+                        memory_targets.get_feature_data(chrom, start, end),
+                        tabix_targets.get_feature_data(chrom, start, end))
+
+    def test_get_feature_data_batch(self):
+        chroms = np.array(["chr1", "chr2", "chr3", "chr1"] * 15)
+        starts = np.arange(0, 18000, 300)
+        for in_memory in [False, True]:
+            targets = self._get_targets(in_memory, 200, 100)
+            batch = targets.get_feature_data_batch(
+                chroms, starts, starts + 1000)
+            self.assertEqual(batch.shape, (60, 6 * 9))
+            for i, (chrom, start) in enumerate(zip(chroms, starts)):
+                np.testing.assert_array_equal(
+                    batch[i],
+                    targets.get_feature_data(chrom, start, start + 1000))
+            sparse_batch = targets.get_feature_data_batch(
+                chroms, starts, starts + 1000, as_sparse=True)
+            np.testing.assert_array_equal(sparse_batch.toarray(), batch)
+
+    def test_get_feature_data_batch_n_threads(self):
+        chroms = np.array(["chr1", "chr2"] * 100)
+        starts = np.arange(0, 18000, 90)
+        batches = []
+        for n_threads in [1, 4]:
+            targets = GenomicFeatures(
+                self.input_path, self.features, 50, 17, in_memory=True,
+                use_label_track=False, n_threads=n_threads)
+            batches.append(targets.get_feature_data_batch(
+                chroms, starts, starts + 1000))
+        np.testing.assert_array_equal(batches[0], batches[1])
+
+    def test_get_feature_data_batch_unequal_lengths(self):
+        targets = self._get_targets(True, 200, 100)
+        with self.assertRaises(ValueError):
+            targets.get_feature_data_batch(
+                ["chr1", "chr1"], [0, 100], [1000, 1200])
+
+    def test_is_positive(self):
+        tabix_targets = self._get_targets(False, 200, 100)
+        memory_targets = self._get_targets(True, 200, 100)
+        for chrom in ["chr1", "chr2"]:
+            for start in range(0, 20000, 37):
+                for length in [10, 200]:
+                    self.assertEqual(
+                        memory_targets.is_positive(
+                            chrom, start, start + length),
+                        tabix_targets.is_positive(
+                            chrom, start, start + length))
+
+
+if __name__ == "__main__":
+    unittest.main()
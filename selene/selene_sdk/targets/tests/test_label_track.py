@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from selene_sdk.targets import GenomicFeatures
+from selene_sdk.targets.label_track import LABEL_TRACK_EXTENSION
+from selene_sdk.targets.label_track import LabelTrack
+from selene_sdk.targets.label_track import load_label_track
+
+
+class TestLabelTrack(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.tmp_dir, "features.bed.gz")
+        shutil.copyfile(
+            os.path.join("selene_sdk", "targets", "tests",
+                         "files", "features.bed.gz"),
+            self.input_path)
+        shutil.copyfile(
+            os.path.join("selene_sdk", "targets", "tests",
+                         "files", "features.bed.gz.tbi"),
+            self.input_path + ".tbi")
+        self.features = ["CTCF", "eGFP-FOS", "GABP", "Pbx3", "Pol2", "TBP"]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_from_bed(self):
+        bed_path = os.path.join(self.tmp_dir, "small.bed")
+        with open(bed_path, 'w') as file_handle:
+            file_handle.write("chr1\t10\t20\tB\n"
+                              "chr1\t15\t30\tA\n"
+                              "chr1\t20\t25\tB\n"
+                              "chr1\t40\t40\tA\n")
+        track = LabelTrack.from_bed(bed_path)
+        self.assertListEqual(track.features, ["A", "B"])
+        labels = track.get_labels("chr1", [-1, 9, 10, 15, 24, 25, 29, 30, 40])
+        self.assertListEqual(
+            labels.tolist(),
+            [[False, False], [False, False], [False, True], [True, True],
+             [True, True], [True, False], [True, False], [False, False],
+             [False, False]])
+        self.assertEqual(track.get_labels("chr2", [0]).shape, (1, 2))
+        self.assertFalse(track.get_labels("chr2", [0]).any())
+
+    def test_load_label_track(self):
+        track = load_label_track(self.input_path)
+        self.assertTrue(os.path.isdir(self.input_path + LABEL_TRACK_EXTENSION))
+        loaded = load_label_track(self.input_path)
+        self.assertIsInstance(loaded._segment_starts, np.memmap)
+        positions = np.arange(0, 20000, 7)
+        np.testing.assert_array_equal(loaded.get_labels("chr1", positions),
+                                      track.get_labels("chr1", positions))
+
+    def _compare_targets(self, features, bin_size, step_size,
+                         in_memory=False):
+        track_targets = GenomicFeatures(
+            self.input_path, features, bin_size, step_size,
+            use_label_track=True)
+        tabix_targets = GenomicFeatures(
+            self.input_path, features, bin_size, step_size,
+            in_memory=in_memory, use_label_track=False)
+        for chrom in ["chr1", "chr2", "chr3"]:
+            for start in range(0, 20000, 331):
+                np.testing.assert_array_equal(
+                    track_targets.get_feature_data(chrom, start, start + 41),
+                    tabix_targets.get_feature_data(chrom, start, start + 41))
+
+    def test_get_feature_data(self):
+        self._compare_targets(self.features, 1, 1)
+        self._compare_targets(self.features, 11, 5)
+
+    def test_get_feature_data_feature_subset(self):
+        # tabix raises a KeyError on the features that are left out
+        self._compare_targets(["TBP", "Missing", "CTCF"], 1, 1,
+                              in_memory=True)
+
+    def test_get_feature_data_batch(self):
+        targets = GenomicFeatures(
+            self.input_path, ["TBP", "Missing", "CTCF"], 1, 1,
+            use_label_track=True)
+        chroms = np.array(["chr2", "chr1", "chr3"] * 20)
+        starts = np.arange(0, 6000, 100)
+        batch = targets.get_feature_data_batch(chroms, starts, starts + 41)
+        for i, (chrom, start) in enumerate(zip(chroms, starts)):
+            np.testing.assert_array_equal(
+                batch[i], targets.get_feature_data(chrom, start, start + 41))
+        np.testing.assert_array_equal(
+            targets.get_feature_data_batch(
+                chroms, starts, starts + 41, as_sparse=True).toarray(),
+            batch)
+
+    def test_use_label_track_default(self):
+        self.assertTrue(
+            GenomicFeatures(self.input_path, self.features, 1, 1)
+            .use_label_track)
+        self.assertFalse(
+            GenomicFeatures(self.input_path, self.features, 200, 100)
+            .use_label_track)
+
+
+if __name__ == "__main__":
+    unittest.main()
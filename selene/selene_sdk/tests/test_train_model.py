@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+import torch
+import torch.nn as nn
+
+from selene_sdk import TrainModel
+from selene_sdk.samplers import MultiFileSampler
+from selene_sdk.samplers import RandomPositionsSampler
+from selene_sdk.samplers.file_samplers import MatFileSampler
+from selene_sdk.samplers.sampler_dataset import SamplerDataLoader
+from selene_sdk.samplers.sampler_dataset import SamplerMultiDataset
+from selene_sdk.sequences import Genome
+
+
+FEATURES = ["CTCF", "GABP", "Pbx3", "TBP", "eGFP-FOS"]
+
+
+class TestTrainModelResume(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.genome_path = os.path.join(self.tmp_dir, "small.fasta")
+        shutil.copy(os.path.join(os.path.dirname(__file__), "..",
+                                 "sequences", "tests", "files",
+                                 "small.fasta"),
+                    self.genome_path)
+        self.target_path = os.path.join(
+            os.path.dirname(__file__), "..", "targets", "tests", "files",
+            "features.bed.gz")
+        self.validate_path = os.path.join(self.tmp_dir, "validate.h5")
+        with h5py.File(self.validate_path, 'w') as file_handle:
+            file_handle.create_dataset(
+                "x", data=np.zeros((8, 4, 20), dtype=np.uint8))
+            file_handle.create_dataset(
+                "y", data=np.zeros((8, len(FEATURES)), dtype=np.uint8))
+        self.checkpoint_path = os.path.join(self.tmp_dir, "checkpoint.pth")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_sampler(self):
+        return RandomPositionsSampler(
+            Genome(self.genome_path), self.target_path, FEATURES, seed=3,
+            validation_holdout=["chr3"], test_holdout=["chr4"],
+            sequence_length=20, bin_size=10, step_size=10, bins_start=5,
+            bins_end=15, replacement=False)
+
+    def make_trainer(self, train_sampler):
+        model = nn.Sequential(
+            nn.Flatten(), nn.Linear(80, len(FEATURES)), nn.Sigmoid())
+        torch.save({"state_dict": model.state_dict(),
+                    "n_train_examples": 8}, self.checkpoint_path)
+        data_sampler = MultiFileSampler(
+            train_sampler, MatFileSampler(self.validate_path, "x",
+                                          targets_key="y"),
+            FEATURES)
+        return TrainModel(
+            model, data_sampler, nn.BCELoss(), torch.optim.SGD,
+            {"lr": 0.01}, 4, 10, os.path.join(self.tmp_dir, "output"),
+            checkpoint_resume=self.checkpoint_path)
+
+    def test_resume(self):
+        expected, _ = self.make_sampler().sample(12)
+        trainer = self.make_trainer(
+            SamplerDataLoader(self.make_sampler(), num_workers=0,
+                              batch_size=4))
+        self.assertEqual(trainer._n_train_examples, 8)
+        sequences, _ = next(iter(trainer._train_sampler))
+        np.testing.assert_array_equal(sequences.numpy(), expected[8:])
+
+    def test_resume_multi_dataset(self):
+        samplers = [self.make_sampler(), self.make_sampler()]
+        with self.assertLogs("selene", level="WARNING"):
+            self.make_trainer(torch.utils.data.DataLoader(
+                SamplerMultiDataset(samplers, batch_size=4)))
+        for sampler in samplers:
+            self.assertEqual(sampler._walk_start["train"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
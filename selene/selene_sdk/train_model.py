@@ -14,13 +14,18 @@ import torch
 import torch.nn as nn
 from torch.autograd import Variable
 from torch.optim.lr_scheduler import ReduceLROnPlateau
+from scipy import sparse
 from scipy.stats import rankdata
 from sklearn.metrics import roc_auc_score
 from sklearn.metrics import average_precision_score
 
+from .utils import densify_targets
+from .utils import expand_sequence_indices
 from .utils import initialize_logger
 from .utils import load_model_from_state_dict
 from .utils import PerformanceMetrics
+from .utils import sequences_to_tensor
+from .utils import targets_to_tensor
 
 
 logger = logging.getLogger("selene")
@@ -146,7 +151,11 @@ class TrainModel(object):
     checkpoint_resume : str or None, optional
         Default is `None`. If `checkpoint_resume` is not None, it should be the
         path to a model file generated by `torch.save` that can now be read
-        using `torch.load`.
+        using `torch.load`. If the training sampler draws without
+        replacement (see `selene_sdk.samplers.RandomPositionsSampler`),
+        it resumes after the training examples drawn before the
+        checkpoint. The samplers of a `SamplerMultiDataset` are not
+        resumed.
 
     Attributes
     ----------
@@ -267,6 +276,8 @@ class TrainModel(object):
 
         # self._start_step = 0
         self._min_loss = float("inf") # TODO: Should this be set when it is used later? Would need to if we want to train model 2x in one run.
+        # the number of training examples drawn, saved in the checkpoints
+        self._n_train_examples = 0
         if checkpoint_resume is not None:
             checkpoint = torch.load(
                 checkpoint_resume,
@@ -279,6 +290,9 @@ class TrainModel(object):
             if "optimizer" in checkpoint:
                 self.optimizer.load_state_dict(
                     checkpoint["optimizer"])
+            if "n_train_examples" in checkpoint:
+                self._n_train_examples = checkpoint["n_train_examples"]
+                self._seek_train_sampler(self._n_train_examples)
             if self.use_cuda:
                 for state in self.optimizer.state.values():
                     for k, v in state.items():
@@ -301,6 +315,29 @@ class TrainModel(object):
         self.multidatasets  = multidatasets
         self.disable_scheduler = disable_scheduler
 
+    def _seek_train_sampler(self, n_train_examples):
+        """
+        Resumes the walk of the online sampler that the training examples
+        are drawn from after its first `n_train_examples` examples (see
+        `selene_sdk.samplers.RandomPositionsSampler.seek`).
+
+        Parameters
+        ----------
+        n_train_examples : int
+            The number of training examples drawn so far.
+
+        """
+        dataset = getattr(self._train_sampler, "dataset", self._train_sampler)
+        if hasattr(dataset, "samplers"):
+            logger.warning(
+                "The samplers of a `SamplerMultiDataset` are not resumed "
+                "from the checkpoint, since the number of examples drawn "
+                "from each of them is not saved.")
+            return
+        online_sampler = getattr(dataset, "sampler", dataset)
+        if hasattr(online_sampler, "seek"):
+            online_sampler.seek(n_train_examples, mode="train")
+
     def _create_validation_set(self, n_samples=None, compute_metrics_on=None):
         """
         Generates the set of validation examples.
@@ -397,6 +434,8 @@ class TrainModel(object):
             inputs, targets = Variable(batch[0]), Variable(batch[1])
             if self.use_cuda:
                 inputs, targets = inputs.cuda(), targets.cuda()
+            inputs = expand_sequence_indices(inputs)
+            targets = densify_targets(targets)
             if self.multidatasets:
                 #TODO: deal with this better
                 try:
@@ -417,6 +456,7 @@ class TrainModel(object):
             loss.backward()
             self.optimizer.step()
             loss_value = loss.item()
+            self._n_train_examples += inputs.shape[0]
             t_f = time()
 
             if self.multidatasets:
@@ -432,7 +472,8 @@ class TrainModel(object):
                     "arch": self.model.__class__.__name__,
                     "state_dict": self.model.state_dict(),
                     "min_loss": min_loss,
-                    "optimizer": self.optimizer.state_dict()
+                    "optimizer": self.optimizer.state_dict(),
+                    "n_train_examples": self._n_train_examples
                 }
                 if self.save_new_checkpoints is not None and \
                         self.save_new_checkpoints >= i:
@@ -483,7 +524,8 @@ class TrainModel(object):
                           "arch": self.model.__class__.__name__,
                           "state_dict": self.model.state_dict(),
                           "min_loss": min_loss,
-                          "optimizer": self.optimizer.state_dict()}, True)
+                          "optimizer": self.optimizer.state_dict(),
+                          "n_train_examples": self._n_train_examples}, True)
                         logger.debug("Updating `best_model.pth.tar`")
                         logger.info("validation loss: {0}".format(validation_loss))
 
@@ -503,15 +545,15 @@ class TrainModel(object):
         #self.sampler.set_mode("train")
 
         inputs, targets = self._get_batch()
-        inputs = torch.Tensor(inputs)
-        targets = torch.Tensor(targets)
+        inputs = sequences_to_tensor(inputs)
+        targets = targets_to_tensor(targets)
 
         if self.use_cuda:
             inputs = inputs.cuda()
             targets = targets.cuda()
 
-        inputs = Variable(inputs)
-        targets = Variable(targets)
+        inputs = Variable(expand_sequence_indices(inputs))
+        targets = Variable(densify_targets(targets))
 
         predictions = self.model(inputs.transpose(1, 2))
         loss = self.criterion(predictions, targets)
@@ -551,18 +593,18 @@ class TrainModel(object):
         count = 0
         while count < data_targets.shape[0]:
             remainder = min(data_targets.shape[0] - count, self.batch_size)
-            inputs = data_seqs[count:count + remainder, :, :].astype(float)
-            targets = data_targets[count:count + remainder, :].astype(float)
-            inputs = torch.Tensor(inputs)
-            targets = torch.Tensor(targets)
+            inputs = data_seqs[count:count + remainder]
+            targets = data_targets[count:count + remainder, :]
+            inputs = sequences_to_tensor(inputs)
+            targets = targets_to_tensor(targets)
 
             if self.use_cuda:
                 inputs = inputs.cuda()
                 targets = targets.cuda()
 
             with torch.no_grad():
-                inputs = Variable(inputs)
-                targets = Variable(targets)
+                inputs = Variable(expand_sequence_indices(inputs))
+                targets = Variable(densify_targets(targets))
                 predictions = self.model(
                     inputs.transpose(1, 2))
                 loss = self.criterion(predictions, targets)
@@ -639,7 +681,17 @@ class TrainModel(object):
 
         output_file = os.path.join(self.output_dir, "test_targets_and_preds.h5")
         with h5py.File(output_file, 'w') as fh:
-            fh.create_dataset("targets", data=self._all_test_targets)
+            if sparse.issparse(self._all_test_targets):
+                # densified one batch at a time
+                targets = fh.create_dataset(
+                    "targets", shape=self._all_test_targets.shape,
+                    dtype=np.float64)
+                for start in range(0, targets.shape[0], self.batch_size):
+                    end = start + self.batch_size
+                    targets[start:end] = \
+                        self._all_test_targets[start:end].toarray()
+            else:
+                fh.create_dataset("targets", data=self._all_test_targets)
             fh.create_dataset("preds", data=all_predictions)
 
         average_scores["loss"] = average_loss
@@ -9,6 +9,13 @@ from .utils import get_indices_and_probabilities
 from .utils import initialize_logger
 from .utils import load_features_list
 from .utils import load_model_from_state_dict
+from .utils import expand_sequence_indices
+from .utils import unpack_sequence_bits
+from .utils import unpack_target_bits
+from .utils import sequences_to_tensor
+from .utils import targets_to_tensor
+from .utils import densify_targets
+from .utils import sparse_tensor_to_csr
 from .performance_metrics import PerformanceMetrics
 from .performance_metrics import visualize_roc_curves
 from .performance_metrics import visualize_precision_recall_curves
@@ -24,6 +31,13 @@ from .example_model import DeeperDeepSEA
 __all__ = ["initialize_logger",
            "load_features_list",
            "load_model_from_state_dict",
+           "expand_sequence_indices",
+           "unpack_sequence_bits",
+           "unpack_target_bits",
+           "sequences_to_tensor",
+           "targets_to_tensor",
+           "densify_targets",
+           "sparse_tensor_to_csr",
            "PerformanceMetrics",
            "load",
            "load_path",
@@ -8,6 +8,7 @@ import os
 
 from joblib import Parallel, delayed
 import numpy as np
+from scipy import sparse
 from sklearn.metrics import average_precision_score
 from sklearn.metrics import precision_recall_curve
 from sklearn.metrics import roc_auc_score
@@ -172,6 +173,27 @@ def visualize_precision_recall_curves(
                 dpi=dpi)
 
 
+def _feature_positives(target):
+    """
+    Gets the number of positives of each feature and a function that
+    returns the dense target column of a feature. Sparse targets are
+    only densified one column at a time, from the rows of the
+    positives of the feature.
+    """
+    if not sparse.issparse(target):
+        return (np.count_nonzero(target, axis=0),
+                lambda index: target[:, index].ravel())
+    target = sparse.csc_matrix(target)
+    target.eliminate_zeros()
+
+    def get_feature_targets(index):
+        feature_targets = np.zeros(target.shape[0])
+        start, end = target.indptr[index], target.indptr[index + 1]
+        feature_targets[target.indices[start:end]] = target.data[start:end]
+        return feature_targets
+    return np.diff(target.indptr), get_feature_targets
+
+
 def compute_score(prediction, target, metric_fn,
                   report_gt_feature_n_positives=10,
                   num_workers=1):
@@ -183,8 +205,10 @@ def compute_score(prediction, target, metric_fn,
     ----------
     prediction : numpy.ndarray
         Value predicted by user model.
-    target : numpy.ndarray
-        True value that the user model was trying to predict.
+    target : numpy.ndarray or scipy.sparse.spmatrix
+        True value that the user model was trying to predict. If it is
+        sparse, features without enough positives are skipped without
+        densifying their column.
     metric_fn : types.FunctionType
         A metric that can measure the distance between the prediction
         and target variables.
@@ -213,13 +237,19 @@ def compute_score(prediction, target, metric_fn,
                 return np.nan
         else:
             return np.nan
+    n_positives, get_feature_targets = _feature_positives(target)
+    scored_features = [i for i in range(prediction.shape[1])
+                       if n_positives[i] > report_gt_feature_n_positives]
+    feature_scores = [np.nan] * prediction.shape[1]
     with Parallel(n_jobs=num_workers) as parallel:
-        feature_scores = parallel(
+        scores = parallel(
             delayed(_compute_score)(prediction[:, i],
-                                    target[:, i].ravel(),
+                                    get_feature_targets(i),
                                     metric_fn,
                                     report_gt_feature_n_positives)
-            for i in range(prediction.shape[1]))
+            for i in scored_features)
+    for i, score in zip(scored_features, scores):
+        feature_scores[i] = score
     valid_feature_scores = [s for s in feature_scores if not np.isnan(s)] # Allow 0 or negative values.
     if not valid_feature_scores:
         return None, feature_scores
@@ -355,8 +385,9 @@ class PerformanceMetrics(object):
         ----------
         prediction : numpy.ndarray
             Value predicted by user model.
-        target : numpy.ndarray
-            True value that the user model was trying to predict.
+        target : numpy.ndarray or scipy.sparse.spmatrix
+            True value that the user model was trying to predict. Sparse
+            targets are scored from the positives of each feature.
 
         Returns
         -------
@@ -407,6 +438,8 @@ class PerformanceMetrics(object):
 
         """
         os.makedirs(output_dir, exist_ok=True)
+        if sparse.issparse(target):
+            target = target.toarray()
         if "roc_auc" in self.metrics:
             visualize_roc_curves(
                 prediction, target, output_dir,
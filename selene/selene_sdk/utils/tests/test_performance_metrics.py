@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+from scipy import sparse
+import torch
+
+from selene_sdk.samplers.sampler_dataset import collate_examples
+from selene_sdk.utils import densify_targets
+from selene_sdk.utils import PerformanceMetrics
+from selene_sdk.utils import sparse_tensor_to_csr
+from selene_sdk.utils import targets_to_tensor
+
+
+class TestSparseTargets(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        self.targets = (rng.random_sample((500, 40)) <
+                        np.linspace(0, 0.2, 40)).astype(float)
+        self.predictions = np.clip(
+            self.targets * 0.3 + rng.random_sample((500, 40)), 0, 1)
+
+    def test_update_sparse_equals_dense(self):
+        dense_metrics = PerformanceMetrics(str)
+        sparse_metrics = PerformanceMetrics(str)
+        dense_scores = dense_metrics.update(self.predictions, self.targets)
+        sparse_scores = sparse_metrics.update(
+            self.predictions, sparse.csr_matrix(self.targets))
+        self.assertEqual(dense_scores.keys(), sparse_scores.keys())
+        for name in dense_scores:
+            self.assertAlmostEqual(dense_scores[name], sparse_scores[name])
+            np.testing.assert_array_equal(
+                dense_metrics.metrics[name].data[0],
+                sparse_metrics.metrics[name].data[0])
+        # features with too few positives are not scored
+        self.assertTrue(np.isnan(sparse_metrics.metrics["roc_auc"].data[0][0]))
+
+    def test_targets_to_tensor(self):
+        tensor = targets_to_tensor(sparse.csr_matrix(self.targets))
+        self.assertTrue(tensor.is_sparse)
+        np.testing.assert_array_equal(
+            densify_targets(tensor).numpy(), self.targets)
+        np.testing.assert_array_equal(
+            sparse_tensor_to_csr(tensor).toarray(), self.targets)
+        dense = targets_to_tensor(self.targets)
+        self.assertFalse(dense.is_sparse)
+        self.assertEqual(dense.dtype, torch.float32)
+        self.assertIs(densify_targets(dense), dense)
+
+    def test_collate_examples(self):
+        examples = [
+            (torch.zeros(10, dtype=torch.uint8),
+             targets_to_tensor(sparse.csr_matrix(self.targets[i:i + 1]))[0])
+            for i in range(4)]
+        sequences, targets = collate_examples(examples)
+        self.assertEqual(tuple(sequences.shape), (4, 10))
+        np.testing.assert_array_equal(
+            targets.to_dense().numpy(), self.targets[:4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+import torch
+
+from selene_sdk.utils import expand_sequence_indices
+from selene_sdk.utils import sequences_to_tensor
+
+
+class TestSequencesToTensor(unittest.TestCase):
+
+    def setUp(self):
+        self.indices = np.array([[0, 1, 2, 3, 4], [3, 3, 0, 4, 1]],
+                                dtype=np.uint8)
+        table = np.vstack([np.eye(4), np.full((1, 4), 0.25)])
+        self.encodings = table[self.indices].astype(np.float32)
+
+    def test_indices(self):
+        inputs = sequences_to_tensor(self.indices)
+        self.assertEqual(inputs.dtype, torch.uint8)
+        self.assertEqual(inputs.shape, (2, 5))
+        np.testing.assert_array_equal(
+            expand_sequence_indices(inputs).numpy(), self.encodings)
+
+    def test_one_hot_encodings(self):
+        # e.g. DeepSEA `*.mat` files, which store uint8 one-hot encodings
+        one_hot = np.eye(4, dtype=np.uint8)[self.indices % 4]
+        for sequences in [one_hot, one_hot.astype(bool),
+                          one_hot.astype(np.float64)]:
+            inputs = sequences_to_tensor(sequences)
+            self.assertEqual(inputs.dtype, torch.float32)
+            self.assertEqual(inputs.shape, (2, 5, 4))
+            inputs = expand_sequence_indices(inputs)
+            self.assertEqual(inputs.dtype, torch.float32)
+            np.testing.assert_array_equal(inputs.numpy(), one_hot)
+
+    def test_expand_encoded_tensors(self):
+        one_hot = torch.from_numpy(np.eye(4, dtype=np.uint8)[
+            self.indices % 4])
+        for inputs in [one_hot, one_hot.bool()]:
+            outputs = expand_sequence_indices(inputs)
+            self.assertEqual(outputs.dtype, torch.float32)
+            self.assertEqual(outputs.shape, (2, 5, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
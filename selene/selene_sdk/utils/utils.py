@@ -8,7 +8,9 @@ from collections import OrderedDict
 import logging
 
 import numpy as np
+from scipy import sparse
 import sys
+import torch
 
 
 def get_indices_and_probabilities(interval_lengths, indices):
@@ -94,6 +96,210 @@ def load_model_from_state_dict(state_dict, model):
     return model
 
 
+def sequences_to_tensor(sequences):
+    """
+    Converts a batch of sequences to a tensor for the model. Base
+    indices (a :math:`B \\times L` integer array) are kept compact, so
+    that they are only expanded to one-hot encodings on the device by
+    `expand_sequence_indices`. Encodings are converted to
+    `torch.float32`, whatever their dtype.
+
+    Parameters
+    ----------
+    sequences : numpy.ndarray
+        The :math:`B \\times L \\times N` encodings or the
+        :math:`B \\times L` base indices of the sequences.
+
+    Returns
+    -------
+    torch.Tensor
+        The sequences as a tensor.
+
+    """
+    if sequences.ndim == 2 and np.issubdtype(sequences.dtype, np.integer):
+        return torch.from_numpy(np.ascontiguousarray(sequences))
+    return torch.from_numpy(sequences.astype(np.float32))
+
+
+def expand_sequence_indices(inputs, n_bases=4):
+    """
+    Expands a batch of base indices (see
+    `selene_sdk.sequences.Genome.sequence_to_indices`) to one-hot
+    encodings on the device that holds them. Use this just before
+    passing the batch to the model, so that only the indices are
+    copied from the host.
+
+    Parameters
+    ----------
+    inputs : torch.Tensor
+        A :math:`B \\times L` integer tensor of base indices, where
+        `n_bases` is the index of an unknown base. Tensors of any other
+        shape are assumed to be encoded already, and are only converted
+        to `torch.float32`.
+    n_bases : int, optional
+        Default is 4. The size :math:`N` of the sequence alphabet.
+
+    Returns
+    -------
+    torch.Tensor
+        The :math:`B \\times L \\times N` `torch.float32` encodings.
+        Unknown bases are encoded as :math:`1 / N` in every column.
+
+    """
+    if inputs.dim() != 2 or inputs.is_floating_point():
+        return inputs.float()
+    table = torch.cat([
+        torch.eye(n_bases, device=inputs.device),
+        torch.full((1, n_bases), 1. / n_bases, device=inputs.device)])
+    return table[inputs.long()]
+
+
+_BIT_TABLES = {}
+"""
+The `256 x 8` tables of the bits of each byte, most significant first
+(as `numpy.unpackbits`), as `torch.float32` tensors keyed by device.
+"""
+
+
+def _unpack_bits(packed):
+    """
+    Unpacks the bytes of an integer tensor along its last axis to
+    `torch.float32` bits on the device that holds it.
+    """
+    table = _BIT_TABLES.get(packed.device)
+    if table is None:
+        table = torch.from_numpy(np.unpackbits(
+            np.arange(256, dtype=np.uint8)[:, None], axis=1)).to(
+                device=packed.device, dtype=torch.float32)
+        _BIT_TABLES[packed.device] = table
+    return table[packed.long()].flatten(-2)
+
+
+def unpack_sequence_bits(packed, length):
+    """
+    Unpacks a batch of sequence encodings packed with `numpy.packbits`
+    along the sequence length axis (see
+    `selene_sdk.samplers.file_samplers.H5Dataset`) on the device that
+    holds them. Use this just before passing the batch to the model,
+    so that only the packed bits are copied from the host.
+
+    Parameters
+    ----------
+    packed : torch.Tensor
+        The :math:`B \\times \\lceil L / 8 \\rceil \\times N`
+        `torch.uint8` packed encodings.
+    length : int
+        The sequence length :math:`L`.
+
+    Returns
+    -------
+    torch.Tensor
+        The :math:`B \\times L \\times N` `torch.float32` encodings.
+        Unknown bases, whose bits are all set, are encoded as
+        :math:`1 / N` in every column.
+
+    """
+    bits = _unpack_bits(packed.transpose(-1, -2))[..., :length]
+    bits = bits.transpose(-1, -2)
+    n_bases = bits.shape[-1]
+    return torch.where(bits.sum(dim=-1, keepdim=True) == n_bases,
+                       1. / n_bases, bits).contiguous()
+
+
+def unpack_target_bits(packed, length):
+    """
+    Unpacks a batch of targets packed with `numpy.packbits` along the
+    feature axis on the device that holds them.
+
+    Parameters
+    ----------
+    packed : torch.Tensor
+        The :math:`B \\times \\lceil F / 8 \\rceil` `torch.uint8`
+        packed targets.
+    length : int
+        The number of features :math:`F`.
+
+    Returns
+    -------
+    torch.Tensor
+        The :math:`B \\times F` `torch.float32` targets.
+
+    """
+    return _unpack_bits(packed)[..., :length]
+
+
+def targets_to_tensor(targets):
+    """
+    Converts a batch of targets to a tensor for the loss. Sparse
+    targets (see `OnlineSampler.sparse_targets`) are converted to a
+    sparse tensor of their positives, so that only the positives are
+    copied to the device, where `densify_targets` expands them.
+
+    Parameters
+    ----------
+    targets : numpy.ndarray or scipy.sparse.spmatrix
+        The :math:`B \\times F` targets.
+
+    Returns
+    -------
+    torch.Tensor
+        The `torch.float32` targets, as a sparse COO tensor if `targets`
+        is sparse.
+
+    """
+    if sparse.issparse(targets):
+        targets = targets.tocoo()
+        indices = np.vstack([targets.row, targets.col]).astype(np.int64)
+        return torch.sparse_coo_tensor(
+            torch.from_numpy(indices),
+            torch.from_numpy(targets.data.astype(np.float32)),
+            targets.shape).coalesce()
+    return torch.from_numpy(np.asarray(targets, dtype=np.float32))
+
+
+def densify_targets(targets):
+    """
+    Expands sparse targets to a dense tensor on the device that holds
+    them. Use this just before computing the loss.
+
+    Parameters
+    ----------
+    targets : torch.Tensor
+        The targets. Dense tensors are returned unchanged.
+
+    Returns
+    -------
+    torch.Tensor
+        The dense targets.
+
+    """
+    if targets.is_sparse:
+        return targets.to_dense()
+    return targets
+
+
+def sparse_tensor_to_csr(targets):
+    """
+    Converts a 2-D sparse tensor of targets (e.g. a batch from a data
+    loader with sparse targets) to a `scipy.sparse.csr_matrix`.
+
+    Parameters
+    ----------
+    targets : torch.Tensor
+        The :math:`B \\times F` sparse COO targets.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        The targets.
+
+    """
+    targets = targets.coalesce().cpu()
+    rows, cols = targets.indices().numpy()
+    return sparse.csr_matrix(
+        (targets.values().numpy(), (rows, cols)), shape=tuple(targets.shape))
+
+
 def load_features_list(input_path):
     """
     Reads in a file of distinct feature names line-by-line and returns
@@ -1,4 +1,5 @@
 import os
+import sys
 
 import numpy as np
 from setuptools import find_packages
@@ -20,17 +21,18 @@ else:
 
 ext = '.pyx' if USING_CYTHON else '.c'
 
-genome_module = Extension(
-    "selene_sdk.sequences._sequence",
-    ["selene_sdk/sequences/_sequence" + ext],
-    include_dirs=[np.get_include()])
+# the batch target builder runs its queries in OpenMP threads, which
+# Apple's compiler does not support out of the box
+openmp_args = [] if sys.platform == "darwin" else ["-fopenmp"]
 
 genomic_features_module = Extension(
     "selene_sdk.targets._genomic_features",
     ["selene_sdk/targets/_genomic_features" + ext],
-    include_dirs=[np.get_include()])
+    include_dirs=[np.get_include()],
+    extra_compile_args=openmp_args,
+    extra_link_args=openmp_args)
 
-ext_modules = [genome_module, genomic_features_module]
+ext_modules = [genomic_features_module]
 cmdclass = {'build_ext': build_ext} if USING_CYTHON else {}
 
 setup(name="selene-sdk",
@@ -57,8 +59,13 @@ setup(name="selene-sdk",
       ],
       ext_modules=ext_modules,
       cmdclass=cmdclass,
+      entry_points={
+        "console_scripts": [
+            "selene-genome-pack=selene_sdk.sequences.genome_pack:main"
+        ]
+      },
       install_requires=[
-        "cython>=0.27.3",
+        "cython>=0.29.31",
         "h5py",
         "matplotlib>=2.2.3",
         "numpy",